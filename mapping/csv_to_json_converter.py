@@ -90,6 +90,19 @@ def convert_csv_to_json():
         "shops": shops_data
     }
     
+    # 保留手動維護的候選密碼擴展規則、匯出標題列與平台排程設定（CSV 中沒有這些欄位）
+    if json_file.exists():
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+        except (OSError, ValueError):
+            existing = {}
+        for key, label in (("candidate_rules", "候選密碼擴展規則"), ("export_headers", "匯出標題列設定"),
+                           ("schedule", "平台排程設定")):
+            if existing.get(key):
+                result[key] = existing[key]
+                print(f"[INFO] 保留既有的{label}：{', '.join(existing[key])}")
+    
     # 寫入 JSON 檔案
     with open(json_file, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
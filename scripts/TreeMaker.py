@@ -6,17 +6,23 @@ File: TreeMaker.py
 說明: 簡單的專案目錄樹結構生成工具，建立專案資料夾結構的視覺化表示
      將目錄樹結構儲存到 tree.txt，適用於文件記錄和專案結構概覽
      自動掃描專案資料夾並生成層級式目錄結構
+     以 os.scandir 逐層走訪（不遞迴），每一行直接寫入輸出檔，
+     數十萬個檔案的 output/ 也只需固定的記憶體；--workers 可平行預先列出子目錄（網路磁碟上較有效）
 重要提醒: 輸出檔案為根目錄的 tree.txt
 Authors: 楊翔志 & AI Collective
 Studio: tranquility-base
-版本: 1.1 (2025-07-14)
+版本: 1.2 (2026-10-19)
 """
 import os
+import re
 import argparse
+import datetime
+import fnmatch
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, TextIO
 
 EXCLUDE_DIRS = {
-    '.git', '__pycache__', '.mypy_cache', '.pytest_cache', '.DS_Store', 
+    '.git', '__pycache__', '.mypy_cache', '.pytest_cache', '.DS_Store',
     'dist', 'build', '.coverage', '.tox', '.eggs'
 }
 
@@ -25,71 +31,212 @@ EXCLUDE_FILES = {
     '*.pyc', '*.pyo', '*.pyd', '__pycache__'
 }
 
-def should_exclude_dir(dir_name: str) -> bool:
-    """檢查目錄是否應該被排除"""
-    return dir_name in EXCLUDE_DIRS or dir_name.startswith('.')
+# 每個目錄最多預先列出幾個子目錄（--workers 大於 1 時）
+PREFETCH_PER_WORKER = 4
 
-def should_exclude_file(file_name: str) -> bool:
-    """檢查檔案是否應該被排除"""
-    return (file_name in EXCLUDE_FILES or 
-            file_name.startswith('.') or 
-            file_name.endswith(('.pyc', '.pyo', '.pyd')))
 
-def generate_tree(directory: Path, prefix: str = "", is_last: bool = True, max_depth: int = None, current_depth: int = 0) -> str:
+class Excluder:
     """
-    生成目錄樹結構
-    
+    排除規則：名稱完全相同或符合萬用字元（*.pyc）即排除，以 . 開頭的項目一律排除
+    萬用字元在建立時就編譯成一個正規表示式，不必每個項目逐一比對
+    """
+
+    def __init__(self, dir_patterns: Iterable[str] = EXCLUDE_DIRS, file_patterns: Iterable[str] = EXCLUDE_FILES):
+        self.dir_names, self.dir_regex = self._compile(dir_patterns)
+        self.file_names, self.file_regex = self._compile(file_patterns)
+
+    @staticmethod
+    def _compile(patterns: Iterable[str]):
+        names = set()
+        globs = []
+        for pattern in patterns:
+            if any(char in pattern for char in "*?["):
+                globs.append(fnmatch.translate(pattern))
+            else:
+                names.add(pattern)
+        regex = re.compile("|".join(globs)) if globs else None
+        return names, regex
+
+    def exclude_dir(self, name: str) -> bool:
+        """檢查目錄是否應該被排除"""
+        return (name.startswith('.') or name in self.dir_names
+                or (self.dir_regex is not None and self.dir_regex.match(name) is not None))
+
+    def exclude_file(self, name: str) -> bool:
+        """檢查檔案是否應該被排除"""
+        return (name.startswith('.') or name in self.file_names
+                or (self.file_regex is not None and self.file_regex.match(name) is not None))
+
+
+def list_directory(path: str, excluder: Excluder) -> Optional[List[tuple]]:
+    """
+    列出目錄內容：[(名稱, 是否為目錄, 完整路徑, 是否可進入)]，目錄在前、依名稱排序（不分大小寫）
+
+    使用 DirEntry 快取的類型資訊，不對每個項目另外 stat；指向目錄的符號連結照常列出但不進入（避免循環）；
+    無權限時回傳 None
+    """
+    items = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                    if is_dir:
+                        if excluder.exclude_dir(entry.name):
+                            continue
+                    elif not entry.is_file() or excluder.exclude_file(entry.name):
+                        continue
+                except OSError:
+                    continue
+                items.append((entry.name, is_dir, entry.path, is_dir and not entry.is_symlink()))
+    except PermissionError:
+        return None
+    items.sort(key=lambda item: (not item[1], item[0].lower()))
+    return items
+
+
+def walk_files(root: Path, excluder: Optional[Excluder] = None) -> Iterator[tuple]:
+    """
+    逐一產生 root 下的檔案 (相對路徑 POSIX 格式, DirEntry)，供輸入清單等工具使用
+
+    以堆疊逐層走訪（不遞迴），不進入符號連結的目錄；DirEntry.stat() 在 Windows 上不需另外呼叫系統
+    """
+    excluder = excluder or Excluder()
+    stack = [(str(root), "")]
+    while stack:
+        path, relative = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not excluder.exclude_dir(name):
+                                stack.append((entry.path, f"{relative}{name}/"))
+                        elif entry.is_file() and not excluder.exclude_file(name):
+                            yield f"{relative}{name}", entry
+                    except OSError:
+                        continue
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            continue
+
+
+def iter_tree(directory: Path, max_depth: Optional[int] = None, excluder: Optional[Excluder] = None,
+              workers: int = 1) -> Iterator[str]:
+    """
+    逐行產生目錄樹（不含結尾換行）
+
+    Args:
+        directory: 目錄路徑
+        max_depth: 最大深度限制
+        excluder: 排除規則（預設為 EXCLUDE_DIRS / EXCLUDE_FILES）
+        workers: 大於 1 時以執行緒預先列出接下來要走訪的子目錄，輸出順序不變
+    """
+    excluder = excluder or Excluder()
+    if max_depth is not None and max_depth <= 0:
+        return
+    pool = None
+    if workers > 1:
+        import concurrent.futures
+        pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="tree")
+    window = workers * PREFETCH_PER_WORKER
+
+    class Frame:
+        """一層目錄的走訪狀態；pending 為已送出的子目錄列表工作 {項目索引: future}"""
+
+        def __init__(self, items, prefix, depth):
+            self.items = items
+            self.prefix = prefix
+            self.depth = depth
+            self.index = 0
+            self.pending = {}
+            self.scheduled = 0  # 下一個要檢查是否預先列出的項目索引
+
+        def prefetch(self):
+            if pool is None or (max_depth is not None and self.depth + 1 >= max_depth):
+                return
+            while len(self.pending) < window and self.scheduled < len(self.items):
+                name, is_dir, path, descend = self.items[self.scheduled]
+                if descend:
+                    self.pending[self.scheduled] = pool.submit(list_directory, path, excluder)
+                self.scheduled += 1
+
+    try:
+        items = list_directory(str(directory), excluder)
+        if items is None:
+            yield "└── [權限不足]"
+            return
+        stack = [Frame(items, "", 0)]
+        stack[0].prefetch()
+        while stack:
+            frame = stack[-1]
+            if frame.index >= len(frame.items):
+                stack.pop()
+                continue
+            index = frame.index
+            name, is_dir, path, descend = frame.items[index]
+            frame.index += 1
+            is_last_item = index == len(frame.items) - 1
+
+            # 選擇適當的符號
+            if is_last_item:
+                current_prefix = "└── "
+                next_prefix = frame.prefix + "    "
+            else:
+                current_prefix = "├── "
+                next_prefix = frame.prefix + "│   "
+
+            if not is_dir:
+                yield f"{frame.prefix}{current_prefix}{name}"
+                continue
+            yield f"{frame.prefix}{current_prefix}{name}/"
+            future = frame.pending.pop(index, None)
+            frame.prefetch()
+            if not descend or (max_depth is not None and frame.depth + 1 >= max_depth):
+                continue
+            children = future.result() if future is not None else list_directory(path, excluder)
+            if children is None:
+                yield f"{next_prefix}└── [權限不足]"
+                continue
+            child = Frame(children, next_prefix, frame.depth + 1)
+            child.prefetch()
+            stack.append(child)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def write_tree(out: TextIO, directory: Path, max_depth: Optional[int] = None, excluder: Optional[Excluder] = None,
+               workers: int = 1) -> dict:
+    """
+    將目錄樹逐行寫入 out，回傳統計 {"dirs", "files", "lines"}
+    """
+    stats = {"dirs": 0, "files": 0, "lines": 0}
+    for line in iter_tree(directory, max_depth, excluder, workers):
+        out.write(line)
+        out.write("\n")
+        stats["lines"] += 1
+        if line.endswith("/"):
+            stats["dirs"] += 1
+        elif not line.endswith("[權限不足]"):
+            stats["files"] += 1
+    return stats
+
+
+def generate_tree(directory: Path, max_depth: int = None, excluder: Optional[Excluder] = None) -> str:
+    """
+    生成目錄樹字串（小型目錄用；大型目錄請用 write_tree 直接寫檔）
+
     Args:
         directory: 目錄路徑
-        prefix: 前綴字串
-        is_last: 是否為最後一個項目
         max_depth: 最大深度限制
-        current_depth: 當前深度
-    
+        excluder: 排除規則
+
     Returns:
         目錄樹字串
     """
-    if max_depth is not None and current_depth >= max_depth:
-        return ""
-    
-    tree_lines = []
-    
-    # 獲取目錄中的所有項目，排序並分組
-    try:
-        items = list(directory.iterdir())
-        items.sort(key=lambda x: (x.is_file(), x.name.lower()))
-    except PermissionError:
-        return f"{prefix}└── [權限不足]\n"
-    
-    # 過濾掉需要排除的項目
-    filtered_items = []
-    for item in items:
-        if item.is_dir() and not should_exclude_dir(item.name):
-            filtered_items.append(item)
-        elif item.is_file() and not should_exclude_file(item.name):
-            filtered_items.append(item)
-    
-    for i, item in enumerate(filtered_items):
-        is_last_item = i == len(filtered_items) - 1
-        
-        # 選擇適當的符號
-        if is_last_item:
-            current_prefix = "└── "
-            next_prefix = prefix + "    "
-        else:
-            current_prefix = "├── "
-            next_prefix = prefix + "│   "
-        
-        # 添加項目名稱
-        if item.is_dir():
-            tree_lines.append(f"{prefix}{current_prefix}{item.name}/")
-            # 遞歸處理子目錄
-            subtree = generate_tree(item, next_prefix, is_last_item, max_depth, current_depth + 1)
-            tree_lines.append(subtree)
-        else:
-            tree_lines.append(f"{prefix}{current_prefix}{item.name}")
-    
-    return "\n".join(tree_lines) + "\n" if tree_lines else ""
+    lines = list(iter_tree(directory, max_depth, excluder))
+    return "\n".join(lines) + "\n" if lines else ""
 
 def main():
     """主函數"""
@@ -97,47 +244,49 @@ def main():
     parser.add_argument("--path", "-p", type=str, default=".", help="要掃描的目錄路徑 (預設: 當前目錄)")
     parser.add_argument("--output", "-o", type=str, default="tree.txt", help="輸出檔案名稱 (預設: tree.txt)")
     parser.add_argument("--max-depth", "-d", type=int, help="最大掃描深度")
-    parser.add_argument("--exclude", "-e", nargs="*", help="額外排除的目錄或檔案")
-    
+    parser.add_argument("--exclude", "-e", nargs="*", help="額外排除的目錄或檔案（可用萬用字元，例如 *.log）")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="平行列出子目錄的執行緒數，網路磁碟或大型目錄可設 4~8 (預設: 1)")
+
     args = parser.parse_args()
-    
+
     # 處理路徑
     target_dir = Path(args.path).resolve()
     if not target_dir.exists():
         print(f"❌ 錯誤：目錄 '{target_dir}' 不存在")
         return
-    
+
     if not target_dir.is_dir():
         print(f"❌ 錯誤：'{target_dir}' 不是一個目錄")
         return
-    
+
     # 處理額外排除項目
+    dir_patterns = set(EXCLUDE_DIRS)
+    file_patterns = set(EXCLUDE_FILES)
     if args.exclude:
         for item in args.exclude:
             if item.startswith('.'):
-                EXCLUDE_DIRS.add(item)
+                dir_patterns.add(item)
             else:
-                EXCLUDE_FILES.add(item)
-    
+                file_patterns.add(item)
+    excluder = Excluder(dir_patterns, file_patterns)
+
     print(f"🌳 正在生成目錄樹...")
     print(f"📁 掃描目錄：{target_dir}")
     print(f"📄 輸出檔案：{args.output}")
     if args.max_depth:
         print(f"📏 最大深度：{args.max_depth}")
-    
-    # 生成目錄樹
-    tree_content = f"專案目錄樹結構\n"
-    tree_content += f"掃描路徑：{target_dir}\n"
-    tree_content += f"生成時間：{os.popen('date /t & time /t').read().strip()}\n"
-    tree_content += "=" * 50 + "\n\n"
-    tree_content += generate_tree(target_dir, max_depth=args.max_depth)
-    
-    # 寫入檔案
+
+    # 生成目錄樹：邊走訪邊寫入
     try:
         with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(tree_content)
+            f.write(f"專案目錄樹結構\n")
+            f.write(f"掃描路徑：{target_dir}\n")
+            f.write(f"生成時間：{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("=" * 50 + "\n\n")
+            stats = write_tree(f, target_dir, args.max_depth, excluder, max(1, args.workers))
         print(f"✅ 目錄樹已成功生成：{args.output}")
-        print(f"📊 檔案大小：{os.path.getsize(args.output)} bytes")
+        print(f"📊 {stats['dirs']} 個目錄、{stats['files']} 個檔案，檔案大小：{os.path.getsize(args.output)} bytes")
     except Exception as e:
         print(f"❌ 寫入檔案失敗：{e}")
 
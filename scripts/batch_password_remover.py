@@ -74,29 +74,86 @@ Excel 密碼移除工具 - 平台分類版本 v3.0.0
 """
 
 import sys
+import os
+import argparse
+import atexit
+import importlib
 from pathlib import Path
 import datetime
-import shutil
-import tempfile
+import io
 import json
-import zipfile
-try:
-    import rarfile  # type: ignore
-except Exception as _rar_import_error:  # ImportError or other env errors
-    rarfile = None  # fallback sentinel
-    _RAR_IMPORT_ERROR = _rar_import_error
-import msoffcrypto  # type: ignore
-from typing import Dict, List, Optional, Union, Any
+import re
+import time
+import functools
+import contextlib
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union, Any, BinaryIO
+
+# 以腳本執行時（__main__，或 spawn 啟動的工作程序中的 __mp_main__）同時登記為 batch_password_remover：
+# 拆出的模組（decrypt_server 等）import 到的是同一份模組，共用生效中的主控台、日誌與統計
+if __name__ in ("__main__", "__mp_main__"):
+    sys.modules.setdefault("batch_password_remover", sys.modules[__name__])
+
+if TYPE_CHECKING:
+    # 僅供型別檢查與 PyInstaller 靜態分析；執行時由下方的 _LazyModule 或函數內的 import 延遲載入
+    import hashlib  # noqa: F401
+    import msoffcrypto  # noqa: F401
+    import rarfile  # noqa: F401
+    import shutil  # noqa: F401
+    import zipfile  # noqa: F401
+    from spool_worker import SpoolWorker  # noqa: F401
+    from workbook_export import WorkbookExporter  # noqa: F401
+
+# =============================================================================
+# 延遲載入模組
+# =============================================================================
+
+class _LazyModule:
+    """
+    第一次存取屬性時才 import 的模組代理
+
+    「input/ 沒有檔案」的執行不需要解密與解壓縮模組，延遲載入可省下大部分啟動時間；
+    except 子句中的 msoffcrypto.exceptions.* 只在真的有例外時才會求值
+    """
+
+    def __init__(self, name: str, on_load: Optional[Callable[[Any], None]] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._on_load is not None:
+                self._on_load(module)
+            self._module = module
+        return self._module
+
+    def _available(self) -> bool:
+        """選用模組（rarfile）是否可用；import 失敗時回傳 False"""
+        try:
+            self._load()
+        except Exception:  # ImportError or other env errors
+            return False
+        return True
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
 
 # =============================================================================
 # 工具函數模組 (來自 utils.py)
 # =============================================================================
 
+# 以 --base-dir 指定的專案根目錄（未指定時依執行模式推算）
+_BASE_PATH_OVERRIDE: Optional[Path] = None
+
 def get_base_path() -> Path:
     """
     取得專案根目錄路徑
     支援 Python 模式、exe 單文件模式、exe 目錄模式
     """
+    if _BASE_PATH_OVERRIDE is not None:
+        return _BASE_PATH_OVERRIDE
     if getattr(sys, 'frozen', False):
         # PyInstaller 單文件模式：使用 _MEIPASS 臨時目錄
         if hasattr(sys, '_MEIPASS'):
@@ -112,14 +169,12 @@ def get_base_path() -> Path:
 # ==========================================
 # 初始化 UnRAR 路徑 (支援打包模式)
 # ==========================================
-def init_unrar_tool():
+def init_unrar_tool(rarfile_module) -> None:
     """
     設定 rarfile 的工具路徑。
     支援：開發環境 (scripts/UnRAR.exe) 與 打包環境 (sys._MEIPASS/UnRAR.exe)
+    rarfile 延遲載入，第一次使用時才由 _LazyModule 呼叫
     """
-    if rarfile is None:
-        return
-
     # 1. 判斷是否為 PyInstaller 打包後的環境
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         # 打包模式：工具會被解壓到臨時目錄 (_MEIPASS)
@@ -132,68 +187,2092 @@ def init_unrar_tool():
 
     # 2. 強制設定 rarfile 的工具路徑
     # 注意：如果不設定，rarfile 會去系統 PATH 找，找不到就會報錯
-    rarfile.UNRAR_TOOL = str(unrar_path)
+    rarfile_module.UNRAR_TOOL = str(unrar_path)
     
     # Debug 訊息 (可選)
     # print(f"[DEBUG] UnRAR path set to: {unrar_path}")
 
-def load_passwords(json_filename: str = "mapping/shops_master.json") -> Dict[str, List[Dict[str, Any]]]:
-    """
-    讀取 mapping/shops_master.json
-    exe 模式與 py 模式皆從執行檔所在資料夾讀取
-    """
-    base_path = get_base_path()
-    json_path = base_path / json_filename
+msoffcrypto = _LazyModule("msoffcrypto")
+rarfile = _LazyModule("rarfile", on_load=init_unrar_tool)
+zipfile = _LazyModule("zipfile")
+shutil = _LazyModule("shutil")
+hashlib = _LazyModule("hashlib")
+openpyxl = _LazyModule("openpyxl")
+xlrd = _LazyModule("xlrd")  # 選用：匯出 .xls
+pyarrow = _LazyModule("pyarrow")  # 選用：匯出 Parquet
+pyarrow_parquet = _LazyModule("pyarrow.parquet")
+
+def load_passwords(json_filename: str = "mapping/shops_master.json") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    讀取 mapping/shops_master.json
+    exe 模式與 py 模式皆從執行檔所在資料夾讀取
+    """
+    base_path = get_base_path()
+    json_path = base_path / json_filename
+
+    if not json_path.exists():
+        raise FileNotFoundError(f"找不到 {json_filename}: {json_path}")
+
+    with json_path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    
+    # 轉換 JSON 資料為原本 passwords.yaml 的格式
+    return convert_json_to_passwords_format(data)
+
+def convert_json_to_passwords_format(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    將 JSON 資料轉換為新的 platform_index 格式
+    直接返回原始 JSON 資料，因為現在使用 platform_index 結構
+    """
+    # 直接返回原始 JSON 資料，因為現在使用新的 platform_index 結構
+    return json_data
+
+# =============================================================================
+# 執行統計模組
+# =============================================================================
+
+class RunMetrics:
+    """
+    記錄每個階段、每個檔案的耗時與計數
+
+    - 階段同時記錄含子階段的總耗時 (seconds) 與扣除子階段的自身耗時 (self_seconds)
+    - 檔案以路徑為鍵，壓縮檔與其中的工作簿各自一筆；同一路徑再次進入時累加
+    - 結束時輸出 JSON 報告與 Prometheus textfile collector 檔案
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.first_file_at: Optional[float] = None  # 開始處理第一個檔案的時間（啟動耗時基準測試用）
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._stage_stack: List[List[float]] = []  # [開始時間, 子階段耗時]
+        self._stage_names: List[str] = []
+        self._file_stack: List[Dict[str, Any]] = []
+        self.timeouts: List[Dict[str, Any]] = []  # 超過處理時限而取消的檔案
+        self.temp: Dict[str, Any] = {}  # 臨時空間用量（TempSpace.report）
+        self.verify: Dict[str, Any] = {}  # 輸出完整性檢查（OutputVerifier.report）
+        self.schedule: Dict[str, Any] = {}  # 各平台的佇列與等待時間（PlatformScheduler.report）
+
+    # ---- 階段計時 ----
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        frame = [time.perf_counter(), 0.0]
+        self._stage_stack.append(frame)
+        self._stage_names.append(name)
+        try:
+            yield
+        finally:
+            self._stage_stack.pop()
+            self._stage_names.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if self._stage_stack:
+                self._stage_stack[-1][1] += elapsed
+            total = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "self_seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += elapsed
+            total["self_seconds"] += elapsed - frame[1]
+            if self._file_stack:
+                file_stages = self._file_stack[-1]["stages"]
+                file_stages[name] = file_stages.get(name, 0.0) + elapsed
+
+    # ---- 檔案記錄 ----
+    @contextlib.contextmanager
+    def file(self, path: Union[str, Path], kind: str = "workbook", platform: Optional[str] = None):
+        key = str(path)
+        if self.first_file_at is None:
+            self.first_file_at = time.time()
+        record = self.files.get(key)
+        if record is None:
+            record = {
+                "file": Path(path).name,
+                "path": key,
+                "kind": kind,
+                "platform": platform,
+                "outcome": None,
+                "seconds": 0.0,
+                "stages": {},
+                "candidates_tried": 0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+            }
+            self.files[key] = record
+        elif platform and not record["platform"]:
+            record["platform"] = platform
+        self._file_stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] += time.perf_counter() - start
+            self._file_stack.pop()
+
+    def add(self, counter: str, amount: int = 1) -> None:
+        if self._file_stack:
+            record = self._file_stack[-1]
+            record[counter] = record.get(counter, 0) + amount
+
+    def set_outcome(self, outcome: str, overwrite: bool = True) -> None:
+        if self._file_stack:
+            record = self._file_stack[-1]
+            if overwrite or record["outcome"] in (None, "deferred"):
+                record["outcome"] = outcome
+
+    def context(self) -> Dict[str, Any]:
+        """目前所在的檔案、平台與階段（供結構化日誌標註）"""
+        context: Dict[str, Any] = {}
+        if self._file_stack:
+            record = self._file_stack[-1]
+            context["file"] = record["file"]
+            if record["platform"]:
+                context["platform"] = record["platform"]
+        if self._stage_names:
+            context["stage"] = self._stage_names[-1]
+        return context
+
+    # ---- 報告輸出 ----
+    def summary(self) -> Dict[str, Any]:
+        finished = self.finished or time.time()
+        outcomes: Dict[str, int] = {}
+        counters = {"candidates_tried": 0, "expanded_candidates": 0, "expanded_matches": 0,
+                    "bytes_read": 0, "bytes_written": 0}
+        for record in self.files.values():
+            outcome = record["outcome"] or "unknown"
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            for counter in counters:
+                counters[counter] += record.get(counter, 0)
+        return {
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "finished": datetime.datetime.fromtimestamp(finished).isoformat(timespec="seconds"),
+            "duration_seconds": round(finished - self.started, 3),
+            "first_file_at": round(self.first_file_at, 3) if self.first_file_at is not None else None,
+            "outcomes": outcomes,
+            "totals": counters,
+            "timeouts": self.timeouts,
+            "temp": self.temp,
+            "verify": self.verify,
+            "schedule": self.schedule,
+            "stages": {name: {"count": int(v["count"]), "seconds": round(v["seconds"], 4),
+                              "self_seconds": round(v["self_seconds"], 4)}
+                       for name, v in self.stages.items()},
+        }
+
+    def write_json(self, report_path: Union[str, Path]) -> None:
+        report = self.summary()
+        report["files"] = [
+            dict(record, seconds=round(record["seconds"], 4),
+                 stages={k: round(v, 4) for k, v in record["stages"].items()})
+            for record in self.files.values()
+        ]
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, prom_path: Union[str, Path]) -> None:
+        """寫出 node exporter textfile collector 格式（先寫臨時檔再 rename，避免被讀到一半）"""
+        summary = self.summary()
+        prefix = "excel_password_remover_last_run"
+        lines = [
+            f"# HELP {prefix}_timestamp_seconds 最近一次執行結束時間",
+            f"# TYPE {prefix}_timestamp_seconds gauge",
+            f"{prefix}_timestamp_seconds {self.finished or time.time():.0f}",
+            f"# HELP {prefix}_duration_seconds 最近一次執行總耗時",
+            f"# TYPE {prefix}_duration_seconds gauge",
+            f"{prefix}_duration_seconds {summary['duration_seconds']}",
+            f"# HELP {prefix}_files 最近一次執行各結果的檔案數",
+            f"# TYPE {prefix}_files gauge",
+        ]
+        for outcome, count in sorted(summary["outcomes"].items()):
+            lines.append(f'{prefix}_files{{outcome="{outcome}"}} {count}')
+        for counter, value in summary["totals"].items():
+            lines.append(f"# TYPE {prefix}_{counter} gauge")
+            lines.append(f"{prefix}_{counter} {value}")
+        lines.append(f"# HELP {prefix}_timeouts 最近一次執行超過處理時限而取消的檔案數")
+        lines.append(f"# TYPE {prefix}_timeouts gauge")
+        lines.append(f"{prefix}_timeouts {len(summary['timeouts'])}")
+        if summary["temp"]:
+            lines.append(f"# HELP {prefix}_temp_peak_bytes 最近一次執行 temp/ 解壓檔案的最大用量")
+            lines.append(f"# TYPE {prefix}_temp_peak_bytes gauge")
+            lines.append(f"{prefix}_temp_peak_bytes {summary['temp']['peak_bytes']}")
+            lines.append(f"# TYPE {prefix}_extracted_bytes gauge")
+            for location, placed in sorted(summary["temp"]["placed"].items()):
+                lines.append(f'{prefix}_extracted_bytes{{location="{location}"}} {placed["bytes"]}')
+        if summary["verify"]:
+            for field in ("files", "failed", "bytes"):
+                lines.append(f"# TYPE {prefix}_verify_{field} gauge")
+                lines.append(f"{prefix}_verify_{field} {summary['verify'][field]}")
+        if summary["schedule"]:
+            lines.append(f"# HELP {prefix}_platform_queued 最近一次執行各平台排入的檔案數（remaining 為未處理）")
+            for metric, field in (("platform_queued", "queued"), ("platform_remaining", "remaining"),
+                                  ("platform_wait_avg_seconds", "wait_avg_seconds"),
+                                  ("platform_wait_max_seconds", "wait_max_seconds")):
+                lines.append(f"# TYPE {prefix}_{metric} gauge")
+                for platform, entry in sorted(summary["schedule"].items()):
+                    lines.append(f'{prefix}_{metric}{{platform="{platform}"}} {entry[field]}')
+            deadlines = [(platform, entry) for platform, entry in sorted(summary["schedule"].items())
+                         if "deadline" in entry]
+            if deadlines:
+                lines.append(f"# TYPE {prefix}_platform_deadline_met gauge")
+                for platform, entry in deadlines:
+                    lines.append(f'{prefix}_platform_deadline_met{{platform="{platform}"}} {int(entry["deadline_met"])}')
+        for metric, field in (("stage_seconds", "seconds"), ("stage_self_seconds", "self_seconds"), ("stage_calls", "count")):
+            lines.append(f"# TYPE {prefix}_{metric} gauge")
+            for name, values in sorted(summary["stages"].items()):
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {values[field]}')
+
+        prom_path = Path(prom_path)
+        temp_path = prom_path.with_name(prom_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, prom_path)
+
+
+# 目前啟用中的統計物件（main 設定；未設定時所有量測皆為 no-op）
+_ACTIVE_METRICS: Optional[RunMetrics] = None
+
+
+def activate_metrics(metrics: Optional[RunMetrics]) -> None:
+    global _ACTIVE_METRICS
+    _ACTIVE_METRICS = metrics
+
+
+def timed_stage(name: str):
+    """裝飾器：把函數呼叫計入指定階段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _ACTIVE_METRICS
+            if metrics is None:
+                return func(*args, **kwargs)
+            with metrics.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def metrics_stage(name: str):
+    """以 with 區塊計入指定階段"""
+    if _ACTIVE_METRICS is None:
+        yield
+    else:
+        with _ACTIVE_METRICS.stage(name):
+            yield
+
+
+@contextlib.contextmanager
+def metrics_file(path: Union[str, Path], kind: str = "workbook", platform: Optional[str] = None):
+    """
+    以 with 區塊把期間的階段與計數歸到指定檔案
+    啟用 --profile-files 時，符合條件的檔案也在此區塊內進行效能剖析
+    """
+    profiler = _ACTIVE_PROFILER
+    profiling = profiler is not None and profiler.matches(path)
+    if profiling:
+        profiler.start()
+    try:
+        if _ACTIVE_METRICS is None:
+            yield None
+        else:
+            with _ACTIVE_METRICS.file(path, kind, platform) as record:
+                yield record
+    finally:
+        if profiling:
+            profiler.stop()
+
+
+def metrics_add(counter: str, amount: int = 1) -> None:
+    if _ACTIVE_METRICS is not None:
+        _ACTIVE_METRICS.add(counter, amount)
+
+
+def metrics_outcome(outcome: str, overwrite: bool = True) -> None:
+    if _ACTIVE_METRICS is not None:
+        _ACTIVE_METRICS.set_outcome(outcome, overwrite)
+
+
+def metrics_timeout(entry: Dict[str, Any]) -> None:
+    if _ACTIVE_METRICS is not None:
+        _ACTIVE_METRICS.timeouts.append(entry)
+
+# =============================================================================
+# 效能剖析模組
+# =============================================================================
+
+class HotPathProfiler:
+    """
+    內建效能剖析（--profile），不需修改程式即可剖析 exe 或 .py
+
+    - cProfile 產生 .pstats（可用 snakeviz / pstats 檢視）
+    - 背景執行緒定時取樣主執行緒的呼叫堆疊，輸出 collapsed stack 文字檔，
+      可直接交給 flamegraph.pl / speedscope 產生火焰圖
+    - 指定 patterns 時只在符合的檔案處理期間剖析，其餘時間不量測；
+      取樣執行緒在第一次 start() 時才建立，沒有任何檔案符合時不會多出背景執行緒
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None, interval: float = 0.001):
+        import cProfile
+        import threading
+        self.patterns = [p.lower() for p in (patterns or [])]
+        self.interval = max(0.0001, interval)
+        self.profile = cProfile.Profile()
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._depth = 0
+        self._target_thread = threading.get_ident()
+        self._active = threading.Event()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def whole_run(self) -> bool:
+        return not self.patterns
+
+    def matches(self, path: Union[str, Path]) -> bool:
+        if self.whole_run:
+            return False  # 整次執行已在剖析中，不需逐檔開關
+        import fnmatch
+        name = Path(path).name.lower()
+        full = str(path).lower()
+        return any(fnmatch.fnmatch(name, p) or p in full for p in self.patterns)
+
+    def start(self) -> None:
+        import threading
+        self._depth += 1
+        if self._depth == 1:
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+            self.profile.enable()
+            self._active.set()
+
+    def stop(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._active.clear()
+            self.profile.disable()
+
+    def _sample_loop(self) -> None:
+        while not self._stop.is_set():
+            if not self._active.wait(0.1):
+                continue
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is not None:
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(parts))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+                del frame
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        """停止剖析與取樣執行緒（可重複呼叫；執行中斷時不寫出結果也要呼叫）"""
+        self._depth = 0
+        self.profile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._active.set()  # 喚醒取樣執行緒讓它結束
+            self._sampler.join(timeout=1)
+            self._sampler = None
+        self._active.clear()
+
+    def save(self, output_dir: Union[str, Path], stem: str) -> tuple:
+        """停止取樣並寫出 .pstats 與 collapsed stack 檔案，回傳兩個路徑"""
+        self.close()
+        output_dir = Path(output_dir)
+        pstats_path = output_dir / f"{stem}.pstats"
+        collapsed_path = output_dir / f"{stem}.collapsed.txt"
+        self.profile.dump_stats(str(pstats_path))
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        return pstats_path, collapsed_path
+
+
+_ACTIVE_PROFILER: Optional[HotPathProfiler] = None
+
+
+def activate_profiler(profiler: Optional[HotPathProfiler]) -> None:
+    global _ACTIVE_PROFILER
+    _ACTIVE_PROFILER = profiler
+
+# =============================================================================
+# 結構化日誌模組
+# =============================================================================
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+class RunLog:
+    """
+    邊執行邊寫入的 JSON Lines 日誌（取代原本整批留在記憶體的 log_lines）
+
+    - 每筆記錄含時間、層級、事件與目前的檔案 / 平台 / 階段，小批次 append 到
+      log/batch_removal.jsonl，程式中途崩潰也只會遺失最後一批
+    - 低於 min_level 的記錄不寫入（候選密碼逐筆記錄為 debug，僅 --debug 時保留）
+    - 檔案超過 max_bytes 或最早一筆超過 max_age 時輪替為 batch_removal_{時間}.jsonl
+    - 保留 keep_days 天內的輪替檔與各次執行的報告，較舊的自動刪除
+    - 保留 append(text) 介面，既有的 log_lines.append(...) 呼叫不需修改；
+      人類閱讀用的 batch_removal_log_*.txt 於結束時由本次的記錄產生
+    """
+
+    ACTIVE_NAME = "batch_removal.jsonl"
+    # log/ 內依保留天數清理的檔案
+    RETAINED_PATTERNS = ("batch_removal_*.jsonl", "batch_removal_log_*.txt", "run_report_*.json",
+                         "profile_*.pstats", "profile_*.collapsed.txt")
+
+    def __init__(self, log_dir: Union[str, Path], run_id: str, max_bytes: int = 10 * 1024 * 1024,
+                 max_age_hours: float = 24, keep_days: float = 14, batch_size: int = 64,
+                 flush_interval: float = 1.0, min_level: str = "info"):
+        self.log_dir = Path(log_dir)
+        self.min_level = LOG_LEVELS[min_level]
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self.max_bytes = max_bytes
+        self.max_age = max_age_hours * 3600
+        self.keep_days = keep_days
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.active_path = self.log_dir / self.ACTIVE_NAME
+        self.segments: List[Path] = []  # 本次執行寫入過的檔案（輪替後的舊名也記錄）
+        self.records_written = 0
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._segment_started = self._read_segment_start()
+        self._closed = False
+        atexit.register(self.close)
+
+    def _read_segment_start(self) -> Optional[float]:
+        """目前使用中的檔案第一筆記錄的時間（用於依時間輪替）"""
+        try:
+            with open(self.active_path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            return json.loads(first).get("epoch") if first else None
+        except (OSError, ValueError):
+            return None
+
+    # ---- 寫入 ----
+    def append(self, text: str) -> None:
+        """相容 log_lines.append(text)：層級由訊息開頭的 [TAG] 判斷"""
+        if text.startswith(("[FAIL]", "[ERROR]")):
+            level = "error"
+        elif text.startswith("[WARN]"):
+            level = "warning"
+        else:
+            level = "info"
+        self.record("message", level=level, msg=text)
+
+    def extend(self, texts) -> None:
+        for text in texts:
+            self.append(text)
+
+    def record(self, event: str, level: str = "info", msg: Optional[str] = None, **fields) -> None:
+        if LOG_LEVELS.get(level, 0) < self.min_level:
+            return
+        now = time.time()
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(now).isoformat(timespec="milliseconds"),
+            "epoch": round(now, 3),
+            "run": self.run_id,
+            "level": level,
+            "event": event,
+        }
+        if _ACTIVE_METRICS is not None:
+            entry.update(_ACTIVE_METRICS.context())
+        entry.update({k: v for k, v in fields.items() if v is not None})
+        if msg is not None:
+            entry["msg"] = msg
+        self._buffer.append(json.dumps(entry, ensure_ascii=False, default=str))
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        self._rotate_if_needed()
+        if self._segment_started is None:
+            self._segment_started = json.loads(self._buffer[0])["epoch"]
+        with open(self.active_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._buffer) + "\n")
+        if self.active_path not in self.segments:
+            self.segments.append(self.active_path)
+        self.records_written += len(self._buffer)
+        self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def _rotate_if_needed(self) -> None:
+        try:
+            size = self.active_path.stat().st_size
+        except FileNotFoundError:
+            return
+        too_old = self._segment_started is not None and time.time() - self._segment_started >= self.max_age
+        if size < self.max_bytes and not too_old:
+            return
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        rotated = self.log_dir / f"batch_removal_{stamp}.jsonl"
+        counter = 1
+        while rotated.exists():
+            rotated = self.log_dir / f"batch_removal_{stamp}_{counter}.jsonl"
+            counter += 1
+        os.replace(self.active_path, rotated)
+        self.segments = [rotated if p == self.active_path else p for p in self.segments]
+        self._segment_started = None
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        atexit.unregister(self.close)
+
+    # ---- 保留與輸出 ----
+    def prune(self) -> int:
+        """刪除超過保留天數的輪替檔與報告，回傳刪除數量"""
+        cutoff = time.time() - self.keep_days * 86400
+        removed = 0
+        for pattern in self.RETAINED_PATTERNS:
+            for path in self.log_dir.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def iter_records(self, min_level: str = "info"):
+        """依序讀回本次執行的記錄（逐行串流，不整份載入）"""
+        self.flush()
+        threshold = LOG_LEVELS.get(min_level, 0)
+        for segment in self.segments:
+            try:
+                f = open(segment, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("run") == self.run_id and LOG_LEVELS.get(entry.get("level"), 0) >= threshold:
+                        yield entry
+
+    def render_text(self, text_path: Union[str, Path]) -> None:
+        """由本次的記錄產生 batch_removal_log_*.txt（格式與原本相同）"""
+        first = True
+        with open(text_path, "w", encoding="utf-8") as f:
+            for entry in self.iter_records():
+                if "msg" not in entry:
+                    continue
+                if not first:
+                    f.write("\n")
+                f.write(entry["msg"])
+                first = False
+
+
+# 日誌接收端：RunLog 或一般 list（函式庫呼叫時）
+LogSink = Union[List[str], RunLog]
+
+_ACTIVE_LOG: Optional[RunLog] = None
+
+
+def activate_log(run_log: Optional[RunLog]) -> None:
+    global _ACTIVE_LOG
+    _ACTIVE_LOG = run_log
+
+
+def log_event(event: str, level: str = "info", msg: Optional[str] = None, **fields) -> None:
+    """寫入一筆結構化記錄（未啟用 RunLog 時為 no-op）"""
+    if _ACTIVE_LOG is not None:
+        _ACTIVE_LOG.record(event, level=level, msg=msg, **fields)
+
+# =============================================================================
+# 主控台輸出模組
+# =============================================================================
+
+# 訊息層級：主控台只顯示層級 <= 目前 verbosity 的訊息
+QUIET, NORMAL, VERBOSE, DEBUG = 0, 1, 2, 3
+
+
+class ConsoleReporter:
+    """
+    依 verbosity 過濾主控台訊息，並維持單一行即時進度
+
+    - quiet (-q)：只顯示錯誤與最後統計
+    - normal（預設）：各階段摘要、警告、錯誤與進度行
+    - verbose (-v)：每個檔案的處理細節
+    - debug (--debug)：每個候選密碼、每個商店比對（同時寫入結構化日誌）
+    進度行在終端機上以 \\r 原地更新；輸出被導向檔案時改為每隔數秒印一行
+    """
+
+    TTY_INTERVAL = 0.2
+    PIPE_INTERVAL = 10.0
+
+    def __init__(self, verbosity: int = NORMAL, show_progress: bool = True, stream=None, prefix: str = ""):
+        self.verbosity = verbosity
+        self.stream = stream or sys.stdout
+        self.prefix = prefix  # --jobs 的子工作以 [名稱] 開頭，多個工作的輸出交錯時仍可分辨
+        self.is_tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.show_progress = show_progress and verbosity >= NORMAL
+        self.label = ""
+        self.total = 0
+        self.done = 0
+        self.candidates = 0
+        self._phase_started = 0.0
+        self._phase_candidates = 0
+        self._last_draw = 0.0
+        self._line_width = 0
+
+    def say(self, message: str, level: int = NORMAL) -> None:
+        if level > self.verbosity:
+            return
+        self._clear_line()
+        if self.prefix:
+            message = "\n".join(self.prefix + line if line else line for line in message.split("\n"))
+        print(message, file=self.stream)
+        self._draw(force=True)
+
+    # ---- 進度 ----
+    def begin(self, label: str, total: int) -> None:
+        self.finish()
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._phase_started = self._last_draw = time.perf_counter()
+        self._phase_candidates = self.candidates
+        self._draw(force=True)
+
+    def advance(self, files: int = 0, candidates: int = 0) -> None:
+        self.done += files
+        self.candidates += candidates
+        if self.total:
+            self._draw()
+
+    def finish(self) -> None:
+        if self.total:
+            self._draw(final=True)
+            if self.is_tty and self._line_width:
+                self.stream.write("\n")
+                self.stream.flush()
+            self._line_width = 0
+        self.total = 0
+
+    def progress_text(self) -> str:
+        elapsed = max(time.perf_counter() - self._phase_started, 1e-6)
+        files_rate = self.done / elapsed
+        candidate_rate = (self.candidates - self._phase_candidates) / elapsed
+        remaining = self.total - self.done
+        eta = f"{remaining / files_rate:.0f}s" if files_rate > 0 else "--"
+        return (f"[PROGRESS] {self.label} {self.done}/{self.total}  "
+                f"{files_rate:.1f} 檔/秒  {candidate_rate:.0f} 候選/秒  剩餘約 {eta}")
+
+    def _draw(self, force: bool = False, final: bool = False) -> None:
+        if not self.show_progress or not self.total:
+            return
+        now = time.perf_counter()
+        if self.is_tty:
+            if not (force or final) and now - self._last_draw < self.TTY_INTERVAL:
+                return
+            text = self.progress_text()
+            width = _display_width(text)
+            self.stream.write("\r" + text + " " * max(0, self._line_width - width))
+            self.stream.flush()
+            self._line_width = width
+        else:
+            # 非終端機：不原地更新，只定期與結束時各印一行
+            if not final and now - self._last_draw < self.PIPE_INTERVAL:
+                return
+            print(self.progress_text(), file=self.stream)
+        self._last_draw = now
+
+    def _clear_line(self) -> None:
+        if self.is_tty and self._line_width:
+            self.stream.write("\r" + " " * self._line_width + "\r")
+            self._line_width = 0
+
+
+def _display_width(text: str) -> int:
+    """終端機顯示寬度（中文等全形字元佔兩格）"""
+    import unicodedata
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+
+
+_CONSOLE: Optional[ConsoleReporter] = None
+
+
+def activate_console(console: Optional[ConsoleReporter]) -> None:
+    global _CONSOLE
+    _CONSOLE = console
+
+
+def say(message: str, level: int = NORMAL) -> None:
+    """依 verbosity 輸出訊息（未啟用 ConsoleReporter 時全部照印，維持函式庫呼叫的原本行為）"""
+    if _CONSOLE is None:
+        print(message)
+    else:
+        _CONSOLE.say(message, level)
+
+
+def progress_advance(files: int = 0, candidates: int = 0) -> None:
+    if _CONSOLE is not None:
+        _CONSOLE.advance(files, candidates)
+
+
+def progress_iter(items: List[Any], label: str):
+    """逐項產出 items，每完成一項更新進度行（迴圈內 continue 也會計入）"""
+    if _CONSOLE is None:
+        yield from items
+        return
+    _CONSOLE.begin(label, len(items))
+    try:
+        for item in items:
+            yield item
+            _CONSOLE.advance(files=1)
+    finally:
+        _CONSOLE.finish()
+
+# =============================================================================
+# 輸出提交模組
+# =============================================================================
+
+# Linux FICLONE ioctl（btrfs / xfs 等支援 reflink 的檔案系統）
+_FICLONE = 0x40049409
+
+
+class OutputVerificationError(Exception):
+    """輸出檔案未通過完整性檢查（截斷或損毀）"""
+
+
+class OutputVerifier:
+    """
+    輸出檔案的快速完整性檢查：只檢查容器結構，不解析工作簿內容
+
+    - .xlsx / .xlsm / .xltx / .xltm：ZIP 中央目錄結尾記錄（EOCD）、[Content_Types].xml 存在、各成員 CRC-32
+    - .xls：OLE 檔頭簽章與磁區大小、FAT 磁區位於檔案範圍內、FAT 中的磁區編號沒有超出檔案（截斷）
+    - 解開後合計超過 PARALLEL_MIN_BYTES 的活頁簿，成員 CRC 以執行緒池平行檢查（zlib 解壓縮與 CRC 計算時釋放 GIL）
+    - 其他副檔名不檢查
+    """
+
+    PARALLEL_MIN_BYTES = 1024 * 1024
+
+    ZIP_SUFFIXES = (".xlsx", ".xlsm", ".xltx", ".xltm")
+    OLE_SIGNATURE = bytes.fromhex("D0CF11E0A1B11AE1")
+    # OLE FAT 特殊值：DIFSECT、FATSECT、ENDOFCHAIN、FREESECT
+    OLE_SPECIAL = (0xFFFFFFFC, 0xFFFFFFFD, 0xFFFFFFFE, 0xFFFFFFFF)
+
+    def __init__(self, workers: int = 4):
+        self.workers = max(1, workers)
+        self._pool = None
+        self.stats = {"files": 0, "bytes": 0, "seconds": 0.0, "failed": 0}
+
+    def applies(self, path: Union[str, Path]) -> bool:
+        suffix = Path(path).suffix.lower()
+        return suffix in self.ZIP_SUFFIXES or suffix == ".xls"
+
+    @timed_stage("verify_output")
+    def verify(self, path: Union[str, Path], suffix: Optional[str] = None) -> None:
+        """
+        檢查 path（suffix 為最終檔名的副檔名，path 為臨時檔時使用）
+
+        Raises:
+            OutputVerificationError: 檢查未通過
+        """
+        path = Path(path)
+        suffix = (suffix or path.suffix).lower()
+        start = time.perf_counter()
+        try:
+            if suffix in self.ZIP_SUFFIXES:
+                self._verify_zip(path)
+            elif suffix == ".xls":
+                self._verify_ole(path)
+            else:
+                return
+        except OutputVerificationError:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.stats["seconds"] += time.perf_counter() - start
+        self.stats["files"] += 1
+        try:
+            self.stats["bytes"] += path.stat().st_size
+        except OSError:
+            pass
+
+    @staticmethod
+    def _check_member(archive: "zipfile.ZipFile", info: "zipfile.ZipInfo") -> None:
+        # 讀到結尾時 ZipExtFile 比對 CRC-32，不符即拋出 BadZipFile
+        with archive.open(info) as f:
+            while f.read(1024 * 1024):
+                pass
+
+    def _verify_zip(self, path: Path) -> None:
+        import zlib
+        try:
+            with zipfile.ZipFile(path) as archive:  # 找不到或無法解析 EOCD / 中央目錄即失敗
+                members = archive.infolist()
+                if "[Content_Types].xml" not in {info.filename for info in members}:
+                    raise OutputVerificationError("缺少 [Content_Types].xml")
+                if self.workers > 1 and sum(info.file_size for info in members) >= self.PARALLEL_MIN_BYTES:
+                    if self._pool is None:
+                        import concurrent.futures
+                        self._pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="verify")
+                    for future in [self._pool.submit(self._check_member, archive, info) for info in members]:
+                        future.result()
+                else:
+                    for info in members:
+                        self._check_member(archive, info)
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError, zlib.error, OSError) as e:
+            raise OutputVerificationError(f"ZIP 結構損毀：{e}") from None
+
+    def _verify_ole(self, path: Path) -> None:
+        import struct
+        try:
+            size = path.stat().st_size
+            with open(path, "rb") as f:
+                header = f.read(512)
+                if len(header) < 512 or header[:8] != self.OLE_SIGNATURE:
+                    raise OutputVerificationError("OLE 檔頭簽章不符")
+                major, byte_order, sector_shift = struct.unpack_from("<HHH", header, 26)
+                if byte_order != 0xFFFE or (major, sector_shift) not in ((3, 9), (4, 12)):
+                    raise OutputVerificationError(f"OLE 檔頭無效（版本 {major}，磁區 2^{sector_shift}）")
+                sector_size = 1 << sector_shift
+                fat_count, dir_start = struct.unpack_from("<II", header, 44)
+                difat_start, difat_count = struct.unpack_from("<II", header, 68)
+                sectors = (size - sector_size + sector_size - 1) // sector_size
+
+                def read_sector(sector: int) -> bytes:
+                    if sector >= sectors:
+                        raise OutputVerificationError(f"磁區 {sector} 超出檔案範圍（共 {sectors} 個，檔案可能被截斷）")
+                    f.seek((sector + 1) * sector_size)
+                    data = f.read(sector_size)
+                    return data + b"\0" * (sector_size - len(data))
+
+                # DIFAT：檔頭 109 筆，其餘以 DIFAT 磁區串接
+                fat_sectors = list(struct.unpack_from("<109I", header, 76))
+                next_difat = difat_start
+                for _ in range(difat_count):
+                    entries = struct.unpack(f"<{sector_size // 4}I", read_sector(next_difat))
+                    fat_sectors.extend(entries[:-1])
+                    next_difat = entries[-1]
+                fat_sectors = fat_sectors[:fat_count]
+                if not fat_sectors or any(sector in self.OLE_SPECIAL for sector in fat_sectors):
+                    raise OutputVerificationError(f"OLE FAT 磁區數 {fat_count} 與 DIFAT 不符")
+                fat = []
+                for sector in fat_sectors:
+                    fat.extend(struct.unpack(f"<{sector_size // 4}I", read_sector(sector)))
+        except (OSError, struct.error) as e:
+            raise OutputVerificationError(f"OLE 結構無法讀取：{e}") from None
+        if any(fat[sector] != 0xFFFFFFFD for sector in fat_sectors if sector < len(fat)):
+            raise OutputVerificationError("OLE FAT 磁區未標記為 FATSECT")
+        if dir_start >= sectors:
+            raise OutputVerificationError("OLE 目錄起始磁區超出檔案範圍")
+        for entry in fat[:sectors]:
+            if entry >= sectors and entry not in self.OLE_SPECIAL:
+                raise OutputVerificationError(f"OLE FAT 指向磁區 {entry}，超出檔案範圍（檔案可能被截斷）")
+
+    def report(self) -> Dict[str, Any]:
+        seconds = self.stats["seconds"]
+        return {"files": self.stats["files"], "failed": self.stats["failed"], "bytes": self.stats["bytes"],
+                "seconds": round(seconds, 4),
+                "mb_per_second": round(self.stats["bytes"] / 1024 / 1024 / seconds, 1) if seconds else None}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class OutputCommitter:
+    """
+    原子化輸出提交器
+
+    - 所有輸出先寫到同目錄的臨時檔（副檔名後加 .partial-*，不會被 *.xlsx 掃到），
+      完成後以 os.replace 一次發佈，程式中斷時不會留下半寫入的 Excel 檔案
+    - durable=True 時，發佈前 fsync 檔案內容，目錄 fsync 則每 fsync_batch 個檔案批次執行
+    - 未加密檔案不做完整複製：scratch_roots（如 temp/）內的檔案直接 rename，其餘先嘗試 reflink，
+      失敗才退回複製；硬連結只用於 output/ 內既有輸出的另一份（link=True），
+      input/ 的來源不與 output/ 共用 inode，之後修改任一邊都不會影響另一邊
+    - 指定 output_dir 時，啟動即清除先前執行中斷留下的 .partial-* 臨時檔
+    - shared=True（多節點共用 output/）時，其他主機的 PID 無法判斷，一律以檔案年齡認定殘留
+    - 指定 verifier 時，發佈前先檢查檔案完整性；未通過的檔案移到 quarantine_dir（不進入 output/），
+      並拋出 OutputVerificationError
+    """
+
+    TEMP_MARKER = ".partial-"
+    # 無法判斷寫入程序是否仍在執行時（Windows），超過此秒數的臨時檔視為殘留
+    STALE_AGE = 3600
+
+    def __init__(self, durable: bool = False, fsync_batch: int = 32,
+                 scratch_roots: Optional[List[Union[str, Path]]] = None, link_plain: bool = True,
+                 output_dir: Optional[Union[str, Path]] = None, shared: bool = False,
+                 verifier: Optional[OutputVerifier] = None, quarantine_dir: Optional[Union[str, Path]] = None):
+        import itertools
+        self.durable = durable
+        self.shared = shared
+        self.fsync_batch = max(1, fsync_batch)
+        self.scratch_roots = [Path(p).resolve() for p in (scratch_roots or [])]
+        self.link_plain = link_plain
+        self._seq = itertools.count(1)
+        self._pending_dirs = set()
+        self._pending_count = 0
+        # 各種發佈方式的次數，供日誌統計
+        self.stats = {"write": 0, "rename": 0, "reflink": 0, "link": 0, "copy": 0}
+        self.verifier = verifier
+        self.quarantine_dir = Path(quarantine_dir) if quarantine_dir is not None else None
+        self.quarantined: List[tuple] = []  # (預定的輸出路徑, 隔離後的路徑, 原因)
+        self.swept = self.sweep_stale(output_dir) if output_dir is not None else []
+
+    def _temp_path_for(self, final_path: Path) -> Path:
+        return final_path.with_name(f"{final_path.name}{self.TEMP_MARKER}{os.getpid()}-{next(self._seq)}")
+
+    def _is_scratch(self, path: Path) -> bool:
+        try:
+            resolved = path.resolve()
+        except OSError:
+            return False
+        return any(root == resolved or root in resolved.parents for root in self.scratch_roots)
+
+    @staticmethod
+    def _discard(temp_path: Path) -> None:
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+
+    def _is_stale(self, temp_path: Path) -> bool:
+        """臨時檔名為 name.partial-{pid}-{seq}：寫入程序已結束者即為殘留"""
+        pid_text = temp_path.name.rsplit(self.TEMP_MARKER, 1)[1].split("-", 1)[0]
+        if os.name == "posix" and pid_text.isdigit() and not self.shared:
+            pid = int(pid_text)
+            if pid == os.getpid():
+                return False
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except OSError:
+                return False  # 程序存在但屬於其他使用者
+            return False
+        try:
+            return time.time() - temp_path.stat().st_mtime > self.STALE_AGE
+        except OSError:
+            return False
+
+    def sweep_stale(self, directory: Union[str, Path]) -> List[Path]:
+        """
+        清除 directory 下先前執行中斷留下的 .partial-* 臨時檔
+
+        Returns:
+            List[Path]: 已刪除的臨時檔
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return []
+        removed = []
+        for temp_path in directory.rglob(f"*{self.TEMP_MARKER}*"):
+            if temp_path.is_file() and self._is_stale(temp_path):
+                self._discard(temp_path)
+                removed.append(temp_path)
+        return removed
+
+    def _verify(self, path: Path, final_path: Path, move: bool) -> None:
+        """
+        檢查即將發佈的檔案；未通過時移到（move=False 時複製到）quarantine_dir 後拋出 OutputVerificationError
+        """
+        if self.verifier is None or not self.verifier.applies(final_path):
+            return
+        try:
+            self.verifier.verify(path, final_path.suffix)
+        except OutputVerificationError as e:
+            isolated = None
+            if self.quarantine_dir is not None:
+                self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+                isolated = self.quarantine_dir / f"{final_path.stem}.{os.getpid()}-{next(self._seq)}{final_path.suffix}"
+                try:
+                    if move:
+                        os.replace(path, isolated)
+                    else:
+                        shutil.copyfile(path, isolated)
+                except OSError:
+                    isolated = None
+            if move and isolated is None:
+                self._discard(path)
+            self.quarantined.append((final_path, isolated, str(e)))
+            log_event("verify_failed", level="warning", output=final_path.name,
+                      quarantine=str(isolated) if isolated else None, error=str(e))
+            metrics_outcome("corrupt")
+            raise OutputVerificationError(f"{final_path.name} 未通過完整性檢查：{e}"
+                                          + (f"，已移至 {isolated}" if isolated else "")) from None
+
+    @staticmethod
+    def _fsync_file(path: Path) -> None:
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+
+    def _publish(self, temp_path: Path, final_path: Path) -> None:
+        os.replace(temp_path, final_path)
+        if self.durable:
+            self._pending_dirs.add(final_path.parent)
+            self._pending_count += 1
+            if self._pending_count >= self.fsync_batch:
+                self.flush()
+
+    def write(self, final_path: Union[str, Path], writer: Callable[[BinaryIO], Any]) -> Path:
+        """
+        以 writer(f_out) 寫入臨時檔後原子發佈到 final_path
+
+        Returns:
+            Path: 發佈後的檔案路徑
+        """
+        final_path = Path(final_path)
+        temp_path = self._temp_path_for(final_path)
+        try:
+            with open(temp_path, "wb") as f_out:
+                writer(f_out)
+                if self.durable:
+                    f_out.flush()
+                    os.fsync(f_out.fileno())
+                metrics_add("bytes_written", f_out.tell())
+            self._verify(temp_path, final_path, move=True)
+            self._publish(temp_path, final_path)
+        except BaseException:
+            self._discard(temp_path)
+            raise
+        self.stats["write"] += 1
+        return final_path
+
+    def _clone(self, source_path: Path, temp_path: Path, link: bool = False) -> str:
+        """以最便宜的方式把 source_path 複製成 temp_path，回傳使用的方式（link=False 時不使用硬連結）"""
+        if self.link_plain:
+            try:
+                import fcntl  # 僅 POSIX
+                with open(source_path, "rb") as f_src, open(temp_path, "wb") as f_dst:
+                    fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+                return "reflink"
+            except (ImportError, OSError):
+                self._discard(temp_path)
+            if link:
+                try:
+                    os.link(source_path, temp_path)
+                    return "link"
+                except (OSError, NotImplementedError, AttributeError):
+                    self._discard(temp_path)
+        shutil.copyfile(source_path, temp_path)
+        size = temp_path.stat().st_size
+        metrics_add("bytes_read", size)
+        metrics_add("bytes_written", size)
+        return "copy"
+
+    def publish_plain(self, source_path: Union[str, Path], final_path: Union[str, Path], verify: bool = True,
+                      link: bool = False) -> str:
+        """
+        發佈未加密的檔案
+
+        Args:
+            source_path: 來源檔案（位於 scratch_roots 內時會被直接搬走）
+            final_path: 目標檔案路徑
+            verify: 是否先做完整性檢查（來源為已檢查過的既有輸出時可略過）
+            link: 允許以硬連結發佈（僅限來源為 output/ 內的既有輸出，不可用於 input/ 的檔案）
+
+        Returns:
+            str: 使用的方式（rename / reflink / link / copy）
+        """
+        source_path = Path(source_path)
+        final_path = Path(final_path)
+        scratch = self._is_scratch(source_path)
+        if verify:
+            # temp/ 內解壓出的檔案直接移到隔離區；input/ 的來源保留原處，只複製一份
+            self._verify(source_path, final_path, move=scratch)
+
+        if scratch:
+            try:
+                # rename 不會寫出檔案內容，durable 模式下須先確保來源內容已落盤
+                if self.durable:
+                    self._fsync_file(source_path)
+                os.replace(source_path, final_path)
+                if self.durable:
+                    self._pending_dirs.add(source_path.parent)
+                    self._pending_dirs.add(final_path.parent)
+                    self._pending_count += 1
+                    if self._pending_count >= self.fsync_batch:
+                        self.flush()
+                self.stats["rename"] += 1
+                return "rename"
+            except OSError:
+                pass  # 跨檔案系統，改用下面的方式
+
+        temp_path = self._temp_path_for(final_path)
+        try:
+            method = self._clone(source_path, temp_path, link)
+            if self.durable:
+                self._fsync_file(temp_path)
+            self._publish(temp_path, final_path)
+        except BaseException:
+            self._discard(temp_path)
+            raise
+        self.stats[method] += 1
+        return method
+
+    def flush(self) -> None:
+        """批次 fsync 已發佈檔案所在的目錄（Windows 不支援目錄 fsync，直接略過）"""
+        for directory in self._pending_dirs:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        self._pending_dirs.clear()
+        self._pending_count = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self.verifier is not None:
+            self.verifier.close()
+
+
+# =============================================================================
+# 內容雜湊去重模組
+# =============================================================================
+
+class DedupeIndex:
+    """
+    以工作簿原始位元組的雜湊值去重（本次執行 + 跨執行）
+
+    - 相同內容只破解一次；之後的重複檔依 mode 處理：
+        link   - 以硬連結（或 reflink / 複製）指向既有輸出，另取新檔名
+        record - 不產生新輸出，只記錄為重複檔案
+    - 跨執行索引存於 output/.dedupe_index.json，輸出已被移走的項目會自動失效
+    - 本次執行中破解失敗的內容也會記住，相同內容不再重試同一平台
+    - shared=True（多節點 spool 模式）時，寫回前在鎖定中合併其他節點已寫入的項目
+    """
+
+    INDEX_VERSION = 1
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, index_path: Union[str, Path], output_dir: Union[str, Path], mode: str = "link",
+                 shared: bool = False):
+        self.index_path = Path(index_path)
+        self.output_dir = Path(output_dir)
+        self.mode = mode
+        self.shared = shared
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.failed = set()
+        self.duplicates: List[tuple] = []
+        self._dirty = False
+        self._touched = set()  # 本程序新增或移除的雜湊值
+        self._load()
+
+    def _load(self) -> None:
+        if not self.index_path.exists():
+            return
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.INDEX_VERSION:
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError) as e:
+            say(f"[WARN] 去重索引讀取失敗，將重新建立：{e}")
+
+    @classmethod
+    @timed_stage("hash")
+    def hash_file(cls, file_path: Union[str, Path]) -> str:
+        """計算檔案內容雜湊（blake2b，分塊讀取）"""
+        h = hashlib.blake2b(digest_size=20)
+        size = 0
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(cls.CHUNK_SIZE), b""):
+                h.update(chunk)
+                size += len(chunk)
+        metrics_add("bytes_read", size)
+        return h.hexdigest()
+
+    def lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        """查詢既有輸出；輸出檔已不存在時移除該筆並回傳 None"""
+        entry = self.entries.get(digest)
+        if entry is None:
+            return None
+        if not (self.output_dir / entry["output"]).exists():
+            del self.entries[digest]
+            self._touched.add(digest)
+            self._dirty = True
+            return None
+        return entry
+
+    def register(self, digest: str, output_path: Union[str, Path], shop_info: Dict[str, Any], platform: str) -> None:
+        output_path = Path(output_path)
+        try:
+            relative = output_path.resolve().relative_to(self.output_dir.resolve())
+        except ValueError:
+            return  # 不在 output/ 底下的輸出不納入索引
+        self.entries[digest] = {
+            "output": relative.as_posix(),
+            "platform": platform,
+            "shop_id": shop_info.get("shop_id", "UNKNOWN"),
+            "shop_account": shop_info.get("shop_account", "UNKNOWN"),
+            "shop_name": shop_info.get("shop_name", ""),
+            "first_seen": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        self._touched.add(digest)
+        self._dirty = True
+
+    def save(self) -> None:
+        """以臨時檔 + os.replace 寫回索引"""
+        if not self._dirty:
+            return
+        with shared_file_lock(self.index_path) if self.shared else contextlib.nullcontext():
+            if self.shared:
+                self.entries = merge_shared_entries(self.index_path, self.INDEX_VERSION, self.entries, self._touched)
+            temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            with temp_path.open("w", encoding="utf-8") as f:
+                json.dump({"version": self.INDEX_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+        self._dirty = False
+
+
+# =============================================================================
+# 共用資料夾鎖定模組
+# =============================================================================
+
+@contextlib.contextmanager
+def shared_file_lock(path: Union[str, Path], timeout: float = 30.0, stale: float = 60.0):
+    """
+    以 O_EXCL 建立 {path}.lock 的跨程序、跨主機鎖（本機與 SMB / NFS 共用資料夾皆適用）
+    持有者異常結束留下的鎖超過 stale 秒即視為失效並移除
+    """
+    lock_path = Path(f"{path}.lock")
+    give_up = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > stale:
+                    lock_path.unlink()
+                    continue
+            except OSError:
+                continue  # 鎖剛被釋放
+            if time.monotonic() > give_up:
+                raise TimeoutError(f"無法取得鎖定：{lock_path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            lock_path.unlink()
+        except OSError:
+            pass
+
+
+def merge_shared_entries(path: Path, version: int, entries: Dict[str, Any], touched: set) -> Dict[str, Any]:
+    """重新讀取其他節點已寫入的項目，只以本程序新增、修改或移除過的 key（touched）覆蓋"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        merged = data.get("entries", {}) if data.get("version") == version else {}
+    except (OSError, ValueError):
+        merged = {}
+    for key in touched:
+        if key in entries:
+            merged[key] = entries[key]
+        else:
+            merged.pop(key, None)
+    return merged
+
+
+# =============================================================================
+# 臨時資料夾管理模組
+# =============================================================================
+
+class TempSpace:
+    """
+    temp/ 內解壓資料夾的生命週期與磁碟用量上限
+
+    - 壓縮檔解開並完成解壓階段的處理後，只保留交給主流程的 Excel 檔案，
+      其餘成員（非 Excel、已發佈的工作簿）立即刪除
+    - 每個解壓資料夾以參考計數追蹤尚未處理的工作簿；工作簿處理完畢即刪除，計數歸零時刪除整個資料夾
+    - budget_bytes > 0 時，解開下一個壓縮檔前若預估會超過上限，先處理已解開的工作簿（drain）騰出空間
+    - 啟動時回收先前執行中斷留下的解壓資料夾（temp_* / extract_*）
+    - 指定 ram_root（記憶體檔案系統）時，預估放得下的壓縮檔解壓到 RAM 工作區，
+      超過 ram_budget 的壓縮檔個別退回 temp/；兩處的用量分別統計
+    """
+
+    EXTRACT_PREFIXES = ("temp_", "extract_")
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, budget_bytes: int = 0,
+                 ram_root: Optional[Union[str, Path]] = None, ram_budget: int = 0):
+        self.root = Path(root) if root is not None else None
+        self.budget = budget_bytes
+        self.used = 0
+        self.peak = 0
+        self.paused = 0  # 因達上限而先處理既有工作簿的次數
+        self.reclaimed = 0
+        self.ram_root = Path(ram_root) if ram_root is not None else None
+        self.ram_budget = ram_budget
+        self.ram_used = 0
+        self.ram_peak = 0
+        # 各位置解開的壓縮檔數與總量（含解開後即刪除的非 Excel 成員）
+        self.placed = {"ram": {"archives": 0, "bytes": 0}, "disk": {"archives": 0, "bytes": 0}}
+        self._dirs: Dict[Path, int] = {}  # 解壓資料夾 -> 尚未處理的工作簿數
+        self._files: Dict[Path, tuple] = {}  # 工作簿 -> (解壓資料夾, 大小, 是否在 RAM 工作區)
+        self.drain: Optional[Callable[[Path], None]] = None  # 處理單一工作簿（main 設定）
+        self.drained = set()  # 已提前處理的工作簿，主流程略過
+
+    def reclaim(self) -> int:
+        """刪除先前執行中斷留下的解壓資料夾，回傳刪除的數量"""
+        if self.root is None or not self.root.is_dir():
+            return 0
+        with os.scandir(self.root) as entries:
+            stale = [entry.path for entry in entries
+                     if entry.is_dir(follow_symlinks=False) and entry.name.startswith(self.EXTRACT_PREFIXES)]
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+        self.reclaimed += len(stale)
+        return len(stale)
+
+    def prepare(self, temp_dir: Union[str, Path], needed: int) -> Path:
+        """
+        選擇下一個壓縮檔的解壓位置
+
+        Args:
+            temp_dir: 磁碟上的臨時資料夾
+            needed: 預估解開後的大小
+
+        Returns:
+            Path: RAM 工作區放得下時回傳 ram_root，否則先確保 temp/ 用量上限再回傳 temp_dir
+        """
+        if self.ram_root is not None and self.ram_used + needed <= self.ram_budget:
+            return self.ram_root
+        self.make_room(needed)
+        return Path(temp_dir)
+
+    def _in_ram(self, path: Path) -> bool:
+        return self.ram_root is not None and self.ram_root in path.parents
+
+    def _account(self, in_ram: bool, size: int) -> None:
+        if in_ram:
+            self.ram_used += size
+            self.ram_peak = max(self.ram_peak, self.ram_used)
+        else:
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def track(self, extract_dir: Union[str, Path], keep: List[Path]) -> None:
+        """解壓階段結束時呼叫：刪除 keep 以外的成員，登記尚待主流程處理的工作簿"""
+        extract_dir = Path(extract_dir)
+        in_ram = self._in_ram(extract_dir)
+        keep = [Path(path) for path in keep]
+        keep_set = set(keep)
+        extracted = 0
+        for dirpath, _, filenames in os.walk(extract_dir):
+            for name in filenames:
+                path = Path(dirpath) / name
+                try:
+                    extracted += path.stat().st_size
+                    if path not in keep_set:
+                        path.unlink()
+                except OSError:
+                    pass
+        placed = self.placed["ram" if in_ram else "disk"]
+        placed["archives"] += 1
+        placed["bytes"] += extracted
+        kept = 0
+        for path in keep:  # 依主流程的處理順序登記，提前處理時先處理較早解開的
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            self._files[path] = (extract_dir, size, in_ram)
+            self._account(in_ram, size)
+            kept += 1
+        if kept:
+            self._dirs[extract_dir] = self._dirs.get(extract_dir, 0) + kept
+        else:
+            self.discard(extract_dir)
+
+    def discard(self, extract_dir: Union[str, Path]) -> None:
+        """解壓失敗或取消時刪除整個解壓資料夾"""
+        extract_dir = Path(extract_dir)
+        for path in [path for path, (owner, _, _) in self._files.items() if owner == extract_dir]:
+            _, size, in_ram = self._files.pop(path)
+            self._account(in_ram, -size)
+        self._dirs.pop(extract_dir, None)
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+    def release(self, file_path: Union[str, Path]) -> None:
+        """工作簿已處理完畢：刪除檔案，所屬資料夾的計數歸零時刪除整個資料夾"""
+        file_path = Path(file_path)
+        tracked = self._files.pop(file_path, None)
+        if tracked is None:
+            return
+        extract_dir, size, in_ram = tracked
+        self._account(in_ram, -size)
+        try:
+            file_path.unlink()
+        except OSError:
+            pass  # 已以 rename 發佈到 output/
+        self._dirs[extract_dir] -= 1
+        if self._dirs[extract_dir] == 0:
+            del self._dirs[extract_dir]
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+    def make_room(self, needed: int) -> None:
+        """解開下一個壓縮檔前呼叫：預估會超過上限時，先處理已解開的工作簿（暫停解壓）"""
+        if not self.budget or self.used + needed <= self.budget:
+            return
+        if self._files and self.drain is not None:
+            self.paused += 1
+            say(f"[TEMP] 臨時空間將超過上限 {self.budget / 1024 / 1024:.1f} MB，"
+                f"先處理已解開的 {len(self._files)} 個工作簿", VERBOSE)
+            log_event("temp_budget", level="info", used=self.used, needed=needed, budget=self.budget)
+            for file_path in [path for path, (_, _, in_ram) in self._files.items() if not in_ram]:
+                if self.used + needed <= self.budget:
+                    break
+                self.drained.add(file_path)
+                self.drain(file_path)
+                self.release(file_path)
+        if self.used + needed > self.budget:
+            say(f"[TEMP] 壓縮檔預估解開 {needed / 1024 / 1024:.1f} MB，超過臨時空間上限，仍繼續解壓", VERBOSE)
+
+    def report(self) -> Dict[str, Any]:
+        report = {"budget_bytes": self.budget, "peak_bytes": self.peak, "paused": self.paused,
+                  "reclaimed_dirs": self.reclaimed, "placed": self.placed}
+        if self.ram_root is not None:
+            report["ram"] = {"path": str(self.ram_root), "budget_bytes": self.ram_budget, "peak_bytes": self.ram_peak}
+        return report
+
+
+def ram_workspace_dir(location: str) -> Optional[Path]:
+    """
+    建立本次執行專用的 RAM 工作區 {location}/excel_password_remover/{PID}
+
+    location 為 auto 時使用 /dev/shm；位置不存在（例如 Windows 未安裝 RAM 磁碟）時回傳 None。
+    POSIX 上同時回收程序已結束的執行留下的工作區（記憶體檔案系統上的殘留會一直佔用記憶體）
+    """
+    base = Path("/dev/shm") if location == "auto" else Path(location)
+    if not base.is_dir():
+        return None
+    parent = base / "excel_password_remover"
+    parent.mkdir(exist_ok=True)
+    if os.name == "posix":
+        with os.scandir(parent) as entries:
+            owners = [entry.name for entry in entries if entry.name.isdigit() and int(entry.name) != os.getpid()]
+        for owner in owners:
+            try:
+                os.kill(int(owner), 0)
+            except ProcessLookupError:
+                shutil.rmtree(parent / owner, ignore_errors=True)
+            except OSError:
+                pass  # 其他使用者的程序仍在執行
+    workspace = parent / str(os.getpid())
+    workspace.mkdir(exist_ok=True)
+    return workspace
+
+
+def make_extract_dir(extract_root: Union[str, Path], prefix: str, filename: str) -> Path:
+    """建立壓縮檔的解壓資料夾（不同資料夾的同名壓縮檔在同一秒解開時也各自使用一個資料夾）"""
+    import tempfile
+    extract_root = Path(extract_root)
+    extract_root.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    return Path(tempfile.mkdtemp(prefix=f"{prefix}_{filename}_{timestamp}_", dir=extract_root))
+
+
+def archive_unpacked_size(archive_path: Union[str, Path]) -> int:
+    """壓縮檔第一層成員解開後的總大小（只讀目錄，不解壓）；無法讀取時回傳 0"""
+    try:
+        archive, _ = open_archive(archive_path)
+        with archive:
+            return sum(info.file_size for info in archive.infolist())
+    except Exception:
+        return 0
+
+
+# =============================================================================
+# 處理時限模組
+# =============================================================================
+
+class TimeBudget:
+    """單一檔案、壓縮檔或整次執行的處理時限（以 time.monotonic 計時）"""
+
+    def __init__(self, seconds: float, kind: str):
+        self.seconds = seconds
+        self.kind = kind  # file / archive / run
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+
+    def expired(self) -> bool:
+        return time.monotonic() > self.deadline
+
+
+class BudgetExceeded(BaseException):
+    """
+    超過處理時限
+
+    繼承 BaseException：各處理函數以 except Exception 吞掉個別候選密碼、壓縮檔成員的錯誤，
+    時限必須穿過這些處理，回到設定該時限的迴圈才能取消該檔案
+    """
+
+    def __init__(self, budget: TimeBudget):
+        super().__init__(f"超過{BUDGET_LABELS.get(budget.kind, budget.kind)}處理時限 {budget.seconds:g} 秒")
+        self.budget = budget
+        self.progress: Dict[str, Dict[str, int]] = {}  # 平台 -> {"tried": 已測試的候選密碼數, "of": 總數}
+
+
+BUDGET_LABELS = {"file": "單一檔案", "archive": "壓縮檔", "run": "整次執行"}
+
+# 整次執行的截止時間（main 設定）與目前生效中的時限（外層在前）
+_RUN_BUDGET: Optional[TimeBudget] = None
+_ACTIVE_BUDGETS: List[TimeBudget] = []
+
+
+def set_run_deadline(seconds: Optional[float]) -> None:
+    global _RUN_BUDGET
+    _RUN_BUDGET = TimeBudget(seconds, "run") if seconds else None
+
+
+def run_deadline_passed() -> bool:
+    return _RUN_BUDGET is not None and _RUN_BUDGET.expired()
+
+
+@contextlib.contextmanager
+def time_budget(seconds: Optional[float], kind: str):
+    """以 with 區塊限制處理時間（seconds 為 0 / None 時不限），產生 TimeBudget 供呼叫端辨識是哪個時限到期"""
+    if not seconds:
+        yield None
+        return
+    budget = TimeBudget(seconds, kind)
+    _ACTIVE_BUDGETS.append(budget)
+    try:
+        yield budget
+    finally:
+        _ACTIVE_BUDGETS.remove(budget)
+
+
+def check_deadline() -> None:
+    """
+    檢查點：任一生效中的時限到期即拋出 BudgetExceeded（整次執行優先，其次由外而內）
+    放在候選密碼之間、解密與解壓縮的每一批之間；單一候選密碼的金鑰推導本身不會被中斷
+    """
+    if _RUN_BUDGET is not None and _RUN_BUDGET.expired():
+        raise BudgetExceeded(_RUN_BUDGET)
+    for budget in _ACTIVE_BUDGETS:
+        if budget.expired():
+            raise BudgetExceeded(budget)
+
+
+class QuarantineList:
+    """
+    超過處理時限的檔案清單（log/quarantine.json，跨執行保留）
+
+    - 記錄超時的檔案 / 壓縮檔、到期的時限、已花費的時間與各平台已測試的候選密碼數
+    - 同一檔案（路徑、大小、修改時間皆相同）下次執行時從上次中斷的候選密碼繼續，不再從頭測試
+    - 在時限內處理完畢（不論成敗）或檔案已不存在時移出清單；解壓到 temp/ 的工作簿只記入本次執行報告
+    - shared=True（多節點 spool 模式）時，寫回前在鎖定中合併其他節點已寫入的項目
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path], input_dir: Union[str, Path], shared: bool = False):
+        self.path = Path(path)
+        self.input_dir = Path(input_dir)
+        self.shared = shared
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.added: List[Dict[str, Any]] = []  # 本次執行新增的項目（寫入執行報告）
+        self._dirty = False
+        self._touched = set()  # 本程序新增或移除的 key
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            say(f"[WARN] 隔離清單讀取失敗，將重新建立：{e}")
+            return
+        if data.get("version") != self.VERSION:
+            return
+        for key, entry in data.get("entries", {}).items():
+            if (self.input_dir / key).exists():
+                self.entries[key] = entry
+            else:
+                self._touched.add(key)
+                self._dirty = True
+
+    def _key(self, file_path: Path) -> Optional[str]:
+        try:
+            return file_path.resolve().relative_to(self.input_dir.resolve()).as_posix()
+        except ValueError:
+            return None  # 解壓到 temp/ 的檔案每次路徑都不同，只記入本次執行報告
+
+    def _matches(self, entry: Dict[str, Any], file_path: Path) -> bool:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+    def add(self, file_path: Union[str, Path], kind: str, error: BudgetExceeded, seconds: float) -> Dict[str, Any]:
+        file_path = Path(file_path)
+        key = self._key(file_path)
+        previous = self.entries.get(key) if key and self._matches(self.entries.get(key, {}), file_path) else None
+        progress = dict((previous or {}).get("progress", {}))
+        progress.update(error.progress)
+        try:
+            stat = file_path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+        entry = {
+            "file": file_path.name,
+            "kind": kind,
+            "budget": error.budget.kind,
+            "budget_seconds": error.budget.seconds,
+            "seconds": round(seconds, 3),
+            "progress": progress,
+            "attempts": (previous or {}).get("attempts", 0) + 1,
+            "size": size,
+            "mtime": mtime,
+            "quarantined_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        if key is not None:
+            self.entries[key] = entry
+            self._touched.add(key)
+            self._dirty = True
+        self.added.append(dict(entry, path=key or str(file_path)))
+        return entry
+
+    def resume_offset(self, file_path: Union[str, Path], platform: str, total: int) -> int:
+        """上次中斷時該平台已測試的候選密碼數；密碼本數量不同或檔案已變更時從頭測試"""
+        file_path = Path(file_path)
+        key = self._key(file_path)
+        entry = self.entries.get(key) if key else None
+        if entry is None or not self._matches(entry, file_path):
+            return 0
+        progress = entry.get("progress", {}).get(platform)
+        if not progress or progress.get("of") != total:
+            return 0
+        return progress.get("tried", 0)  # 超過密碼本數量表示中斷時已在測試擴展候選
+
+    def release(self, file_path: Union[str, Path]) -> None:
+        key = self._key(Path(file_path))
+        if key and self.entries.pop(key, None) is not None:
+            self._touched.add(key)
+            self._dirty = True
+
+    def save(self) -> None:
+        """以臨時檔 + os.replace 寫回清單"""
+        if not self._dirty:
+            return
+        with shared_file_lock(self.path) if self.shared else contextlib.nullcontext():
+            if self.shared:
+                self.entries = merge_shared_entries(self.path, self.VERSION, self.entries, self._touched)
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            with temp_path.open("w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        self._dirty = False
+
+
+def quarantine_timeout(file_path: Union[str, Path], kind: str, error: BudgetExceeded, seconds: float,
+                       log_lines: LogSink, ctx: "RunContext") -> str:
+    """取消超時的檔案：記入隔離清單、執行報告與日誌，回傳錯誤訊息"""
+    file_path = Path(file_path)
+    tried = sum(p.get("tried", 0) for p in error.progress.values())
+    msg = f"[TIMEOUT] {file_path.name} - {error}，已列入隔離清單（已測試 {tried} 個候選密碼）"
+    if ctx.quarantine is not None:
+        entry = ctx.quarantine.add(file_path, kind, error, seconds)
+    else:
+        entry = {"file": file_path.name, "kind": kind, "budget": error.budget.kind,
+                 "budget_seconds": error.budget.seconds, "seconds": round(seconds, 3), "progress": error.progress}
+    if ctx.spool is not None:
+        ctx.spool.complete(file_path, "timeout")  # 其他節點本次不再重試，留給下次執行
+    mark_unfinished(file_path, ctx)
+    metrics_outcome("timeout")
+    metrics_timeout(entry)
+    log_event("timeout", level="warning", path=str(file_path), kind=kind, budget=error.budget.kind,
+              seconds=round(seconds, 3), candidates=tried)
+    log_lines.append(msg)
+    say(msg, QUIET)
+    return msg
+
+
+def mark_unfinished(file_path: Union[str, Path], ctx: "RunContext") -> None:
+    """記錄未處理完成的輸入檔：解壓出的工作簿記其來源壓縮檔，--changed-only 下次執行仍會處理"""
+    file_path = Path(file_path)
+    ctx.unfinished.add(ctx.sources.get(file_path, file_path))
+
+
+def release_archive_lease(file_path: Union[str, Path], ctx: "RunContext") -> None:
+    """解壓途中達到整次執行截止時間：交還壓縮檔的租約（不記錄完成），留給其他節點或下次執行"""
+    if ctx.spool is not None:
+        ctx.spool.release(file_path)
+
+# =============================================================================
+# 破解工作階段與串流解密模組
+# =============================================================================
+
+# ECMA-376 Agile 加密以 4096 bytes 為一個區段，每段獨立 IV
+AGILE_SEGMENT_LENGTH = 4096
+# 串流解密每批處理的大小（記憶體上限約為此值的兩倍）
+DEFAULT_DECRYPT_CHUNK = 1024 * 1024
+
+# EncryptionInfo 的雜湊演算法名稱 -> hashlib 建構函數名稱
+_AGILE_HASHES = {
+    "SHA1": "sha1",
+    "SHA256": "sha256",
+    "SHA384": "sha384",
+    "SHA512": "sha512",
+    "MD5": "md5",
+}
+
+# BIFF8 記錄編號
+_BIFF_FILEPASS = 0x002F
+_BIFF_EOF = 0x000A
+
+
+class _OleStreamReader:
+    """
+    依 FAT 鏈直接從 mmap 讀取 OLE 串流，只在需要時讀取對應的 sector
+    （olefile.openstream 會把整個串流讀進記憶體）
+    """
+
+    def __init__(self, buffer, fat, sector_size: int, start_sector: int, size: int):
+        self.buffer = buffer
+        self.fat = fat
+        self.sector_size = sector_size
+        self.sector = start_sector
+        self.offset = 0  # 目前 sector 內的位移
+        self.remaining = size
+        self.high_water = 0  # 已讀取到的最大檔案位移
+
+    def read(self, n: int) -> bytes:
+        n = min(n, self.remaining)
+        pieces = []
+        while n > 0 and self.sector >= 0 and self.sector < len(self.fat):
+            # 合併連續的 sector，減少切片次數
+            run_start = self.sector
+            run_sectors = 1
+            available = self.sector_size - self.offset
+            while available < n and self.fat[run_start + run_sectors - 1] == run_start + run_sectors:
+                run_sectors += 1
+                available += self.sector_size
+            take = min(n, available)
+            start = (run_start + 1) * self.sector_size + self.offset
+            pieces.append(self.buffer[start:start + take])
+            self.high_water = max(self.high_water, start + take)
+            n -= take
+            self.remaining -= take
+
+            consumed = self.offset + take
+            full_sectors, self.offset = divmod(consumed, self.sector_size)
+            for _ in range(full_sectors):
+                self.sector = self.fat[self.sector]
+        return b"".join(pieces)
+
+
+def stream_decrypt_agile(source: Union[str, Path, BinaryIO], ole, info: Dict[str, Any], secret_key: bytes,
+                         f_out: BinaryIO, chunk_size: int = DEFAULT_DECRYPT_CHUNK) -> int:
+    """
+    以固定記憶體上限串流解密 Agile 加密的 EncryptedPackage
+
+    Args:
+        source: 加密檔案路徑，或已開啟、具 fileno() 的檔案物件（皆以 mmap 讀取）
+        ole: 已開啟的 olefile.OleFileIO（只用來取得 FAT 與目錄資訊）
+        info: msoffcrypto 解析出的 EncryptionInfo
+        secret_key: 已驗證的金鑰
+        f_out: 輸出檔案
+        chunk_size: 每批處理的大小（會對齊到 4096 bytes 區段）
+
+    Returns:
+        int: 寫出的位元組數
+    """
+    import mmap
+
+    released = 0
+
+    def release(high_water: int) -> None:
+        # 已處理的頁面從工作集釋放（仍留在系統檔案快取），RSS 不隨檔案大小成長
+        nonlocal released
+        release_to = high_water - high_water % mmap.PAGESIZE
+        if release_to > released:
+            buffer.madvise(mmap.MADV_DONTNEED, released, release_to - released)
+            released = release_to
+
+    with contextlib.ExitStack() as stack:
+        f_in = source if hasattr(source, "fileno") else stack.enter_context(open(source, "rb"))
+        buffer = stack.enter_context(mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ))
+        return decrypt_agile_buffer(buffer, ole, info, secret_key, f_out, chunk_size,
+                                    release if hasattr(mmap, "MADV_DONTNEED") else None)
+
+
+def decrypt_agile_buffer(buffer, ole, info: Dict[str, Any], secret_key: bytes, f_out: BinaryIO,
+                         chunk_size: int = DEFAULT_DECRYPT_CHUNK,
+                         release: Optional[Callable[[int], None]] = None) -> int:
+    """
+    從整份檔案的 buffer（mmap、bytes 或 memoryview）逐批解密 EncryptedPackage 並寫入 f_out
+    release 於每批寫出後以已讀取的最高位移呼叫，供 mmap 釋放頁面
+    """
+    import struct
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    hash_func = getattr(hashlib, _AGILE_HASHES[info["keyDataHashAlgorithm"].upper().replace("-", "")])
+    key_data_salt = info["keyDataSalt"]
+    block_size = info["keyDataBlockSize"]
+    segments_per_chunk = max(1, chunk_size // AGILE_SEGMENT_LENGTH)
+
+    entry = ole.direntries[ole._find("EncryptedPackage")]
+    written = 0
+    reader = _OleStreamReader(buffer, ole.fat, ole.sectorsize, entry.isectStart, entry.size)
+    (total_size,) = struct.unpack("<Q", reader.read(8))
+    remaining = total_size
+    segment_index = 0
+    while remaining > 0:
+        check_deadline()
+        chunk = reader.read(AGILE_SEGMENT_LENGTH * segments_per_chunk)
+        if not chunk:
+            break
+        out = []
+        for pos in range(0, len(chunk), AGILE_SEGMENT_LENGTH):
+            iv = hash_func(key_data_salt + struct.pack("<I", segment_index)).digest()[:block_size]
+            decryptor = Cipher(algorithms.AES(secret_key), modes.CBC(iv)).decryptor()
+            plain = decryptor.update(chunk[pos:pos + AGILE_SEGMENT_LENGTH]) + decryptor.finalize()
+            if len(plain) > remaining:
+                plain = plain[:remaining]
+            if segment_index == 0 and not plain.startswith(b"PK"):
+                raise msoffcrypto.exceptions.InvalidKeyError("The file could not be decrypted with this password")
+            out.append(plain)
+            remaining -= len(plain)
+            segment_index += 1
+            if remaining <= 0:
+                break
+        data = b"".join(out)
+        f_out.write(data)
+        written += len(data)
+        if release is not None:
+            release(reader.high_water)
+    return written
+
+
+class CrackSession:
+    """
+    單一檔案的破解工作階段
+
+    - 檔案只開啟、解析一次，每個候選密碼只跑密碼驗證器（verifier），不做整份解密
+    - 驗證成功後 decrypt_to() 才真正解密；Agile 加密走串流路徑，記憶體用量固定
+    - source 可為檔案路徑，或可 seek 的二進位串流（例如 BytesIO、已開啟的檔案；由呼叫端負責關閉）
+    """
+
+    def __init__(self, source: Union[str, Path, BinaryIO], chunk_size: int = DEFAULT_DECRYPT_CHUNK):
+        self.chunk_size = chunk_size
+        self.password: Optional[str] = None
+        if isinstance(source, (str, Path)):
+            self.file_path: Optional[Path] = Path(source)
+            self._f = open(self.file_path, "rb")
+            self._owns_file = True
+        else:
+            self.file_path = None
+            self._f = source
+            self._owns_file = False
+        try:
+            self.office_file = msoffcrypto.OfficeFile(self._f)
+            self.kind = getattr(self.office_file, "type", None) or getattr(self.office_file, "format", "unknown")
+            if self.office_file.format == "xls97":
+                self.kind = "xls97" if self._xls_has_filepass() else "plain"
+        except BaseException:
+            self.close()
+            raise
+
+    def _mappable(self) -> bool:
+        """來源串流是否為可 mmap 的一般檔案（例如呼叫端以 open() 開啟的檔案）"""
+        import stat
+        try:
+            st = os.fstat(self._f.fileno())
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            return False
+        return stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+    def _xls_has_filepass(self) -> bool:
+        """掃描 Workbook 串流的 globals 區段，判斷是否有 FilePass 記錄"""
+        import struct
+        stream = self.office_file.data.workbook
+        stream.seek(0)
+        while True:
+            header = stream.read(4)
+            if len(header) < 4:
+                return False
+            num, size = struct.unpack("<HH", header)
+            if num == _BIFF_FILEPASS:
+                return True
+            if num == _BIFF_EOF:
+                return False
+            stream.seek(size, os.SEEK_CUR)
+
+    @property
+    def is_encrypted(self) -> bool:
+        return self.kind != "plain"
+
+    @property
+    def source_size(self) -> int:
+        """來源的位元組數（串流來源不改變目前位置）"""
+        if self.file_path is not None:
+            return os.fstat(self._f.fileno()).st_size
+        position = self._f.tell()
+        size = self._f.seek(0, os.SEEK_END)
+        self._f.seek(position)
+        return size
+
+    def try_password(self, password: str) -> bool:
+        """只以密碼驗證器檢查候選密碼，成功時保留金鑰供 decrypt_to 使用"""
+        try:
+            if self.office_file.format == "ooxml":
+                self.office_file.load_key(password=password, verify_password=True)
+            else:
+                self.office_file.load_key(password=password)
+        except msoffcrypto.exceptions.InvalidKeyError:
+            return False
+        self.password = password
+        return True
+
+    def decrypt_to(self, f_out: BinaryIO) -> None:
+        """把已驗證的檔案解密寫入 f_out"""
+        if self.password is None:
+            raise msoffcrypto.exceptions.DecryptionError("No key specified")
+        if self.kind == "agile":
+            ole = self.office_file.file
+            entry = ole.direntries[ole._find("EncryptedPackage")]
+            if entry.size >= ole.minisectorcutoff:
+                if self.file_path is not None or self._mappable():
+                    # 路徑或一般檔案：直接 mmap 開啟中的檔案，記憶體用量固定
+                    stream_decrypt_agile(self._f, ole, self.office_file.info,
+                                         self.office_file.secret_key, f_out, self.chunk_size)
+                    return
+                if isinstance(self._f, io.BytesIO):
+                    # 記憶體內的來源：直接在既有 buffer 上逐批解密，不再另外複製整份
+                    with self._f.getbuffer() as buffer:
+                        decrypt_agile_buffer(buffer, ole, self.office_file.info,
+                                             self.office_file.secret_key, f_out, self.chunk_size)
+                    return
+        self.office_file.decrypt(f_out)
 
-    if not json_path.exists():
-        raise FileNotFoundError(f"找不到 {json_filename}: {json_path}")
+    def close(self) -> None:
+        if self._owns_file:
+            self._f.close()
 
-    with json_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    # 轉換 JSON 資料為原本 passwords.yaml 的格式
-    return convert_json_to_passwords_format(data)
+    def __enter__(self) -> "CrackSession":
+        return self
 
-def convert_json_to_passwords_format(json_data: Dict[str, Any]) -> Dict[str, Any]:
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class RunContext:
     """
-    將 JSON 資料轉換為新的 platform_index 格式
-    直接返回原始 JSON 資料，因為現在使用 platform_index 結構
+    單次執行共用的處理狀態，於各處理函數之間傳遞
     """
-    # 直接返回原始 JSON 資料，因為現在使用新的 platform_index 結構
-    return json_data
+
+    def __init__(self, committer: Optional[OutputCommitter] = None, dedupe: Optional[DedupeIndex] = None,
+                 decrypt_chunk: int = DEFAULT_DECRYPT_CHUNK, archive_limits: Optional["ArchiveLimits"] = None,
+                 quarantine: Optional[QuarantineList] = None, file_timeout: Optional[float] = None,
+                 archive_timeout: Optional[float] = None, layout: Optional["OutputLayout"] = None,
+                 spool: Optional["SpoolWorker"] = None, temp_space: Optional[TempSpace] = None,
+                 candidate_rules: Optional[Dict[str, "CandidateRules"]] = None,
+                 exporter: Optional["WorkbookExporter"] = None):
+        self.committer = committer or OutputCommitter()
+        self.dedupe = dedupe
+        self.decrypt_chunk = decrypt_chunk
+        self.archive_limits = archive_limits or ArchiveLimits()
+        self.quarantine = quarantine
+        self.file_timeout = file_timeout  # 單一檔案的處理時限秒數（None = 不限）
+        self.archive_timeout = archive_timeout  # 單一壓縮檔解壓（含巢狀壓縮檔）的處理時限秒數
+        self.layout = layout or OutputLayout()
+        self.spool = spool  # 多節點 spool 模式的工作節點（None = 獨佔 input/）
+        self.temp_space = temp_space or TempSpace()
+        self.candidate_rules = candidate_rules or {}  # 平台 -> 候選密碼擴展規則（"*" 為預設）
+        self.exporter = exporter  # --export：輸出後另外匯出 CSV / Parquet（None = 不匯出）
+        self.sources: Dict[Path, Path] = {}  # 解壓出的工作簿 -> input/ 中的來源壓縮檔（巢狀壓縮檔記最外層）
+        self.unfinished: Set[Path] = set()  # 處理失敗、超時的 input/ 檔案（解壓出的工作簿記其來源壓縮檔）
 
 # =============================================================================
 # Excel 密碼移除核心模組 (來自 remover.py)
 # =============================================================================
 
-def remove_password(input_path: Union[str, Path], output_path: Union[str, Path], password: str) -> bool:
+@timed_stage("remove_password")
+def remove_password(input_path: Union[str, Path], output_path: Union[str, Path], password: str,
+                    committer: Optional[OutputCommitter] = None, session: Optional[CrackSession] = None) -> bool:
     """
     使用 msoffcrypto-tool 解開 Excel 開啟密碼，另存為 output_path
-    若檔案未加密，直接複製
-    """
-    with open(input_path, "rb") as f_in:
-        office_file = msoffcrypto.OfficeFile(f_in)
-        try:
-            office_file.load_key(password=password)
-            with open(output_path, "wb") as f_out:
-                office_file.decrypt(f_out)
-        except msoffcrypto.exceptions.FileFormatError as e:
-            error_msg = str(e)
-            if "Unencrypted document" in error_msg:
-                # 檔案未加密，直接複製
-                shutil.copyfile(input_path, output_path)
-            elif "Record not found" in error_msg:
-                # Record not found 可能表示檔案已解密或格式異常，直接複製
-                shutil.copyfile(input_path, output_path)
-            else:
-                raise
-    
+    若檔案未加密，直接發佈原檔（temp/ 內的檔案 rename，其餘 reflink，必要時才複製）
+    輸出一律經由 OutputCommitter 寫入臨時檔後原子發佈
+
+    Args:
+        session: 已驗證過密碼的 CrackSession（可選，避免重新開檔與重新推導金鑰）
+    """
+    if committer is None:
+        committer = OutputCommitter()
+
+    own_session = session is None
+    if own_session:
+        session = CrackSession(input_path)
+    try:
+        encrypted = session.is_encrypted
+        if encrypted:
+            if session.password != password and not session.try_password(password):
+                raise msoffcrypto.exceptions.InvalidKeyError("Key verification failed")
+            committer.write(output_path, session.decrypt_to)
+            metrics_add("bytes_read", session.source_size)
+    except (msoffcrypto.exceptions.DecryptionError, msoffcrypto.exceptions.ParseError) as e:
+        error_msg = str(e)
+        if "Unencrypted document" in error_msg or "Record not found" in error_msg:
+            # 檔案未加密，或 Record not found（可能已解密或格式異常），直接發佈
+            encrypted = False
+        else:
+            raise
+    finally:
+        if own_session:
+            session.close()
+
+    if not encrypted:
+        # 未加密：直接發佈原檔（先關閉檔案，Windows 才能 rename）
+        committer.publish_plain(input_path, output_path)
+
     return True
 
 # =============================================================================
 # 壓縮檔案處理核心模組 (來自 compression.py)
 # =============================================================================
 
+def extract_members(archive, extract_to: Union[str, Path]) -> List[str]:
+    """
+    逐一成員分塊解壓縮（取代 extractall），每批之間檢查處理時限
+    成員路徑經 safe_member_path 處理，回傳實際寫出的相對路徑
+    """
+    extract_to = Path(extract_to)
+    extracted_files = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        relative = safe_member_path(info.filename)
+        target = extract_to / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with archive.open(info) as src, open(target, "wb") as dst:
+            for chunk in iter(lambda: src.read(DedupeIndex.CHUNK_SIZE), b""):
+                check_deadline()
+                dst.write(chunk)
+        extracted_files.append(relative.as_posix())
+    return extracted_files
+
+@timed_stage("extract")
 def extract_zip(zip_path: Union[str, Path], extract_to: Union[str, Path], password: Optional[str] = None) -> List[str]:
     """
     解壓縮 ZIP 檔案
@@ -213,13 +2292,8 @@ def extract_zip(zip_path: Union[str, Path], extract_to: Union[str, Path], passwo
             if password:
                 zip_ref.setpassword(password.encode('utf-8'))
             
-            # 解壓縮所有檔案
-            zip_ref.extractall(extract_to)
-            
-            # 記錄解壓縮的檔案
-            for file_info in zip_ref.infolist():
-                if not file_info.is_dir():
-                    extracted_files.append(file_info.filename)
+            # 逐一成員解壓縮（可在每批之間取消）
+            extracted_files = extract_members(zip_ref, extract_to)
                     
     except zipfile.BadZipFile:
         raise Exception(f"無效的 ZIP 檔案：{zip_path}")
@@ -231,6 +2305,7 @@ def extract_zip(zip_path: Union[str, Path], extract_to: Union[str, Path], passwo
     
     return extracted_files
 
+@timed_stage("extract")
 def extract_rar(rar_path: Union[str, Path], extract_to: Union[str, Path], password: Optional[str] = None) -> List[str]:
     """
     解壓縮 RAR 檔案
@@ -246,7 +2321,7 @@ def extract_rar(rar_path: Union[str, Path], extract_to: Union[str, Path], passwo
     extracted_files = []
 
     # 依賴檢查
-    if rarfile is None:
+    if not rarfile._available():
         raise Exception(
             "缺少依賴 'rarfile'，請先執行: python -m pip install -r requirements.txt"
         )
@@ -256,13 +2331,8 @@ def extract_rar(rar_path: Union[str, Path], extract_to: Union[str, Path], passwo
             if password:
                 rar_ref.setpassword(password)
             
-            # 解壓縮所有檔案
-            rar_ref.extractall(extract_to)
-            
-            # 記錄解壓縮的檔案
-            for file_info in rar_ref.infolist():
-                if not file_info.is_dir():
-                    extracted_files.append(file_info.filename)
+            # 逐一成員解壓縮（可在每批之間取消，取消時 UnRAR 程序隨之結束）
+            extracted_files = extract_members(rar_ref, extract_to)
                     
     except rarfile.BadRarFile:
         raise Exception(f"無效的 RAR 檔案：{rar_path}")
@@ -320,43 +2390,388 @@ def is_compressed_file(file_path: Union[str, Path]) -> bool:
     file_path = Path(file_path)
     return file_path.suffix.lower() in ['.zip', '.rar']
 
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+ARCHIVE_EXTENSIONS = ('.zip', '.rar')
+
+# 巢狀壓縮檔預設上限：往下展開的層數、單一成員的壓縮比
+DEFAULT_ARCHIVE_DEPTH = 3
+DEFAULT_ARCHIVE_RATIO = 100
+
+
+class UnpackLimitExceeded(Exception):
+    """壓縮檔解開後超過大小上限（防止 zip bomb）"""
+
+
+def read_archive_member(archive, info, limit: Optional[int], pwd=None) -> bytes:
+    """分塊讀取壓縮檔成員，解開的大小超過 limit 時立即停止（不信任標頭宣告的大小）"""
+    if limit is not None and info.file_size > limit:
+        raise UnpackLimitExceeded(f"{info.filename} 宣告大小 {info.file_size} bytes 超過上限 {limit} bytes")
+    chunks = []
+    total = 0
+    with archive.open(info, pwd=pwd) as member:
+        for chunk in iter(lambda: member.read(DedupeIndex.CHUNK_SIZE), b""):
+            check_deadline()
+            total += len(chunk)
+            if limit is not None and total > limit:
+                raise UnpackLimitExceeded(f"{info.filename} 解開後超過上限 {limit} bytes")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class ArchiveLimits:
+    """
+    巢狀壓縮檔的展開上限（防止 zip bomb）
+
+    - max_depth：最外層之下最多再展開幾層壓縮檔
+    - max_bytes：一個壓縮檔（含其內所有巢狀壓縮檔）解開的總量上限（None = 不限）
+    - max_ratio：單一成員解開大小 / 壓縮後大小的上限（0 = 不檢查）
+    """
+
+    def __init__(self, max_depth: int = DEFAULT_ARCHIVE_DEPTH, max_bytes: Optional[int] = None,
+                 max_ratio: float = DEFAULT_ARCHIVE_RATIO):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.max_ratio = max_ratio
+
+    def new_budget(self) -> "ArchiveBudget":
+        """每個最外層壓縮檔使用一份新的額度"""
+        return ArchiveBudget(self)
+
+
+class ArchiveBudget:
+    """單一壓縮檔樹的剩餘額度，所有層級共用"""
+
+    def __init__(self, limits: ArchiveLimits):
+        self.limits = limits
+        self.remaining = limits.max_bytes
+
+    def charge(self, size: int, name: str) -> None:
+        """扣除已解開的位元組數（例如已解壓到磁碟的第一層成員）"""
+        if self.remaining is None:
+            return
+        self.remaining -= size
+        if self.remaining < 0:
+            raise UnpackLimitExceeded(f"{name} 解開後總量超過上限 {self.limits.max_bytes} bytes")
+
+    def read(self, archive, info, pwd=None) -> bytes:
+        """讀取成員並扣除額度；壓縮比異常或總量超過上限時拋出 UnpackLimitExceeded"""
+        ratio = self.limits.max_ratio
+        if ratio and info.compress_size and info.file_size / info.compress_size > ratio:
+            raise UnpackLimitExceeded(f"{info.filename} 壓縮比 {info.file_size / info.compress_size:.0f} 超過上限 {ratio:g}")
+        content = read_archive_member(archive, info, self.remaining, pwd)
+        if ratio and info.compress_size and len(content) / info.compress_size > ratio:
+            raise UnpackLimitExceeded(f"{info.filename} 壓縮比 {len(content) / info.compress_size:.0f} 超過上限 {ratio:g}")
+        if self.remaining is not None:
+            self.remaining -= len(content)
+        return content
+
+
+def open_archive(source: Union[str, Path, BinaryIO]):
+    """依內容（不看副檔名）開啟 ZIP / RAR，回傳 (壓縮檔物件, 密碼是否需編碼為 bytes)"""
+    if zipfile.is_zipfile(source):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return zipfile.ZipFile(source), True
+    if not rarfile._available():
+        raise Exception("缺少依賴 'rarfile'，請先執行: python -m pip install -r requirements.txt")
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return rarfile.RarFile(source), False
+
+
+def walk_archive(source: Union[str, Path, BinaryIO], passwords: List[str], budget: ArchiveBudget,
+                 prefix: str = "", depth: int = 0):
+    """
+    逐層走訪壓縮檔，產生 (成員路徑, 內容 bytes 或 None, 錯誤訊息或 None)
+
+    - 只產生 Excel 成員；內層 .zip / .rar 讀入記憶體後遞迴展開，不寫入暫存資料夾
+    - 成員路徑以「/」串接各層名稱，例如 月結.zip/MOMO.rar/報表.xlsx
+    - 每個成員先試無密碼再試 passwords，成功的密碼移到最前面，同層其他成員優先使用
+    - 內層壓縮檔無法開啟、密碼錯誤或超過層數上限時記為錯誤，不影響其他成員
+    - 超過總量或壓縮比上限時拋出 UnpackLimitExceeded，整棵樹停止展開
+    """
+    archive, encode_password = open_archive(source)
+    attempts: List[Optional[str]] = [None] + [password for password in passwords if password]
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            suffix = Path(info.filename).suffix.lower()
+            if suffix not in EXCEL_EXTENSIONS and suffix not in ARCHIVE_EXTENSIONS:
+                continue
+            member_path = f"{prefix}{info.filename}"
+            if suffix in ARCHIVE_EXTENSIONS and depth >= budget.limits.max_depth:
+                yield member_path, None, f"超過巢狀壓縮檔層數上限 {budget.limits.max_depth}"
+                continue
+
+            content = None
+            for password in attempts:
+                pwd = None
+                if password is not None:
+                    pwd = password.encode("utf-8") if encode_password else password
+                try:
+                    content = budget.read(archive, info, pwd)
+                except UnpackLimitExceeded:
+                    raise
+                except Exception:
+                    continue
+                attempts.remove(password)
+                attempts.insert(0, password)
+                break
+            if content is None:
+                yield member_path, None, "壓縮檔密碼錯誤"
+                continue
+
+            if suffix in EXCEL_EXTENSIONS:
+                yield member_path, content, None
+                continue
+            try:
+                yield from walk_archive(io.BytesIO(content), passwords, budget, f"{member_path}/", depth + 1)
+            except UnpackLimitExceeded:
+                raise
+            except Exception as e:
+                yield member_path, None, f"無法開啟內層壓縮檔：{e}"
+
+
+def safe_member_path(member_path: str) -> Path:
+    """將壓縮檔成員路徑轉為安全的相對路徑（去除絕對路徑、磁碟代號與 ..）"""
+    parts = [part for part in member_path.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    if parts and parts[0].endswith(":"):
+        parts = parts[1:]
+    return Path(*parts) if parts else Path("unnamed")
+
+
+@timed_stage("extract_nested")
+def expand_nested_archives(extract_dir: Path, extracted_files: List[str], passwords: List[str],
+                           limits: ArchiveLimits, log_lines: LogSink) -> List[str]:
+    """
+    展開第一層解壓結果中的巢狀壓縮檔
+
+    內層壓縮檔在記憶體中逐層展開，只有 Excel 成員寫入 extract_dir/nested/，
+    回傳這些檔案相對 extract_dir 的路徑，供呼叫端與第一層的 Excel 檔案一併處理
+
+    Args:
+        extract_dir: 第一層的解壓縮資料夾
+        extracted_files: 第一層解壓出的成員（相對路徑）
+        passwords: 各層壓縮檔要嘗試的密碼（無密碼一律先試）
+        limits: 層數、總量與壓縮比上限
+        log_lines: 日誌行列表
+    """
+    inner_archives = [name for name in extracted_files if Path(name).suffix.lower() in ARCHIVE_EXTENSIONS]
+    if not inner_archives or limits.max_depth < 1:
+        return []
+
+    budget = limits.new_budget()
+    nested_files: List[str] = []
+    try:
+        for name in extracted_files:
+            path = extract_dir / name
+            if path.is_file():
+                budget.charge(path.stat().st_size, name)
+        for name in inner_archives:
+            try:
+                for member_path, content, error in walk_archive(extract_dir / name, passwords, budget,
+                                                                f"{name}/", depth=1):
+                    if content is None:
+                        msg = f"[NESTED] 略過 {member_path}：{error}"
+                        log_lines.append(msg)
+                        say(msg, QUIET)
+                        continue
+                    relative = Path("nested") / safe_member_path(member_path)
+                    target = extract_dir / relative
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(content)
+                    nested_files.append(str(relative))
+                    say(f"[NESTED] 展開巢狀壓縮檔成員：{member_path}", VERBOSE)
+            except UnpackLimitExceeded:
+                raise
+            except Exception as e:
+                msg = f"[NESTED] 無法展開內層壓縮檔 {name}：{e}"
+                log_lines.append(msg)
+                say(msg, QUIET)
+    except UnpackLimitExceeded as e:
+        msg = f"[NESTED] 停止展開巢狀壓縮檔（疑似 zip bomb）：{e}"
+        log_lines.append(msg)
+        say(msg, QUIET)
+        log_event("archive_limit", level="warning", archive=str(extract_dir.name), error=str(e))
+    if nested_files:
+        metrics_add("nested_members", len(nested_files))
+    return nested_files
+
+# =============================================================================
+# 候選密碼擴展模組
+# =============================================================================
+
+DEFAULT_MAX_EXPANSIONS = 200
+# 檔名中的日期：20250116、2025-01-16、2025_01_16、2025.01.16
+FILENAME_DATE = re.compile(r"(?<!\d)(20\d{2})[-_.]?(0[1-9]|1[0-2])[-_.]?(0[1-9]|[12]\d|3[01])(?!\d)")
+
+
+def filename_dates(filename: Optional[str]) -> List[Dict[str, str]]:
+    """檔名中出現的日期，依出現順序、去除重複，供 {yyyy} {mm} {dd} 等樣板使用"""
+    dates = []
+    for year, month, day in dict.fromkeys(FILENAME_DATE.findall(filename or "")):
+        dates.append({"yyyy": year, "yy": year[2:], "mm": month, "dd": day, "mmdd": month + day,
+                      "yymmdd": year[2:] + month + day, "yyyymmdd": year + month + day})
+    return dates
+
+
+class CandidateRules:
+    """
+    單一平台的候選密碼擴展規則（shops_master.json 的 candidate_rules.{平台}，"*" 為所有平台的預設）
+
+    - fields：作為變化基礎的值，password 為密碼本身，其餘為商店欄位（例如 shop_account、shop_id）
+    - case：大小寫變化 upper / lower / title / swapcase
+    - prefixes / suffixes：前綴、後綴；可含檔名日期樣板 {yyyy} {yy} {mm} {dd} {mmdd} {yymmdd} {yyyymmdd}
+    - digits：結尾補上 1 到 N 位數字（例如 shop_id + 01）
+    - max_expansions：每個檔案最多測試的擴展候選數
+
+    expand() 依可能性由高到低逐一產生，只在密碼本的候選都失敗後才需要：
+    欄位原值與大小寫 → 固定前後綴 → 檔名日期前後綴 → 補數字；同一層內檔名比對到的商店優先，
+    密碼本中已有或已產生過的候選不重複測試
+    """
+
+    CASES = {"upper": str.upper, "lower": str.lower, "title": str.title, "swapcase": str.swapcase}
+    KEYS = ("fields", "case", "prefixes", "suffixes", "digits", "max_expansions")
+
+    def __init__(self, rules: Dict[str, Any]):
+        unknown = sorted(set(rules) - set(self.KEYS))
+        if unknown:
+            raise ValueError(f"不支援的擴展規則：{', '.join(unknown)}（可用：{', '.join(self.KEYS)}）")
+        self.fields: List[str] = list(rules.get("fields", ["password"]))
+        self.case: List[str] = list(rules.get("case", []))
+        for name in self.case:
+            if name not in self.CASES:
+                raise ValueError(f"不支援的大小寫變化：{name}（可用：{', '.join(self.CASES)}）")
+        self.prefixes: List[str] = list(rules.get("prefixes", []))
+        self.suffixes: List[str] = list(rules.get("suffixes", []))
+        sample = filename_dates("20250116")[0]
+        for affix in self.prefixes + self.suffixes:
+            try:
+                affix.format(**sample)
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"前後綴樣板無效：{affix}（{e}）") from None
+        self.digits = int(rules.get("digits", 0))
+        self.max_expansions = int(rules.get("max_expansions", DEFAULT_MAX_EXPANSIONS))
+
+    def _bases(self, passwords: Dict[str, Dict[str, Any]], filename: Optional[str]) -> List[tuple]:
+        bases: Dict[str, Optional[Dict[str, Any]]] = {}
+        for password, shop_info in route_candidates(passwords, filename):
+            for field in self.fields:
+                value = password if field == "password" else str((shop_info or {}).get(field) or "")
+                if value:
+                    bases.setdefault(value, shop_info)
+        return list(bases.items())
+
+    def _tiers(self, bases: List[tuple], filename: Optional[str]):
+        forms = []  # 原值與大小寫變化
+        for value, shop_info in bases:
+            forms.append((value, shop_info, "field"))
+            forms.extend((self.CASES[name](value), shop_info, f"case:{name}") for name in self.case)
+        yield from forms
+
+        literal = [("prefix", affix) for affix in self.prefixes if "{" not in affix] + \
+                  [("suffix", affix) for affix in self.suffixes if "{" not in affix]
+        for value, shop_info, rule in forms:
+            for kind, affix in literal:
+                yield (affix + value if kind == "prefix" else value + affix), shop_info, f"{rule}+{kind}:{affix}"
+
+        templated = [("prefix", affix) for affix in self.prefixes if "{" in affix] + \
+                    [("suffix", affix) for affix in self.suffixes if "{" in affix]
+        dates = filename_dates(filename) if templated else []
+        for value, shop_info, rule in forms:
+            for date in dates:
+                for kind, affix in templated:
+                    text = affix.format(**date)
+                    yield (text + value if kind == "prefix" else value + text), shop_info, f"{rule}+{kind}:{affix}"
+
+        for value, shop_info in bases:
+            for width in range(1, self.digits + 1):
+                for number in range(10 ** width):
+                    yield f"{value}{number:0{width}d}", shop_info, f"digits:{width}"
+
+    def expand(self, passwords: Dict[str, Dict[str, Any]], filename: Optional[str] = None):
+        """
+        逐一產生擴展候選 (密碼, 商店資訊, 規則)，最多 max_expansions 個
+
+        Args:
+            passwords: 該平台的密碼本 {密碼: 商店資訊}
+            filename: 檔名（用於商店優先順序與日期樣板）
+        """
+        seen = set(passwords)
+        produced = 0
+        for password, shop_info, rule in self._tiers(self._bases(passwords, filename), filename):
+            if produced >= self.max_expansions:
+                return
+            if password in seen:
+                continue
+            seen.add(password)
+            produced += 1
+            yield password, shop_info, rule
+
+
+def load_candidate_rules(data: Dict[str, Any]) -> Dict[str, CandidateRules]:
+    """讀取 shops_master.json 的 candidate_rules；規則無效時拋出 ValueError（訊息含平台名稱）"""
+    rules = {}
+    for platform, platform_rules in (data.get("candidate_rules") or {}).items():
+        try:
+            rules[platform] = CandidateRules(platform_rules)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"candidate_rules.{platform}：{e}") from None
+    return rules
+
 # =============================================================================
 # 主要處理邏輯
 # =============================================================================
 
-def test_password(file_path: Union[str, Path], password: str) -> tuple[bool, str]:
-    """測試密碼是否正確，使用臨時檔案"""
-    temp_path = None
+def export_output(output_path: Path, new_filename: str, platform_type: str, log_lines: LogSink,
+                  ctx: RunContext) -> None:
+    """匯出剛發佈的輸出檔；失敗只記錄，不影響輸出本身"""
     try:
-        # 建立臨時檔案來測試，使用原始檔案的副檔名
-        file_ext = Path(file_path).suffix.lower()
-        with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as temp_file:
-            temp_path = temp_file.name
-        
-        # 嘗試移除密碼到臨時檔案
-        remove_password(file_path, temp_path, password)
-        
-        # 如果成功，刪除臨時檔案
-        Path(temp_path).unlink()
-        return True, "encrypted"  # 返回成功和檔案類型
-        
+        exported = ctx.exporter.export(output_path, platform_type)
+    except Exception as e:
+        error_msg = f"[EXPORT] {new_filename} 匯出 {ctx.exporter.fmt} 失敗：{e}"
+        log_lines.append(error_msg)
+        say(error_msg)
+        log_event("export_failed", level="warning", output=new_filename, error=str(e))
+        return
+    msg = f"[EXPORT] {new_filename} 匯出 {len(exported)} 張工作表：{', '.join(path.name for path in exported)}"
+    log_lines.append(msg)
+    say(msg, DEBUG)
+
+@timed_stage("test_password")
+def test_password(file_path: Union[str, Path], password: str, session: Optional[CrackSession] = None) -> tuple[bool, str]:
+    """
+    測試密碼是否正確：只跑密碼驗證器，不做整份解密
+    同一檔案測試多個密碼時傳入 CrackSession，檔案只需開啟、解析一次
+    """
+    check_deadline()
+    own_session = session is None
+    metrics_add("candidates_tried")
+    progress_advance(candidates=1)
+    try:
+        if own_session:
+            session = CrackSession(file_path)
+        if not session.is_encrypted:
+            say("   [OK] 檔案已解密或未加密：Unencrypted document", DEBUG)
+            return True, "unencrypted"  # 返回成功和檔案類型
+        if session.try_password(password):
+            return True, "encrypted"  # 返回成功和檔案類型
+        say(f"   [FAIL] 密碼測試失敗：Key verification failed", DEBUG)
+        return False, "failed"
     except Exception as e:
-        # 如果失敗，清理臨時檔案（如果存在）
-        try:
-            if temp_path and Path(temp_path).exists():
-                Path(temp_path).unlink()
-        except:
-            pass
-        
         error_msg = str(e)
         # 某些錯誤應該被視為成功（檔案已解密或未加密）
         if "Unencrypted document" in error_msg or "Record not found" in error_msg:
-            print(f"   [OK] 檔案已解密或未加密：{error_msg}")
-            return True, "unencrypted"  # 返回成功和檔案類型
-        else:
-            print(f"   [FAIL] 密碼測試失敗：{e}")
-            return False, "failed"
+            say(f"   [OK] 檔案已解密或未加密：{error_msg}", DEBUG)
+            return True, "unencrypted"
+        say(f"   [FAIL] 密碼測試失敗：{e}", DEBUG)
+        return False, "failed"
+    finally:
+        if own_session and session is not None:
+            session.close()
 
+@timed_stage("generate_unique_filename")
 def generate_unique_filename(output_dir: Union[str, Path], base_name: str, file_ext: str, timestamp: Optional[str] = None) -> str:
     """
     生成唯一的檔案名稱，統一使用流水號從 01 開始
@@ -389,6 +2804,146 @@ def generate_unique_filename(output_dir: Union[str, Path], base_name: str, file_
     filename = f"{base_name}_{timestamp}_{microsecond:06d}{file_ext}"
     return filename
 
+# --output-layout sharded 對應的分層格式
+SHARDED_OUTPUT_LAYOUT = "{yyyy}/{mm}/{platform}/{shop_id}"
+OUTPUT_LAYOUT_FIELDS = ("yyyy", "mm", "dd", "platform", "shop_id", "shop_account")
+
+
+class OutputLayout:
+    """
+    輸出資料夾配置
+
+    - flat（pattern 為空）：所有輸出放在 output/ 根目錄（原本行為）
+    - 分層：依 pattern 建立子資料夾，例如 "{yyyy}/{mm}/{platform}/{shop_id}" → output/2026/10/MOMO/MO0021/
+      可用欄位：yyyy、mm、dd（處理日期）、platform、shop_id、shop_account
+    - 分層資料夾第一次使用時以 scandir 讀取一次既有檔名，之後的流水號在記憶體中分配，
+      不再對每個候選檔名呼叫 exists()
+    - 使用中的配置記錄於 output/.layout.json，之後未指定 --output-layout 的執行沿用同一配置
+    - exclusive=True（多節點 spool 模式）時，檔名以 O_EXCL 建立 .{檔名}.reserved 保留，
+      避免不同節點在同一秒分配到相同檔名；保留檔於整次執行結束時移除
+    """
+
+    SETTINGS_FILE = ".layout.json"
+
+    def __init__(self, pattern: str = "", exclusive: bool = False):
+        if pattern == "sharded":
+            pattern = SHARDED_OUTPUT_LAYOUT
+        elif pattern == "flat":
+            pattern = ""
+        import string
+        for _, field, spec, conversion in string.Formatter().parse(pattern):
+            if field is not None and (field not in OUTPUT_LAYOUT_FIELDS or spec or conversion):
+                raise ValueError(f"不支援的輸出配置欄位：{{{field}}}（可用：{', '.join(OUTPUT_LAYOUT_FIELDS)}）")
+        self.pattern = pattern.strip("/")
+        self._names: Dict[Path, set] = {}  # 分層資料夾 -> 已使用的檔名
+        self.exclusive = exclusive
+        self._reserved: List[Path] = []
+
+    @property
+    def flat(self) -> bool:
+        return not self.pattern
+
+    @classmethod
+    def saved(cls, output_dir: Union[str, Path]) -> Optional[str]:
+        """讀取 output/ 記錄的配置；沒有記錄時回傳 None"""
+        try:
+            with open(Path(output_dir) / cls.SETTINGS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f).get("pattern")
+        except (OSError, ValueError):
+            return None
+
+    def save(self, output_dir: Union[str, Path]) -> None:
+        settings_path = Path(output_dir) / self.SETTINGS_FILE
+        temp_path = settings_path.with_name(settings_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"pattern": self.pattern}, f, ensure_ascii=False)
+        os.replace(temp_path, settings_path)
+
+    @staticmethod
+    def _component(value: Any) -> str:
+        """資料夾名稱不可含路徑分隔與 Windows 保留字元"""
+        text = "".join("_" if ch in '\\/:*?"<>|' else ch for ch in str(value or "")).strip(" .")
+        return text or "_unknown"
+
+    def directory(self, output_dir: Union[str, Path], platform: Optional[str], shop_info: Optional[Dict[str, Any]],
+                  when: Optional[datetime.datetime] = None) -> Path:
+        """輸出檔所屬的分層資料夾"""
+        output_dir = Path(output_dir)
+        if self.flat:
+            return output_dir
+        when = when or datetime.datetime.now()
+        shop_info = shop_info or {}
+        fields = {
+            "yyyy": f"{when:%Y}",
+            "mm": f"{when:%m}",
+            "dd": f"{when:%d}",
+            "platform": self._component(platform),
+            "shop_id": self._component(shop_info.get("shop_id")),
+            "shop_account": self._component(shop_info.get("shop_account")),
+        }
+        return output_dir.joinpath(*[part for part in self.pattern.format(**fields).split("/") if part])
+
+    def _used_names(self, directory: Path) -> set:
+        names = self._names.get(directory)
+        if names is None:
+            directory.mkdir(parents=True, exist_ok=True)
+            with os.scandir(directory) as entries:
+                names = {entry.name for entry in entries}
+            self._names[directory] = names
+        return names
+
+    @timed_stage("generate_unique_filename")
+    def allocate(self, output_dir: Union[str, Path], base_name: str, file_ext: str, platform: Optional[str],
+                 shop_info: Optional[Dict[str, Any]]) -> Path:
+        """
+        分配輸出路徑：{分層資料夾}/{base_name}_{執行日期時間}_{流水號}{副檔名}
+        flat 配置沿用 generate_unique_filename（與原本行為相同）
+        """
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        if self.flat and not self.exclusive:
+            return Path(output_dir) / generate_unique_filename(output_dir, base_name, file_ext, timestamp)
+        directory = self.directory(output_dir, platform, shop_info, now)
+        names = self._used_names(directory)
+        for sequence in range(1, 100):  # 最多 99 個流水號
+            filename = f"{base_name}_{timestamp}_{sequence:02d}{file_ext}"
+            if filename not in names and self._reserve(directory, filename):
+                break
+        else:
+            filename = f"{base_name}_{timestamp}_{now.microsecond:06d}{file_ext}"
+        names.add(filename)
+        return directory / filename
+
+    def _reserve(self, directory: Path, filename: str) -> bool:
+        """保留檔名（僅 exclusive 模式）；其他節點已保留或已發佈同名檔案時回傳 False"""
+        if not self.exclusive:
+            return True
+        marker = directory / f".{filename}.reserved"
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        # 先建立保留檔再確認：保留檔被釋放前，持有者一定已經發佈完畢
+        if (directory / filename).exists():
+            marker.unlink()
+            return False
+        self._reserved.append(marker)
+        return True
+
+    def release_reservations(self) -> None:
+        for marker in self._reserved:
+            try:
+                marker.unlink()
+            except OSError:
+                pass
+        self._reserved.clear()
+
+
+def output_base_name(shop_info: Dict[str, Any]) -> str:
+    """輸出檔名的商店部分：{shop_name}_{shop_id}_{shop_account}（只替換空格，保留點號）"""
+    safe_name = shop_info.get("shop_name", "").replace(' ', '_')
+    return f"{safe_name}_{shop_info.get('shop_id', 'UNKNOWN')}_{shop_info.get('shop_account', 'UNKNOWN')}"
+
 def handle_file_conflict(output_path: Union[str, Path], backup_dir: Union[str, Path]) -> bool:
     """
     處理檔案衝突，將舊檔案移到備份資料夾
@@ -416,17 +2971,20 @@ def handle_file_conflict(output_path: Union[str, Path], backup_dir: Union[str, P
             
             # 移動舊檔案到備份資料夾
             shutil.move(str(output_path), str(backup_path))
-            print(f"[BACKUP] 檔案衝突處理：{output_path.name} → 備份至 {backup_path}")
+            say(f"[BACKUP] 檔案衝突處理：{output_path.name} → 備份至 {backup_path}", VERBOSE)
             return True
     except Exception as e:
-        print(f"[WARN] 處理檔案衝突失敗：{e}")
+        say(f"[WARN] 處理檔案衝突失敗：{e}")
         return False
     
     return True
 
-def process_compressed_files(input_dir: Union[str, Path], output_dir: Union[str, Path], temp_dir: Union[str, Path], compressed_accounts: List[Dict[str, Any]], log_lines: List[str]) -> List[Path]:
+@timed_stage("process_compressed_files")
+def process_compressed_files(input_dir: Union[str, Path], output_dir: Union[str, Path], temp_dir: Union[str, Path], compressed_accounts: List[Dict[str, Any]], log_lines: LogSink, ctx: Optional[RunContext] = None,
+                             compressed_files: Optional[List[Path]] = None) -> List[Path]:
     """
     處理壓縮檔案，展開到 temp 資料夾等待處理
+    壓縮檔內的巢狀壓縮檔會逐層展開，其中的 Excel 檔案一併處理
     
     Args:
         input_dir: 輸入資料夾
@@ -434,6 +2992,8 @@ def process_compressed_files(input_dir: Union[str, Path], output_dir: Union[str,
         temp_dir: 臨時資料夾
         compressed_accounts: 壓縮檔案帳號設定
         log_lines: 日誌行列表
+        ctx: 執行狀態（巢狀壓縮檔上限）
+        compressed_files: 已掃描到的根目錄壓縮檔（None 時自行掃描 input_dir）
     
     Returns:
         list: 解壓縮後的 Excel 檔案路徑列表
@@ -442,320 +3002,1100 @@ def process_compressed_files(input_dir: Union[str, Path], output_dir: Union[str,
     input_dir = Path(input_dir)
     output_dir = Path(output_dir)
     temp_dir = Path(temp_dir)
+    if ctx is None:
+        ctx = RunContext()
     
     extracted_excel_files = []
     
     # 掃描壓縮檔案
-    compressed_files = []
-    for file_path in input_dir.iterdir():
-        if file_path.is_file() and is_compressed_file(file_path):
-            compressed_files.append(file_path)
+    if compressed_files is None:
+        compressed_files = []
+        with metrics_stage("scan"):
+            for file_path in input_dir.iterdir():
+                if file_path.is_file() and is_compressed_file(file_path):
+                    compressed_files.append(file_path)
     
     if not compressed_files:
         return extracted_excel_files
     
-    print(f"[ZIP] 發現 {len(compressed_files)} 個壓縮檔案")
+    say(f"[ZIP] 發現 {len(compressed_files)} 個壓縮檔案")
     
     # 處理每個壓縮檔案
     for file_path in compressed_files:
+        if run_deadline_passed():
+            break
+        if ctx.spool is not None and not ctx.spool.claim(file_path):
+            continue  # 其他節點處理中或已處理
+        extract_root = ctx.temp_space.prepare(temp_dir, archive_unpacked_size(file_path))
         filename = file_path.name
-        print(f"\n[ZIP] 正在處理壓縮檔案：{filename}")
+        say(f"\n[ZIP] 正在處理壓縮檔案：{filename}", VERBOSE)
+        archive_start = time.perf_counter()
         
         # 嘗試所有已知密碼
         success = False
         # 追蹤是否已處理此檔案（用於除錯和統計）
         processed_this_file = False  # 用於追蹤處理狀態
-        for account_info in compressed_accounts:
-            password = account_info.get("password")
-            name = account_info["name"]
-            platform = account_info.get("platform", "")
+        try:
+            with time_budget(ctx.archive_timeout, "archive") as archive_budget:
+                for account_info in compressed_accounts:
+                    password = account_info.get("password")
+                    name = account_info["name"]
+                    platform = account_info.get("platform", "")
             
-            if not password:
-                continue
+                    if not password:
+                        continue
             
-            # 特例：如果壓縮檔有密碼，跳過 Shopee 平台的密碼嘗試
-            if platform == "Shopee":
-                print(f"   [SKIP] 跳過 Shopee 平台密碼：{name}")
-                continue
+                    # 特例：如果壓縮檔有密碼，跳過 Shopee 平台的密碼嘗試
+                    if platform == "Shopee":
+                        say(f"   [SKIP] 跳過 Shopee 平台密碼：{name}", DEBUG)
+                        continue
                 
-            try:
-                # 建立臨時解壓縮資料夾
-                temp_extract_dir = temp_dir / f"temp_{filename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                temp_extract_dir.mkdir(parents=True, exist_ok=True)
+                    try:
+                        # 建立臨時解壓縮資料夾
+                        temp_extract_dir = make_extract_dir(extract_root, "temp", filename)
                 
-                # 解壓縮檔案到臨時資料夾
-                extracted_files = extract_compressed_file(file_path, temp_extract_dir, password)
+                        # 解壓縮檔案到臨時資料夾
+                        extracted_files = extract_compressed_file(file_path, temp_extract_dir, password)
+                        # 內層壓縮檔先試同一組密碼，再試其他壓縮檔密碼
+                        nested_passwords = [password] + [a.get("password") for a in compressed_accounts
+                                                         if a.get("platform", "") != "Shopee" and a.get("password") != password]
+                        extracted_files += expand_nested_archives(temp_extract_dir, extracted_files, nested_passwords,
+                                                                  ctx.archive_limits, log_lines)
                 
-                # 處理解壓縮後的檔案，直接移動到 output 並重新命名
-                for extracted_file in extracted_files:
-                    extracted_path = temp_extract_dir / extracted_file
-                    if extracted_path.is_file():
-                        # 檢查壓縮檔案名稱中間是否包含 TP0007 (MOMO 系列)
-                        if "TP0007" in filename:
-                            # 重新命名為 MO_Store_Plus_[原始檔名]
-                            new_filename = f"MO_Store_Plus_{extracted_file}"
-                        else:
-                            # 重新命名為 [shop_name]_[shop_id]_[shop_account]_[執行日期時間]_[流水號]
-                            shop_id = account_info.get("shop_id", "UNKNOWN")
-                            shop_account = account_info.get("account", "UNKNOWN")
-                            # 只替換空格，保留點號
-                            safe_name = name.replace(' ', '_')
-                            file_ext = Path(extracted_file).suffix
-                            base_name = f"{safe_name}_{shop_id}_{shop_account}"
-                            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                            new_filename = generate_unique_filename(output_dir, base_name, file_ext, timestamp)
+                        # 處理解壓縮後的檔案，直接移動到 output 並重新命名
+                        kept_files = []
+                        for extracted_file in extracted_files:
+                            extracted_path = temp_extract_dir / extracted_file
+                            if extracted_path.is_file():
+                                # 檢查壓縮檔案名稱中間是否包含 TP0007 (MOMO 系列)
+                                if "TP0007" in filename:
+                                    # 重新命名為 MO_Store_Plus_[原始檔名]
+                                    new_filename = f"MO_Store_Plus_{Path(extracted_file).name}"
+                                else:
+                                    # 重新命名為 [shop_name]_[shop_id]_[shop_account]_[執行日期時間]_[流水號]
+                                    shop_id = account_info.get("shop_id", "UNKNOWN")
+                                    shop_account = account_info.get("account", "UNKNOWN")
+                                    # 只替換空格，保留點號
+                                    safe_name = name.replace(' ', '_')
+                                    file_ext = Path(extracted_file).suffix
+                                    base_name = f"{safe_name}_{shop_id}_{shop_account}"
+                                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                                    new_filename = generate_unique_filename(output_dir, base_name, file_ext, timestamp)
                         
-                        # 處理檔名衝突
-                        output_path = output_dir / new_filename
-                        backup_dir = output_dir / "backup"
-                        handle_file_conflict(output_path, backup_dir)
+                                # 處理檔名衝突
+                                output_path = output_dir / new_filename
+                                backup_dir = output_dir / "backup"
+                                handle_file_conflict(output_path, backup_dir)
                         
-                        # 如果是 Excel 檔案，加入處理列表（包括 MO_Store_Plus 檔案）
-                        # 注意：檔案暫時不移動到 output，等密碼移除成功後再移動
-                        if output_path.suffix.lower() in ['.xlsx', '.xls']:
-                            extracted_excel_files.append(extracted_path)  # 使用原始路徑，不是 output 路徑
+                                # 如果是 Excel 檔案，加入處理列表（包括 MO_Store_Plus 檔案）
+                                # 注意：檔案暫時不移動到 output，等密碼移除成功後再移動
+                                if output_path.suffix.lower() in EXCEL_EXTENSIONS:
+                                    kept_files.append(extracted_path)  # 使用原始路徑，不是 output 路徑
+                                    ctx.sources[extracted_path] = file_path
+                        extracted_excel_files.extend(kept_files)
                 
-                # 暫時不刪除臨時資料夾，等所有檔案都處理完成後再清理
-                # 記錄臨時資料夾路徑，供後續清理使用
-                print(f"[TEMP] 臨時資料夾保留：{temp_extract_dir}")
-                print(f"[TEMP] 等待所有檔案處理完成後再清理")
+                        # 只保留待處理的 Excel 檔案；各檔案處理完畢即刪除，全部處理完時刪除整個資料夾
+                        ctx.temp_space.track(temp_extract_dir, kept_files)
+                        say(f"[TEMP] 臨時資料夾保留 {len(kept_files)} 個待處理檔案：{temp_extract_dir}", VERBOSE)
                 
-                success_msg = f"[OK] {name} - 成功解壓縮：{filename} → {len(extracted_files)} 個檔案"
-                log_lines.append(success_msg)
-                print(success_msg)
-                print(f"   [FILE] 解壓縮檔案：{len(extracted_files)} 個")
-                print(f"   [STAT] Excel 檔案：{len([f for f in extracted_files if Path(f).suffix.lower() in ['.xlsx', '.xls']])} 個")
+                        success_msg = f"[OK] {name} - 成功解壓縮：{filename} → {len(extracted_files)} 個檔案"
+                        log_lines.append(success_msg)
+                        say(success_msg, VERBOSE)
+                        say(f"   [FILE] 解壓縮檔案：{len(extracted_files)} 個", VERBOSE)
+                        say(f"   [STAT] Excel 檔案：{len([f for f in extracted_files if Path(f).suffix.lower() in EXCEL_EXTENSIONS])} 個", VERBOSE)
                 
-                success = True
-                processed_this_file = True  # 標記此檔案已處理（用於統計）
-                print(f"[DEBUG] 檔案 {filename} 處理完成，狀態：{processed_this_file}")
-                break  # 解壓縮成功後跳出，避免重複處理同一個壓縮檔案
+                        success = True
+                        processed_this_file = True  # 標記此檔案已處理（用於統計）
+                        say(f"[DEBUG] 檔案 {filename} 處理完成，狀態：{processed_this_file}", DEBUG)
+                        break  # 解壓縮成功後跳出，避免重複處理同一個壓縮檔案
                 
-            except Exception as e:
-                error_msg = f"[FAIL] {name} - 解壓縮失敗：{filename} - {e}"
-                log_lines.append(error_msg)
-                print(f"   {error_msg}")
-                # 清理臨時資料夾
-                try:
-                    if 'temp_extract_dir' in locals() and temp_extract_dir.exists():
-                        shutil.rmtree(temp_extract_dir)
-                except Exception:
-                    pass  # 忽略清理錯誤
-                continue
+                    except Exception as e:
+                        error_msg = f"[FAIL] {name} - 解壓縮失敗：{filename} - {e}"
+                        log_lines.append(error_msg)
+                        say(f"   {error_msg}", QUIET)
+                        # 清理臨時資料夾
+                        try:
+                            if 'temp_extract_dir' in locals() and temp_extract_dir.exists():
+                                shutil.rmtree(temp_extract_dir)
+                        except Exception:
+                            pass  # 忽略清理錯誤
+                        continue
+        except BudgetExceeded as e:
+            if e.budget is not archive_budget:
+                release_archive_lease(file_path, ctx)
+                raise
+            quarantine_timeout(file_path, "archive", e, time.perf_counter() - archive_start, log_lines, ctx)
+            continue
         
         if not success:
             error_msg = f"[FAIL] 所有密碼都無法解壓縮：{filename}"
             log_lines.append(error_msg)
-            print(error_msg)
+            say(error_msg, QUIET)
         else:
-            print(f"[SUCCESS] 壓縮檔案 {filename} 處理完成")
+            say(f"[SUCCESS] 壓縮檔案 {filename} 處理完成", VERBOSE)
+    
+    return extracted_excel_files
+
+@timed_stage("process_platform_compressed_files")
+def process_platform_compressed_files(compressed_files: List[Path], output_dir: Path, temp_dir: Path, platform_index: Dict[str, Any], platform_name: str, log_lines: LogSink, ctx: Optional[RunContext] = None) -> List[Path]:
+    """
+    處理平台資料夾中的壓縮檔案（以該平台的密碼解壓）
+    解壓出的 Excel 檔案記錄來源壓縮檔（ctx.sources）後回傳，由主流程排入該平台的佇列破解
+    """
+    if ctx is None:
+        ctx = RunContext()
+    extracted_excel_files = []
+    
+    # 根據平台名稱確定平台類型
+    platform_type = platform_name.replace("_files", "").replace("zip", "shopee").replace("xlsx", "shopee")
+    
+    for compressed_file in progress_iter(compressed_files, f"{platform_type} 壓縮檔"):
+        if run_deadline_passed():
+            break
+        if ctx.spool is not None and not ctx.spool.claim(compressed_file):
+            continue
+        extract_root = ctx.temp_space.prepare(temp_dir, archive_unpacked_size(compressed_file))
+        with metrics_file(compressed_file, "archive", platform_type), \
+                time_budget(ctx.archive_timeout, "archive") as archive_budget:
+            archive_start = time.perf_counter()
+            filename = compressed_file.name
+            say(f"[EXTRACT] 正在處理壓縮檔案：{filename}", VERBOSE)
+        
+            # 建立臨時解壓縮目錄
+            temp_extract_dir = make_extract_dir(extract_root, "extract", filename)
+        
+            try:
+                # 先嘗試使用平台密碼解壓縮
+                extracted_files = []
+                if platform_type in platform_index:
+                    passwords = platform_index[platform_type]
+                    say(f"[EXTRACT] 嘗試使用 {platform_type} 平台的 {len(passwords)} 個密碼解壓縮", VERBOSE)
+                
+                    for password in passwords.keys():
+                        try:
+                            say(f"[EXTRACT] 嘗試密碼：{password}", DEBUG)
+                            if compressed_file.suffix.lower() == '.zip':
+                                extracted_files = extract_zip(compressed_file, temp_extract_dir, password)
+                            elif compressed_file.suffix.lower() == '.rar':
+                                extracted_files = extract_rar(compressed_file, temp_extract_dir, password)
+                            say(f"[EXTRACT] 使用密碼 {password} 成功解壓縮 {len(extracted_files)} 個檔案", VERBOSE)
+                            break
+                        except Exception as e:
+                            say(f"[EXTRACT] 密碼 {password} 解壓縮失敗：{e}", DEBUG)
+                            continue
+            
+                # 如果密碼解壓縮失敗，嘗試無密碼解壓縮
+                if not extracted_files:
+                    say(f"[EXTRACT] 密碼解壓縮失敗，嘗試無密碼解壓縮", VERBOSE)
+                    if compressed_file.suffix.lower() == '.zip':
+                        extracted_files = extract_zip(compressed_file, temp_extract_dir)
+                    elif compressed_file.suffix.lower() == '.rar':
+                        extracted_files = extract_rar(compressed_file, temp_extract_dir)
+                    else:
+                        say(f"[SKIP] 不支援的壓縮格式：{compressed_file.suffix}")
+                        ctx.temp_space.discard(temp_extract_dir)
+                        continue
+                
+                    say(f"[EXTRACT] 無密碼解壓縮成功 {len(extracted_files)} 個檔案", VERBOSE)
+
+                # 巢狀壓縮檔：每一層都嘗試該平台的密碼
+                extracted_files += expand_nested_archives(temp_extract_dir, extracted_files,
+                                                          list(platform_index.get(platform_type, {})),
+                                                          ctx.archive_limits, log_lines)
+            
+                # 解壓出的 Excel 檔案帶著來源壓縮檔交給主流程，排入該平台的佇列破解
+                kept_files = []
+                for extracted_filename in extracted_files:
+                    extracted_file_path = temp_extract_dir / extracted_filename
+                    if extracted_file_path.exists() and extracted_file_path.suffix.lower() in EXCEL_EXTENSIONS:
+                        say(f"[EXTRACT] 發現 Excel 檔案：{extracted_filename}", VERBOSE)
+                        kept_files.append(extracted_file_path)
+                        ctx.sources[extracted_file_path] = compressed_file
+                extracted_excel_files.extend(kept_files)
+                ctx.temp_space.track(temp_extract_dir, kept_files)
+                metrics_outcome("extracted")
+
+            except BudgetExceeded as e:
+                ctx.temp_space.discard(temp_extract_dir)
+                if e.budget is not archive_budget:
+                    release_archive_lease(compressed_file, ctx)
+                    raise
+                quarantine_timeout(compressed_file, "archive", e, time.perf_counter() - archive_start, log_lines, ctx)
+                continue
+            except Exception as e:
+                ctx.temp_space.discard(temp_extract_dir)
+                mark_unfinished(compressed_file, ctx)
+                error_msg = f"[EXTRACT] 解壓縮 {filename} 失敗：{e}"
+                log_lines.append(error_msg)
+                say(error_msg, QUIET)
+                metrics_outcome("failed")
+                continue
     
     return extracted_excel_files
 
-def process_platform_compressed_files(compressed_files: List[Path], output_dir: Path, temp_dir: Path, platform_index: Dict[str, Any], platform_name: str, log_lines: List[str]) -> List[Path]:
+@timed_stage("try_platform_passwords")
+def try_platform_passwords(file_path: Path, platform_index: Dict[str, Any], platform_type: str, output_dir: Path, log_lines: LogSink, ctx: Optional[RunContext] = None) -> bool:
+    """
+    嘗試使用指定平台的密碼破解檔案（僅限該平台密碼）
+    """
+    import itertools
+    if ctx is None:
+        ctx = RunContext()
+    filename = file_path.name
+
+    # 內容去重：相同位元組只破解一次
+    digest = None
+    if ctx.dedupe is not None:
+        digest = ctx.dedupe.hash_file(file_path)
+        entry = ctx.dedupe.lookup(digest)
+        if entry is not None:
+            return handle_duplicate(file_path, entry, output_dir, log_lines, ctx)
+        if (digest, platform_type) in ctx.dedupe.failed:
+            say(f"[DUP] {filename} 與本次已失敗的檔案內容相同，略過 {platform_type} 平台密碼測試", VERBOSE)
+            return False
+    
+    # 獲取該平台的密碼
+    if platform_type in platform_index:
+        passwords = platform_index[platform_type]
+        rules = ctx.candidate_rules.get(platform_type) or ctx.candidate_rules.get("*")
+        say(f"[PLATFORM] 僅使用 {platform_type} 平台的 {len(passwords)} 個密碼進行測試"
+            + (f"，失敗時再測試最多 {rules.max_expansions} 個擴展候選" if rules else ""), VERBOSE)
+
+        # 同一檔案只開啟、解析一次；無法辨識的格式交給 test_password 回報失敗
+        try:
+            session = CrackSession(file_path, ctx.decrypt_chunk)
+        except Exception:
+            session = None
+
+        # 上次超時中斷的檔案：從中斷處的候選密碼繼續
+        offset = ctx.quarantine.resume_offset(file_path, platform_type, len(passwords)) if ctx.quarantine else 0
+        if offset:
+            say(f"[RESUME] {filename} 上次已測試 {offset} 個 {platform_type} 平台密碼，從第 {offset + 1} 個繼續", VERBOSE)
+        candidate_index = offset
+        # 密碼本的候選之後接著擴展候選（逐一產生，密碼本命中時不會產生）
+        candidates = ((password, shop_info, None) for password, shop_info in passwords.items())
+        if rules is not None:
+            candidates = itertools.chain(candidates, rules.expand(passwords, filename))
+        try:
+            for candidate_index, (password, shop_info, rule) in enumerate(itertools.islice(candidates, offset, None), offset):
+                say(f"[TEST] 測試 {platform_type} 平台密碼：{password}" + (f"（{rule}）" if rule else ""), DEBUG)
+                if rule:
+                    metrics_add("expanded_candidates")
+                test_start = time.perf_counter()
+                if session is not None:
+                    success, file_type = test_password(file_path, password, session)
+                else:
+                    success, file_type = test_password(file_path, password)
+                log_event("candidate", level="debug", candidate=candidate_index,
+                          shop=shop_info.get("shop_id"), outcome="match" if success else "mismatch",
+                          seconds=round(time.perf_counter() - test_start, 6), rule=rule)
+                if success:
+                    # 密碼正確，建立檔案
+                    shop_name = shop_info.get("shop_name", "")
+                    shop_id = shop_info.get("shop_id", "UNKNOWN")
+                    shop_account = shop_info.get("shop_account", "UNKNOWN")
+                
+                    say(f"[SUCCESS] {platform_type} 平台密碼 {password} 破解成功，對應商店：{shop_name} ({shop_account})", VERBOSE)
+                    if rule:
+                        metrics_add("expanded_matches")
+                        rule_msg = f"[RULE] {filename} 以擴展候選 {password}（{rule}）破解，可考慮更新 {shop_name} ({shop_account}) 的密碼本"
+                        log_lines.append(rule_msg)
+                        say(rule_msg, VERBOSE)
+                
+                    file_ext = file_path.suffix.lower()
+                
+                    # 統一使用標準格式：{shop_name}_{shop_id}_{shop_account}_{執行日期時間}_{流水號}
+                    # 依輸出配置放在 output/ 或其分層資料夾
+                    output_path = ctx.layout.allocate(output_dir, output_base_name(shop_info), file_ext,
+                                                      platform_type, shop_info)
+                    new_filename = output_path.relative_to(output_dir).as_posix()
+                
+                    # 處理檔名衝突
+                    backup_dir = output_dir / "backup"
+                    handle_file_conflict(output_path, backup_dir)
+                
+                    try:
+                        if file_type == "encrypted":
+                            # 加密檔案，進行密碼移除（沿用已驗證的金鑰）
+                            remove_password(file_path, output_path, password, ctx.committer, session)
+                        else:
+                            # 未加密檔案，直接發佈（不做完整複製）
+                            if session is not None:
+                                session.close()
+                            ctx.committer.publish_plain(file_path, output_path)
+                        if digest is not None:
+                            ctx.dedupe.register(digest, output_path, shop_info, platform_type)
+                        success_msg = f"[OK] 使用 {platform_type} 平台 {shop_name} ({shop_account}) 密碼成功處理：{new_filename}"
+                        log_lines.append(success_msg)
+                        say(success_msg, VERBOSE)
+                        if session is not None:
+                            session.close()
+                        if ctx.exporter is not None:
+                            export_output(output_path, new_filename, platform_type, log_lines, ctx)
+                        return True
+                    except OutputVerificationError as e:
+                        # 解密結果損毀：換其他候選密碼也無濟於事
+                        error_msg = f"[VERIFY] {filename} 的輸出未通過完整性檢查，未放入 output/：{e}"
+                        log_lines.append(error_msg)
+                        say(error_msg, QUIET)
+                        break
+                    except Exception as e:
+                        error_msg = f"[FAIL] 使用 {platform_type} 平台 {shop_name} ({shop_account}) 密碼處理失敗：{e}"
+                        log_lines.append(error_msg)
+                        say(error_msg)
+                        continue
+                else:
+                    say(f"[FAIL] {platform_type} 平台密碼 {password} 測試失敗", DEBUG)
+        except BudgetExceeded as e:
+            # 記錄中斷位置，下次執行從這個候選密碼繼續
+            e.progress[platform_type] = {"tried": candidate_index, "of": len(passwords)}
+            raise
+        finally:
+            if session is not None:
+                session.close()
+    else:
+        say(f"[WARN] 找不到 {platform_type} 平台的密碼設定")
+
+    if digest is not None:
+        ctx.dedupe.failed.add((digest, platform_type))
+    return False
+
+@timed_stage("handle_duplicate")
+def handle_duplicate(file_path: Path, entry: Dict[str, Any], output_dir: Path, log_lines: LogSink, ctx: RunContext) -> bool:
+    """
+    處理與既有輸出內容相同的檔案（不再破解）
+
+    Args:
+        file_path: 重複的輸入檔案
+        entry: 去重索引中的既有輸出資訊
+        output_dir: 輸出資料夾
+        log_lines: 日誌行列表
+        ctx: 執行狀態
+
+    Returns:
+        bool: 是否成功處理
+    """
+    filename = file_path.name
+    existing_output = output_dir / entry["output"]
+
+    metrics_outcome("duplicate")
+    if ctx.dedupe.mode == "record":
+        msg = f"[DUP] {filename} 與既有輸出內容相同，僅記錄不另存：{entry['output']}"
+        ctx.dedupe.duplicates.append((filename, entry["output"], None))
+        log_lines.append(msg)
+        say(msg, VERBOSE)
+        return True
+
+    # link 模式：依既有輸出的商店資訊取新檔名，內容以硬連結 / reflink 指向既有輸出
+    output_path = ctx.layout.allocate(output_dir, output_base_name(entry), file_path.suffix.lower(),
+                                      entry.get("platform"), entry)
+    new_filename = output_path.relative_to(output_dir).as_posix()
+    try:
+        method = ctx.committer.publish_plain(existing_output, output_path, verify=False, link=True)
+    except Exception as e:
+        error_msg = f"[FAIL] 重複檔案連結失敗：{filename} - {e}"
+        log_lines.append(error_msg)
+        say(error_msg, QUIET)
+        return False
+
+    msg = f"[DUP] {filename} 與既有輸出內容相同，未重新破解（{method}）：{entry['output']} → {new_filename}"
+    ctx.dedupe.duplicates.append((filename, entry["output"], new_filename))
+    log_lines.append(msg)
+    say(msg, VERBOSE)
+    return True
+
+@timed_stage("process_root_compressed_files")
+def process_root_compressed_files(compressed_files: List[Path], output_dir: Path, temp_dir: Path, platform_index: Dict[str, Any], log_lines: LogSink, ctx: Optional[RunContext] = None) -> List[Path]:
     """
-    處理平台資料夾中的壓縮檔案
+    處理根目錄中的壓縮檔案（使用所有平台密碼）
     """
+    if ctx is None:
+        ctx = RunContext()
+    # 巢狀壓縮檔每一層都嘗試所有平台的密碼
+    nested_passwords = list(dict.fromkeys(password for passwords in platform_index.values() for password in passwords))
     extracted_excel_files = []
     
-    # 根據平台名稱確定平台類型
-    platform_type = platform_name.replace("_files", "").replace("zip", "shopee").replace("xlsx", "shopee")
-    
-    for compressed_file in compressed_files:
-        filename = compressed_file.name
-        print(f"[EXTRACT] 正在處理壓縮檔案：{filename}")
+    for compressed_file in progress_iter(compressed_files, "根目錄壓縮檔"):
+        if run_deadline_passed():
+            break
+        if ctx.spool is not None and not ctx.spool.claim(compressed_file):
+            continue
+        extract_root = ctx.temp_space.prepare(temp_dir, archive_unpacked_size(compressed_file))
+        with metrics_file(compressed_file, "archive"), time_budget(ctx.archive_timeout, "archive") as archive_budget:
+            archive_start = time.perf_counter()
+            filename = compressed_file.name
+            say(f"[EXTRACT] 正在處理根目錄壓縮檔案：{filename}", VERBOSE)
         
-        # 建立臨時解壓縮目錄
-        temp_extract_dir = temp_dir / f"extract_{filename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        temp_extract_dir.mkdir(exist_ok=True)
+            # 建立臨時解壓縮目錄
+            temp_extract_dir = make_extract_dir(extract_root, "extract", filename)
         
-        try:
-            # 先嘗試使用平台密碼解壓縮
-            extracted_files = []
-            if platform_type in platform_index:
-                passwords = platform_index[platform_type]
-                print(f"[EXTRACT] 嘗試使用 {platform_type} 平台的 {len(passwords)} 個密碼解壓縮")
-                
-                for password in passwords.keys():
-                    try:
-                        print(f"[EXTRACT] 嘗試密碼：{password}")
-                        if compressed_file.suffix.lower() == '.zip':
-                            extracted_files = extract_zip(compressed_file, temp_extract_dir, password)
-                        elif compressed_file.suffix.lower() == '.rar':
-                            extracted_files = extract_rar(compressed_file, temp_extract_dir, password)
-                        print(f"[EXTRACT] 使用密碼 {password} 成功解壓縮 {len(extracted_files)} 個檔案")
-                        break
-                    except Exception as e:
-                        print(f"[EXTRACT] 密碼 {password} 解壓縮失敗：{e}")
-                        continue
-            
-            # 如果密碼解壓縮失敗，嘗試無密碼解壓縮
-            if not extracted_files:
-                print(f"[EXTRACT] 密碼解壓縮失敗，嘗試無密碼解壓縮")
+            try:
+                # 嘗試解壓縮檔案
                 if compressed_file.suffix.lower() == '.zip':
                     extracted_files = extract_zip(compressed_file, temp_extract_dir)
                 elif compressed_file.suffix.lower() == '.rar':
                     extracted_files = extract_rar(compressed_file, temp_extract_dir)
                 else:
-                    print(f"[SKIP] 不支援的壓縮格式：{compressed_file.suffix}")
+                    say(f"[SKIP] 不支援的壓縮格式：{compressed_file.suffix}")
+                    ctx.temp_space.discard(temp_extract_dir)
                     continue
-                
-                print(f"[EXTRACT] 無密碼解壓縮成功 {len(extracted_files)} 個檔案")
             
-            # 處理解壓縮出來的 Excel 檔案
-            for extracted_filename in extracted_files:
-                extracted_file_path = temp_extract_dir / extracted_filename
-                if extracted_file_path.exists() and extracted_file_path.suffix.lower() in ['.xlsx', '.xls']:
-                    print(f"[EXTRACT] 發現 Excel 檔案：{extracted_filename}")
-                    
-                    # 嘗試使用該平台的密碼破解
-                    success = try_platform_passwords(extracted_file_path, platform_index, platform_type, output_dir, log_lines)
-                    if success:
-                        extracted_excel_files.append(extracted_file_path)
-                    else:
-                        print(f"[EXTRACT] 無法破解 {extracted_filename}，將加入一般處理流程")
-                        extracted_excel_files.append(extracted_file_path)
+                say(f"[EXTRACT] 成功解壓縮 {len(extracted_files)} 個檔案", VERBOSE)
+                extracted_files += expand_nested_archives(temp_extract_dir, extracted_files, nested_passwords,
+                                                          ctx.archive_limits, log_lines)
             
-        except Exception as e:
-            error_msg = f"[EXTRACT] 解壓縮 {filename} 失敗：{e}"
-            log_lines.append(error_msg)
-            print(error_msg)
-            continue
-    
+                # 處理解壓縮出來的 Excel 檔案
+                kept_files = []
+                for extracted_filename in extracted_files:
+                    extracted_file_path = temp_extract_dir / extracted_filename
+                    if extracted_file_path.exists() and extracted_file_path.suffix.lower() in EXCEL_EXTENSIONS:
+                        say(f"[EXTRACT] 發現 Excel 檔案：{extracted_filename}", VERBOSE)
+                        # 加入一般處理流程，讓程式嘗試所有平台密碼
+                        kept_files.append(extracted_file_path)
+                        ctx.sources[extracted_file_path] = compressed_file
+                extracted_excel_files.extend(kept_files)
+                ctx.temp_space.track(temp_extract_dir, kept_files)
+                metrics_outcome("extracted")
+
+            except BudgetExceeded as e:
+                ctx.temp_space.discard(temp_extract_dir)
+                if e.budget is not archive_budget:
+                    release_archive_lease(compressed_file, ctx)
+                    raise
+                quarantine_timeout(compressed_file, "archive", e, time.perf_counter() - archive_start, log_lines, ctx)
+                continue
+            except Exception as e:
+                ctx.temp_space.discard(temp_extract_dir)
+                mark_unfinished(compressed_file, ctx)
+                error_msg = f"[EXTRACT] 解壓縮 {filename} 失敗：{e}"
+                log_lines.append(error_msg)
+                say(error_msg, QUIET)
+                metrics_outcome("failed")
+                continue
+
     return extracted_excel_files
 
-def try_platform_passwords(file_path: Path, platform_index: Dict[str, Any], platform_type: str, output_dir: Path, log_lines: List[str]) -> bool:
+
+# input/ 底下的平台資料夾與會被處理的副檔名
+PLATFORM_FOLDERS = ["Shopee_files", "MOMO_files", "PChome_files", "Yahoo_files", "ETMall_files",
+                    "mo_store_plus_files", "coupang_files"]
+INPUT_EXTENSIONS = (".xlsx", ".xls", ".zip", ".rar")
+
+# 預設的輸入路由（mapping/routing.json 不存在時使用）：資料夾 → 平台，蝦皮資料夾只處理 Order.all 檔案
+DEFAULT_ROUTING = {
+    "include": ["*" + extension for extension in INPUT_EXTENSIONS],
+    "exclude": ["~$*"],
+    "depth": 0,
+    "folders": {name: {"platform": name.replace("_files", "")} for name in PLATFORM_FOLDERS},
+}
+DEFAULT_ROUTING["folders"]["Shopee_files"]["include"] = ["*Order.all*"]
+
+
+def compile_globs(patterns: Iterable[str]) -> Optional[Callable[[str], bool]]:
     """
-    嘗試使用指定平台的密碼破解檔案（僅限該平台密碼）
+    將萬用字元清單編譯成一個不分大小寫的比對函數（清單為空時回傳 None）
+
+    常見的 *.xlsx、*Order.all*、~$* 形式改以字串的 endswith / in / startswith 比對，
+    其他形式合併成一個正規表示式
     """
-    filename = file_path.name
-    
-    # 獲取該平台的密碼
-    if platform_type in platform_index:
-        passwords = platform_index[platform_type]
-        print(f"[PLATFORM] 僅使用 {platform_type} 平台的 {len(passwords)} 個密碼進行測試")
-        
-        for password, shop_info in passwords.items():
-            print(f"[TEST] 測試 {platform_type} 平台密碼：{password}")
-            success, file_type = test_password(file_path, password)
-            if success:
-                # 密碼正確，建立檔案
-                shop_name = shop_info.get("shop_name", "")
-                shop_id = shop_info.get("shop_id", "UNKNOWN")
-                shop_account = shop_info.get("shop_account", "UNKNOWN")
-                
-                print(f"[SUCCESS] {platform_type} 平台密碼 {password} 破解成功，對應商店：{shop_name} ({shop_account})")
-                
-                file_ext = file_path.suffix.lower()
-                
-                # 統一使用標準格式：{shop_name}_{shop_id}_{shop_account}_{執行日期時間}_{流水號}
-                # 只替換空格，保留點號
-                safe_name = shop_name.replace(' ', '_')
-                base_name = f"{safe_name}_{shop_id}_{shop_account}"
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                new_filename = generate_unique_filename(output_dir, base_name, file_ext, timestamp)
-
-                output_path = output_dir / new_filename
-                
-                # 處理檔名衝突
-                backup_dir = output_dir / "backup"
-                handle_file_conflict(output_path, backup_dir)
-                
-                try:
-                    if file_type == "encrypted":
-                        # 加密檔案，進行密碼移除
-                        remove_password(file_path, output_path, password)
-                    else:
-                        # 未加密檔案，直接複製
-                        shutil.copyfile(file_path, output_path)
-                    success_msg = f"[OK] 使用 {platform_type} 平台 {shop_name} ({shop_account}) 密碼成功處理：{new_filename}"
-                    log_lines.append(success_msg)
-                    print(success_msg)
-                    return True
-                except Exception as e:
-                    error_msg = f"[FAIL] 使用 {platform_type} 平台 {shop_name} ({shop_account}) 密碼處理失敗：{e}"
-                    log_lines.append(error_msg)
-                    print(error_msg)
-                    continue
-            else:
-                print(f"[FAIL] {platform_type} 平台密碼 {password} 測試失敗")
-    else:
-        print(f"[WARN] 找不到 {platform_type} 平台的密碼設定")
-    
-    return False
+    import fnmatch
+    suffixes, infixes, prefixes, globs = [], [], [], []
+    for pattern in patterns or []:
+        body = pattern.strip("*")
+        if not body or any(char in body for char in "*?["):
+            globs.append(fnmatch.translate(pattern))
+        elif pattern.startswith("*") and pattern.endswith("*"):
+            infixes.append(body.lower())
+        elif pattern.startswith("*"):
+            suffixes.append(body.lower())
+        elif pattern.endswith("*"):
+            prefixes.append(body.lower())
+        else:
+            globs.append(fnmatch.translate(pattern))
+    if not (suffixes or infixes or prefixes or globs):
+        return None
+    suffixes, prefixes = tuple(suffixes), tuple(prefixes)
+    regex = re.compile("|".join(globs), re.IGNORECASE) if globs else None
+
+    def match(name: str) -> bool:
+        lowered = name.lower()
+        return ((bool(suffixes) and lowered.endswith(suffixes)) or (bool(prefixes) and lowered.startswith(prefixes))
+                or any(infix in lowered for infix in infixes)
+                or (regex is not None and regex.match(name) is not None))
+    return match
+
+
+class FolderRoute:
+    """單一資料夾的路由：平台、額外的檔名規則與往下掃描的層數"""
+
+    __slots__ = ("folder", "platform", "depth", "include", "exclude")
+
+    def __init__(self, folder: str, platform: Optional[str], depth: int = 0,
+                 include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        if depth < 0:
+            raise ValueError("depth 不可小於 0")
+        self.folder = folder
+        self.platform = platform
+        self.depth = int(depth)
+        self.include = compile_globs(include)
+        self.exclude = compile_globs(exclude)
 
-def process_root_compressed_files(compressed_files: List[Path], output_dir: Path, temp_dir: Path, platform_index: Dict[str, Any], log_lines: List[str]) -> List[Path]:
+    def accepts(self, name: str) -> bool:
+        return (self.include is None or self.include(name)) and (self.exclude is None or not self.exclude(name))
+
+
+class RoutingTable:
     """
-    處理根目錄中的壓縮檔案（使用所有平台密碼）
+    input/ 的路由表：設定檔只在建立時編譯一次
+
+    - 平台判斷只看相對於 input/ 的第一層資料夾名稱（dict 查詢），temp/ 等 input/ 以外的路徑一律不屬於任何平台，
+      不會因為路徑中剛好含有平台名稱而判斷錯誤
+    - scan() 以 os.scandir 由上而下走訪，使用 DirEntry 快取的類型資訊，不另外 stat
     """
-    extracted_excel_files = []
-    
-    for compressed_file in compressed_files:
-        filename = compressed_file.name
-        print(f"[EXTRACT] 正在處理根目錄壓縮檔案：{filename}")
-        
-        # 建立臨時解壓縮目錄
-        temp_extract_dir = temp_dir / f"extract_{filename}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        temp_extract_dir.mkdir(exist_ok=True)
-        
+
+    def __init__(self, input_dir: Union[str, Path], config: Optional[Dict[str, Any]] = None):
+        config = DEFAULT_ROUTING if config is None else config
+        self.input_dir = Path(input_dir)
+        self._prefix = str(self.input_dir) + os.sep
+        self.include = compile_globs(config.get("include", DEFAULT_ROUTING["include"]))
+        self.exclude = compile_globs(config.get("exclude", []))
+        default_depth = config.get("depth", 0)
+        self.routes: Dict[str, FolderRoute] = {}
+        for folder, settings in (config.get("folders") or {}).items():
+            try:
+                if not isinstance(settings, dict) or not settings.get("platform"):
+                    raise ValueError("必須指定 platform")
+                self.routes[folder] = FolderRoute(folder, settings["platform"], settings.get("depth", default_depth),
+                                                  settings.get("include", ()), settings.get("exclude", ()))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"folders.{folder}：{e}") from None
+        root = config.get("root") or {}
+        self.root = FolderRoute("", root.get("platform"), root.get("depth", 0), root.get("include", ()),
+                                root.get("exclude", ()))
+
+    @classmethod
+    def load(cls, input_dir: Union[str, Path], path: Union[str, Path], required: bool = False) -> "RoutingTable":
+        """讀取路由設定檔；檔案不存在且非必要時使用預設路由"""
         try:
-            # 嘗試解壓縮檔案
-            if compressed_file.suffix.lower() == '.zip':
-                extracted_files = extract_zip(compressed_file, temp_extract_dir)
-            elif compressed_file.suffix.lower() == '.rar':
-                extracted_files = extract_rar(compressed_file, temp_extract_dir)
-            else:
-                print(f"[SKIP] 不支援的壓縮格式：{compressed_file.suffix}")
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            if required:
+                raise
+            return cls(input_dir)
+        return cls(input_dir, config)
+
+    def platform_for(self, file_path: Union[str, Path]) -> Optional[str]:
+        """檔案所屬的平台：input/ 底下第一層資料夾的路由；根目錄檔案為 root 的設定；input/ 以外為 None"""
+        path = str(file_path)
+        if not path.startswith(self._prefix):
+            return None
+        relative = path[len(self._prefix):]
+        if os.sep in relative:
+            route = self.routes.get(relative.split(os.sep, 1)[0])
+            if route is not None:
+                return route.platform
+        return self.root.platform
+
+    def _accepts(self, route: FolderRoute, name: str) -> bool:
+        return (self.include is not None and self.include(name)
+                and (self.exclude is None or not self.exclude(name)) and route.accepts(name))
+
+    def walk(self, counts: Optional[Dict[str, int]] = None) -> Iterator[tuple]:
+        """
+        逐一產生 (路由, 所在資料夾 Path, DirEntry)：根目錄的檔案與平台資料夾（依設定的層數往下）中符合規則的檔案
+
+        counts 不為 None 時累計各路由略過的檔案數（{資料夾: 數量}），不逐一輸出訊息
+        """
+        stack = [(self.input_dir, self.root, 0)]
+        while stack:
+            directory, route, depth = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        try:
+                            if entry.is_dir():
+                                if route is self.root and depth == 0 and name in self.routes:
+                                    stack.append((directory / name, self.routes[name], 0))
+                                elif depth < route.depth and not entry.is_symlink():
+                                    stack.append((directory / name, route, depth + 1))
+                            elif entry.is_file():
+                                if self._accepts(route, name):
+                                    yield route, directory, entry
+                                elif counts is not None:
+                                    counts[route.folder] = counts.get(route.folder, 0) + 1
+                        except OSError:
+                            continue
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
                 continue
-            
-            print(f"[EXTRACT] 成功解壓縮 {len(extracted_files)} 個檔案")
-            
-            # 處理解壓縮出來的 Excel 檔案
-            for extracted_filename in extracted_files:
-                extracted_file_path = temp_extract_dir / extracted_filename
-                if extracted_file_path.exists() and extracted_file_path.suffix.lower() in ['.xlsx', '.xls']:
-                    print(f"[EXTRACT] 發現 Excel 檔案：{extracted_filename}")
-                    # 加入一般處理流程，讓程式嘗試所有平台密碼
-                    extracted_excel_files.append(extracted_file_path)
-            
-        except Exception as e:
-            error_msg = f"[EXTRACT] 解壓縮 {filename} 失敗：{e}"
-            log_lines.append(error_msg)
-            print(error_msg)
-            continue
-    
-    return extracted_excel_files
 
-def main():
-    """主程式：批次處理 Excel 檔案密碼移除"""
-    
-    # 初始化 UnRAR 工具路徑
-    init_unrar_tool()
-    
+    def has_pending(self) -> bool:
+        """找到第一個符合規則的檔案即回傳 True"""
+        for _ in self.walk():
+            return True
+        return False
+
+    def scan(self) -> Dict[str, Dict[str, Any]]:
+        """
+        掃描 input/：{資料夾（根目錄為 ""）: {"excel": [...], "archives": [...], "skipped": 略過數}}
+
+        平台資料夾依設定的順序排列、根目錄最後；各資料夾內依檔名排序
+        """
+        counts: Dict[str, int] = {}
+        found: Dict[str, Dict[str, list]] = {}
+        for route, directory, entry in self.walk(counts):
+            bucket = found.get(route.folder)
+            if bucket is None:
+                bucket = found[route.folder] = {"excel": [], "archives": []}
+            kind = "excel" if entry.name.lower().endswith(EXCEL_EXTENSIONS) else "archives"
+            bucket[kind].append((entry.name, directory))
+        result = {}
+        for folder in list(self.routes) + [""]:
+            if folder not in found and not counts.get(folder):
+                continue  # 資料夾不存在或沒有任何檔案
+            bucket = found.get(folder, {"excel": [], "archives": []})
+            # 以所在資料夾 Path 接上檔名，只需解析檔名部分
+            result[folder] = {kind: [directory / name for name, directory in sorted(items, key=lambda item: (str(item[1]), item[0]))]
+                              for kind, items in bucket.items()}
+            result[folder]["skipped"] = counts.get(folder, 0)
+        return result
+
+
+def has_pending_input(input_dir: Union[str, Path], routing: Optional[RoutingTable] = None) -> bool:
+    """
+    以 os.scandir 快速檢查 input/ 根目錄與平台資料夾是否有待處理的檔案
+    規則與 main() 的掃描相同（依路由設定，例如蝦皮資料夾只算檔名含 Order.all 的檔案），找到第一個即回傳
+    """
+    return (routing or RoutingTable(input_dir)).has_pending()
+
+
+# MO_Store_Plus 檔案的比對結果標記（不對應單一帳號，改用整個 mo_store_plus 平台的密碼）
+MO_STORE_PLUS = "MO_Store_Plus"
+
+
+def match_shop(filename: str, file_platform: Optional[str], platform_index: Dict[str, Any],
+               accounts: Dict[str, Dict[str, Any]],
+               trace: Optional[Callable[[str, int], None]] = None) -> tuple:
+    """
+    依檔名比對商店帳號（批次處理與 Decryptor 共用的路由規則）
+
+    - 檔名含 MO_Store_Plus 或來自 mo_store_plus 資料夾：改用 mo_store_plus 平台，帳號為 MO_STORE_PLUS
+    - 已知平台時只比對該平台的帳號，否則比對 accounts 中的所有帳號
+    - 依序檢查每個帳號：先比對帳號，再比對店家名稱，取第一個符合者
+
+    Args:
+        trace: 比對過程的訊息輸出（例如 say），None 時不輸出
+
+    Returns:
+        tuple: (平台, 比對到的帳號或 None)
+    """
+    def note(message: str, level: int) -> None:
+        if trace is not None:
+            trace(message, level)
+
+    if MO_STORE_PLUS in filename or file_platform == "mo_store_plus":
+        note(f"   [MATCH] MO_Store_Plus 檔案，將嘗試所有有密碼的帳號", VERBOSE)
+        return "mo_store_plus", MO_STORE_PLUS
+
+    target_accounts = accounts
+    if file_platform and file_platform in platform_index:
+        # 只檢查該平台的帳號
+        target_accounts = {}
+        for shop_info in platform_index[file_platform].values():
+            account = shop_info.get("shop_account", "")
+            if account:
+                target_accounts[account] = shop_info
+        note(f"   [MATCH] 限制在 {file_platform} 平台的 {len(target_accounts)} 個帳號中匹配", VERBOSE)
+
+    for account, account_info in target_accounts.items():
+        name = account_info.get("shop_name", "")
+        note(f"   [MATCH] 檢查帳號：{account}, 店家名稱：{name}", DEBUG)
+        # 先嘗試匹配帳號
+        if account in filename:
+            note(f"   [OK] 帳號匹配成功：{account}", VERBOSE)
+            return file_platform, account
+        # 如果帳號匹配失敗，嘗試匹配店家名稱
+        if name and name in filename:
+            note(f"   [OK] 店家名稱匹配成功：{name}", VERBOSE)
+            return file_platform, account
+        note(f"   [FAIL] 無匹配：帳號 '{account}' 和店家名稱 '{name}' 都不在檔案名中", DEBUG)
+    return file_platform, None
+
+# =============================================================================
+# 函式庫 API（記憶體內解密，不讀寫 input/ output/ temp/ log/）
+# =============================================================================
+
+# 候選密碼：{密碼: 商店資訊}（即 platform_index[平台] 的格式）或單純的密碼清單
+Candidates = Union[Dict[str, Dict[str, Any]], List[str]]
+
+
+def route_candidates(candidates: Candidates, filename: Optional[str] = None) -> List[tuple]:
+    """
+    整理候選密碼為 [(密碼, 商店資訊)]，以 match_shop 比對到的商店排在最前面，其餘維持原順序
+    """
+    if isinstance(candidates, dict):
+        pairs = list(candidates.items())
+    else:
+        pairs = [(password, None) for password in candidates]
+    if not filename:
+        return pairs
+    accounts: Dict[str, Dict[str, Any]] = {}
+    for _, shop_info in pairs:
+        account = (shop_info or {}).get("shop_account", "")
+        if account:
+            accounts.setdefault(account, shop_info)
+    _, matched = match_shop(filename, None, {}, accounts)
+    if matched is None or matched == MO_STORE_PLUS:
+        return pairs
+    return sorted(pairs, key=lambda pair: (pair[1] or {}).get("shop_account") != matched)
+
+
+class Decryptor:
+    """
+    記憶體內解密：供 ETL / 排程工作直接處理郵件附件，不經過檔案系統
+
+    - mapping 可為 shops_master.json 路徑或 platform_index 字典；
+      指定 platform 時只測試該平台密碼，未指定時測試所有平台
+    - 與批次處理相同的路由規則（match_shop）：檔名含 MO_Store_Plus 時改用 mo_store_plus 平台，
+      檔名比對到的商店優先測試
+    - 沿用 CrackSession：每個候選密碼只跑驗證器，成功後才解密
+    - 以內容雜湊快取成功的密碼，同一份附件再次出現時不必重新搜尋
+    - 壓縮檔內的巢狀壓縮檔在記憶體中逐層展開（archive_limits 控制層數、總量與壓縮比）
+
+    範例：
+        decryptor = Decryptor("mapping/shops_master.json")
+        plaintext, shop = decryptor.decrypt_bytes(data, platform="MOMO", filename=name)
+    """
+
+    def __init__(self, mapping: Union[str, Path, Dict[str, Any], None] = None, cache_size: int = 1024,
+                 chunk_size: int = DEFAULT_DECRYPT_CHUNK, max_unpacked_bytes: Optional[int] = None,
+                 archive_limits: Optional[ArchiveLimits] = None):
+        if isinstance(mapping, (str, Path)):
+            with open(mapping, "r", encoding="utf-8") as f:
+                mapping = convert_json_to_passwords_format(json.load(f))
+        if mapping and "platform_index" in mapping:
+            mapping = mapping["platform_index"]
+        self.platform_index: Dict[str, Dict[str, Any]] = mapping or {}
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size
+        # 每個壓縮檔（含巢狀壓縮檔）解開的上限；max_unpacked_bytes 為總量上限（None = 不限）
+        self.archive_limits = archive_limits or ArchiveLimits(max_bytes=max_unpacked_bytes)
+        self._cache: Dict[bytes, tuple] = {}  # 內容雜湊 -> (密碼, 商店資訊)
+
+    def candidates(self, platform: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        if platform is not None:
+            if platform not in self.platform_index:
+                raise KeyError(f"找不到 {platform} 平台的密碼設定")
+            return self.platform_index[platform]
+        merged: Dict[str, Dict[str, Any]] = {}
+        for passwords in self.platform_index.values():
+            for password, shop_info in passwords.items():
+                merged.setdefault(password, shop_info)
+        return merged
+
+    def route(self, platform: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """依平台提示與檔名選出候選密碼"""
+        if filename:
+            platform, _ = match_shop(filename, platform, self.platform_index, {})
+        return self.candidates(platform)
+
+    def _remember(self, digest: bytes, password: str, shop_info: Optional[Dict[str, Any]]) -> None:
+        if self.cache_size <= 0:
+            return
+        if len(self._cache) >= self.cache_size:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[digest] = (password, shop_info)
+
+    def decrypt_stream(self, src: BinaryIO, dst: BinaryIO, candidates: Optional[Candidates] = None,
+                       platform: Optional[str] = None, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        解密 src 寫入 dst，回傳對應的商店資訊（未加密檔案原樣複製，回傳 None）
+
+        src 需可 seek；不可 seek 的串流會先讀入記憶體
+        找不到正確密碼時拋出 msoffcrypto.exceptions.InvalidKeyError
+        """
+        if not (hasattr(src, "seekable") and src.seekable()):
+            src = io.BytesIO(src.read())
+        if candidates is None:
+            candidates = self.route(platform, filename)
+
+        src.seek(0)
+        digest = hashlib.blake2b(digest_size=16)
+        for block in iter(lambda: src.read(DedupeIndex.CHUNK_SIZE), b""):
+            digest.update(block)
+        key = digest.digest()
+        src.seek(0)
+
+        with CrackSession(src, self.chunk_size) as session:
+            if not session.is_encrypted:
+                src.seek(0)
+                shutil.copyfileobj(src, dst)
+                return None
+
+            pairs = route_candidates(candidates, filename)
+            cached = self._cache.get(key)
+            if cached is not None:
+                pairs.insert(0, cached)
+            for password, shop_info in pairs:
+                if session.try_password(password):
+                    session.decrypt_to(dst)
+                    self._remember(key, password, shop_info)
+                    return shop_info
+        raise msoffcrypto.exceptions.InvalidKeyError(f"{len(pairs)} 個候選密碼都無法解密")
+
+    def decrypt_bytes(self, data: bytes, candidates: Optional[Candidates] = None,
+                      platform: Optional[str] = None, filename: Optional[str] = None) -> tuple:
+        """解密記憶體內的 Excel 檔案，回傳 (明文 bytes, 商店資訊或 None)"""
+        out = io.BytesIO()
+        shop_info = self.decrypt_stream(io.BytesIO(data), out, candidates, platform, filename)
+        return out.getvalue(), shop_info
+
+    def decrypt_archive(self, data: bytes, candidates: Optional[Candidates] = None,
+                        platform: Optional[str] = None, archive_name: str = "") -> List[tuple]:
+        """
+        解密記憶體內的 ZIP / RAR 中所有 Excel 檔案（含巢狀壓縮檔內的 Excel 檔案）
+        每一層壓縮檔都先試無密碼，再試候選密碼（與批次處理相同）
+
+        解開的總量或壓縮比超過 archive_limits 時停止展開，最後一筆記為錯誤
+
+        Returns:
+            list: [(成員路徑, 明文 bytes 或 None, 商店資訊或 None, 錯誤訊息或 None)]
+                  巢狀成員的路徑以「/」串接各層名稱，例如 月結.zip/報表.xlsx
+        """
+        archive_candidates = candidates if candidates is not None else self.route(platform, archive_name)
+        archive_passwords = [password for password, _ in route_candidates(archive_candidates, archive_name)]
+
+        results = []
+        members = walk_archive(io.BytesIO(data), archive_passwords, self.archive_limits.new_budget())
+        try:
+            for member_path, content, error in members:
+                if content is None:
+                    results.append((member_path, None, None, error))
+                    continue
+                try:
+                    plaintext, shop_info = self.decrypt_bytes(content, candidates, platform,
+                                                              filename=Path(member_path).name)
+                    results.append((member_path, plaintext, shop_info, None))
+                except Exception as e:
+                    results.append((member_path, None, None, str(e)))
+        except UnpackLimitExceeded as e:
+            results.append((archive_name, None, None, str(e)))
+        return results
+
+
+def decrypt_bytes(data: bytes, candidates: Candidates, filename: Optional[str] = None) -> tuple:
+    """解密記憶體內的 Excel 檔案，回傳 (明文 bytes, 商店資訊或 None)"""
+    return Decryptor(cache_size=0).decrypt_bytes(data, candidates, filename=filename)
+
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO, candidates: Candidates,
+                   filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """解密 src 寫入 dst，回傳對應的商店資訊"""
+    return Decryptor(cache_size=0).decrypt_stream(src, dst, candidates, filename=filename)
+
+
+def decrypt_archive(data: bytes, candidates: Candidates, archive_name: str = "") -> List[tuple]:
+    """解密記憶體內壓縮檔中的所有 Excel 檔案"""
+    return Decryptor(cache_size=0).decrypt_archive(data, candidates, archive_name=archive_name)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令列參數（全部選填，不帶參數時與原本行為相同）"""
+    from workbook_export import DEFAULT_EXPORT_BATCH_ROWS, WorkbookExporter
+    parser = argparse.ArgumentParser(description="Excel 密碼移除工具 - 批次處理")
+    parser.add_argument("--serve", action="store_true",
+                        help="啟動本機解密服務（不執行批次處理）")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="服務綁定位址 (預設: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="服務埠號 (預設: 8765)")
+    parser.add_argument("--unix-socket", type=str, help="改為監聽 Unix socket 路徑")
+    parser.add_argument("--workers", type=int, help="解密工作程序數 (預設: CPU 核心數)")
+    parser.add_argument("--max-concurrency", type=int, help="同時處理的請求上限，超過回應 503 (預設: 工作程序數 x 2)")
+    parser.add_argument("--queue-timeout", type=float, default=30,
+                        help="達到同時處理上限時的最長等待秒數，逾時回應 503 (預設: 30)")
+    parser.add_argument("--max-unpacked-mb", type=float, default=1024,
+                        help="每個壓縮檔（含巢狀壓縮檔）解開後的總量上限 MB，防止 zip bomb (預設: 1024)")
+    parser.add_argument("--archive-max-depth", type=int, default=DEFAULT_ARCHIVE_DEPTH,
+                        help=f"壓縮檔內巢狀壓縮檔最多展開幾層，0 = 不展開 (預設: {DEFAULT_ARCHIVE_DEPTH})")
+    parser.add_argument("--archive-max-ratio", type=float, default=DEFAULT_ARCHIVE_RATIO,
+                        help=f"壓縮檔成員解開大小 / 壓縮大小的上限，超過視為 zip bomb，0 = 不檢查 (預設: {DEFAULT_ARCHIVE_RATIO})")
+    parser.add_argument("--max-upload-mb", type=float, default=200, help="單一上傳大小上限 MB (預設: 200)")
+    parser.add_argument("--base-dir", type=str,
+                        help="專案根目錄（含 input/、mapping/；預設為程式所在位置）")
+    parser.add_argument("--durable", action="store_true",
+                        help="發佈輸出前先 fsync 檔案內容（較慢，但可承受斷電）")
+    parser.add_argument("--fsync-batch", type=int, default=32,
+                        help="durable 模式下每幾個檔案批次 fsync 一次目錄 (預設: 32)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="不檢查輸出檔案的完整性（ZIP 中央目錄與 CRC、OLE 檔頭與 FAT）")
+    parser.add_argument("--verify-workers", type=int, default=4,
+                        help="完整性檢查時平行檢查 ZIP 成員 CRC 的執行緒數 (預設: 4)")
+    parser.add_argument("--copy-plain", action="store_true",
+                        help="未加密檔案及重複檔案一律完整複製，不使用 reflink / 硬連結")
+    parser.add_argument("--output-layout", type=str,
+                        help="輸出資料夾配置：flat（全部放在 output/）、sharded（"
+                             + SHARDED_OUTPUT_LAYOUT + "）或自訂格式；未指定時沿用上次的配置 (預設: flat)")
+    parser.add_argument("--temp-budget-mb", type=float, default=0,
+                        help="temp/ 解壓檔案的用量上限 MB，達到上限時先處理已解開的工作簿再繼續解壓，0 = 不限 (預設: 0)")
+    parser.add_argument("--ram-workspace", type=str, nargs="?", const="auto",
+                        help="壓縮檔解壓到記憶體檔案系統（tmpfs / RAM 磁碟）；不加路徑時使用 /dev/shm")
+    parser.add_argument("--ram-workspace-mb", type=float, default=512,
+                        help="RAM 工作區的用量上限 MB，預估放不下的壓縮檔改解壓到 temp/ (預設: 512)")
+    parser.add_argument("--jobs", type=str,
+                        help="工作清單 JSON：在同一次執行中平行處理多組 input / mapping / output（見 README）")
+    parser.add_argument("--job-workers", type=int, help="--jobs 的工作程序數 (預設: CPU 核心數與工作數的較小者)")
+    parser.add_argument("--input-dir", type=str, help="輸入資料夾 (預設: input)")
+    parser.add_argument("--output-dir", type=str, help="輸出資料夾 (預設: output)")
+    parser.add_argument("--mapping", type=str, help="密碼設定檔 (預設: mapping/shops_master.json)")
+    parser.add_argument("--log-dir", type=str, help="日誌與執行報告資料夾 (預設: log)")
+    parser.add_argument("--job-name", type=str, help=argparse.SUPPRESS)  # --jobs 內部使用
+    parser.add_argument("--export", choices=list(WorkbookExporter.FORMATS),
+                        help="輸出後將每張工作表另外匯出成 CSV 或 Parquet（Parquet 需要 pyarrow，.xls 需要 xlrd）")
+    parser.add_argument("--export-dir", type=str, help="匯出資料夾 (預設: export)")
+    parser.add_argument("--export-batch-rows", type=int, default=DEFAULT_EXPORT_BATCH_ROWS,
+                        help=f"匯出時每批寫出的列數，決定記憶體上限 (預設: {DEFAULT_EXPORT_BATCH_ROWS})")
+    parser.add_argument("--routing", type=str, help="輸入路由設定檔 (預設: mapping/routing.json，不存在時使用內建規則)")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="只處理上次執行之後 input/ 中新增或變更的檔案（比對 log/input_inventory.json 快照）")
+    parser.add_argument("--spool", action="store_true",
+                        help="多節點模式：多台電腦共用同一份專案資料夾，以租約認領 input/ 中的檔案")
+    parser.add_argument("--worker-id", type=str, help="spool 模式的節點名稱 (預設: 主機名稱-PID)")
+    parser.add_argument("--lease-seconds", type=float, default=120,
+                        help="spool 模式的租約有效秒數，節點超過此時間沒有心跳即由其他節點接手 (預設: 120)")
+    parser.add_argument("--file-timeout", type=float, default=600,
+                        help="單一 Excel 檔案的處理時限秒數，超過即取消並列入隔離清單，0 = 不限 (預設: 600)")
+    parser.add_argument("--archive-timeout", type=float, default=1800,
+                        help="單一壓縮檔解壓（含巢狀壓縮檔）的處理時限秒數，0 = 不限 (預設: 1800)")
+    parser.add_argument("--run-timeout", type=float, default=0,
+                        help="整次執行的截止時間秒數，到期後其餘檔案留待下次執行，0 = 不限 (預設: 0)")
+    parser.add_argument("--decrypt-chunk-kb", type=int, default=DEFAULT_DECRYPT_CHUNK // 1024,
+                        help="串流解密每批處理的大小 KB，決定大型檔案的記憶體上限 (預設: 1024)")
+    parser.add_argument("--prom-textfile", type=str,
+                        help="Prometheus textfile collector 輸出路徑 (預設: log/excel_password_remover.prom)")
+    parser.add_argument("--dedupe", choices=["link", "record", "off"], default="link",
+                        help="內容相同的工作簿只破解一次：link=連結既有輸出（預設）、record=僅記錄、off=關閉")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", action="store_true",
+                           help="只顯示錯誤與最後統計")
+    verbosity.add_argument("-v", "--verbose", action="store_true",
+                           help="顯示每個檔案的處理細節")
+    verbosity.add_argument("--debug", action="store_true",
+                           help="顯示每個候選密碼與商店比對，並寫入結構化日誌")
+    parser.add_argument("--no-progress", action="store_true",
+                        help="不顯示即時進度行")
+    parser.add_argument("--log-keep-days", type=float, default=14,
+                        help="log/ 內舊日誌與報告的保留天數 (預設: 14)")
+    parser.add_argument("--log-max-mb", type=float, default=10,
+                        help="結構化日誌超過此大小 MB 即輪替 (預設: 10)")
+    parser.add_argument("--log-max-age-hours", type=float, default=24,
+                        help="結構化日誌最早一筆超過此時數即輪替 (預設: 24)")
+    parser.add_argument("--profile", action="store_true",
+                        help="啟用效能剖析，於 log/ 輸出 .pstats 與 collapsed stack（火焰圖用）")
+    parser.add_argument("--profile-files", nargs="+", metavar="PATTERN",
+                        help="只剖析檔名符合的檔案（支援萬用字元，例如 *Order.all*），隱含 --profile")
+    parser.add_argument("--profile-interval-ms", type=float, default=1.0,
+                        help="呼叫堆疊取樣間隔毫秒 (預設: 1)")
+    return parser.parse_args(argv)
+
+def run_batch(args: argparse.Namespace, argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """批次處理一組 input / mapping / output；回傳執行統計摘要，無法執行時回傳 {"error": 原因}"""
     # 取得專案根目錄（使用統一的函數）
     project_root = get_base_path().resolve()
 
-    input_dir = project_root / "input"
-    output_dir = project_root / "output"
-    output_dir.mkdir(exist_ok=True)
-    temp_dir = project_root / "temp"
+    # --input-dir 等選項（--jobs 的每個工作使用）可覆寫預設位置，相對路徑以專案根目錄為準
+    input_dir = project_root / (args.input_dir or "input")
+    log_dir = project_root / (args.log_dir or "log")
+
+    # 輸入路由：mapping/routing.json 不存在時使用預設（平台資料夾 → 平台）
+    try:
+        routing = RoutingTable.load(input_dir, project_root / (args.routing or "mapping/routing.json"),
+                                    required=bool(args.routing))
+    except (OSError, ValueError) as e:
+        say(f"[FAIL] 路由設定無效：{e}", QUIET)
+        return {"error": f"路由設定無效：{e}"}
+
+    # 沒有待處理的檔案時直接結束：不載入密碼本、不 import 解密模組、不建立日誌
+    if not has_pending_input(input_dir, routing):
+        say(f"[OK] {input_dir} 中沒有需要處理的檔案")
+        metrics = RunMetrics()
+        metrics.finished = time.time()
+        if log_dir.is_dir() or args.prom_textfile:
+            prom_path = Path(args.prom_textfile) if args.prom_textfile else log_dir / "excel_password_remover.prom"
+            try:
+                metrics.write_prometheus(prom_path)  # 監控仍能看到最近一次執行時間
+            except OSError as e:
+                say(f"[WARN] Prometheus 指標寫入失敗：{e}")
+        return metrics.summary()
+
+    # --changed-only：與上次的輸入清單快照比對，只處理新增或變更的檔案
+    inventory = None
+    changed_inputs = None
+    if args.changed_only:
+        from input_inventory import InputInventory
+        inventory = InputInventory(log_dir / "input_inventory.json", input_dir)
+        inventory_state = inventory.scan()
+        delta = inventory.diff(inventory_state)
+        changed_inputs = {input_dir / relative for relative in delta["added"] + delta["modified"]}
+        say(f"[INVENTORY] 與上次快照相比：新增 {len(delta['added'])}、變更 {len(delta['modified'])}、"
+            f"刪除 {len(delta['removed'])} 個檔案（重新計算雜湊 {inventory.hashed} 個）")
+        if not changed_inputs:
+            log_dir.mkdir(exist_ok=True)
+            inventory.save(inventory_state)
+            say(f"[OK] {input_dir} 中沒有新增或變更的檔案")
+            return RunMetrics().summary()
+
+    output_dir = project_root / (args.output_dir or "output")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    temp_root = project_root / "temp"
+    temp_root.mkdir(exist_ok=True)
+    # spool 模式與 --jobs 的工作各自使用自己的臨時資料夾，清理時不會刪到其他節點或工作的檔案
+    worker_id = None
+    if args.spool:
+        from spool_worker import SpoolWorker, spool_worker_id
+        worker_id = spool_worker_id(args.worker_id)
+    scratch_name = worker_id or (f"job-{args.job_name}" if args.job_name else None)
+    temp_dir = temp_root / scratch_name if scratch_name else temp_root
     temp_dir.mkdir(exist_ok=True)
-    log_dir = project_root / "log"
-    passwords_path = "mapping/shops_master.json"
+    passwords_path = args.mapping or "mapping/shops_master.json"
 
-    # 清空並建立 log 資料夾
-    if log_dir.exists():
-        shutil.rmtree(log_dir)
-    log_dir.mkdir(exist_ok=True)
+    # 建立 log 資料夾（保留先前的日誌，依保留天數清理）
+    log_dir.mkdir(parents=True, exist_ok=True)
 
     # 建立 log 檔案
-    log_path = log_dir / f"batch_removal_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    # 同一秒內的多次執行共用同一個 JSONL 檔，加上 PID 才能區分各次的記錄
+    # spool 模式改用節點名稱（不同主機的 PID 可能相同）
+    run_id = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{worker_id or os.getpid()}"
+    log_path = log_dir / f"batch_removal_log_{run_id}.txt"
+    log_lines = RunLog(log_dir, run_id, max_bytes=int(args.log_max_mb * 1024 * 1024),
+                       max_age_hours=args.log_max_age_hours, keep_days=args.log_keep_days,
+                       min_level="debug" if args.debug else "info")
+    activate_log(log_lines)
+    log_lines.record("run_start", argv=sys.argv[1:] if argv is None else argv)
+
+    # 啟用執行統計與整次執行的截止時間
+    metrics = RunMetrics()
+    activate_metrics(metrics)
+    set_run_deadline(args.run_timeout)
+
+    # 效能剖析：未指定 --profile-files 時剖析整次執行
+    profiler = None
+    if args.profile or args.profile_files:
+        profiler = HotPathProfiler(args.profile_files, interval=args.profile_interval_ms / 1000)
+        activate_profiler(profiler)
+        if profiler.whole_run:
+            profiler.start()
 
     # 讀取密碼設定
     try:
-        data = load_passwords(passwords_path)
+        with metrics_stage("load_mapping"):
+            data = load_passwords(passwords_path)
         platform_index = data.get("platform_index", {})
         shops_data = data.get("shops", [])
+        candidate_rules = load_candidate_rules(data)
+        from workbook_export import load_export_headers
+        export_headers = load_export_headers(data)
+        from platform_scheduler import PlatformScheduler, load_schedule
+        schedule = load_schedule(data)
         
         # 建立帳號到商店資訊的映射
         excel_accounts = {}
@@ -765,189 +4105,339 @@ def main():
                 excel_accounts[account] = shop
         
         compressed_accounts = data.get("compressed_files", [])
-        print(f"[OK] 成功載入 {len(excel_accounts)} 個 Excel 帳號設定")
-        print(f"[OK] 成功載入 {len(compressed_accounts)} 個壓縮檔案設定")
-        print(f"[OK] 成功載入 {len(platform_index)} 個平台索引")
+        say(f"[OK] 成功載入 {len(excel_accounts)} 個 Excel 帳號設定")
+        say(f"[OK] 成功載入 {len(compressed_accounts)} 個壓縮檔案設定")
+        say(f"[OK] 成功載入 {len(platform_index)} 個平台索引")
+        if candidate_rules:
+            say(f"[OK] 成功載入 {len(candidate_rules)} 組候選密碼擴展規則：{', '.join(candidate_rules)}")
     except Exception as e:
-        print(f"[FAIL] 載入 mapping/shops_master.json 失敗：{e}")
-        return
+        say(f"[FAIL] 載入 {passwords_path} 失敗：{e}", QUIET)
+        log_lines.append(f"[FAIL] 載入 {passwords_path} 失敗：{e}")
+        return {"error": f"載入 {passwords_path} 失敗：{e}"}
 
-    log_lines = []
     processed_files = []
     failed_files = []
+    deadline_skipped = []  # 已達整次執行截止時間而未處理的檔案
 
-    # 處理壓縮檔案
-    extracted_excel_files = process_compressed_files(input_dir, output_dir, temp_dir, compressed_accounts, log_lines)
+    spool = None
+    if worker_id:
+        spool = SpoolWorker(project_root / "spool", input_dir, worker_id, args.lease_seconds)
+        reclaimed, pruned = spool.sweep(temp_root)
+        say(f"[SPOOL] 節點 {worker_id} 加入（租約 {args.lease_seconds:g} 秒）", VERBOSE)
+        if reclaimed:
+            say(f"[SPOOL] 已回收 {reclaimed} 個失效節點的臨時資料夾")
+        if pruned:
+            say(f"[SPOOL] 已清除 {pruned} 筆輸入檔已不存在的完成記錄", VERBOSE)
 
-    # 掃描 input 資料夾中的 Excel 檔案（支援平台分類資料夾）
-    excel_files = []
-    platform_folders = ["Shopee_files", "MOMO_files", "PChome_files", "Yahoo_files", "ETMall_files", "mo_store_plus_files", "coupang_files"]
-    
-    # 掃描平台資料夾
-    for folder_name in platform_folders:
-        folder_path = input_dir / folder_name
-        if folder_path.exists() and folder_path.is_dir():
-            print(f"[SCAN] 掃描平台資料夾：{folder_name}")
-            folder_excel_files = []
-            folder_compressed_files = []
-            
-            for file_path in folder_path.iterdir():
-                if file_path.is_file():
-                    file_ext = file_path.suffix.lower()
+    # RAM 工作區：預估放得下的壓縮檔解壓到記憶體檔案系統，其餘照常使用 temp/
+    ram_dir = None
+    ram_budget = 0
+    if args.ram_workspace:
+        ram_dir = ram_workspace_dir(args.ram_workspace)
+        if ram_dir is None:
+            say(f"[WARN] 找不到 RAM 工作區位置：{args.ram_workspace}，解壓檔案改用 temp/")
+        else:
+            ram_budget = min(int(args.ram_workspace_mb * 1024 * 1024), shutil.disk_usage(ram_dir).free)
+            say(f"[TEMP] RAM 工作區：{ram_dir}（上限 {ram_budget / 1024 / 1024:.1f} MB）", VERBOSE)
+
+    # 輸出提交器：temp/ 與 RAM 工作區內解壓出的未加密檔案可直接 rename（跨檔案系統時複製）到 output/
+    committer = OutputCommitter(durable=args.durable, fsync_batch=args.fsync_batch,
+                                scratch_roots=[temp_dir] + ([ram_dir] if ram_dir else []),
+                                link_plain=not args.copy_plain,
+                                output_dir=output_dir, shared=spool is not None,
+                                verifier=None if args.no_verify else OutputVerifier(args.verify_workers),
+                                quarantine_dir=project_root / "quarantine")
+    if committer.swept:
+        say(f"[CLEAN] 已清除 {len(committer.swept)} 個先前中斷留下的臨時檔", VERBOSE)
+        log_event("stale_partials", level="info", count=len(committer.swept))
+    dedupe = None
+    if args.dedupe != "off":
+        dedupe = DedupeIndex(output_dir / ".dedupe_index.json", output_dir, mode=args.dedupe,
+                             shared=spool is not None)
+    archive_limits = ArchiveLimits(args.archive_max_depth, int(args.max_unpacked_mb * 1024 * 1024),
+                                   args.archive_max_ratio)
+    # 輸出配置：未指定時沿用 output/.layout.json 的記錄；明確指定時寫回記錄，之後的執行保持一致
+    try:
+        layout = OutputLayout(args.output_layout if args.output_layout is not None
+                              else OutputLayout.saved(output_dir) or "", exclusive=spool is not None)
+        if args.output_layout is not None:
+            layout.save(output_dir)
+    except (ValueError, OSError) as e:
+        say(f"[FAIL] 輸出配置無效：{e}", QUIET)
+        log_lines.append(f"[FAIL] 輸出配置無效：{e}")
+        if spool is not None:
+            spool.close()
+        if ram_dir is not None:
+            shutil.rmtree(ram_dir, ignore_errors=True)
+        return {"error": f"輸出配置無效：{e}"}
+    if not layout.flat:
+        say(f"[OUTPUT] 輸出分層配置：{layout.pattern}", VERBOSE)
+    quarantine = QuarantineList(log_dir / "quarantine.json", input_dir, shared=spool is not None)
+    # 解壓資料夾：啟動時回收先前中斷留下的資料夾，處理中依參考計數即時刪除
+    temp_space = TempSpace(temp_dir, int(args.temp_budget_mb * 1024 * 1024), ram_dir, ram_budget)
+    if temp_space.reclaim():
+        say(f"[CLEAN] 已回收 {temp_space.reclaimed} 個先前中斷留下的解壓資料夾", VERBOSE)
+    if quarantine.entries:
+        say(f"[RESUME] 隔離清單中有 {len(quarantine.entries)} 個先前超時的檔案，將從中斷處繼續", VERBOSE)
+    ctx = RunContext(committer, dedupe, decrypt_chunk=max(4, args.decrypt_chunk_kb) * 1024,
+                     archive_limits=archive_limits, quarantine=quarantine,
+                     file_timeout=args.file_timeout, archive_timeout=args.archive_timeout, layout=layout,
+                     spool=spool, temp_space=temp_space, candidate_rules=candidate_rules)
+    if args.export:
+        if args.export == "parquet" and not pyarrow._available():
+            say("[WARN] 匯出 Parquet 需要 pyarrow 套件（pip install pyarrow），本次不匯出", QUIET)
+        else:
+            from workbook_export import WorkbookExporter
+            ctx.exporter = WorkbookExporter(args.export, project_root / (args.export_dir or "export"), output_dir,
+                                            export_headers, args.export_batch_rows, committer)
+            say(f"[EXPORT] 輸出檔另外匯出 {args.export}：{ctx.exporter.export_root}", VERBOSE)
+
+    def platform_of(file_path: Path) -> Optional[str]:
+        """檔案的平台：解壓出的工作簿依來源壓縮檔所在的資料夾"""
+        return routing.platform_for(ctx.sources.get(file_path, file_path))
+
+    def process_excel_file(file_path: Path) -> None:
+        """處理單一 Excel 檔案（主流程與臨時空間達上限時的提前處理共用）"""
+        with metrics_file(file_path) as file_record:
+            file_start = time.perf_counter()
+            try:
+                with time_budget(args.file_timeout, "file"):
                     filename = file_path.name
+                    say(f"\n[PROCESS] 正在處理：{filename}", VERBOSE)
+
+                    # 根據檔案所在資料夾確定平台
+                    file_platform = platform_of(file_path)
+        
+                    if file_record is not None and file_platform:
+                        file_record["platform"] = file_platform
+                    if file_platform:
+                        say(f"[PLATFORM] 檔案來自平台資料夾：{file_platform}", VERBOSE)
+                    else:
+                        say(f"[PLATFORM] 檔案來自根目錄，將嘗試所有平台", VERBOSE)
+
+                    # 尋找匹配的帳號（MO_Store_Plus 檔案標記為特殊處理）
+                    say(f"[MATCH] 正在匹配檔案：{filename}", VERBOSE)
+                    _, matched_account = match_shop(filename, file_platform, platform_index, excel_accounts, trace=say)
+
+                    success = False
+        
+                    if matched_account:
+                        if matched_account == MO_STORE_PLUS:
+                            # 特殊處理：MO_Store_Plus 檔案，僅使用 mo_store_plus 平台密碼
+                            say(f"[WARN] MO_Store_Plus 檔案，僅使用 mo_store_plus 平台密碼破解：{filename}", VERBOSE)
+                            success = try_platform_passwords(file_path, platform_index, "mo_store_plus", output_dir, log_lines, ctx)
+                        else:
+                            # 找到對應帳號，僅使用該平台的密碼
+                            account_info = excel_accounts[matched_account]
+                            shop_name = account_info.get("shop_name", "")
+                            shop_id = account_info.get("shop_id", "UNKNOWN")
+                            shop_account = account_info.get("shop_account", "UNKNOWN")
+                
+                            # 根據檔案所在平台，僅使用該平台的密碼
+                            if file_platform and file_platform in platform_index:
+                                say(f"[PLATFORM] 檔案來自 {file_platform} 平台，僅使用該平台密碼", VERBOSE)
+                                success = try_platform_passwords(file_path, platform_index, file_platform, output_dir, log_lines, ctx)
                     
-                    # 特殊處理：蝦皮平台只處理包含 "Order.all" 的檔案
-                    if folder_name == "Shopee_files" and "Order.all" not in filename:
-                        print(f"[SKIP] 蝦皮平台跳過非 Order.all 檔案：{filename}")
-                        continue
-                    
-                    if file_ext in ['.xlsx', '.xls']:
-                        folder_excel_files.append(file_path)
-                    elif file_ext in ['.zip', '.rar']:
-                        folder_compressed_files.append(file_path)
-            
-            print(f"[SCAN] 在 {folder_name} 中發現 {len(folder_excel_files)} 個 Excel 檔案，{len(folder_compressed_files)} 個壓縮檔案")
-            excel_files.extend(folder_excel_files)
+                                if success:
+                                    # 成功處理，記錄到 processed_files
+                                    processed_files.append((filename, "已處理", shop_name, matched_account))
+                            else:
+                                say(f"[WARN] 無法確定檔案平台，跳過處理：{filename}")
+                                success = False
+
+                    # 如果還沒有成功，僅嘗試檔案所在平台的密碼
+                    if not success:
+                        if file_platform and file_platform in platform_index:
+                            say(f"[WARN] 嘗試使用 {file_platform} 平台密碼破解：{filename}", VERBOSE)
+                            success = try_platform_passwords(file_path, platform_index, file_platform, output_dir, log_lines, ctx)
+                
+                            if success:
+                                # 成功處理，記錄到 processed_files
+                                processed_files.append((filename, "已處理", "平台檔案", file_platform))
+                            else:
+                                # 失敗，記錄到 failed_files
+                                error_msg = f"[FAIL] {file_platform} 平台密碼無法破解：{filename}"
+                                log_lines.append(error_msg)
+                                failed_files.append((filename, error_msg))
+                                say(error_msg, VERBOSE)
+                        else:
+                            say(f"[WARN] 無法確定檔案平台，跳過處理：{filename}", VERBOSE)
+                            error_msg = f"[FAIL] 無法確定檔案平台：{filename}"
+                            log_lines.append(error_msg)
+                            failed_files.append((filename, error_msg))
+
+                    # 如果所有密碼都無法破解
+                    if not success:
+                        error_msg = f"[FAIL] 所有密碼都無法破解：{filename}"
+                        log_lines.append(error_msg)
+                        failed_files.append((filename, error_msg))
+                        mark_unfinished(file_path, ctx)
+                        say(error_msg, QUIET)
+                    # 在時限內跑完（不論成敗）即移出隔離清單
+                    quarantine.release(file_path)
+                    if spool is not None:
+                        spool.complete(file_path, "ok" if success else "failed")
+                    metrics_outcome("ok" if success else "failed", overwrite=False)
+                    log_event("file", outcome=file_record["outcome"] if file_record else ("ok" if success else "failed"),
+                              seconds=round(time.perf_counter() - file_start, 4))
+            except BudgetExceeded as e:
+                error_msg = quarantine_timeout(file_path, "workbook", e, time.perf_counter() - file_start,
+                                               log_lines, ctx)
+                failed_files.append((file_path.name, error_msg))
+        # 處理完畢即刪除解壓出來的暫存檔
+        ctx.temp_space.release(file_path)
+
+    def drain_excel_file(file_path: Path) -> None:
+        if run_deadline_passed():
+            deadline_skipped.append(file_path)
+            return
+        process_excel_file(file_path)
+
+    temp_space.drain = drain_excel_file
+
+
+    # 依路由表掃描 input/（平台資料夾與根目錄一次走訪完畢）
+    with metrics_stage("scan"):
+        scanned = routing.scan()
+
+    def changed(paths: List[Path]) -> List[Path]:
+        """--changed-only 唯一的篩選點：只保留上次快照之後新增或變更的檔案"""
+        return paths if changed_inputs is None else [path for path in paths if path in changed_inputs]
+
+    root_scan = scanned.get("", {"excel": [], "archives": [], "skipped": 0})
+
+    # 掃描 input 資料夾中的 Excel 檔案（支援平台分類資料夾）
+    excel_files = []
+    platform_archives = []  # (平台資料夾, 平台, 壓縮檔列表)
+    
+    # 平台資料夾
+    for folder_name, route in routing.routes.items():
+        if folder_name not in scanned:
+            continue
+        found = scanned[folder_name]
+        say(f"[SCAN] 掃描平台資料夾：{folder_name}", VERBOSE)
+        folder_excel_files = changed(found["excel"])
+        folder_compressed_files = changed(found["archives"])
+        if found["skipped"]:
+            say(f"[SKIP] {folder_name} 中有 {found['skipped']} 個檔案不符合路由規則，已略過", VERBOSE)
             
-            # 處理該資料夾中的壓縮檔案
-            if folder_compressed_files:
-                print(f"[EXTRACT] 開始處理 {folder_name} 中的壓縮檔案...")
-                extracted_files = process_platform_compressed_files(folder_compressed_files, output_dir, temp_dir, platform_index, folder_name, log_lines)
-                excel_files.extend(extracted_files)
-    
-    # 掃描 input 根目錄中的檔案（向後相容）
-    root_excel_files = []
-    root_compressed_files = []
-    for file_path in input_dir.iterdir():
-        if file_path.is_file():
-            file_ext = file_path.suffix.lower()
-            if file_ext in ['.xlsx', '.xls']:
-                root_excel_files.append(file_path)
-            elif file_ext in ['.zip', '.rar']:
-                root_compressed_files.append(file_path)
+        say(f"[SCAN] 在 {folder_name} 中發現 {len(folder_excel_files)} 個 Excel 檔案，{len(folder_compressed_files)} 個壓縮檔案")
+        excel_files.extend(folder_excel_files)
+        if folder_compressed_files:
+            platform_archives.append((folder_name, route.platform, folder_compressed_files))
+    
+    # input 根目錄中的檔案（向後相容）
+    root_excel_files = changed(root_scan["excel"])
+    root_compressed_files = changed(root_scan["archives"])
     
     if root_excel_files:
-        print(f"[SCAN] 在 input 根目錄中發現 {len(root_excel_files)} 個 Excel 檔案")
+        say(f"[SCAN] 在 input 根目錄中發現 {len(root_excel_files)} 個 Excel 檔案")
         excel_files.extend(root_excel_files)
-    
-    if root_compressed_files:
-        print(f"[SCAN] 在 input 根目錄中發現 {len(root_compressed_files)} 個壓縮檔案")
-        # 處理根目錄中的壓縮檔案（使用所有平台密碼）
-        print(f"[EXTRACT] 開始處理根目錄中的壓縮檔案...")
-        extracted_files = process_root_compressed_files(root_compressed_files, output_dir, temp_dir, platform_index, log_lines)
-        excel_files.extend(extracted_files)
+
+    # 處理壓縮檔案；解壓途中達到整次執行截止時間時，其餘壓縮檔留待下次執行
+    try:
+        excel_files.extend(process_compressed_files(input_dir, output_dir, temp_dir, compressed_accounts, log_lines,
+                                                    ctx, compressed_files=root_compressed_files))
+
+        # 處理各平台資料夾中的壓縮檔案
+        for folder_name, platform, folder_compressed_files in platform_archives:
+            say(f"[EXTRACT] 開始處理 {folder_name} 中的壓縮檔案...")
+            extracted_files = process_platform_compressed_files(folder_compressed_files, output_dir, temp_dir, platform_index, platform, log_lines, ctx)
+            excel_files.extend(extracted_files)
+
+        if root_compressed_files:
+            say(f"[SCAN] 在 input 根目錄中發現 {len(root_compressed_files)} 個壓縮檔案")
+            # 處理根目錄中的壓縮檔案（使用所有平台密碼）
+            say(f"[EXTRACT] 開始處理根目錄中的壓縮檔案...")
+            extracted_files = process_root_compressed_files(root_compressed_files, output_dir, temp_dir, platform_index, log_lines, ctx)
+            excel_files.extend(extracted_files)
+    except BudgetExceeded as e:
+        if e.budget is not _RUN_BUDGET:
+            raise
+        # 已解壓的工作簿照常排入佇列（隨即記入未處理的檔案）
+        queued = set(excel_files)
+        excel_files.extend(path for path in ctx.sources if path not in queued)
+        say(f"[DEADLINE] 解壓縮途中已達執行截止時間，其餘壓縮檔留待下次執行", QUIET)
+        log_lines.append(f"[DEADLINE] 解壓縮途中已達執行截止時間（{args.run_timeout:g} 秒），其餘壓縮檔留待下次執行")
 
     # 合併所有需要處理的 Excel 檔案
     all_excel_files = excel_files
-    print(f"[FILES] 總計發現 {len(excel_files)} 個 Excel 檔案")
+    say(f"[FILES] 總計發現 {len(excel_files)} 個 Excel 檔案")
 
-    # 處理每個 Excel 檔案
+    # 依平台排程處理每個 Excel 檔案：各平台分別排隊，依截止時間、優先度與權重輪流處理
+    scheduler = PlatformScheduler(schedule)
     for file_path in all_excel_files:
-        filename = file_path.name
-        print(f"\n[PROCESS] 正在處理：{filename}")
-
-        # 根據檔案所在資料夾確定平台
-        file_platform = None
-        for folder_name in platform_folders:
-            if folder_name in str(file_path):
-                file_platform = folder_name.replace("_files", "")
-                break
-        
-        if file_platform:
-            print(f"[PLATFORM] 檔案來自平台資料夾：{file_platform}")
-        else:
-            print(f"[PLATFORM] 檔案來自根目錄，將嘗試所有平台")
+        scheduler.add(file_path, platform_of(file_path))
+    if len(scheduler.queues) > 1:
+        say("[SCHEDULE] 各平台待處理：" + "、".join(f"{platform} {depth}" for platform, depth
+                                                   in scheduler.depth().items()), VERBOSE)
+    for file_path in progress_iter(scheduler, "Excel 檔案"):
+        if file_path in temp_space.drained:
+            continue  # 臨時空間達上限時已提前處理
+        if run_deadline_passed():
+            # 已達整次執行的截止時間：其餘檔案留待下次執行
+            deadline_skipped.append(file_path)
+            continue
+        if spool is not None and not spool.claim(file_path):
+            continue  # 其他節點處理中或已處理
+        process_excel_file(file_path)
 
-        # 尋找匹配的帳號
-        matched_account = None
-        print(f"[MATCH] 正在匹配檔案：{filename}")
-        
-        # 特殊處理：MO_Store_Plus 檔案，嘗試所有有密碼的帳號
-        if "MO_Store_Plus" in filename or file_platform == "mo_store_plus":
-            print(f"   [MATCH] MO_Store_Plus 檔案，將嘗試所有有密碼的帳號")
-            matched_account = "MO_Store_Plus"  # 標記為特殊處理
+    # 確保所有輸出都已落地（durable 模式下批次 fsync 目錄）
+    committer.close()
+    layout.release_reservations()
+    stats = committer.stats
+    log_lines.append(f"[COMMIT] 輸出發佈方式：寫入 {stats['write']}、rename {stats['rename']}、"
+                     f"reflink {stats['reflink']}、硬連結 {stats['link']}、複製 {stats['copy']}")
+    if committer.verifier is not None:
+        metrics.verify = committer.verifier.report()
+        verify = metrics.verify
+        line = (f"[VERIFY] 完整性檢查 {verify['files'] + verify['failed']} 個輸出（{verify['bytes'] / 1024 / 1024:.1f} MB，"
+                f"{verify['seconds']:.2f} 秒" + (f"，{verify['mb_per_second']} MB/s" if verify['mb_per_second'] else "")
+                + f"），未通過 {verify['failed']} 個")
+        log_lines.append(line)
+        say(line, VERBOSE)
+        for final_path, isolated, reason in committer.quarantined:
+            log_lines.append(f"  [VERIFY] {final_path.name}：{reason}" + (f" → {isolated}" if isolated else ""))
+    metrics.schedule = scheduler.report()
+    for platform, entry in metrics.schedule.items():
+        line = (f"[SCHEDULE] {platform}：處理 {entry['processed']}/{entry['queued']} 個，耗時 {entry['seconds']:.1f} 秒，"
+                f"等待平均 {entry['wait_avg_seconds']:.1f} 秒、最長 {entry['wait_max_seconds']:.1f} 秒")
+        if "deadline" in entry:
+            line += f"，截止 {entry['deadline']}（{'已達成' if entry['deadline_met'] else '未達成'}）"
+        log_lines.append(line)
+        say(line, VERBOSE)
+    if ctx.exporter is not None:
+        export = ctx.exporter.report()
+        line = (f"[EXPORT] 匯出 {export['workbooks']} 個活頁簿、{export['sheets']} 張工作表、{export['rows']} 列"
+                f"（{export['format']}），失敗 {export['failed']} 個：{export['path']}")
+        log_lines.append(line)
+        say(line, VERBOSE)
+    if dedupe is not None:
+        try:
+            dedupe.save()
+        except OSError as e:
+            say(f"[WARN] 去重索引寫入失敗：{e}")
+    try:
+        quarantine.save()
+    except OSError as e:
+        say(f"[WARN] 隔離清單寫入失敗：{e}")
+    if inventory is not None:
+        # 處理失敗、超時與未處理的檔案（解壓出的工作簿以來源壓縮檔計）保留上次的記錄，下次 --changed-only 仍會處理；
+        # 已達執行截止時間時無法確定哪些壓縮檔已處理，不更新快照（重複處理的檔案由去重索引略過）
+        if run_deadline_passed():
+            say("[INVENTORY] 已達執行截止時間，輸入清單快照維持不變", VERBOSE)
         else:
-            # 根據平台篩選帳號
-            target_accounts = excel_accounts
-            if file_platform and file_platform in platform_index:
-                # 只檢查該平台的帳號
-                platform_accounts = {}
-                for password, shop_info in platform_index[file_platform].items():
-                    account = shop_info.get("shop_account", "")
-                    if account:
-                        platform_accounts[account] = shop_info
-                target_accounts = platform_accounts
-                print(f"   [MATCH] 限制在 {file_platform} 平台的 {len(target_accounts)} 個帳號中匹配")
-            
-            for account, account_info in target_accounts.items():
-                name = account_info.get("shop_name", "")
-                print(f"   [MATCH] 檢查帳號：{account}, 店家名稱：{name}")
-                # 先嘗試匹配帳號
-                if account in filename:
-                    print(f"   [OK] 帳號匹配成功：{account}")
-                    matched_account = account
-                    break
-                # 如果帳號匹配失敗，嘗試匹配店家名稱
-                elif name and name in filename:
-                    print(f"   [OK] 店家名稱匹配成功：{name}")
-                    matched_account = account
-                    break
-                else:
-                    print(f"   [FAIL] 無匹配：帳號 '{account}' 和店家名稱 '{name}' 都不在檔案名中")
-
-        success = False
-        
-        if matched_account:
-            if matched_account == "MO_Store_Plus":
-                # 特殊處理：MO_Store_Plus 檔案，僅使用 mo_store_plus 平台密碼
-                print(f"[WARN] MO_Store_Plus 檔案，僅使用 mo_store_plus 平台密碼破解：{filename}")
-                success = try_platform_passwords(file_path, platform_index, "mo_store_plus", output_dir, log_lines)
-            else:
-                # 找到對應帳號，僅使用該平台的密碼
-                account_info = excel_accounts[matched_account]
-                shop_name = account_info.get("shop_name", "")
-                shop_id = account_info.get("shop_id", "UNKNOWN")
-                shop_account = account_info.get("shop_account", "UNKNOWN")
-                
-                # 根據檔案所在平台，僅使用該平台的密碼
-                if file_platform and file_platform in platform_index:
-                    print(f"[PLATFORM] 檔案來自 {file_platform} 平台，僅使用該平台密碼")
-                    success = try_platform_passwords(file_path, platform_index, file_platform, output_dir, log_lines)
-                    
-                    if success:
-                        # 成功處理，記錄到 processed_files
-                        processed_files.append((filename, "已處理", shop_name, matched_account))
-                else:
-                    print(f"[WARN] 無法確定檔案平台，跳過處理：{filename}")
-                    success = False
-
-        # 如果還沒有成功，僅嘗試檔案所在平台的密碼
-        if not success:
-            if file_platform and file_platform in platform_index:
-                print(f"[WARN] 嘗試使用 {file_platform} 平台密碼破解：{filename}")
-                success = try_platform_passwords(file_path, platform_index, file_platform, output_dir, log_lines)
-                
-                if success:
-                    # 成功處理，記錄到 processed_files
-                    processed_files.append((filename, "已處理", "平台檔案", file_platform))
-                else:
-                    # 失敗，記錄到 failed_files
-                    error_msg = f"[FAIL] {file_platform} 平台密碼無法破解：{filename}"
-                    log_lines.append(error_msg)
-                    failed_files.append((filename, error_msg))
-                    print(error_msg)
-            else:
-                print(f"[WARN] 無法確定檔案平台，跳過處理：{filename}")
-                error_msg = f"[FAIL] 無法確定檔案平台：{filename}"
-                log_lines.append(error_msg)
-                failed_files.append((filename, error_msg))
-
-        # 如果所有密碼都無法破解
-        if not success:
-            error_msg = f"[FAIL] 所有密碼都無法破解：{filename}"
-            log_lines.append(error_msg)
-            failed_files.append((filename, error_msg))
-            print(error_msg)
+            for file_path in deadline_skipped:
+                mark_unfinished(file_path, ctx)
+            try:
+                inventory.save(inventory_state, [relative for relative in inventory_state
+                                                 if input_dir / relative in ctx.unfinished])
+            except OSError as e:
+                say(f"[WARN] 輸入清單快照寫入失敗：{e}")
+    set_run_deadline(None)
+    if spool is not None:
+        # 輸出與索引都已寫回後才標記壓縮檔完成、釋放租約
+        spool.close()
 
     # 寫入詳細日誌
     log_lines.append("\n" + "="*50)
@@ -961,54 +4451,187 @@ def main():
         for original, new_name, name, account in processed_files:
             log_lines.append(f"  {original} → {new_name}")
 
+    if dedupe is not None and dedupe.duplicates:
+        log_lines.append(f"\n[DUP] 重複內容的檔案（未重新破解）：{len(dedupe.duplicates)} 個")
+        for original, existing, linked in dedupe.duplicates:
+            log_lines.append(f"  {original} = {existing}" + (f" → {linked}" if linked else ""))
+
+    if quarantine.added:
+        log_lines.append(f"\n[TIMEOUT] 超過處理時限的檔案（已列入 {quarantine.path.name}）：{len(quarantine.added)} 個")
+        for entry in quarantine.added:
+            log_lines.append(f"  {entry['path']}: {BUDGET_LABELS[entry['budget']]}時限 {entry['budget_seconds']:g} 秒，"
+                             f"已花費 {entry['seconds']:.1f} 秒，第 {entry['attempts']} 次")
+
+    if deadline_skipped:
+        log_lines.append(f"\n[DEADLINE] 已達執行截止時間（{args.run_timeout:g} 秒），未處理的檔案：{len(deadline_skipped)} 個")
+        for file_path in deadline_skipped:
+            log_lines.append(f"  {file_path.name}")
+
+    metrics.temp = temp_space.report()
+    if temp_space.peak:
+        line = f"\n[TEMP] 解壓暫存用量峰值 {temp_space.peak / 1024 / 1024:.1f} MB"
+        if temp_space.budget:
+            line += f"（上限 {temp_space.budget / 1024 / 1024:.1f} MB，為騰出空間先行處理 {temp_space.paused} 次）"
+        log_lines.append(line)
+    if ram_dir is not None:
+        ram, disk = temp_space.placed["ram"], temp_space.placed["disk"]
+        line = (f"[TEMP] 解壓位置：RAM 工作區 {ram['archives']} 個壓縮檔 {ram['bytes'] / 1024 / 1024:.1f} MB"
+                f"（峰值 {temp_space.ram_peak / 1024 / 1024:.1f} MB / 上限 {ram_budget / 1024 / 1024:.1f} MB），"
+                f"temp/ {disk['archives']} 個壓縮檔 {disk['bytes'] / 1024 / 1024:.1f} MB")
+        log_lines.append(line)
+        say(line, VERBOSE)
+
+    if spool is not None:
+        log_lines.append(f"\n[SPOOL] 節點 {spool.worker_id}：認領 {spool.stats['claimed']} 個，"
+                         f"其他節點處理中 {spool.stats['busy']} 個，已處理過 {spool.stats['done']} 個，"
+                         f"接手失效租約 {spool.stats['reclaimed']} 個")
+        for lost in spool.lost:
+            log_lines.append(f"  [WARN] 租約已被其他節點接手：{lost}")
+
     if failed_files:
         log_lines.append("\n[FAIL] 處理失敗的檔案：")
         for filename, error in failed_files:
             log_lines.append(f"  {filename}: {error}")
 
-    # 寫入 log 檔案
-    with log_path.open("w", encoding="utf-8") as log_file:
-        log_file.write("\n".join(log_lines))
+    # 寫入 log 檔案（由結構化記錄產生）
+    log_lines.record("run_end", processed=len(processed_files), failed=len(failed_files))
+    log_lines.render_text(log_path)
 
     # 輸出結果摘要
-    print(f"\n" + "="*50)
-    print(f"[STAT] 處理完成！")
-    print(f"總檔案數：{len(all_excel_files)}")
-    print(f"成功處理：{len(processed_files)}")
-    print(f"處理失敗：{len(failed_files)}")
-    print(f"[LOG] 詳細日誌：{log_path}")
+    say(f"\n" + "="*50, QUIET)
+    say(f"[STAT] 處理完成！", QUIET)
+    say(f"總檔案數：{len(all_excel_files)}", QUIET)
+    say(f"成功處理：{len(processed_files)}", QUIET)
+    say(f"處理失敗：{len(failed_files)}", QUIET)
+    if committer.quarantined:
+        say(f"[VERIFY] 輸出未通過完整性檢查：{len(committer.quarantined)}（已移至 {project_root / 'quarantine'}）", QUIET)
+    if quarantine.added:
+        say(f"超過時限：{len(quarantine.added)}（已列入隔離清單：{quarantine.path}）", QUIET)
+    if deadline_skipped:
+        say(f"[DEADLINE] 已達執行截止時間，{len(deadline_skipped)} 個檔案留待下次執行", QUIET)
+    if spool is not None:
+        say(f"[SPOOL] 本節點認領 {spool.stats['claimed']} 個檔案，"
+            f"略過其他節點處理中 {spool.stats['busy']} 個、已處理過 {spool.stats['done']} 個", QUIET)
+    say(f"[LOG] 詳細日誌：{log_path}", QUIET)
     
     # 清理 temp 資料夾中的所有臨時檔案
-    print(f"\n[CLEANUP] 開始清理 temp 資料夾...")
+    say(f"\n[CLEANUP] 開始清理 temp 資料夾...", VERBOSE)
     temp_files_cleaned = 0
     temp_dirs_cleaned = 0
     
     # 清理 temp 資料夾中的所有檔案和資料夾
-    if temp_dir.exists():
-        for item in temp_dir.iterdir():
-            try:
-                if item.is_file():
-                    item.unlink()
-                    temp_files_cleaned += 1
-                elif item.is_dir():
-                    shutil.rmtree(item)
-                    temp_dirs_cleaned += 1
-            except Exception as e:
-                print(f"[ERROR] 清理失敗：{item.name} - {e}")
+    with metrics_stage("cleanup"):
+        if temp_dir.exists():
+            for item in temp_dir.iterdir():
+                try:
+                    if item.is_file():
+                        item.unlink()
+                        temp_files_cleaned += 1
+                    elif item.is_dir():
+                        shutil.rmtree(item)
+                        temp_dirs_cleaned += 1
+                except Exception as e:
+                    say(f"[ERROR] 清理失敗：{item.name} - {e}")
+        if temp_dir != temp_root:
+            shutil.rmtree(temp_dir, ignore_errors=True)  # 本節點的 temp/{節點}/ 或本工作的 temp/job-{名稱}/
+        if ram_dir is not None:
+            shutil.rmtree(ram_dir, ignore_errors=True)
     
-    print(f"[CLEANUP] 總共清理了 {temp_files_cleaned} 個臨時檔案和 {temp_dirs_cleaned} 個臨時資料夾")
+    say(f"[CLEANUP] 總共清理了 {temp_files_cleaned} 個臨時檔案和 {temp_dirs_cleaned} 個臨時資料夾", VERBOSE)
+
+    # 輸出效能剖析結果
+    if profiler is not None:
+        if profiler.whole_run:
+            profiler.stop()
+        activate_profiler(None)
+        stem = log_path.stem.replace("batch_removal_log_", "profile_")
+        try:
+            pstats_path, collapsed_path = profiler.save(log_dir, stem)
+            say(f"[PROFILE] cProfile 統計：{pstats_path}")
+            say(f"[PROFILE] 呼叫堆疊取樣（{profiler.samples} 筆）：{collapsed_path}")
+        except OSError as e:
+            say(f"[WARN] 效能剖析結果寫入失敗：{e}")
+
+    # 輸出執行報告（JSON）與 Prometheus textfile
+    metrics.finished = time.time()
+    activate_metrics(None)
+    report_path = log_dir / log_path.name.replace("batch_removal_log_", "run_report_").replace(".txt", ".json")
+    prom_path = Path(args.prom_textfile) if args.prom_textfile else log_dir / "excel_password_remover.prom"
+    try:
+        metrics.write_json(report_path)
+        metrics.write_prometheus(prom_path)
+        say(f"[REPORT] 執行報告：{report_path}")
+        say(f"[REPORT] Prometheus 指標：{prom_path}")
+    except OSError as e:
+        say(f"[WARN] 執行報告寫入失敗：{e}")
+
+    log_lines.close()
+    activate_log(None)
+    pruned = log_lines.prune()
+    if pruned:
+        say(f"[LOG] 已刪除 {pruned} 個超過 {args.log_keep_days:g} 天的舊日誌")
 
     if processed_files:
-        print(f"\n[OK] 成功處理的檔案已重新命名並儲存至：{output_dir}")
+        say(f"\n[OK] 成功處理的檔案已重新命名並儲存至：{output_dir}", VERBOSE)
         for original, new_name, name, account in processed_files:
-            print(f"  {original} → {new_name}")
+            say(f"  {original} → {new_name}", VERBOSE)
 
     if failed_files:
-        print(f"\n[FAIL] 處理失敗的檔案：")
+        say(f"\n[FAIL] 處理失敗的檔案：", QUIET)
         for filename, error in failed_files:
-            print(f"  {filename}: {error}")
+            say(f"  {filename}: {error}", QUIET)
+    return metrics.summary()
+
+
+def main(argv: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    主程式：批次處理 Excel 檔案密碼移除
+    回傳執行統計摘要（供基準測試等程式呼叫），無法執行時回傳 {"error": 原因}；--serve / --jobs 回傳 None
+    """
+    args = parse_args(argv)
+    if args.quiet:
+        verbosity = QUIET
+    elif args.debug:
+        verbosity = DEBUG
+    elif args.verbose:
+        verbosity = VERBOSE
+    else:
+        verbosity = NORMAL
+    activate_console(ConsoleReporter(verbosity, show_progress=not args.no_progress,
+                                     prefix=f"[{args.job_name}] " if args.job_name else ""))
+    global _BASE_PATH_OVERRIDE
+    _BASE_PATH_OVERRIDE = Path(args.base_dir).resolve() if args.base_dir else None
+
+    try:
+        if args.serve:
+            from decrypt_server import run_server
+            run_server(args)
+            return None
+        if args.jobs:
+            if args.spool:
+                say("[FAIL] --jobs 不能與 --spool 同時使用", QUIET)
+                return {"error": "--jobs 不能與 --spool 同時使用"}
+            from job_runner import run_jobs
+            run_jobs(args, sys.argv[1:] if argv is None else list(argv))
+            return None
+        return run_batch(args, argv)
+    finally:
+        # 出錯或提前結束時也停用本次的剖析、統計、日誌與截止時間，
+        # --jobs 的工作程序會在同一程序中接著執行下一個工作
+        if _ACTIVE_PROFILER is not None:
+            _ACTIVE_PROFILER.close()
+            activate_profiler(None)
+        activate_metrics(None)
+        if _ACTIVE_LOG is not None:
+            _ACTIVE_LOG.close()
+            activate_log(None)
+        set_run_deadline(None)
+        activate_console(None)
 
 
 if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()  # 打包成 exe 時 --serve 的工作程序需要
     main()
     print("\n[OK] 執行完畢") 
\ No newline at end of file
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成測試資料產生器與端對端基準測試
+
+主要功能：
+    🏗️ generate：產生可重現的測試專案（mapping/shops_master.json + input/<平台>_files/）
+        - 每個平台 N 個商店，密碼與檔名由 seed 決定
+        - Agile 加密 .xlsx（spinCount 可設定多組輪流使用）
+        - 未加密 .xlsx、未加密 .xls（手寫最小 OLE / BIFF8）
+        - 部分檔案以 ZipCrypto 密碼壓縮包裝（密碼為該商店的平台密碼）
+        - 部分檔案使用不存在的密碼，驗證失敗路徑
+    ⏱️ run：對產生的專案執行 main()，記錄端對端耗時與各階段耗時，輸出 JSON 供跨版本比較
+
+使用方法：
+    python scripts/benchmark_corpus.py generate --out bench_corpus --shops 50 --files 200
+    python scripts/benchmark_corpus.py run --corpus bench_corpus --repeat 3
+    python scripts/benchmark_corpus.py run --corpus bench_corpus --output log/bench.json -- --dedupe off
+
+注意事項：
+    - 加密時的 salt 由 msoffcrypto 隨機產生，檔案位元組不同，但檔案數量、大小、密碼與
+      預期結果在相同 seed 下完全一致
+    - .xls 檔案為未加密格式（msoffcrypto 不支援寫出加密的 .xls）
+    - run 每一輪都會清空 corpus 內的 output/、log/、temp/
+"""
+
+import argparse
+import datetime
+import io
+import itertools
+import json
+import platform as platform_module
+import random
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+
+PLATFORMS = ["Shopee", "MOMO", "PChome", "Yahoo", "ETMall", "mo_store_plus", "coupang"]
+
+# =============================================================================
+# 檔案產生
+# =============================================================================
+
+def build_xlsx(rng: random.Random, rows: int) -> bytes:
+    """手寫最小 .xlsx（不需 openpyxl），rows 控制工作表大小"""
+    cells = []
+    for r in range(1, rows + 1):
+        value = rng.randint(0, 10 ** 9)
+        cells.append(f'<row r="{r}"><c r="A{r}"><v>{r}</v></c><c r="B{r}"><v>{value}</v></c></row>')
+    sheet = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+             '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+             f'<sheetData>{"".join(cells)}</sheetData></worksheet>')
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'),
+        "xl/worksheets/sheet1.xml": sheet,
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in parts.items():
+            # 固定時間戳，相同 seed 產生相同位元組
+            info = zipfile.ZipInfo(name, date_time=(2025, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, content)
+    return buffer.getvalue()
+
+
+def encrypt_xlsx(data: bytes, password: str, spin_count: int) -> bytes:
+    """以 ECMA-376 Agile 加密 .xlsx"""
+    from msoffcrypto.method.ecma376_agile import ECMA376Agile
+    return ECMA376Agile.encrypt(password, io.BytesIO(data), spin_count=spin_count)
+
+
+def build_xls(rng: random.Random) -> bytes:
+    """
+    手寫最小 .xls：OLE 複合文件（512 bytes sector）內含一個 Workbook 串流
+    串流為 BIFF8 BOF + EOF，再以亂數補到 4096 bytes（放在一般 FAT 而非 mini stream，
+    且每個檔案內容不同，不會被去重合併）
+    """
+    sector = 512
+    end_of_chain, free_sect, fat_sect, no_stream = 0xFFFFFFFE, 0xFFFFFFFF, 0xFFFFFFFD, 0xFFFFFFFF
+
+    bof = struct.pack("<HH", 0x0809, 16) + struct.pack("<HHHHII", 0x0600, 0x0005, 0x0DBB, 0x07CC, 0, 0x06)
+    eof = struct.pack("<HH", 0x000A, 0)
+    stream = bof + eof
+    stream += rng.randbytes(4096 - len(stream))
+    stream_sectors = len(stream) // sector
+
+    # FAT：sector 0 = FAT、sector 1 = 目錄、sector 2.. = Workbook
+    fat = [fat_sect, end_of_chain]
+    fat += [2 + i + 1 for i in range(stream_sectors - 1)] + [end_of_chain]
+    fat += [free_sect] * (sector // 4 - len(fat))
+
+    header = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + bytes(16)
+    header += struct.pack("<HHHHH", 0x003E, 0x0003, 0xFFFE, 9, 6) + bytes(6)
+    header += struct.pack("<IIIIIIIII", 0, 1, 1, 0, 4096, end_of_chain, 0, end_of_chain, 0)
+    header += struct.pack("<I", 0) + struct.pack("<I", free_sect) * 108
+
+    def dir_entry(name: str, entry_type: int, child: int, start: int, size: int) -> bytes:
+        encoded = (name + "\x00").encode("utf-16-le") if name else b""
+        return (encoded.ljust(64, b"\x00") + struct.pack("<HBB", len(encoded), entry_type, 1)
+                + struct.pack("<III", no_stream, no_stream, child) + bytes(16)
+                + struct.pack("<I", 0) + bytes(16) + struct.pack("<IQ", start, size))
+
+    directory = (dir_entry("Root Entry", 5, 1, end_of_chain, 0)
+                 + dir_entry("Workbook", 2, no_stream, 2, len(stream))
+                 + dir_entry("", 0, no_stream, 0, 0) * 2)
+    return header + struct.pack(f"<{len(fat)}I", *fat) + directory + stream
+
+
+class _ZipCrypto:
+    """PKWARE 傳統加密（ZipCrypto），zipfile 只能讀不能寫，故自行實作"""
+
+    def __init__(self, password: bytes):
+        self.keys = [0x12345678, 0x23456789, 0x34567890]
+        for byte in password:
+            self._update(byte)
+
+    @staticmethod
+    def _crc(value: int, byte: int) -> int:
+        return zlib.crc32(bytes([byte]), value ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+    def _update(self, byte: int) -> None:
+        k0, k1, k2 = self.keys
+        k0 = self._crc(k0, byte)
+        k1 = ((k1 + (k0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k2 = self._crc(k2, k1 >> 24)
+        self.keys = [k0, k1, k2]
+
+    def encrypt(self, data: bytes) -> bytes:
+        out = bytearray(len(data))
+        for i, byte in enumerate(data):
+            temp = (self.keys[2] | 2) & 0xFFFF
+            out[i] = byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF)
+            self._update(byte)
+        return bytes(out)
+
+
+def build_encrypted_zip(members: dict, password: str, rng: random.Random) -> bytes:
+    """以 ZipCrypto 加密（STORED）寫出 ZIP；members 為 {檔名: 內容}"""
+    local_parts = []
+    central = []
+    offset = 0
+    dos_time, dos_date = 0, (45 << 9) | (1 << 5) | 1  # 2025-01-01
+    for name, data in members.items():
+        crc = zlib.crc32(data)
+        header_plain = bytes(rng.getrandbits(8) for _ in range(11)) + bytes([crc >> 24])
+        cipher = _ZipCrypto(password.encode("utf-8"))
+        payload = cipher.encrypt(header_plain) + cipher.encrypt(data)
+        encoded_name = name.encode("utf-8")
+        flags = 0x0001 | (0x0800 if not name.isascii() else 0)
+        local = (struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, 0, dos_time, dos_date,
+                             crc, len(payload), len(data), len(encoded_name), 0) + encoded_name)
+        central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, 0, dos_time, dos_date,
+                                   crc, len(payload), len(data), len(encoded_name), 0, 0, 0, 0, 0, offset)
+                       + encoded_name)
+        local_parts.append(local + payload)
+        offset += len(local) + len(payload)
+    central_bytes = b"".join(central)
+    end = struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(members), len(members),
+                      len(central_bytes), offset, 0)
+    return b"".join(local_parts) + central_bytes + end
+
+# =============================================================================
+# 測試專案產生
+# =============================================================================
+
+def generate_corpus(out_dir: Path, shops: int, files: int, platforms: list, spin_counts: list,
+                    rows: int, xls_ratio: float, plain_ratio: float, zip_ratio: float,
+                    unknown_ratio: float, seed: int) -> dict:
+    """產生測試專案並回傳 manifest（同時寫入 out_dir/corpus_manifest.json）"""
+    rng = random.Random(seed)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    (out_dir / "mapping").mkdir(parents=True)
+
+    # 商店與密碼本
+    shops_data = []
+    platform_index = {}
+    for platform_name in platforms:
+        platform_index[platform_name] = {}
+        prefix = platform_name[:2].upper()
+        for i in range(shops):
+            shop = {
+                "platform": platform_name,
+                "shop_id": f"{prefix}{i:04d}",
+                "shop_account": f"{platform_name.lower()}acct{i:04d}",
+                "shop_name": f"測試商店{prefix}{i:04d}",
+                "shop_status": "Active",
+                "Universal Password": f"{prefix}{rng.getrandbits(40):010x}",
+                "Report Download Password": "",
+            }
+            shops_data.append(shop)
+            platform_index[platform_name][shop["Universal Password"]] = shop
+    with open(out_dir / "mapping" / "shops_master.json", "w", encoding="utf-8") as f:
+        json.dump({"platform_index": platform_index, "shops": shops_data}, f, ensure_ascii=False, indent=2)
+
+    # 輸入檔案
+    expected = {"ok": 0, "failed": 0}
+    counts = {"agile": 0, "plain_xlsx": 0, "xls": 0, "zip": 0, "unknown_password": 0}
+    spin_cycle = itertools.cycle(spin_counts)
+    for platform_name in platforms:
+        folder = out_dir / "input" / f"{platform_name}_files"
+        folder.mkdir(parents=True)
+        shop_list = list(platform_index[platform_name].values())
+        for n in range(files):
+            shop = rng.choice(shop_list)
+            # 蝦皮平台只處理檔名含 Order.all 的檔案
+            stem = f"Order.all.{shop['shop_account']}_{n:05d}" if platform_name == "Shopee" else f"{shop['shop_account']}_{n:05d}"
+            roll = rng.random()
+            if roll < xls_ratio:
+                name, data = f"{stem}.xls", build_xls(rng)
+                counts["xls"] += 1
+                expected["ok"] += 1
+            elif roll < xls_ratio + plain_ratio:
+                name, data = f"{stem}.xlsx", build_xlsx(rng, rows)
+                counts["plain_xlsx"] += 1
+                expected["ok"] += 1
+            else:
+                password = shop["Universal Password"]
+                if rng.random() < unknown_ratio:
+                    password = f"unknown{rng.getrandbits(32):08x}"
+                    counts["unknown_password"] += 1
+                    expected["failed"] += 1
+                else:
+                    expected["ok"] += 1
+                name, data = f"{stem}.xlsx", encrypt_xlsx(build_xlsx(rng, rows), password, next(spin_cycle))
+                counts["agile"] += 1
+
+            if rng.random() < zip_ratio:
+                archive = build_encrypted_zip({name: data}, shop["Universal Password"], rng)
+                archive_stem = f"Order.all.bundle_{n:05d}" if platform_name == "Shopee" else f"bundle_{n:05d}"
+                (folder / f"{archive_stem}.zip").write_bytes(archive)
+                counts["zip"] += 1
+            else:
+                (folder / name).write_bytes(data)
+
+    manifest = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "platforms": platforms,
+        "shops_per_platform": shops,
+        "files_per_platform": files,
+        "spin_counts": spin_counts,
+        "rows": rows,
+        "counts": counts,
+        "expected": expected,
+    }
+    with open(out_dir / "corpus_manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+# =============================================================================
+# 基準測試
+# =============================================================================
+
+def git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def run_benchmark(corpus_dir: Path, repeat: int, extra_args: list) -> dict:
+    """在同一程序內重複執行 main()，回傳各輪結果與中位數摘要"""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    import batch_password_remover as remover
+
+    manifest_path = corpus_dir / "corpus_manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    runs = []
+    for i in range(repeat):
+        for name in ("output", "log", "temp"):
+            shutil.rmtree(corpus_dir / name, ignore_errors=True)
+        start = time.perf_counter()
+        summary = remover.main(["--base-dir", str(corpus_dir), "-q", "--no-progress", *extra_args])
+        elapsed = time.perf_counter() - start
+        if "error" in summary:
+            raise RuntimeError(f"main() 未完成：{summary['error']}")
+        run = {
+            "wall_seconds": round(elapsed, 4),
+            "outcomes": summary["outcomes"],
+            "totals": summary["totals"],
+            "stages": summary["stages"],
+            "temp": summary["temp"],  # 解壓位置（--ram-workspace 時區分 RAM / 磁碟）
+        }
+        runs.append(run)
+        print(f"[BENCH] 第 {i + 1}/{repeat} 輪：{elapsed:.2f}s  結果：{summary['outcomes']}")
+
+    stage_names = sorted({name for run in runs for name in run["stages"]})
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform_module.platform(),
+        "args": extra_args,
+        "corpus": manifest,
+        "runs": runs,
+        "median": {
+            "wall_seconds": round(statistics.median(r["wall_seconds"] for r in runs), 4),
+            "stages": {name: round(statistics.median(r["stages"].get(name, {}).get("seconds", 0.0) for r in runs), 4)
+                       for name in stage_names},
+            "stage_self_seconds": {name: round(statistics.median(r["stages"].get(name, {}).get("self_seconds", 0.0) for r in runs), 4)
+                                   for name in stage_names},
+        },
+    }
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="合成測試資料產生器與端對端基準測試")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="產生測試專案")
+    gen.add_argument("--out", type=str, default="bench_corpus", help="輸出資料夾 (預設: bench_corpus)")
+    gen.add_argument("--shops", type=int, default=20, help="每個平台的商店數 (預設: 20)")
+    gen.add_argument("--files", type=int, default=50, help="每個平台的檔案數 (預設: 50)")
+    gen.add_argument("--platforms", nargs="+", default=PLATFORMS, help="平台清單 (預設: 全部)")
+    gen.add_argument("--spin-counts", type=int, nargs="+", default=[100000],
+                     help="加密 spinCount，多個值輪流使用 (預設: 100000，與 Excel 相同)")
+    gen.add_argument("--rows", type=int, default=200, help="每個工作表的列數 (預設: 200)")
+    gen.add_argument("--xls-ratio", type=float, default=0.1, help=".xls 比例 (預設: 0.1)")
+    gen.add_argument("--plain-ratio", type=float, default=0.1, help="未加密 .xlsx 比例 (預設: 0.1)")
+    gen.add_argument("--zip-ratio", type=float, default=0.1, help="以密碼 ZIP 包裝的比例 (預設: 0.1)")
+    gen.add_argument("--unknown-ratio", type=float, default=0.05, help="加密檔使用未知密碼的比例 (預設: 0.05)")
+    gen.add_argument("--seed", type=int, default=1234, help="亂數種子 (預設: 1234)")
+
+    run = sub.add_parser("run", help="執行基準測試")
+    run.add_argument("--corpus", type=str, default="bench_corpus", help="測試專案資料夾 (預設: bench_corpus)")
+    run.add_argument("--repeat", type=int, default=3, help="重複次數 (預設: 3)")
+    run.add_argument("--output", "-o", type=str, help="結果 JSON 輸出路徑 (預設: benchmark_results/corpus_{時間}.json)")
+    run.add_argument("extra", nargs=argparse.REMAINDER, help="-- 之後的參數直接傳給 batch_password_remover")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        out_dir = Path(args.out).resolve()
+        print(f"[BENCH] 產生測試專案：{out_dir}")
+        start = time.perf_counter()
+        manifest = generate_corpus(out_dir, args.shops, args.files, args.platforms, args.spin_counts,
+                                   args.rows, args.xls_ratio, args.plain_ratio, args.zip_ratio,
+                                   args.unknown_ratio, args.seed)
+        print(f"[BENCH] 完成（{time.perf_counter() - start:.1f}s）：{manifest['counts']}")
+        print(f"[BENCH] 預期結果：{manifest['expected']}")
+        return
+
+    extra = [a for a in args.extra if a != "--"]
+    report = run_benchmark(Path(args.corpus).resolve(), max(1, args.repeat), extra)
+    output = Path(args.output) if args.output else \
+        Path("benchmark_results") / f"corpus_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 端對端中位數：{report['median']['wall_seconds']}s")
+    print(f"[BENCH] 結果已寫入：{output}")
+
+
+if __name__ == "__main__":
+    main()
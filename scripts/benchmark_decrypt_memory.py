@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串流解密記憶體基準測試
+
+主要功能：
+    📈 產生不同大小的 Agile 加密測試檔
+    🧪 在獨立子程序中分別以「串流解密」與「msoffcrypto 整份解密」處理
+    📊 回報各檔案大小對應的峰值 RSS 與耗時
+
+使用方法：
+    python scripts/benchmark_decrypt_memory.py
+    python scripts/benchmark_decrypt_memory.py --sizes 50 200 500 --output log/decrypt_memory.json
+
+注意事項：
+    - 峰值 RSS：Linux 讀取 /proc/self/status 的 VmHWM，macOS 使用 resource，
+      Windows 需安裝 psutil，否則顯示 null
+    - 測試檔寫在系統暫存資料夾，結束後自動刪除
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+
+
+def peak_rss_mb():
+    """目前程序的峰值 RSS (MB)，無法取得時回傳 None"""
+    # Linux：VmHWM 於 exec 時歸零；ru_maxrss 會沿用 fork 前父程序的峰值，不能用
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 單位為 KB，macOS 為 bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil  # type: ignore
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def build_encrypted_file(path: Path, size_mb: int, password: str, spin_count: int) -> None:
+    """產生內含 size_mb 隨機資料的 ZIP，再以 Agile 加密寫入 path"""
+    from msoffcrypto.method.ecma376_agile import ECMA376Agile
+
+    payload = io.BytesIO()
+    with zipfile.ZipFile(payload, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+        with zf.open("xl/worksheets/sheet1.bin", "w") as member:
+            block = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                member.write(block)
+    payload.seek(0)
+    path.write_bytes(ECMA376Agile.encrypt(password, payload, spin_count=spin_count))
+
+
+def run_child(mode: str, input_path: str, output_path: str, password: str, chunk_kb: int) -> None:
+    """子程序：執行一次解密並以 JSON 輸出峰值 RSS 與耗時"""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    import msoffcrypto  # type: ignore
+    import batch_password_remover as remover
+
+    start = time.perf_counter()
+    if mode == "stream":
+        with remover.CrackSession(input_path, chunk_kb * 1024) as session:
+            session.try_password(password)
+            remover.remove_password(input_path, output_path, password, session=session)
+    else:
+        with open(input_path, "rb") as f_in, open(output_path, "wb") as f_out:
+            office_file = msoffcrypto.OfficeFile(f_in)
+            office_file.load_key(password=password)
+            office_file.decrypt(f_out)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": round(elapsed, 3), "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(mode: str, input_path: Path, password: str, chunk_kb: int) -> dict:
+    output_path = input_path.with_name(f"{input_path.stem}_{mode}_out.xlsx")
+    result = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child", mode, str(input_path),
+         str(output_path), password, str(chunk_kb)],
+        capture_output=True, text=True,
+    )
+    if output_path.exists():
+        output_path.unlink()
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "unknown"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """主函數"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        mode, input_path, output_path, password, chunk_kb = sys.argv[2:7]
+        run_child(mode, input_path, output_path, password, int(chunk_kb))
+        return
+
+    parser = argparse.ArgumentParser(description="串流解密記憶體基準測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100], help="測試檔大小 MB (預設: 10 50 100)")
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="串流解密每批大小 KB (預設: 1024)")
+    parser.add_argument("--spin-count", type=int, default=1000, help="測試檔的 spinCount (預設: 1000)")
+    parser.add_argument("--skip-baseline", action="store_true", help="不執行 msoffcrypto 整份解密對照組")
+    parser.add_argument("--output", "-o", type=str, help="結果 JSON 輸出路徑")
+    args = parser.parse_args()
+
+    password = "benchmark"
+    results = []
+    with tempfile.TemporaryDirectory(prefix="decrypt_bench_") as work_dir:
+        for size_mb in args.sizes:
+            input_path = Path(work_dir) / f"encrypted_{size_mb}mb.xlsx"
+            print(f"[BENCH] 產生 {size_mb} MB 加密測試檔...")
+            build_encrypted_file(input_path, size_mb, password, args.spin_count)
+
+            row = {"size_mb": size_mb, "file_bytes": input_path.stat().st_size}
+            row["stream"] = measure("stream", input_path, password, args.chunk_kb)
+            if not args.skip_baseline:
+                row["msoffcrypto"] = measure("msoffcrypto", input_path, password, args.chunk_kb)
+            results.append(row)
+            input_path.unlink()
+
+            print(f"[BENCH] {size_mb:>5} MB  串流：{row['stream']}")
+            if "msoffcrypto" in row:
+                print(f"[BENCH] {size_mb:>5} MB  整份：{row['msoffcrypto']}")
+
+    report = {"chunk_kb": args.chunk_kb, "spin_count": args.spin_count, "results": results}
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] 結果已寫入：{args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+輸入掃描基準測試
+
+主要功能：
+    📂 在暫存資料夾建立大型 input/（各平台資料夾合計約 10 萬個項目，含蝦皮非 Order.all 檔案與無關副檔名）
+    ⏱️ 比較舊版掃描（Path.iterdir + is_file、逐一比對平台資料夾名稱字串）與編譯後的路由表（os.scandir + 路徑第一層查詢）
+    📈 記錄各實作的耗時與找到的 Excel / 壓縮檔數量，確認兩者結果一致
+
+使用方法：
+    python scripts/benchmark_scan.py
+    python scripts/benchmark_scan.py --entries 200000 --repeat 5
+    python scripts/benchmark_scan.py --path D:/excel_remover/input   # 量測既有的 input/
+
+注意事項：
+    - 合成資料夾建立在暫存資料夾，結束後刪除；--path 指定的資料夾只讀不寫
+    - 兩種實作都包含「判斷每個檔案的平台」，對應主流程排程時的平台判斷
+    - 第一輪為暖身（目錄項目進入作業系統快取），不計入結果
+"""
+
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from batch_password_remover import EXCEL_EXTENSIONS, PLATFORM_FOLDERS, RoutingTable  # noqa: E402
+from benchmark_corpus import git_revision  # noqa: E402
+
+# =============================================================================
+# 舊版實作（3.0 版 main() 的掃描迴圈，作為比較基準）
+# =============================================================================
+
+def legacy_scan(input_dir: Path) -> dict:
+    excel_files, compressed_files = [], []
+    for folder_name in PLATFORM_FOLDERS:
+        folder_path = input_dir / folder_name
+        if folder_path.exists() and folder_path.is_dir():
+            for file_path in folder_path.iterdir():
+                if file_path.is_file():
+                    file_ext = file_path.suffix.lower()
+                    if folder_name == "Shopee_files" and "Order.all" not in file_path.name:
+                        continue
+                    if file_ext in EXCEL_EXTENSIONS:
+                        excel_files.append(file_path)
+                    elif file_ext in ['.zip', '.rar']:
+                        compressed_files.append(file_path)
+    for file_path in input_dir.iterdir():
+        if file_path.is_file():
+            file_ext = file_path.suffix.lower()
+            if file_ext in EXCEL_EXTENSIONS:
+                excel_files.append(file_path)
+            elif file_ext in ['.zip', '.rar']:
+                compressed_files.append(file_path)
+    platforms = {}
+    for file_path in excel_files:
+        file_platform = None
+        for folder_name in PLATFORM_FOLDERS:
+            if folder_name in str(file_path):
+                file_platform = folder_name.replace("_files", "")
+                break
+        platforms[file_platform] = platforms.get(file_platform, 0) + 1
+    return {"excel": len(excel_files), "archives": len(compressed_files), "platforms": platforms}
+
+
+def routed_scan(input_dir: Path) -> dict:
+    routing = RoutingTable(input_dir)
+    scanned = routing.scan()
+    platforms = {}
+    excel = archives = 0
+    for found in scanned.values():
+        excel += len(found["excel"])
+        archives += len(found["archives"])
+        for file_path in found["excel"]:
+            platform = routing.platform_for(file_path)
+            platforms[platform] = platforms.get(platform, 0) + 1
+    return {"excel": excel, "archives": archives, "platforms": platforms}
+
+# =============================================================================
+# 合成資料夾與量測
+# =============================================================================
+
+def build_input(root: Path, entries: int, seed: int) -> dict:
+    """依比例在各平台資料夾與根目錄建立空檔案，回傳各資料夾的項目數"""
+    rng = random.Random(seed)
+    shares = {"Shopee_files": 0.4, "MOMO_files": 0.2, "PChome_files": 0.1, "Yahoo_files": 0.1,
+              "ETMall_files": 0.05, "coupang_files": 0.05, "": 0.1}
+    layout = {}
+    for folder, share in shares.items():
+        directory = root / folder if folder else root
+        directory.mkdir(parents=True, exist_ok=True)
+        count = int(entries * share)
+        for index in range(count):
+            roll = rng.random()
+            if folder == "Shopee_files" and roll < 0.5:
+                name = f"Order.all.shop{index}.20250116_{index:06d}.xlsx"
+            elif roll < 0.8:
+                name = f"report_acct{index % 500}_{index:06d}.xlsx"
+            elif roll < 0.9:
+                name = f"bundle_{index:06d}.zip"
+            else:
+                name = f"notes_{index:06d}.txt"
+            (directory / name).touch()
+        layout[folder or "(root)"] = count
+    return layout
+
+
+def measure(label: str, func, repeat: int) -> dict:
+    func()  # 暖身
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = func()
+        seconds.append(time.perf_counter() - start)
+    result = {"median_seconds": round(statistics.median(seconds), 4), "runs": [round(s, 4) for s in seconds],
+              "counts": counts}
+    print(f"[BENCH] {label:<8} 中位數 {result['median_seconds']:.3f} 秒，"
+          f"{counts['excel']} 個 Excel、{counts['archives']} 個壓縮檔")
+    return result
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="輸入掃描基準測試（舊版 iterdir 掃描 vs 路由表 scandir 掃描）")
+    parser.add_argument("--path", type=str, help="量測既有的 input/ 資料夾（不指定時建立合成資料夾）")
+    parser.add_argument("--entries", type=int, default=100000, help="合成資料夾的項目總數 (預設: 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="每種實作的重複次數 (預設: 3)")
+    parser.add_argument("--seed", type=int, default=50, help="亂數種子 (預設: 50)")
+    parser.add_argument("--output", "-o", type=str,
+                        help="結果 JSON 輸出路徑 (預設: benchmark_results/scan_{時間}.json)")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="scan_bench_") as work_dir:
+        if args.path:
+            input_dir = Path(args.path).resolve()
+            report["input"] = {"path": str(input_dir)}
+        else:
+            input_dir = Path(work_dir) / "input"
+            print(f"[BENCH] 建立合成 input/：{args.entries} 個項目...")
+            report["input"] = build_input(input_dir, args.entries, args.seed)
+        repeat = max(1, args.repeat)
+        report["results"]["legacy"] = measure("legacy", lambda: legacy_scan(input_dir), repeat)
+        report["results"]["routed"] = measure("routed", lambda: routed_scan(input_dir), repeat)
+
+    legacy, routed = report["results"]["legacy"], report["results"]["routed"]
+    if legacy["counts"] != routed["counts"]:
+        print(f"[WARN] 兩種實作的結果不一致：{legacy['counts']} / {routed['counts']}")
+    if routed["median_seconds"]:
+        print(f"[BENCH] 路由表掃描比舊版快 {legacy['median_seconds'] / routed['median_seconds']:.1f} 倍")
+
+    output = Path(args.output) if args.output else \
+        Path("benchmark_results") / f"scan_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 結果已寫入：{output}")
+
+
+if __name__ == "__main__":
+    main()
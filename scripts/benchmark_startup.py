@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+啟動時間基準測試
+
+主要功能：
+    ⏱️ 量測兩種情境的端對端時間：
+        - idle：input/ 沒有檔案（排程最常見的「沒事可做」執行）
+        - one ：input/ 只有一個加密檔案，量測從啟動到開始處理第一個檔案的時間
+    🔬 以 python -X importtime 統計各模組的 import 耗時（自身 / 累計）
+    📦 同時支援原始碼（python scripts/batch_password_remover.py）與打包後的 exe（--exe）
+
+使用方法：
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --repeat 10 --top 15
+    python scripts/benchmark_startup.py --exe dist/Excel_Password_Remover_v3.exe
+
+注意事項：
+    - 測試專案建立在暫存資料夾，不會動到專案的 input/ output/ log/
+    - 「到第一個檔案」取自執行報告的 first_file_at 與啟動時間的差
+    - 打包後的 exe 不一定接受 PYTHONPROFILEIMPORTTIME，取不到時 import 統計記為 null
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from benchmark_corpus import build_xlsx, encrypt_xlsx, git_revision  # noqa: E402
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# =============================================================================
+# 測試專案
+# =============================================================================
+
+def build_project(root: Path, with_file: bool) -> None:
+    """建立最小專案：一個 MOMO 商店的密碼本；with_file 時放一個以該密碼加密的檔案"""
+    password = "startup-bench"
+    shop = {"platform": "MOMO", "shop_id": "MO0001", "shop_account": "momoacct0001",
+            "shop_name": "啟動測試商店", "shop_status": "Active", "Universal Password": password}
+    (root / "mapping").mkdir(parents=True)
+    with open(root / "mapping" / "shops_master.json", "w", encoding="utf-8") as f:
+        json.dump({"platform_index": {"MOMO": {password: shop}}, "shops": [shop]}, f, ensure_ascii=False)
+    folder = root / "input" / "MOMO_files"
+    folder.mkdir(parents=True)
+    if with_file:
+        data = encrypt_xlsx(build_xlsx(random.Random(36), 50), password, spin_count=1000)
+        (folder / "momoacct0001_report.xlsx").write_bytes(data)
+
+
+def reset_project(root: Path) -> None:
+    for name in ("output", "log", "temp"):
+        shutil.rmtree(root / name, ignore_errors=True)
+
+# =============================================================================
+# 量測
+# =============================================================================
+
+def parse_importtime(stderr: str) -> dict:
+    """彙整 -X importtime 輸出：{模組: {"self_us", "cumulative_us", "top_level"}}"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules[name] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                         "top_level": len(indent) <= 1}
+    return modules
+
+
+def time_run(command: list, project: Path, importtime: bool = False) -> dict:
+    """執行一次，回傳端對端時間、到第一個檔案的時間與（選用）import 統計"""
+    reset_project(project)
+    env = dict(os.environ)
+    if importtime:
+        env["PYTHONPROFILEIMPORTTIME"] = "1"
+    launched = time.time()
+    start = time.perf_counter()
+    result = subprocess.run(command + ["--base-dir", str(project), "-q", "--no-progress"],
+                            capture_output=True, text=True, encoding="utf-8", errors="replace", env=env)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"執行失敗（exit {result.returncode}）：{result.stderr[-500:]}")
+
+    first_file = None
+    reports = sorted((project / "log").glob("run_report_*.json")) if (project / "log").is_dir() else []
+    if reports:
+        report = json.loads(reports[-1].read_text(encoding="utf-8"))
+        if report.get("first_file_at"):
+            first_file = report["first_file_at"] - launched
+    run = {"wall_seconds": round(wall, 4),
+           "first_file_seconds": round(first_file, 4) if first_file is not None else None}
+    if importtime:
+        run["imports"] = parse_importtime(result.stderr)
+    return run
+
+
+def summarize_imports(modules: dict, top: int) -> dict:
+    if not modules:
+        return None
+    top_level = {name: v for name, v in modules.items() if v["top_level"]}
+    by_cumulative = sorted(top_level.items(), key=lambda item: item[1]["cumulative_us"], reverse=True)
+    by_self = sorted(modules.items(), key=lambda item: item[1]["self_us"], reverse=True)
+    return {
+        "total_ms": round(sum(v["cumulative_us"] for v in top_level.values()) / 1000, 2),
+        "loaded": sorted(modules),
+        "top_cumulative_ms": {name: round(v["cumulative_us"] / 1000, 2) for name, v in by_cumulative[:top]},
+        "top_self_ms": {name: round(v["self_us"] / 1000, 2) for name, v in by_self[:top]},
+    }
+
+
+def benchmark_target(label: str, command: list, work_dir: Path, repeat: int, top: int) -> dict:
+    result = {"command": command}
+    for scenario, with_file in (("idle", False), ("one", True)):
+        project = work_dir / f"{label}_{scenario}"
+        build_project(project, with_file)
+        time_run(command, project)  # 暖身：讓檔案系統快取與 .pyc 就緒
+        runs = [time_run(command, project) for _ in range(repeat)]
+        profiled = time_run(command, project, importtime=True)
+        firsts = [r["first_file_seconds"] for r in runs if r["first_file_seconds"] is not None]
+        result[scenario] = {
+            "runs": runs,
+            "median_wall_seconds": round(statistics.median(r["wall_seconds"] for r in runs), 4),
+            "median_first_file_seconds": round(statistics.median(firsts), 4) if firsts else None,
+            "imports": summarize_imports(profiled["imports"], top),
+        }
+        line = f"[BENCH] {label} / {scenario}：中位數 {result[scenario]['median_wall_seconds'] * 1000:.0f} ms"
+        if firsts:
+            line += f"，到第一個檔案 {result[scenario]['median_first_file_seconds'] * 1000:.0f} ms"
+        if result[scenario]["imports"]:
+            line += f"，import 合計 {result[scenario]['imports']['total_ms']:.0f} ms"
+        print(line)
+    return result
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="啟動時間基準測試（-X importtime 與到第一個檔案的時間）")
+    parser.add_argument("--repeat", type=int, default=5, help="每種情境的重複次數 (預設: 5)")
+    parser.add_argument("--top", type=int, default=10, help="列出最耗時的前幾個模組 (預設: 10)")
+    parser.add_argument("--exe", type=str, help="另外量測打包後的 exe")
+    parser.add_argument("--output", "-o", type=str,
+                        help="結果 JSON 輸出路徑 (預設: benchmark_results/startup_{時間}.json)")
+    args = parser.parse_args()
+
+    targets = {"script": [sys.executable, str(SCRIPT_DIR / "batch_password_remover.py")]}
+    if args.exe:
+        targets["exe"] = [str(Path(args.exe).resolve())]
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "targets": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as work_dir:
+        for label, command in targets.items():
+            report["targets"][label] = benchmark_target(label, command, Path(work_dir), max(1, args.repeat), args.top)
+
+    idle_imports = report["targets"]["script"]["idle"]["imports"]
+    if idle_imports:
+        print("[BENCH] idle 執行 import 累計耗時前幾名（ms）：")
+        for name, ms in idle_imports["top_cumulative_ms"].items():
+            print(f"  {name:<40} {ms:>8.2f}")
+
+    output = Path(args.output) if args.output else \
+        Path("benchmark_results") / f"startup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 結果已寫入：{output}")
+
+
+if __name__ == "__main__":
+    main()
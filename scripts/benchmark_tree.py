@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目錄樹生成基準測試
+
+主要功能：
+    🌲 在暫存資料夾建立與 output/ 相仿的大型目錄（年 / 月 / 平台 / 商店，每個商店資料夾數百個檔案）
+    ⏱️ 比較舊版遞迴實作（Path.iterdir + 字串串接）與 TreeMaker 的 scandir 串流實作（單執行緒 / 多執行緒）
+    📈 記錄各實作的耗時、tracemalloc 記憶體峰值與列出的目錄 / 檔案數
+
+使用方法：
+    python scripts/benchmark_tree.py
+    python scripts/benchmark_tree.py --shops 200 --files 500 --workers 8 --repeat 3
+    python scripts/benchmark_tree.py --path D:/excel_remover/output   # 量測既有的資料夾
+
+注意事項：
+    - 合成目錄建立在暫存資料夾，結束後刪除；--path 指定的資料夾只讀不寫
+    - 記憶體峰值以 tracemalloc 量測另一輪執行，不計入耗時
+    - 舊版實作在每一層輸出間留有空行，結果以目錄 / 檔案數比對，不比對逐行內容
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from TreeMaker import Excluder, write_tree  # noqa: E402
+from benchmark_corpus import git_revision  # noqa: E402
+
+# =============================================================================
+# 舊版實作（1.1 版 generate_tree，作為比較基準）
+# =============================================================================
+
+def legacy_generate_tree(directory: Path, prefix: str = "", max_depth: int = None, current_depth: int = 0) -> str:
+    if max_depth is not None and current_depth >= max_depth:
+        return ""
+    tree_lines = []
+    try:
+        items = list(directory.iterdir())
+        items.sort(key=lambda x: (x.is_file(), x.name.lower()))
+    except PermissionError:
+        return f"{prefix}└── [權限不足]\n"
+    filtered_items = []
+    for item in items:
+        if item.is_dir() and not item.name.startswith('.') and item.name != '__pycache__':
+            filtered_items.append(item)
+        elif item.is_file() and not item.name.startswith('.') and not item.name.endswith(('.pyc', '.pyo', '.pyd')):
+            filtered_items.append(item)
+    for i, item in enumerate(filtered_items):
+        is_last_item = i == len(filtered_items) - 1
+        current_prefix, next_prefix = ("└── ", prefix + "    ") if is_last_item else ("├── ", prefix + "│   ")
+        if item.is_dir():
+            tree_lines.append(f"{prefix}{current_prefix}{item.name}/")
+            tree_lines.append(legacy_generate_tree(item, next_prefix, max_depth, current_depth + 1))
+        else:
+            tree_lines.append(f"{prefix}{current_prefix}{item.name}")
+    return "\n".join(tree_lines) + "\n" if tree_lines else ""
+
+# =============================================================================
+# 合成目錄與量測
+# =============================================================================
+
+def build_tree(root: Path, shops: int, files: int) -> int:
+    """建立 2025/{mm}/{平台}/{商店}/ 的分層資料夾，回傳檔案總數"""
+    platforms = ["MOMO", "Shopee", "Yahoo", "PChome"]
+    total = 0
+    for shop in range(shops):
+        folder = root / "2025" / f"{shop % 12 + 1:02d}" / platforms[shop % len(platforms)] / f"SH{shop:04d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for index in range(files):
+            (folder / f"店{shop}_SH{shop:04d}_acct{shop}_20250116_143052_{index:02d}.xlsx").touch()
+        total += files
+    return total
+
+
+def count_legacy(text: str) -> dict:
+    lines = [line for line in text.splitlines() if line.strip()]
+    return {"dirs": sum(line.endswith("/") for line in lines), "files": sum(not line.endswith("/") for line in lines)}
+
+
+def run_legacy(root: Path) -> dict:
+    text = legacy_generate_tree(root)
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        f.write(text)
+    return count_legacy(text)
+
+
+def run_streaming(root: Path, workers: int) -> dict:
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        stats = write_tree(f, root, excluder=Excluder(), workers=workers)
+    return {"dirs": stats["dirs"], "files": stats["files"]}
+
+
+def measure(label: str, func, repeat: int) -> dict:
+    func()  # 暖身：讓目錄項目進入作業系統快取
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = func()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"median_seconds": round(statistics.median(seconds), 4), "runs": [round(s, 4) for s in seconds],
+              "peak_memory_mb": round(peak / 1024 / 1024, 2), "counts": counts}
+    print(f"[BENCH] {label:<14} 中位數 {result['median_seconds']:.3f} 秒，記憶體峰值 {result['peak_memory_mb']:.1f} MB，"
+          f"{counts['dirs']} 個目錄、{counts['files']} 個檔案")
+    return result
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="目錄樹生成基準測試（舊版遞迴實作 vs scandir 串流實作）")
+    parser.add_argument("--path", type=str, help="量測既有的資料夾（不指定時建立合成目錄）")
+    parser.add_argument("--shops", type=int, default=100, help="合成目錄的商店資料夾數 (預設: 100)")
+    parser.add_argument("--files", type=int, default=500, help="每個商店資料夾的檔案數 (預設: 500)")
+    parser.add_argument("--workers", type=int, default=8, help="多執行緒版本的執行緒數 (預設: 8)")
+    parser.add_argument("--repeat", type=int, default=3, help="每種實作的重複次數 (預設: 3)")
+    parser.add_argument("--output", "-o", type=str,
+                        help="結果 JSON 輸出路徑 (預設: benchmark_results/tree_{時間}.json)")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="tree_bench_") as work_dir:
+        if args.path:
+            root = Path(args.path).resolve()
+            report["tree"] = {"path": str(root)}
+        else:
+            root = Path(work_dir)
+            print(f"[BENCH] 建立合成目錄：{args.shops} 個商店資料夾 × {args.files} 個檔案...")
+            report["tree"] = {"shops": args.shops, "files": build_tree(root, args.shops, args.files)}
+        repeat = max(1, args.repeat)
+        report["results"]["legacy"] = measure("legacy", lambda: run_legacy(root), repeat)
+        report["results"]["scandir"] = measure("scandir", lambda: run_streaming(root, 1), repeat)
+        report["results"][f"scandir_w{args.workers}"] = measure(f"scandir ×{args.workers}",
+                                                                lambda: run_streaming(root, args.workers), repeat)
+
+    counts = {json.dumps(result["counts"], sort_keys=True) for result in report["results"].values()}
+    if len(counts) != 1:
+        print(f"[WARN] 各實作列出的數量不一致：{counts}")
+    legacy = report["results"]["legacy"]["median_seconds"]
+    for label, result in report["results"].items():
+        if label != "legacy" and result["median_seconds"]:
+            print(f"[BENCH] {label}：比舊版快 {legacy / result['median_seconds']:.1f} 倍")
+
+    output = Path(args.output) if args.output else \
+        Path("benchmark_results") / f"tree_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 結果已寫入：{output}")
+
+
+if __name__ == "__main__":
+    main()
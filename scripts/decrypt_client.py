@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本機解密服務用戶端
+
+主要功能：
+    📤 將 Excel 檔案或壓縮檔上傳到 batch_password_remover.py --serve 啟動的服務
+    📥 儲存解密後的檔案並顯示對應商店
+    🩺 查詢服務狀態（/health）與指標（/metrics）
+
+使用方法：
+    python scripts/batch_password_remover.py --serve --port 8765
+    python scripts/decrypt_client.py report.xlsx --platform MOMO --out decrypted/
+    python scripts/decrypt_client.py bundle.zip --platform Shopee --out decrypted/
+    python scripts/decrypt_client.py --health
+    python scripts/decrypt_client.py --unix-socket /tmp/epr.sock report.xlsx
+
+注意事項：
+    - 只使用標準函式庫
+    - 壓縮檔（.zip / .rar）會送到 /decrypt-archive，逐一儲存其中的 Excel 檔案
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import socket
+import sys
+from pathlib import Path
+from urllib.parse import quote, unquote, urlencode
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """透過 Unix socket 連線的 HTTPConnection"""
+
+    def __init__(self, socket_path: str, timeout: float = 300):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def open_connection(args) -> http.client.HTTPConnection:
+    if args.unix_socket:
+        return UnixHTTPConnection(args.unix_socket, timeout=args.timeout)
+    return http.client.HTTPConnection(args.host, args.port, timeout=args.timeout)
+
+
+def request(args, method: str, path: str, body: bytes = None):
+    conn = open_connection(args)
+    try:
+        headers = {"Content-Type": "application/octet-stream"} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def decrypt_file(args, file_path: Path, out_dir: Path) -> bool:
+    """上傳單一檔案並儲存結果，回傳是否成功"""
+    is_archive = file_path.suffix.lower() in (".zip", ".rar")
+    query = {"filename": file_path.name}
+    if args.platform:
+        query["platform"] = args.platform
+    endpoint = "/decrypt-archive" if is_archive else "/decrypt"
+    status, headers, body = request(args, "POST", f"{endpoint}?{urlencode(query, quote_via=quote)}",
+                                    file_path.read_bytes())
+
+    if status != 200:
+        try:
+            error = json.loads(body).get("error")
+        except ValueError:
+            error = body[:200]
+        print(f"[FAIL] {file_path.name}：HTTP {status} {error}")
+        return False
+
+    if not is_archive:
+        output = out_dir / file_path.name
+        output.write_bytes(body)
+        shop = unquote(headers.get("X-Shop-Name", "")) or "（未加密）"
+        shop_id = unquote(headers.get("X-Shop-Id", ""))
+        print(f"[OK] {file_path.name} → {output}  商店：{shop} {shop_id}")
+        return True
+
+    ok = True
+    for member in json.loads(body)["members"]:
+        name = Path(member["name"]).name
+        if member["content"] is None:
+            print(f"[FAIL] {file_path.name}/{member['name']}：{member['error']}")
+            ok = False
+            continue
+        output = out_dir / name
+        output.write_bytes(base64.b64decode(member["content"]))
+        shop = member["shop"] or {}
+        print(f"[OK] {file_path.name}/{member['name']} → {output}  "
+              f"商店：{shop.get('shop_name', '（未加密）')} {shop.get('shop_id', '')}")
+    return ok
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="本機解密服務用戶端")
+    parser.add_argument("files", nargs="*", help="要解密的 Excel 檔案或壓縮檔")
+    parser.add_argument("--platform", type=str, help="平台提示（例如 MOMO、Shopee），未指定時測試所有平台")
+    parser.add_argument("--out", type=str, default="decrypted", help="輸出資料夾 (預設: decrypted)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="服務位址 (預設: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="服務埠號 (預設: 8765)")
+    parser.add_argument("--unix-socket", type=str, help="改用 Unix socket 連線")
+    parser.add_argument("--timeout", type=float, default=300, help="逾時秒數 (預設: 300)")
+    parser.add_argument("--health", action="store_true", help="顯示服務狀態")
+    parser.add_argument("--metrics", action="store_true", help="顯示服務指標")
+    args = parser.parse_args()
+
+    if args.health or args.metrics:
+        status, _, body = request(args, "GET", "/health" if args.health else "/metrics")
+        print(body.decode("utf-8"))
+        sys.exit(0 if status == 200 else 1)
+
+    if not args.files:
+        parser.error("請指定要解密的檔案，或使用 --health / --metrics")
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    failures = 0
+    for name in args.files:
+        if not decrypt_file(args, Path(name), out_dir):
+            failures += 1
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
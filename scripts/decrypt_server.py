@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+本機解密服務（batch_password_remover.py --serve）
+
+主要功能：
+    🔥 密碼本索引與解密、解壓縮模組在工作程序中只載入一次，之後每個請求直接解密
+    🌐 以 HTTP（127.0.0.1）或 Unix socket 提供 /decrypt、/decrypt-archive、/health、/metrics
+    🚦 同時處理中的請求達上限時排隊，逾時回應 503；工作程序異常結束時重建程序池
+
+使用方法：
+    python scripts/batch_password_remover.py --serve --port 8765 --workers 2
+    python scripts/batch_password_remover.py --serve --unix-socket /tmp/epr.sock
+
+注意事項：
+    - 由 batch_password_remover.py 的 --serve 啟動，用戶端見 decrypt_client.py
+    - 只應綁定 127.0.0.1 或 Unix socket
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from batch_password_remover import (DEFAULT_DECRYPT_CHUNK, QUIET, VERBOSE, ArchiveLimits, Decryptor,
+                                    convert_json_to_passwords_format, get_base_path, msoffcrypto, rarfile, say)
+
+# 工作程序內的 Decryptor（由 _serve_worker_init 建立，程序存活期間常駐）
+_WORKER_DECRYPTOR: Optional[Decryptor] = None
+
+
+_WORKER_BARRIER = None
+
+
+def _serve_worker_init(mapping_path: str, chunk_size: int, archive_limits: ArchiveLimits, barrier) -> None:
+    global _WORKER_DECRYPTOR, _WORKER_BARRIER
+    # 工作程序常駐，預先載入解密與解壓縮模組，第一個請求不必等 import
+    msoffcrypto._load()
+    rarfile._available()
+    _WORKER_DECRYPTOR = Decryptor(mapping_path, chunk_size=chunk_size, archive_limits=archive_limits)
+    _WORKER_BARRIER = barrier
+
+
+def _serve_warmup() -> int:
+    # 每個暖機工作都卡在 barrier 直到全部工作程序到齊，確保分散到不同程序
+    _WORKER_BARRIER.wait(timeout=120)
+    return os.getpid()
+
+
+def _serve_decrypt(kind: str, data: bytes, platform: Optional[str], filename: Optional[str]) -> tuple:
+    """在工作程序中解密，回傳 (狀態, 結果, 錯誤訊息)；例外轉為狀態碼避免跨程序序列化問題"""
+    try:
+        if kind == "archive":
+            members = _WORKER_DECRYPTOR.decrypt_archive(data, platform=platform, archive_name=filename or "")
+            return "ok", members, None
+        plaintext, shop_info = _WORKER_DECRYPTOR.decrypt_bytes(data, platform=platform, filename=filename)
+        return "ok", (plaintext, shop_info), None
+    except msoffcrypto.exceptions.InvalidKeyError as e:
+        return "invalid_key", None, str(e)
+    except KeyError as e:
+        return "bad_request", None, str(e.args[0]) if e.args else str(e)
+    except Exception as e:
+        return "error", None, f"{type(e).__name__}: {e}"
+
+
+class DecryptService:
+    """
+    常駐的本機解密服務：索引與工作程序池只載入一次，之後每個請求直接解密
+
+    端點：
+        POST /decrypt?platform=MOMO&filename=x.xlsx   本體為 Excel 檔案，回應為解密後內容，
+                                                      商店資訊放在 X-Shop-* 標頭（URL 編碼）
+        POST /decrypt-archive?platform=MOMO           本體為 ZIP / RAR，回應為 JSON（內容以 base64 編碼）
+        GET  /health                                  JSON 狀態
+        GET  /metrics                                 Prometheus 文字格式
+    同時處理中的請求達 max_concurrency 時排隊，等待超過 queue_timeout 秒回應 503
+    工作程序異常結束（例如記憶體不足被終止）時重建程序池，重建前 /health 回應 503
+    只應綁定 127.0.0.1 或 Unix socket
+    """
+
+    def __init__(self, mapping_path: Union[str, Path], workers: int, max_concurrency: int,
+                 max_upload_bytes: int, chunk_size: int = DEFAULT_DECRYPT_CHUNK, queue_timeout: float = 30,
+                 archive_limits: Optional[ArchiveLimits] = None):
+        import threading
+        self.mapping_path = str(mapping_path)
+        with open(self.mapping_path, "r", encoding="utf-8") as f:
+            self.platforms = sorted(convert_json_to_passwords_format(json.load(f)).get("platform_index", {}))
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_upload_bytes = max_upload_bytes
+        self.queue_timeout = queue_timeout
+        self.chunk_size = chunk_size
+        self.archive_limits = archive_limits or ArchiveLimits()
+        self.started = time.time()
+        self.healthy = False
+        self.pool_restarts = 0
+        self._pool_lock = threading.Lock()
+        self.pool = self._new_pool()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.requests: Dict[str, int] = {}
+        self.request_seconds = 0.0
+
+    def _new_pool(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        barrier = multiprocessing.Barrier(self.workers)
+        return ProcessPoolExecutor(self.workers, initializer=_serve_worker_init,
+                                   initargs=(self.mapping_path, self.chunk_size, self.archive_limits, barrier))
+
+    def warm_up(self) -> List[int]:
+        """讓每個工作程序先完成 import 與索引載入，第一個請求不必等待"""
+        futures = [self.pool.submit(_serve_warmup) for _ in range(self.workers)]
+        pids = sorted({future.result() for future in futures})
+        self.healthy = True
+        return pids
+
+    def run(self, *args) -> tuple:
+        """交給工作程序執行；程序池損壞時重建後回報錯誤（不重試，避免同一個檔案再次拖垮程序）"""
+        from concurrent.futures.process import BrokenProcessPool
+
+        pool = self.pool
+        try:
+            return pool.submit(_serve_decrypt, *args).result()
+        except BrokenProcessPool:
+            self.count("worker_crash")
+            self.recover(pool)
+            return "error", None, "解密工作程序異常結束，已重新啟動"
+
+    def recover(self, broken_pool) -> None:
+        with self._pool_lock:
+            if self.pool is not broken_pool:
+                return  # 其他請求已重建
+            self.healthy = False
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+            self.pool_restarts += 1
+            try:
+                self.warm_up()
+                say(f"[SERVE] 工作程序異常結束，已重建程序池（第 {self.pool_restarts} 次）")
+            except Exception as e:
+                say(f"[SERVE] 重建程序池失敗：{e}", QUIET)
+
+    def acquire(self) -> bool:
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.count("rejected")
+            return False
+        with self._lock:
+            self.inflight += 1
+        return True
+
+    def release(self, seconds: float) -> None:
+        with self._lock:
+            self.inflight -= 1
+            self.request_seconds += seconds
+        self._slots.release()
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.requests[outcome] = self.requests.get(outcome, 0) + 1
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok" if self.healthy else "degraded",
+            "pool_restarts": self.pool_restarts,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "inflight": self.inflight,
+            "platforms": self.platforms,
+            "requests": dict(self.requests),
+        }
+
+    def prometheus(self) -> str:
+        prefix = "excel_password_remover_serve"
+        lines = [
+            f"# TYPE {prefix}_uptime_seconds gauge",
+            f"{prefix}_uptime_seconds {time.time() - self.started:.0f}",
+            f"# TYPE {prefix}_inflight gauge",
+            f"{prefix}_inflight {self.inflight}",
+            f"# TYPE {prefix}_max_concurrency gauge",
+            f"{prefix}_max_concurrency {self.max_concurrency}",
+            f"# TYPE {prefix}_workers gauge",
+            f"{prefix}_workers {self.workers}",
+            f"# TYPE {prefix}_healthy gauge",
+            f"{prefix}_healthy {int(self.healthy)}",
+            f"# TYPE {prefix}_pool_restarts_total counter",
+            f"{prefix}_pool_restarts_total {self.pool_restarts}",
+            f"# TYPE {prefix}_request_seconds_total counter",
+            f"{prefix}_request_seconds_total {self.request_seconds:.4f}",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for outcome, count in sorted(self.requests.items()):
+            lines.append(f'{prefix}_requests_total{{outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _make_request_handler(service: DecryptService):
+    import base64
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, quote, urlsplit
+
+    class DecryptRequestHandler(BaseHTTPRequestHandler):
+        server_version = "ExcelPasswordRemover"
+        protocol_version = "HTTP/1.1"
+
+        def address_string(self) -> str:
+            # Unix socket 的 client_address 不是 (host, port)
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format: str, *args) -> None:
+            say(f"[SERVE] {self.address_string()} {format % args}", VERBOSE)
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                       "application/json; charset=utf-8")
+
+        def do_GET(self) -> None:
+            path = urlsplit(self.path).path
+            if path == "/health":
+                self._send_json(200 if service.healthy else 503, service.health())
+            elif path == "/metrics":
+                self._send(200, service.prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            url = urlsplit(self.path)
+            if url.path not in ("/decrypt", "/decrypt-archive"):
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                self._send_json(400, {"error": "empty body"})
+                return
+            if length > service.max_upload_bytes:
+                service.count("too_large")
+                self.close_connection = True
+                self._send_json(413, {"error": f"upload exceeds {service.max_upload_bytes} bytes"})
+                return
+            if not service.acquire():
+                self.close_connection = True
+                self._send_json(503, {"error": "too many concurrent requests"})
+                return
+
+            start = time.perf_counter()
+            try:
+                data = self.rfile.read(length)
+                query = parse_qs(url.query)
+                platform = query.get("platform", [None])[0]
+                filename = query.get("filename", [None])[0]
+                kind = "archive" if url.path == "/decrypt-archive" else "workbook"
+                status, result, error = service.run(kind, data, platform, filename)
+            except Exception as e:
+                status, result, error = "error", None, f"{type(e).__name__}: {e}"
+            finally:
+                service.release(time.perf_counter() - start)
+            service.count(status)
+
+            if status == "invalid_key":
+                self._send_json(422, {"error": error})
+            elif status == "bad_request":
+                self._send_json(400, {"error": error})
+            elif status != "ok":
+                self._send_json(500, {"error": error})
+            elif kind == "archive":
+                self._send_json(200, {"members": [
+                    {"name": name, "shop": shop_info, "error": member_error,
+                     "content": base64.b64encode(plaintext).decode("ascii") if plaintext is not None else None}
+                    for name, plaintext, shop_info, member_error in result
+                ]})
+            else:
+                plaintext, shop_info = result
+                headers = {"X-Encrypted": "1" if shop_info is not None else "0"}
+                for field, header in (("shop_id", "X-Shop-Id"), ("shop_account", "X-Shop-Account"),
+                                      ("shop_name", "X-Shop-Name"), ("platform", "X-Shop-Platform")):
+                    if shop_info and shop_info.get(field):
+                        headers[header] = quote(str(shop_info[field]))
+                self._send(200, plaintext, "application/octet-stream", headers)
+
+    return DecryptRequestHandler
+
+
+def run_server(args: argparse.Namespace) -> None:
+    """啟動本機解密服務，直到 Ctrl+C"""
+    import socketserver
+    import stat
+    import threading
+    from http.server import ThreadingHTTPServer
+
+    # 只移除先前服務留下的 socket；路徑上是一般檔案或資料夾時不啟動，避免誤刪
+    socket_path = Path(args.unix_socket) if args.unix_socket else None
+    if socket_path is not None:
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            mode = None
+        if mode is not None and not stat.S_ISSOCK(mode):
+            say(f"[FAIL] {socket_path} 已存在且不是 socket，請改用其他路徑", QUIET)
+            return
+
+    mapping_path = get_base_path() / (args.mapping or "mapping/shops_master.json")
+    workers = args.workers or os.cpu_count() or 1
+    service = DecryptService(mapping_path, workers, args.max_concurrency or workers * 2,
+                             int(args.max_upload_mb * 1024 * 1024),
+                             chunk_size=max(4, args.decrypt_chunk_kb) * 1024, queue_timeout=args.queue_timeout,
+                             archive_limits=ArchiveLimits(args.archive_max_depth,
+                                                          int(args.max_unpacked_mb * 1024 * 1024),
+                                                          args.archive_max_ratio))
+    pids = service.warm_up()
+    handler = _make_request_handler(service)
+
+    if socket_path is not None:
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if mode is not None:
+            socket_path.unlink()
+        server = UnixHTTPServer(str(socket_path), handler)
+        where = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        server.daemon_threads = True
+        where = f"http://{args.host}:{server.server_address[1]}"
+
+    # 服務管理程式以 SIGTERM 停止服務時，同樣走正常關閉流程（移除 socket、關閉程序池）
+    import signal
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    say(f"[SERVE] 已載入 {len(service.platforms)} 個平台索引，{len(pids)} 個工作程序待命")
+    say(f"[SERVE] 服務位址：{where}（同時處理上限 {service.max_concurrency}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        say("\n[SERVE] 停止服務")
+        server.server_close()
+        service.close()
+        if socket_path is not None and socket_path.is_socket():
+            socket_path.unlink()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+輸入清單快照工具
+
+主要功能：
+    📋 記錄 input/ 內每個檔案的路徑、大小、修改時間與內容雜湊，存成精簡的快照（log/input_inventory.json）
+    ⚡ 只重新計算大小或修改時間有變的檔案，雜湊以多執行緒平行計算（已安裝 xxhash 時使用 xxh3，否則 blake2b）
+    🔍 diff 模式列出上次快照之後新增、變更、刪除的檔案（只比對目錄資訊，不讀檔案內容）
+    🔗 批次處理加上 --changed-only 時只處理變更的檔案，處理完畢更新快照
+
+使用方法：
+    python scripts/input_inventory.py diff
+    python scripts/input_inventory.py diff --json --list changed.txt
+    python scripts/input_inventory.py snapshot --workers 8
+    python scripts/input_inventory.py snapshot --base-dir D:/excel_remover
+
+注意事項：
+    - 快照以相對於 input/ 的路徑記錄，專案資料夾搬移後仍可沿用
+    - 大小與修改時間都沒變的檔案視為未變更，不讀取內容；只有修改時間變動但內容相同的檔案不列為變更
+    - diff 模式不計算新增檔案的雜湊、不寫入快照；snapshot 模式才更新快照
+    - 以 . 開頭的檔案與資料夾不列入
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from TreeMaker import Excluder, walk_files  # noqa: E402
+
+try:
+    import xxhash
+    HASH_ALGORITHM = "xxh3_128"
+except ImportError:  # 未安裝 xxhash 時使用標準函式庫
+    xxhash = None
+    HASH_ALGORITHM = "blake2b_128"
+
+SNAPSHOT_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """計算檔案內容雜湊（分塊讀取；xxh3 與 blake2b 在處理大區塊時都會釋放 GIL）"""
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class InputInventory:
+    """
+    input/ 的檔案清單快照
+
+    快照格式：{"version", "algorithm", "created", "files": {相對路徑: [大小, 修改時間 ns, 雜湊]}}
+    scan() 取得目前狀態（沿用大小與修改時間相同的雜湊），diff() 與上次快照比對，save() 寫回快照
+    """
+
+    def __init__(self, snapshot_path: Path, root: Path, workers: int = 4):
+        self.snapshot_path = Path(snapshot_path)
+        self.root = Path(root)
+        self.workers = max(1, workers)
+        self.previous: Dict[str, list] = {}
+        self.hashed = 0  # 本次重新計算雜湊的檔案數
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SNAPSHOT_VERSION and data.get("algorithm") == HASH_ALGORITHM:
+                self.previous = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def scan(self, hash_added: bool = True) -> Dict[str, list]:
+        """
+        取得 input/ 目前的狀態
+
+        Args:
+            hash_added: 是否計算新增檔案的雜湊（只需列出差異時可略過，雜湊記為 None）
+        """
+        current: Dict[str, list] = {}
+        to_hash: List[str] = []
+        # input/ 只排除隱藏檔，不套用 TreeMaker 預設的 build / dist 等排除規則
+        for relative, entry in walk_files(self.root, Excluder((), ())):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            old = self.previous.get(relative)
+            if old is not None and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                current[relative] = old
+                continue
+            current[relative] = [st.st_size, st.st_mtime_ns, None]
+            if old is not None or hash_added:
+                to_hash.append(relative)
+
+        if to_hash:
+            paths = [str(self.root / relative) for relative in to_hash]
+            if self.workers > 1 and len(paths) > 1:
+                import concurrent.futures
+                with concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="inventory") as pool:
+                    digests = list(pool.map(self._safe_hash, paths))
+            else:
+                digests = [self._safe_hash(path) for path in paths]
+            for relative, digest in zip(to_hash, digests):
+                current[relative][2] = digest
+            self.hashed += len(to_hash)
+        return current
+
+    @staticmethod
+    def _safe_hash(path: str) -> Optional[str]:
+        try:
+            return hash_file(path)
+        except OSError:
+            return None  # 掃描後被移走或無法讀取：視為變更
+
+    def diff(self, current: Dict[str, list]) -> Dict[str, list]:
+        """與上次快照比對：{"added", "modified", "removed", "touched"}（touched 為只有修改時間變動、內容相同）"""
+        added, modified, touched = [], [], []
+        for relative, (size, mtime_ns, digest) in current.items():
+            old = self.previous.get(relative)
+            if old is None:
+                added.append(relative)
+            elif old[0] != size or old[1] != mtime_ns:
+                if digest is not None and digest == old[2]:
+                    touched.append(relative)
+                else:
+                    modified.append(relative)
+        removed = [relative for relative in self.previous if relative not in current]
+        return {"added": sorted(added), "modified": sorted(modified), "removed": sorted(removed),
+                "touched": sorted(touched)}
+
+    def save(self, current: Dict[str, list], pending: Iterable[str] = ()) -> None:
+        """
+        寫回快照；pending 中的檔案（處理失敗、逾時等）保留上次的記錄，下次仍列為新增或變更
+        """
+        files = dict(current)
+        for relative in pending:
+            if relative in self.previous:
+                files[relative] = self.previous[relative]
+            else:
+                files.pop(relative, None)
+        for relative, record in list(files.items()):
+            if record[2] is None:
+                record = files[relative] = list(record)
+                record[2] = self._safe_hash(str(self.root / relative))
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "algorithm": HASH_ALGORITHM,
+                       "created": datetime.datetime.now().isoformat(timespec="seconds"), "files": files},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.snapshot_path)
+        self.previous = files
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="input/ 檔案清單快照與差異比對")
+    parser.add_argument("mode", choices=["snapshot", "diff"], help="snapshot：更新快照；diff：列出變更的檔案")
+    parser.add_argument("--base-dir", type=str, default=str(SCRIPT_DIR.parent),
+                        help="專案根目錄（含 input/、log/；預設為程式所在位置）")
+    parser.add_argument("--snapshot", type=str, help="快照檔路徑 (預設: log/input_inventory.json)")
+    parser.add_argument("--workers", type=int, default=4, help="平行計算雜湊的執行緒數 (預設: 4)")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出差異")
+    parser.add_argument("--list", type=str, help="將新增與變更的檔案完整路徑逐行寫入此檔案")
+    args = parser.parse_args()
+
+    base_dir = Path(args.base_dir).resolve()
+    input_dir = base_dir / "input"
+    if not input_dir.is_dir():
+        print(f"[FAIL] 找不到輸入資料夾：{input_dir}")
+        sys.exit(1)
+    snapshot_path = Path(args.snapshot) if args.snapshot else base_dir / "log" / "input_inventory.json"
+
+    start = time.perf_counter()
+    inventory = InputInventory(snapshot_path, input_dir, args.workers)
+    current = inventory.scan(hash_added=args.mode == "snapshot")
+    delta = inventory.diff(current)
+    if args.mode == "snapshot":
+        inventory.save(current)
+    elapsed = time.perf_counter() - start
+
+    if args.list:
+        with open(args.list, "w", encoding="utf-8") as f:
+            for relative in delta["added"] + delta["modified"]:
+                f.write(f"{input_dir / relative}\n")
+    if args.json:
+        print(json.dumps(dict(delta, files=len(current), hashed=inventory.hashed, seconds=round(elapsed, 4)),
+                         ensure_ascii=False, indent=2))
+        return
+
+    for label, key in (("新增", "added"), ("變更", "modified"), ("刪除", "removed")):
+        for relative in delta[key]:
+            print(f"  [{label}] {relative}")
+    print(f"[INVENTORY] {len(current)} 個檔案：新增 {len(delta['added'])}、變更 {len(delta['modified'])}、"
+          f"刪除 {len(delta['removed'])}（僅修改時間變動 {len(delta['touched'])}），"
+          f"計算雜湊 {inventory.hashed} 個，耗時 {elapsed * 1000:.0f} ms（{HASH_ALGORITHM}）")
+    if args.mode == "snapshot":
+        print(f"[OK] 快照已更新：{snapshot_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+多工作批次（batch_password_remover.py --jobs）
+
+主要功能：
+    🗂️ 一次處理多組 (input, mapping, output)，每個工作有自己的日誌、執行報告與去重索引
+    ⚖️ 依 input 大小由大到小送進共用的工作程序池，最大的工作最先開始
+    📊 全部完成後寫入 log/jobs_report_*.json 彙總各工作的結果與耗時
+
+使用方法：
+    python scripts/batch_password_remover.py --jobs jobs.json
+    python scripts/batch_password_remover.py --jobs jobs.json --job-workers 2 --dedupe off
+
+注意事項：
+    - 由 batch_password_remover.py 的 --jobs 啟動，其餘選項原樣傳給每個工作
+    - 每個工作由一個程序從頭到尾執行 main()，工作之間不分攤個別檔案
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from batch_password_remover import QUIET, get_base_path, main, msoffcrypto, rarfile, say
+
+JOB_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def load_job_specs(jobs_path: Union[str, Path], project_root: Path) -> List[Dict[str, Any]]:
+    """
+    讀取工作清單：{"jobs": [{"name", "input", "mapping", "output", "log"}]}
+
+    只有 name 與 input 必填；mapping 預設 mapping/shops_master.json，output 預設 output/{name}，
+    log 預設 log/{name}；相對路徑以專案根目錄為準。各工作的 input / output / log 不可重複
+    （去重索引、輸出配置、隔離清單都存放在這些資料夾）
+    """
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("jobs") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("工作清單必須是非空的 jobs 陣列")
+    jobs = []
+    seen: Dict[str, set] = {"name": set(), "input": set(), "output": set(), "log": set()}
+    for index, entry in enumerate(entries):
+        name = str(entry.get("name", ""))
+        if not JOB_NAME.match(name):
+            raise ValueError(f"jobs[{index}].name 只能使用英數字、- 與 _：{name!r}")
+        if not entry.get("input"):
+            raise ValueError(f"jobs[{index}] ({name}) 缺少 input")
+        job = {
+            "name": name,
+            "input": (project_root / entry["input"]).resolve(),
+            "mapping": (project_root / entry.get("mapping", "mapping/shops_master.json")).resolve(),
+            "output": (project_root / entry.get("output", f"output/{name}")).resolve(),
+            "log": (project_root / entry.get("log", f"log/{name}")).resolve(),
+        }
+        for key in seen:
+            if job[key] in seen[key]:
+                raise ValueError(f"jobs[{index}] ({name}) 的 {key} 與其他工作重複：{job[key]}")
+            seen[key].add(job[key])
+        jobs.append(job)
+    return jobs
+
+
+def strip_job_options(argv: List[str]) -> List[str]:
+    """移除 --jobs / --job-workers，其餘選項原樣傳給每個工作"""
+    stripped = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg in ("--jobs", "--job-workers"):
+            skip = True
+            continue
+        if arg.startswith(("--jobs=", "--job-workers=")):
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def input_size(path: Path) -> int:
+    """input 資料夾的檔案總大小，用來決定工作的啟動順序"""
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+def _job_worker_init() -> None:
+    # 工作程序依序執行多個工作，解密與解壓縮模組只載入一次
+    msoffcrypto._load()
+    rarfile._available()
+
+
+def _run_job(argv: List[str]) -> Dict[str, Any]:
+    return main(argv)
+
+
+def run_jobs(args: argparse.Namespace, argv: List[str]) -> List[Dict[str, Any]]:
+    """
+    在同一次執行中處理多組 (input, mapping, output)
+
+    各工作在共用的工作程序池中執行（程序數預設為 CPU 核心數與工作數的較小者），每個工作由一個程序從頭到尾
+    執行 main()，工作之間不分攤個別檔案；依 input 大小由大到小送出，讓最大的工作最先開始，
+    總耗時至少是最大工作的耗時。每個工作有自己的日誌、執行報告、去重索引與 temp/job-{名稱}/，主控台輸出以 [名稱] 開頭
+    """
+    project_root = get_base_path().resolve()
+    try:
+        jobs = load_job_specs(args.jobs, project_root)
+    except (OSError, ValueError) as e:
+        say(f"[FAIL] 讀取工作清單失敗：{e}", QUIET)
+        return []
+    workers = max(1, min(args.job_workers or os.cpu_count() or 1, len(jobs)))
+    for job in jobs:
+        job["bytes"] = input_size(job["input"])
+    jobs.sort(key=lambda job: job["bytes"], reverse=True)
+
+    common = strip_job_options(argv)
+    say(f"[JOBS] {len(jobs)} 個工作，{workers} 個工作程序")
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_job_worker_init) as pool:
+        futures = {}
+        for job in jobs:
+            job_argv = common + ["--job-name", job["name"], "--input-dir", str(job["input"]),
+                                 "--mapping", str(job["mapping"]), "--output-dir", str(job["output"]),
+                                 "--log-dir", str(job["log"]), "--no-progress"]
+            futures[pool.submit(_run_job, job_argv)] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            result = {"name": job["name"], "input": str(job["input"]), "output": str(job["output"]),
+                      "log": str(job["log"]), "input_bytes": job["bytes"]}
+            try:
+                summary = future.result()
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                say(f"[JOBS] {job['name']} 執行失敗：{result['error']}", QUIET)
+            else:
+                if "error" in summary:
+                    result["error"] = summary["error"]
+                    say(f"[JOBS] {job['name']} 執行失敗：{summary['error']}", QUIET)
+                else:
+                    result.update(outcomes=summary["outcomes"], duration_seconds=summary["duration_seconds"])
+                    outcomes = summary["outcomes"]
+                    say(f"[JOBS] {job['name']} 完成：成功 {outcomes.get('ok', 0)}、失敗 {outcomes.get('failed', 0)}，"
+                        f"耗時 {summary['duration_seconds']:.1f} 秒")
+            results.append(result)
+
+    elapsed = time.time() - started
+    serial = sum(result.get("duration_seconds", 0) for result in results)
+    say(f"[JOBS] 全部完成，總耗時 {elapsed:.1f} 秒（各工作耗時合計 {serial:.1f} 秒）", QUIET)
+    log_dir = project_root / "log"
+    log_dir.mkdir(exist_ok=True)
+    report_path = log_dir / f"jobs_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+    try:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump({"workers": workers, "duration_seconds": round(elapsed, 3), "jobs": results},
+                      f, ensure_ascii=False, indent=2)
+        say(f"[REPORT] 工作彙總：{report_path}")
+    except OSError as e:
+        say(f"[WARN] 工作彙總寫入失敗：{e}")
+    return results
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+輸出資料夾分層遷移工具（一次性）
+
+主要功能：
+    📦 將 output/ 根目錄下既有的平面輸出，依分層配置批次搬到 output/{yyyy}/{mm}/{平台}/{商店代號}/
+    🏷️ 商店與平台優先取自去重索引（output/.dedupe_index.json），其次依檔名比對 mapping/shops_master.json
+    🔗 同步更新去重索引中的輸出路徑，並記錄配置到 output/.layout.json，之後的批次處理自動沿用
+    📝 搬移清單寫入 log/output_migration_{時間}.json，可供稽核或還原
+
+使用方法：
+    python scripts/migrate_output_layout.py --dry-run
+    python scripts/migrate_output_layout.py
+    python scripts/migrate_output_layout.py --layout "{yyyy}/{platform}/{shop_id}" --base-dir D:/excel_remover
+
+注意事項：
+    - 只搬移 output/ 根目錄的檔案；backup/、隱藏檔與未完成的 .partial-* 臨時檔不動
+    - 日期取自檔名中的執行日期（{shop_name}_{shop_id}_{shop_account}_{YYYYMMDD}_{HHMMSS}_{流水號}），
+      檔名不符時使用檔案修改時間
+    - 找不到對應商店的檔案留在原處並列於報告
+    - 同一檔案系統內以 rename 搬移，不複製檔案內容；執行前請先停止批次處理
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from batch_password_remover import OutputCommitter, OutputLayout  # noqa: E402
+
+OUTPUT_NAME = re.compile(r"^(?P<stem>.+)_(?P<date>\d{8})_(?P<time>\d{6})_(?:\d{2}|\d{6})$")
+
+
+def load_json(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def shop_suffixes(mapping: dict) -> dict:
+    """{"_{shop_id}_{shop_account}": 商店資訊}，供檔名比對"""
+    suffixes = {}
+    for shop in mapping.get("shops", []):
+        if shop.get("shop_id") and shop.get("shop_account"):
+            suffixes[f"_{shop['shop_id']}_{shop['shop_account']}"] = shop
+    return suffixes
+
+
+def match_suffix(stem: str, suffixes: dict):
+    """找出檔名主體中最長的 _{shop_id}_{shop_account} 結尾"""
+    position = stem.find("_")
+    while position != -1:
+        shop = suffixes.get(stem[position:])
+        if shop is not None:
+            return shop
+        position = stem.find("_", position + 1)
+    return None
+
+
+def plan_moves(output_dir: Path, layout: OutputLayout, dedupe_entries: dict, suffixes: dict) -> tuple:
+    """回傳 (搬移清單 [(來源, 目的地)], 略過清單 [(檔名, 原因)])"""
+    by_output = {entry.get("output"): entry for entry in dedupe_entries.values()}
+    moves, skipped = [], []
+    planned = set()
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not entry.is_file(follow_symlinks=False) or name.startswith(".") or OutputCommitter.TEMP_MARKER in name:
+                continue
+            stem = Path(name).stem
+            match = OUTPUT_NAME.match(stem)
+            shop = by_output.get(name)
+            if shop is None:
+                shop = match_suffix(match.group("stem") if match else stem, suffixes)
+            if shop is None:
+                skipped.append((name, "找不到對應商店"))
+                continue
+            if match:
+                when = datetime.datetime.strptime(match.group("date"), "%Y%m%d")
+            else:
+                when = datetime.datetime.fromtimestamp(entry.stat().st_mtime)
+            target = layout.directory(output_dir, shop.get("platform"), shop, when) / name
+            if target in planned or target.exists():
+                skipped.append((name, f"目的地已有同名檔案：{target.relative_to(output_dir).as_posix()}"))
+                continue
+            planned.add(target)
+            moves.append((Path(entry.path), target))
+    return moves, skipped
+
+
+def update_dedupe_index(index_path: Path, index: dict, renamed: dict) -> int:
+    """把去重索引中的輸出路徑改為搬移後的位置，回傳更新筆數"""
+    updated = 0
+    for entry in index.get("entries", {}).values():
+        new_output = renamed.get(entry.get("output"))
+        if new_output is not None:
+            entry["output"] = new_output
+            updated += 1
+    if updated:
+        temp_path = index_path.with_name(index_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+    return updated
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description="將平面的 output/ 批次遷移為分層配置")
+    parser.add_argument("--base-dir", type=str, default=str(SCRIPT_DIR.parent),
+                        help="專案根目錄（含 output/、mapping/；預設為程式所在位置）")
+    parser.add_argument("--layout", type=str, default="sharded",
+                        help="分層配置：sharded 或自訂格式，例如 \"{yyyy}/{mm}/{platform}/{shop_id}\" (預設: sharded)")
+    parser.add_argument("--dry-run", action="store_true", help="只列出搬移計畫，不實際搬移")
+    args = parser.parse_args()
+
+    base_dir = Path(args.base_dir).resolve()
+    output_dir = base_dir / "output"
+    if not output_dir.is_dir():
+        print(f"[FAIL] 找不到輸出資料夾：{output_dir}")
+        sys.exit(1)
+    try:
+        layout = OutputLayout(args.layout)
+    except ValueError as e:
+        print(f"[FAIL] {e}")
+        sys.exit(1)
+    if layout.flat:
+        print("[FAIL] 目標配置為 flat，不需遷移")
+        sys.exit(1)
+
+    index_path = output_dir / ".dedupe_index.json"
+    index = load_json(index_path)
+    mapping = load_json(base_dir / "mapping" / "shops_master.json")
+    moves, skipped = plan_moves(output_dir, layout, index.get("entries", {}), shop_suffixes(mapping))
+    print(f"[PLAN] 配置：{layout.pattern}，搬移 {len(moves)} 個檔案，略過 {len(skipped)} 個")
+
+    if args.dry_run:
+        for source, target in moves[:20]:
+            print(f"  {source.name} → {target.relative_to(output_dir).as_posix()}")
+        if len(moves) > 20:
+            print(f"  ...（另有 {len(moves) - 20} 個）")
+        for name, reason in skipped:
+            print(f"  [SKIP] {name}：{reason}")
+        return
+
+    renamed = {}
+    failed = []
+    created = set()
+    for source, target in moves:
+        if target.parent not in created:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            created.add(target.parent)
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            failed.append((source.name, str(e)))
+            continue
+        renamed[source.name] = target.relative_to(output_dir).as_posix()
+
+    updated = update_dedupe_index(index_path, index, renamed) if index else 0
+    layout.save(output_dir)
+
+    log_dir = base_dir / "log"
+    log_dir.mkdir(exist_ok=True)
+    manifest_path = log_dir / f"output_migration_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"layout": layout.pattern, "moved": renamed, "skipped": dict(skipped), "failed": dict(failed)},
+                  f, ensure_ascii=False, indent=2)
+
+    print(f"[OK] 已搬移 {len(renamed)} 個檔案到 {len(created)} 個分層資料夾，更新去重索引 {updated} 筆")
+    for name, reason in skipped:
+        print(f"  [SKIP] {name}：{reason}")
+    for name, error in failed:
+        print(f"  [FAIL] {name}：{error}")
+    print(f"[OK] 搬移清單：{manifest_path}")
+    print(f"[OK] 之後的批次處理將沿用配置：{layout.pattern}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+平台排程工具（shops_master.json 的 schedule）
+
+主要功能：
+    🥇 依平台的優先度、權重與截止時間決定下一個要處理的檔案
+    ⚖️ 同優先度的平台依權重分配處理時間，不會因為某個平台檔案較多而讓其他平台一直等待
+    ⏰ 尚未到期的截止時間排在所有平台之前（最早到期者優先），執行報告記錄各平台是否趕上截止時間
+
+使用方法：
+    在 shops_master.json 加入：
+    "schedule": {"ETMall": {"deadline": "08:00"}, "PChome": {"priority": 5}, "MOMO": {"weight": 2}}
+
+注意事項：
+    - 由 batch_password_remover.py 讀取密碼設定時載入，未設定 schedule 時各平台同等對待
+    - 不在平台資料夾內的檔案歸入 root 平台
+"""
+
+import collections
+import datetime
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+ROOT_PLATFORM = "root"  # 不在平台資料夾內的檔案（input/ 根目錄）
+
+
+class PlatformPolicy:
+    """
+    單一平台的排程設定
+
+    Args:
+        priority: 優先度，數字大者先處理（預設 0）
+        weight: 同優先度的平台之間依權重分配處理時間（預設 1）
+        deadline: 截止時間；尚未到期時此平台排在所有平台之前（最早到期者優先）
+    """
+
+    def __init__(self, priority: int = 0, weight: float = 1.0, deadline: Optional[datetime.datetime] = None):
+        if weight <= 0:
+            raise ValueError("weight 必須大於 0")
+        self.priority = int(priority)
+        self.weight = float(weight)
+        self.deadline = deadline
+
+
+def parse_deadline(value: str, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """解析截止時間：HH:MM 為當天的該時刻，或完整的 ISO 8601 日期時間"""
+    now = now or datetime.datetime.now()
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", value.strip())
+    if match:
+        return now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+    return datetime.datetime.fromisoformat(value)
+
+
+def load_schedule(data: Dict[str, Any], now: Optional[datetime.datetime] = None) -> Dict[str, PlatformPolicy]:
+    """讀取 shops_master.json 的 schedule：{平台: {priority, weight, deadline}}（"*" 為預設）"""
+    policies = {}
+    for platform, settings in (data.get("schedule") or {}).items():
+        try:
+            if not isinstance(settings, dict):
+                raise TypeError("必須是物件")
+            unknown = set(settings) - {"priority", "weight", "deadline"}
+            if unknown:
+                raise ValueError(f"不支援的設定：{', '.join(sorted(unknown))}")
+            deadline = parse_deadline(settings["deadline"], now) if settings.get("deadline") else None
+            policies[platform] = PlatformPolicy(settings.get("priority", 0), settings.get("weight", 1.0), deadline)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"schedule.{platform}：{e}") from None
+    return policies
+
+
+class PlatformScheduler:
+    """
+    依平台分佇列的處理順序
+
+    每次從以下順序挑選下一個檔案的平台：
+    1. 截止時間尚未到的平台最先，最早到期者優先
+    2. 其次依 priority 由高到低
+    3. 同一優先度內，累計處理秒數 ÷ weight 最小者（依實際耗時分配，大量積壓的平台不會佔滿整段時間）
+    同分時依加入順序。迭代時量測每個檔案從排入到開始處理的等待時間與處理秒數
+    """
+
+    def __init__(self, policies: Optional[Dict[str, PlatformPolicy]] = None, clock: Callable[[], float] = time.time):
+        self.policies = policies or {}
+        self.clock = clock
+        self.queues: Dict[str, collections.deque] = {}
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._virtual: Dict[str, float] = {}  # 累計處理秒數 ÷ weight
+        self._total = 0
+
+    def policy(self, platform: str) -> PlatformPolicy:
+        return self.policies.get(platform) or self.policies.get("*") or PlatformPolicy()
+
+    def add(self, item: Any, platform: Optional[str]) -> None:
+        platform = platform or ROOT_PLATFORM
+        queue = self.queues.get(platform)
+        if queue is None:
+            queue = self.queues[platform] = collections.deque()
+            self._virtual[platform] = 0.0
+            self.stats[platform] = {"queued": 0, "processed": 0, "seconds": 0.0, "wait_total": 0.0,
+                                    "wait_max": 0.0, "finished": None}
+        queue.append((item, self.clock()))
+        self.stats[platform]["queued"] += 1
+        self._total += 1
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _next_platform(self) -> str:
+        now = datetime.datetime.fromtimestamp(self.clock())
+
+        def rank(platform):
+            policy = self.policy(platform)
+            urgent = policy.deadline is not None and now < policy.deadline
+            return (0 if urgent else 1, policy.deadline.timestamp() if urgent else 0,
+                    -policy.priority, self._virtual[platform])
+        return min((platform for platform, queue in self.queues.items() if queue), key=rank)
+
+    def __iter__(self) -> Iterator[Any]:
+        while any(self.queues.values()):
+            platform = self._next_platform()
+            item, queued_at = self.queues[platform].popleft()
+            stats = self.stats[platform]
+            wait = max(0.0, self.clock() - queued_at)
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            started = self.clock()
+            try:
+                yield item
+            finally:
+                elapsed = max(0.0, self.clock() - started)
+                self._virtual[platform] += elapsed / self.policy(platform).weight
+                stats["processed"] += 1
+                stats["seconds"] += elapsed
+                if not self.queues[platform]:
+                    stats["finished"] = self.clock()
+
+    def depth(self) -> Dict[str, int]:
+        """各平台目前的佇列長度"""
+        return {platform: len(queue) for platform, queue in self.queues.items()}
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for platform, stats in self.stats.items():
+            policy = self.policy(platform)
+            entry = {
+                "queued": stats["queued"],
+                "remaining": len(self.queues[platform]),
+                "processed": stats["processed"],
+                "seconds": round(stats["seconds"], 3),
+                "wait_avg_seconds": round(stats["wait_total"] / stats["processed"], 3) if stats["processed"] else 0.0,
+                "wait_max_seconds": round(stats["wait_max"], 3),
+                "priority": policy.priority,
+                "weight": policy.weight,
+            }
+            if policy.deadline is not None:
+                entry["deadline"] = policy.deadline.isoformat(timespec="seconds")
+                entry["deadline_met"] = (stats["finished"] is not None
+                                         and stats["finished"] <= policy.deadline.timestamp())
+            report[platform] = entry
+        return report
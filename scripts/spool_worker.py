@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+多節點分散處理工具（batch_password_remover.py --spool）
+
+主要功能：
+    🤝 多個節點共用同一份專案資料夾（網路磁碟）時，以租約認領 input/ 中的檔案，同一檔案只由一個節點處理
+    💓 背景執行緒定期更新租約與節點檔作為心跳，失效節點的租約由其他節點搶回
+    ✅ 處理完畢的檔案記入 spool/done/，內容未變時各節點不再處理
+
+使用方法：
+    python scripts/batch_password_remover.py --spool
+    python scripts/batch_password_remover.py --spool --worker-id node-a --lease-seconds 300
+
+注意事項：
+    - 由 batch_password_remover.py 的 --spool 啟動；跨節點共用的去重索引、隔離清單與輸出配置仍使用
+      batch_password_remover.py 的 shared_file_lock
+    - 到期判斷以共用資料夾上的檔案修改時間為準，不受各主機時鐘誤差影響
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from batch_password_remover import log_event
+
+
+def spool_worker_id(worker_id: Optional[str] = None) -> str:
+    """節點名稱：預設為 {主機名稱}-{PID}，只保留可用於檔名的字元"""
+    if not worker_id:
+        import socket
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in worker_id)
+
+
+class SpoolWorker:
+    """
+    多節點共用同一份專案資料夾（網路磁碟）時的工作節點（--spool）
+
+    - 以租約認領 input/ 中的檔案：spool/leases/{路徑雜湊}.lease 以 O_EXCL 建立，同一時間只有一個節點成功
+    - 背景執行緒定期更新租約與節點檔（spool/workers/{節點}.alive）的修改時間作為心跳；
+      超過 lease_seconds 未更新的租約視為失效，由其他節點以 rename 搶回（只有一個節點會成功）後重新處理
+    - 處理完畢的檔案記入 spool/done/{路徑雜湊}.json（含大小、修改時間），內容未變時各節點不再處理；
+      超過處理時限的檔案留待之後啟動的執行重試（配合隔離清單從中斷處繼續）
+    - 壓縮檔的租約持有到整次執行結束，確保解出的工作簿都處理完才標記完成
+    - 到期判斷以共用資料夾上的檔案修改時間（伺服器時鐘）為準，不受各主機時鐘誤差影響
+    """
+
+    def __init__(self, spool_dir: Union[str, Path], input_dir: Union[str, Path], worker_id: str,
+                 lease_seconds: float = 120.0):
+        import threading
+        self.spool_dir = Path(spool_dir)
+        self.input_dir = Path(input_dir)
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lease_dir = self.spool_dir / "leases"
+        self.done_dir = self.spool_dir / "done"
+        self.workers_dir = self.spool_dir / "workers"
+        for directory in (self.lease_dir, self.done_dir, self.workers_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.alive_path = self.workers_dir / f"{worker_id}.alive"
+        self._held: Dict[Path, Path] = {}  # 輸入檔 -> 租約檔
+        self._lock = threading.Lock()
+        self.lost: List[str] = []  # 心跳時發現已被其他節點搶回的租約
+        self.stats = {"claimed": 0, "busy": 0, "done": 0, "reclaimed": 0}
+        self._write_json(self.alive_path, {"worker": worker_id, "pid": os.getpid(),
+                                           "started": datetime.datetime.now().isoformat(timespec="seconds")})
+        self.started = self._server_now()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name="spool-heartbeat", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]) -> None:
+        temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _server_now(self) -> float:
+        """更新節點檔後讀回其修改時間，作為共用資料夾所在伺服器的目前時間"""
+        os.utime(self.alive_path)
+        return self.alive_path.stat().st_mtime
+
+    def _relative(self, file_path: Path) -> Optional[str]:
+        try:
+            return file_path.resolve().relative_to(self.input_dir.resolve()).as_posix()
+        except ValueError:
+            return None  # 解壓到本節點 temp/ 的檔案不需認領
+
+    @staticmethod
+    def _key(relative: str) -> str:
+        return hashlib.sha1(relative.encode("utf-8")).hexdigest()
+
+    def _heartbeat(self) -> None:
+        interval = max(0.05, self.lease_seconds / 4)
+        while not self._stop.wait(interval):
+            with self._lock:
+                held = list(self._held.items())
+            for file_path, lease_path in held:
+                try:
+                    os.utime(lease_path)
+                except OSError:
+                    self.lost.append(str(file_path))
+            try:
+                os.utime(self.alive_path)
+            except OSError:
+                pass
+
+    def _is_done(self, file_path: Path, key: str) -> bool:
+        entry = self._read_json(self.done_dir / f"{key}.json")
+        if entry is None:
+            return False
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return True  # 檔案已被移走
+        if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime:
+            return False
+        # 超時的檔案：本次執行開始前記錄的留給本次重試，執行期間其他節點記錄的不再重複嘗試
+        return entry.get("outcome") != "timeout" or entry.get("finished", 0) >= self.started
+
+    def _reclaim(self, lease_path: Path) -> bool:
+        """搶回失效的租約；回傳 True 表示可以重新嘗試建立租約"""
+        try:
+            age = self._server_now() - lease_path.stat().st_mtime
+        except FileNotFoundError:
+            return True  # 持有者剛釋放
+        if age <= self.lease_seconds:
+            return False
+        stale_path = lease_path.with_name(f"{lease_path.name}.stale-{self.worker_id}")
+        try:
+            os.rename(lease_path, stale_path)
+        except OSError:
+            return True  # 其他節點先搶回了
+        # rename 前租約可能剛被其他節點重建：搬到的是新租約時放回原處
+        try:
+            if self._server_now() - stale_path.stat().st_mtime <= self.lease_seconds:
+                os.rename(stale_path, lease_path)
+                return False
+        except OSError:
+            pass
+        previous = self._read_json(stale_path) or {}
+        try:
+            stale_path.unlink()
+        except OSError:
+            pass
+        self.stats["reclaimed"] += 1
+        log_event("lease_reclaimed", level="warning", path=previous.get("path"), previous_worker=previous.get("worker"),
+                  age=round(age, 1))
+        return True
+
+    def claim(self, file_path: Union[str, Path]) -> bool:
+        """
+        認領輸入檔
+
+        Returns:
+            bool: True 表示由本節點處理；其他節點處理中或已處理完畢時回傳 False
+        """
+        file_path = Path(file_path)
+        relative = self._relative(file_path)
+        if relative is None or file_path in self._held:
+            return True
+        key = self._key(relative)
+        if self._is_done(file_path, key):
+            self.stats["done"] += 1
+            return False
+        lease_path = self.lease_dir / f"{key}.lease"
+        for _ in range(3):
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._reclaim(lease_path):
+                    continue
+                break
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"worker": self.worker_id, "path": relative,
+                           "claimed": datetime.datetime.now().isoformat(timespec="seconds")}, f, ensure_ascii=False)
+            # 其他節點可能在上面的檢查之後、建立租約之前剛處理完畢
+            if self._is_done(file_path, key):
+                self._drop_lease(lease_path)
+                self.stats["done"] += 1
+                return False
+            with self._lock:
+                self._held[file_path] = lease_path
+            self.stats["claimed"] += 1
+            log_event("lease", level="debug", path=relative)
+            return True
+        self.stats["busy"] += 1
+        return False
+
+    def _drop_lease(self, lease_path: Path) -> None:
+        """只刪除仍屬於本節點的租約（已被其他節點搶回的不動）"""
+        lease = self._read_json(lease_path)
+        if lease is not None and lease.get("worker") == self.worker_id:
+            try:
+                lease_path.unlink()
+            except OSError:
+                pass
+
+    def complete(self, file_path: Union[str, Path], outcome: str = "ok") -> None:
+        """記錄處理結果並釋放租約（先寫完成記錄再刪租約，其他節點不會重複處理）"""
+        file_path = Path(file_path)
+        with self._lock:
+            lease_path = self._held.pop(file_path, None)
+        if lease_path is None:
+            return
+        relative = self._relative(file_path)
+        try:
+            stat = file_path.stat()
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+        self._write_json(self.done_dir / f"{self._key(relative)}.json",
+                         {"path": relative, "outcome": outcome, "worker": self.worker_id, "size": size,
+                          "mtime": mtime, "finished": self._server_now()})
+        self._drop_lease(lease_path)
+
+    def release(self, file_path: Union[str, Path]) -> None:
+        """放棄租約但不記錄完成，其他節點或下次執行會重新處理"""
+        with self._lock:
+            lease_path = self._held.pop(Path(file_path), None)
+        if lease_path is not None:
+            self._drop_lease(lease_path)
+
+    def sweep(self, temp_root: Union[str, Path]) -> tuple:
+        """
+        回收已失效節點的臨時資料夾（temp/{節點}/），並清除輸入檔已不存在的完成記錄
+
+        Returns:
+            tuple: (回收的臨時資料夾數, 清除的完成記錄數)
+        """
+        temp_root = Path(temp_root)
+        now = self._server_now()
+        reclaimed = 0
+        for alive_path in self.workers_dir.glob("*.alive"):
+            worker_id = alive_path.name[:-len(".alive")]
+            try:
+                if worker_id == self.worker_id or now - alive_path.stat().st_mtime <= self.lease_seconds:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(temp_root / worker_id, ignore_errors=True)
+            try:
+                alive_path.unlink()
+            except OSError:
+                pass
+            reclaimed += 1
+            log_event("worker_reclaimed", level="warning", worker=worker_id)
+        pruned = 0
+        with os.scandir(self.done_dir) as entries:
+            for entry in entries:
+                done = self._read_json(Path(entry.path)) if entry.name.endswith(".json") else None
+                if done is not None and not (self.input_dir / done.get("path", "")).exists():
+                    try:
+                        os.unlink(entry.path)
+                        pruned += 1
+                    except OSError:
+                        pass
+        return reclaimed, pruned
+
+    def close(self, outcome: str = "processed") -> None:
+        """整次執行結束：標記仍持有的壓縮檔為完成，停止心跳並移除節點檔"""
+        for file_path in list(self._held):
+            self.complete(file_path, outcome)
+        self._stop.set()
+        self._thread.join()
+        try:
+            self.alive_path.unlink()
+        except OSError:
+            pass
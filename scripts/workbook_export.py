@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+資料匯出工具（batch_password_remover.py --export）
+
+主要功能：
+    📤 將輸出的活頁簿逐張工作表匯出成 CSV / Parquet，供倉儲載入程式直接讀取
+    🔎 依平台設定的關鍵字（shops_master.json 的 export_headers）判斷標題列，未設定時自動判斷
+    💾 逐列串流寫出，每批 batch_rows 列，記憶體用量不隨工作表大小增加
+
+使用方法：
+    python scripts/batch_password_remover.py --export csv
+    python scripts/batch_password_remover.py --export parquet --export-dir warehouse --export-batch-rows 2000
+
+    from workbook_export import export_workbook
+    export_workbook("output/報表.xlsx", "warehouse/momo", "parquet", platform="MOMO")
+
+注意事項：
+    - Parquet 需要 pyarrow，.xls 需要 xlrd（皆為選用套件）
+    - 匯出檔經由 OutputCommitter 寫入臨時檔後原子發佈，匯出失敗不影響已完成的輸出
+"""
+
+import datetime
+import io
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from batch_password_remover import (OutputCommitter, OutputVerifier, openpyxl, pyarrow, pyarrow_parquet,
+                                    timed_stage, xlrd)
+
+DEFAULT_EXPORT_BATCH_ROWS = 5000
+HEADER_SCAN_ROWS = 20
+SHEET_NAME_UNSAFE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class ExportError(Exception):
+    """工作表無法匯出（缺少選用套件、格式無法解析等）"""
+
+
+def iter_workbook_sheets(source: Union[str, Path, bytes], suffix: str) -> Iterator[tuple]:
+    """
+    逐一產生 (工作表名稱, 欄數, 逐列 iterator)；source 可為路徑或記憶體內的 bytes
+
+    .xlsx 以 openpyxl 唯讀模式逐列解析工作表 XML，不建立整張表；.xls 需要 xlrd（選用），
+    以 on_demand 模式一次只載入一張工作表
+    """
+    if suffix in OutputVerifier.ZIP_SUFFIXES:
+        try:
+            workbook = openpyxl.load_workbook(io.BytesIO(source) if isinstance(source, bytes) else source,
+                                              read_only=True, data_only=True)
+        except Exception as e:
+            raise ExportError(f"無法解析活頁簿：{e}") from None
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.max_column or 0, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    elif suffix == ".xls":
+        if not xlrd._available():
+            raise ExportError("匯出 .xls 需要 xlrd 套件（pip install xlrd）")
+        try:
+            if isinstance(source, bytes):
+                book = xlrd.open_workbook(file_contents=source, on_demand=True)
+            else:
+                book = xlrd.open_workbook(str(source), on_demand=True)
+        except Exception as e:
+            raise ExportError(f"無法解析活頁簿：{e}") from None
+        try:
+            for index in range(book.nsheets):
+                sheet = book.sheet_by_index(index)
+                yield sheet.name, sheet.ncols, _xls_rows(book, sheet)
+                book.unload_sheet(index)
+        finally:
+            book.release_resources()
+    else:
+        raise ExportError(f"不支援匯出 {suffix} 檔案")
+
+
+def _xls_rows(book, sheet) -> Iterator[tuple]:
+    for row_index in range(sheet.nrows):
+        values = []
+        for cell in sheet.row(row_index):
+            if cell.ctype == xlrd.XL_CELL_EMPTY or cell.ctype == xlrd.XL_CELL_BLANK:
+                values.append(None)
+            elif cell.ctype == xlrd.XL_CELL_DATE:
+                try:
+                    values.append(xlrd.xldate.xldate_as_datetime(cell.value, book.datemode))
+                except Exception:
+                    values.append(cell.value)
+            else:
+                values.append(cell.value)
+        yield tuple(values)
+
+
+def detect_header(rows: Iterator[tuple], keywords: Iterable[str] = ()) -> Tuple[Optional[tuple], Iterator[tuple]]:
+    """
+    在前 HEADER_SCAN_ROWS 列中找出標題列，回傳 (標題列, 之後的資料列 iterator)
+
+    有 keywords（平台設定）時取第一個含任一關鍵字的列；否則取第一個全為文字、
+    且非空欄位數達掃描範圍內最寬列一半以上的列。標題列之前的列（報表名稱、匯出時間等）捨棄；
+    找不到標題列時回傳 None，所有列都視為資料
+    """
+    import itertools
+    keywords = [keyword for keyword in keywords if keyword]
+    scanned = list(itertools.islice(rows, HEADER_SCAN_ROWS))
+    header_index = None
+    if keywords:
+        for index, row in enumerate(scanned):
+            if any(isinstance(value, str) and any(keyword in value for keyword in keywords) for value in row):
+                header_index = index
+                break
+    else:
+        widths = [sum(value is not None and value != "" for value in row) for row in scanned]
+        widest = max(widths, default=0)
+        for index, row in enumerate(scanned):
+            filled = [value for value in row if value is not None and value != ""]
+            if len(filled) >= 2 and len(filled) * 2 >= widest and all(isinstance(value, str) for value in filled):
+                header_index = index
+                break
+    if header_index is None:
+        return None, itertools.chain(scanned, rows)
+    return scanned[header_index], itertools.chain(scanned[header_index + 1:], rows)
+
+
+def column_names(header: Optional[tuple], width: int) -> List[str]:
+    """欄位名稱：空白與重複的標題補上欄號"""
+    names = []
+    seen = set()
+    for index in range(width):
+        value = header[index] if header is not None and index < len(header) else None
+        name = str(value).strip() if value not in (None, "") else f"column_{index + 1}"
+        if name in seen:
+            name = f"{name}_{index + 1}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _cell_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def write_sheet(rows: Iterator[tuple], columns: List[str], f_out: BinaryIO, fmt: str,
+                batch_rows: int = DEFAULT_EXPORT_BATCH_ROWS) -> int:
+    """
+    將資料列以每批 batch_rows 列寫成 CSV（UTF-8）或 Parquet（全部欄位為字串），回傳列數
+
+    每批寫出後即釋放，記憶體只與 batch_rows × 欄數有關；超出欄數的儲存格捨棄，完全空白的列略過
+    """
+    width = len(columns)
+    written = 0
+    if fmt == "csv":
+        import csv
+        text = io.TextIOWrapper(f_out, encoding="utf-8", newline="", write_through=True)
+        try:
+            writer = csv.writer(text)
+            writer.writerow(columns)
+            batch = []
+            for row in rows:
+                values = [_cell_text(value) for value in row[:width]]
+                if not any(value not in (None, "") for value in values):
+                    continue
+                batch.append(values + [None] * (width - len(values)))
+                if len(batch) >= batch_rows:
+                    writer.writerows(batch)
+                    written += len(batch)
+                    batch = []
+            writer.writerows(batch)
+            written += len(batch)
+        finally:
+            text.detach()  # 不關閉底層的 f_out（由 OutputCommitter 關閉）
+        return written
+
+    if not pyarrow._available():
+        raise ExportError("匯出 Parquet 需要 pyarrow 套件（pip install pyarrow）")
+    schema = pyarrow.schema([(name, pyarrow.string()) for name in columns])
+    writer = pyarrow_parquet.ParquetWriter(f_out, schema)
+    try:
+        batch = [[] for _ in columns]
+        count = 0
+        for row in rows:
+            values = [_cell_text(value) for value in row[:width]]
+            if not any(value not in (None, "") for value in values):
+                continue
+            values += [None] * (width - len(values))
+            for column, value in zip(batch, values):
+                column.append(value)
+            count += 1
+            if count >= batch_rows:
+                writer.write_table(pyarrow.Table.from_arrays([pyarrow.array(c, pyarrow.string()) for c in batch],
+                                                             schema=schema))
+                written += count
+                batch = [[] for _ in columns]
+                count = 0
+        if count or not written:
+            writer.write_table(pyarrow.Table.from_arrays([pyarrow.array(c, pyarrow.string()) for c in batch],
+                                                         schema=schema))
+            written += count
+    finally:
+        writer.close()
+    return written
+
+
+class WorkbookExporter:
+    """
+    將輸出的活頁簿逐張工作表匯出成 CSV / Parquet，供倉儲載入程式直接讀取
+
+    匯出檔放在 export_root 下與 output/ 相同的相對位置：{輸出檔名}__{工作表}.csv；
+    標題列依平台設定的關鍵字（shops_master.json 的 export_headers）判斷，未設定時自動判斷；
+    匯出檔經由 OutputCommitter 寫入臨時檔後原子發佈，匯出失敗不影響已完成的輸出
+    """
+
+    FORMATS = ("csv", "parquet")
+
+    def __init__(self, fmt: str, export_root: Union[str, Path], output_root: Optional[Union[str, Path]] = None,
+                 headers: Optional[Dict[str, List[str]]] = None, batch_rows: int = DEFAULT_EXPORT_BATCH_ROWS,
+                 committer: Optional[OutputCommitter] = None):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"不支援的匯出格式：{fmt}")
+        self.fmt = fmt
+        self.export_root = Path(export_root)
+        self.output_root = Path(output_root) if output_root is not None else None
+        self.headers = headers or {}
+        self.batch_rows = max(1, batch_rows)
+        self.committer = committer or OutputCommitter()
+        self.stats = {"workbooks": 0, "sheets": 0, "rows": 0, "failed": 0}
+
+    def keywords_for(self, platform: Optional[str]) -> List[str]:
+        return self.headers.get(platform or "", self.headers.get("*", []))
+
+    @timed_stage("export")
+    def export(self, output_path: Union[str, Path], platform: Optional[str] = None) -> List[Path]:
+        """匯出已發佈的輸出檔"""
+        output_path = Path(output_path)
+        dest_dir = self.export_root
+        if self.output_root is not None:
+            try:
+                dest_dir = self.export_root / output_path.parent.relative_to(self.output_root)
+            except ValueError:
+                pass
+        return self.export_source(output_path, output_path.suffix.lower(), dest_dir, output_path.stem, platform)
+
+    def export_source(self, source: Union[str, Path, bytes], suffix: str, dest_dir: Union[str, Path], stem: str,
+                      platform: Optional[str] = None) -> List[Path]:
+        """匯出路徑或記憶體內的活頁簿（bytes 不落地），回傳匯出檔路徑"""
+        import itertools
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        keywords = self.keywords_for(platform)
+        exported = []
+        try:
+            for sheet_name, width, rows in iter_workbook_sheets(source, suffix):
+                header, data_rows = detect_header(rows, keywords)
+                first = next(data_rows, None)
+                if header is None and first is None:
+                    continue  # 空白工作表
+                if first is not None:
+                    data_rows = itertools.chain([first], data_rows)
+                # 唯讀模式的欄數來自工作表的 dimension 記錄，可能缺少或偏小：以標題列與欄數較大者為準
+                columns = column_names(header, max(width, len(header) if header else 0))
+                if not columns:
+                    continue
+                safe_sheet = SHEET_NAME_UNSAFE.sub("_", sheet_name).strip("_") or f"sheet{len(exported) + 1}"
+                target = dest_dir / f"{stem}__{safe_sheet}.{self.fmt}"
+                counted = []
+                self.committer.write(target, lambda f: counted.append(
+                    write_sheet(data_rows, columns, f, self.fmt, self.batch_rows)))
+                self.stats["sheets"] += 1
+                self.stats["rows"] += counted[0]
+                exported.append(target)
+        except BaseException:
+            self.stats["failed"] += 1
+            raise
+        self.stats["workbooks"] += 1
+        return exported
+
+    def report(self) -> Dict[str, Any]:
+        return dict(self.stats, format=self.fmt, path=str(self.export_root))
+
+
+def export_workbook(source: Union[str, Path, bytes], dest_dir: Union[str, Path], fmt: str = "csv",
+                    suffix: Optional[str] = None, stem: Optional[str] = None, platform: Optional[str] = None,
+                    headers: Optional[Dict[str, List[str]]] = None,
+                    batch_rows: int = DEFAULT_EXPORT_BATCH_ROWS) -> List[Path]:
+    """
+    將單一活頁簿匯出成 CSV / Parquet（可搭配 Decryptor.decrypt_bytes，解密內容不寫入磁碟）
+
+    Args:
+        source: 活頁簿路徑或內容
+        suffix: source 為 bytes 時的副檔名（預設 .xlsx）
+        stem: 匯出檔名前綴（預設為來源檔名，bytes 時為 workbook）
+    """
+    if isinstance(source, bytes):
+        suffix = suffix or ".xlsx"
+        stem = stem or "workbook"
+    else:
+        suffix = suffix or Path(source).suffix.lower()
+        stem = stem or Path(source).stem
+    exporter = WorkbookExporter(fmt, dest_dir, headers=headers, batch_rows=batch_rows)
+    return exporter.export_source(source, suffix, dest_dir, stem, platform)
+
+
+def load_export_headers(data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """讀取 shops_master.json 的 export_headers：{平台: [標題列關鍵字]}（"*" 為預設）"""
+    headers = {}
+    for platform, keywords in (data.get("export_headers") or {}).items():
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+            raise ValueError(f"export_headers.{platform} 必須是字串清單")
+        headers[platform] = keywords
+    return headers
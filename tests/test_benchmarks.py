@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+基準測試腳本的冒煙測試：以極小的資料量實際執行各個 benchmark_*.py，避免腳本悄悄壞掉
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+
+def run_script(script: str, *args: str, cwd: Path) -> str:
+    result = subprocess.run([sys.executable, str(SCRIPTS_DIR / script), *args], cwd=cwd, capture_output=True,
+                            timeout=300, env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+    output = result.stdout.decode("utf-8", "replace") + result.stderr.decode("utf-8", "replace")
+    assert result.returncode == 0, output
+    return output
+
+
+def load(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_corpus(tmp_path: Path) -> dict:
+    # 列數維持預設（200）：過小的活頁簿加密後會落在 mini stream，msoffcrypto 的加密輸出無法解開
+    run_script("benchmark_corpus.py", "generate", "--out", "corpus", "--shops", "2", "--files", "4",
+               "--platforms", "MOMO", "Shopee", "--spin-counts", "1000", "--xls-ratio", "0.25",
+               "--plain-ratio", "0.25", "--zip-ratio", "0.4", "--unknown-ratio", "0.3", cwd=tmp_path)
+    return load(tmp_path / "corpus" / "corpus_manifest.json")
+
+
+def test_corpus_generate_and_run(tmp_path):
+    manifest = generate_corpus(tmp_path)
+    assert sum(manifest["counts"][kind] for kind in ("agile", "plain_xlsx", "xls")) == 8
+    run_script("benchmark_corpus.py", "run", "--corpus", "corpus", "--repeat", "1", "-o", "result.json", cwd=tmp_path)
+    report = load(tmp_path / "result.json")
+    (run,) = report["runs"]
+    assert run["outcomes"].get("ok", 0) == manifest["expected"]["ok"]
+    assert run["outcomes"].get("failed", 0) == manifest["expected"]["failed"]
+    assert report["median"]["wall_seconds"] > 0 and "try_platform_passwords" in report["median"]["stages"]
+
+
+def test_corpus_run_with_ram_workspace(tmp_path):
+    manifest = generate_corpus(tmp_path)
+    ram_root = tmp_path / "ram"
+    ram_root.mkdir()
+    run_script("benchmark_corpus.py", "run", "--corpus", "corpus", "--repeat", "1", "-o", "result.json",
+               "--", "--ram-workspace", str(ram_root), "--ram-workspace-mb", "64", cwd=tmp_path)
+    (run,) = load(tmp_path / "result.json")["runs"]
+    assert run["outcomes"].get("ok", 0) == manifest["expected"]["ok"]
+    # 每個壓縮檔都解壓到 RAM 工作區，結束後工作區清空
+    assert run["temp"]["placed"]["ram"]["archives"] == manifest["counts"]["zip"]
+    assert not any((ram_root / "excel_password_remover").iterdir())
+
+
+def test_startup_benchmark(tmp_path):
+    run_script("benchmark_startup.py", "--repeat", "1", "--top", "3", "-o", "startup.json", cwd=tmp_path)
+    script = load(tmp_path / "startup.json")["targets"]["script"]
+    assert script["idle"]["median_wall_seconds"] > 0 and script["idle"]["median_first_file_seconds"] is None
+    # 沒有檔案可處理時不載入解密模組
+    assert "msoffcrypto" not in script["idle"]["imports"]["loaded"]
+    assert script["one"]["median_first_file_seconds"] is not None
+
+
+def test_decrypt_memory_benchmark(tmp_path):
+    run_script("benchmark_decrypt_memory.py", "--sizes", "1", "--spin-count", "1000", "-o", "memory.json", cwd=tmp_path)
+    (result,) = load(tmp_path / "memory.json")["results"]
+    assert result["size_mb"] == 1 and result["stream"]["seconds"] > 0 and result["msoffcrypto"]["seconds"] > 0
+
+
+def test_tree_benchmark(tmp_path):
+    run_script("benchmark_tree.py", "--shops", "2", "--files", "3", "--workers", "2", "--repeat", "1",
+               "-o", "tree.json", cwd=tmp_path)
+    results = load(tmp_path / "tree.json")["results"]
+    # 各實作走訪到的目錄與檔案數必須一致
+    assert len({json.dumps(entry["counts"], sort_keys=True) for entry in results.values()}) == 1
+
+
+def test_scan_benchmark(tmp_path):
+    run_script("benchmark_scan.py", "--entries", "200", "--repeat", "1", "-o", "scan.json", cwd=tmp_path)
+    results = load(tmp_path / "scan.json")["results"]
+    # 路由表掃描與舊版掃描找到的檔案與平台分類相同
+    assert results["routed"]["counts"] == results["legacy"]["counts"]
+    assert results["routed"]["counts"]["excel"] > 0
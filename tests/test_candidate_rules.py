@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+候選密碼擴展規則測試：產生順序、檔名日期樣板、上限，以及密碼本失敗後以擴展候選破解
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+PASSWORDS = {
+    "pw-a": {"shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲店"},
+    "pw-b": {"shop_id": "MO2", "shop_account": "acct_b", "shop_name": "乙店"},
+}
+
+
+def expand(rules: dict, filename: str = None) -> list:
+    return [password for password, _, _ in bpr.CandidateRules(rules).expand(PASSWORDS, filename)]
+
+
+def test_expansions_follow_probability_order():
+    rules = {"fields": ["shop_account"], "case": ["upper"], "suffixes": ["!", "{mmdd}"], "digits": 1}
+    candidates = expand(rules, "acct_b_report_2025-01-16.xlsx")
+    # 檔名比對到的 acct_b 在每一層都排在前面
+    assert candidates[:4] == ["acct_b", "ACCT_B", "acct_a", "ACCT_A"]
+    assert candidates[4:8] == ["acct_b!", "ACCT_B!", "acct_a!", "ACCT_A!"]
+    assert candidates[8:12] == ["acct_b0116", "ACCT_B0116", "acct_a0116", "ACCT_A0116"]
+    assert candidates[12:] == [f"acct_b{i}" for i in range(10)] + [f"acct_a{i}" for i in range(10)]
+
+
+def test_no_dates_no_duplicates_and_cap():
+    rules = {"fields": ["password", "shop_id"], "case": ["lower"], "prefixes": ["{yyyy}"], "digits": 2,
+             "max_expansions": 5}
+    candidates = expand(rules, "report.xlsx")
+    # 密碼本中已有的 pw-a / pw-b 與重複的小寫不再產生；檔名沒有日期時略過樣板
+    assert candidates == ["MO1", "mo1", "MO2", "mo2", "pw-a0"]
+    assert bpr.filename_dates("x_20250116_20250116_2025.02.03") == [
+        bpr.filename_dates("20250116")[0], bpr.filename_dates("20250203")[0]]
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError, match="MOMO.*suffix"):
+        bpr.load_candidate_rules({"candidate_rules": {"MOMO": {"suffix": ["1"]}}})
+    with pytest.raises(ValueError, match="大小寫"):
+        bpr.CandidateRules({"case": ["camel"]})
+    with pytest.raises(ValueError, match="樣板"):
+        bpr.CandidateRules({"suffixes": ["{date}"]})
+
+
+def test_variant_cracks_after_mapping_fails(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    file_path = input_dir / "acct_b_20250116.xlsx"
+    file_path.write_bytes(encrypt_xlsx(build_xlsx(random.Random(43), 200), "ACCT_B0116", spin_count=1000))
+
+    log_lines = []
+    assert not bpr.try_platform_passwords(file_path, {"MOMO": PASSWORDS}, "MOMO", output_dir, log_lines)
+
+    rules = bpr.load_candidate_rules({"candidate_rules": {"*": {"fields": ["shop_account"], "case": ["upper"],
+                                                                 "suffixes": ["{mmdd}"]}}})
+    ctx = bpr.RunContext(candidate_rules=rules)
+    assert bpr.try_platform_passwords(file_path, {"MOMO": PASSWORDS}, "MOMO", output_dir, log_lines, ctx)
+    outputs = list(output_dir.iterdir())
+    assert len(outputs) == 1 and outputs[0].name.startswith("乙店_MO2_acct_b_")
+    assert any(line.startswith("[RULE]") and "ACCT_B0116" in line for line in log_lines)
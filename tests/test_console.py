@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+主控台輸出測試：依 verbosity 過濾訊息、終端機原地更新的進度行、導向檔案時的定期進度、工作名稱前綴
+"""
+
+import io
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_verbosity_filter_and_prefix():
+    stream = io.StringIO()
+    console = bpr.ConsoleReporter(bpr.NORMAL, stream=stream, prefix="[job-a] ")
+    console.say("[FAIL] 錯誤", bpr.QUIET)
+    console.say("摘要\n\n第二行")
+    console.say("[TEST] 候選密碼", bpr.DEBUG)
+    assert stream.getvalue() == "[job-a] [FAIL] 錯誤\n[job-a] 摘要\n\n[job-a] 第二行\n"
+
+    quiet = io.StringIO()
+    bpr.activate_console(bpr.ConsoleReporter(bpr.QUIET, stream=quiet))
+    try:
+        bpr.say("一般訊息")
+        bpr.say("[FAIL] 錯誤", bpr.QUIET)
+        assert list(bpr.progress_iter([1, 2], "檔案")) == [1, 2]  # quiet 不顯示進度行
+    finally:
+        bpr.activate_console(None)
+    assert quiet.getvalue() == "[FAIL] 錯誤\n"
+
+
+def test_tty_progress_redraws_in_place():
+    stream = FakeTerminal()
+    console = bpr.ConsoleReporter(bpr.NORMAL, stream=stream)
+    bpr.activate_console(console)
+    try:
+        for _ in bpr.progress_iter(["a", "b", "c"], "平台檔案"):
+            bpr.progress_advance(candidates=10)
+            bpr.say("[OK] 完成")
+    finally:
+        bpr.activate_console(None)
+    output = stream.getvalue()
+    # 訊息前先清除進度行，進度行以 \r 原地更新，結束時換行
+    assert "\r[PROGRESS] 平台檔案 0/3" in output and "[PROGRESS] 平台檔案 3/3" in output
+    assert "\n[PROGRESS]" not in output and output.endswith("\n")
+    assert output.count("[OK] 完成\n") == 3
+    assert console.candidates == 30
+
+
+def test_piped_progress_prints_final_line_only():
+    stream = io.StringIO()
+    console = bpr.ConsoleReporter(bpr.NORMAL, stream=stream)
+    console.begin("根目錄壓縮檔", 2)
+    console.advance(files=1)
+    console.advance(files=1)
+    console.finish()
+    lines = stream.getvalue().splitlines()
+    assert "\r" not in stream.getvalue()
+    assert [line.split("  ")[0] for line in lines] == ["[PROGRESS] 根目錄壓縮檔 2/2"]
+    assert bpr._display_width("進度 ab") == 7
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+函式庫 API 測試：decrypt_bytes / decrypt_stream / decrypt_archive 與 Decryptor 的密碼快取
+"""
+
+import io
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import msoffcrypto
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import Decryptor, decrypt_archive, decrypt_bytes, decrypt_stream  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+SHOP = {"shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲店"}
+
+
+@pytest.fixture(scope="module")
+def plaintext():
+    return build_xlsx(random.Random(5), rows=300)
+
+
+@pytest.fixture(scope="module")
+def encrypted(plaintext):
+    return encrypt_xlsx(plaintext, "pw-a", spin_count=1000)
+
+
+class OneWayStream(io.RawIOBase):
+    """不可 seek 的串流（模擬郵件附件的讀取端）"""
+
+    def __init__(self, data: bytes):
+        self._inner = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._inner.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def test_decrypt_bytes_returns_plaintext_and_shop(plaintext, encrypted):
+    result, shop_info = decrypt_bytes(encrypted, {"wrong": None, "pw-a": SHOP})
+    assert result == plaintext and shop_info == SHOP
+    # 未加密檔案原樣回傳
+    assert decrypt_bytes(plaintext, ["pw-a"]) == (plaintext, None)
+    with pytest.raises(msoffcrypto.exceptions.InvalidKeyError):
+        decrypt_bytes(encrypted, ["x", "y"])
+
+
+def test_decrypt_stream_accepts_unseekable_source(plaintext, encrypted):
+    out = io.BytesIO()
+    assert decrypt_stream(OneWayStream(encrypted), out, ["pw-a"], filename="甲店.xlsx") is None
+    assert out.getvalue() == plaintext
+
+
+def test_decrypt_archive_reports_each_member(plaintext, encrypted):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("a.xlsx", encrypted)
+        archive.writestr("b.xlsx", plaintext)
+        archive.writestr("readme.txt", b"skip")
+    results = decrypt_archive(buffer.getvalue(), {"pw-a": SHOP}, archive_name="bundle.zip")
+    assert [(name, data, shop_info, error) for name, data, shop_info, error in results] == [
+        ("a.xlsx", plaintext, SHOP, None),
+        ("b.xlsx", plaintext, None, None),
+    ]
+
+
+def test_decryptor_caches_password_by_content(encrypted):
+    decryptor = Decryptor({"MOMO": {"pw-a": SHOP}})
+    assert decryptor.decrypt_bytes(encrypted, platform="MOMO")[1] == SHOP
+    # 同一份內容再次出現時，快取的密碼排在最前面，即使候選清單已不含該密碼
+    assert decryptor.decrypt_bytes(encrypted, candidates=["x"])[1] == SHOP
+    with pytest.raises(KeyError):
+        decryptor.candidates("Yahoo")
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+本機解密服務測試：以 --serve 啟動服務（Unix socket），透過 decrypt_client 呼叫解密、平台提示、排隊逾時與狀態端點
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import decrypt_client  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="需要 Unix socket")
+
+PLATFORM_INDEX = {
+    "MOMO": {
+        "pw-a": {"shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲店"},
+        "pw-b": {"shop_id": "MO2", "shop_account": "acct_b", "shop_name": "乙店"},
+    },
+    "Shopee": {
+        "pw-c": {"shop_id": "SH1", "shop_account": "acct_c", "shop_name": "丙店"},
+    },
+}
+QUEUE_TIMEOUT = 0.5
+
+
+@pytest.fixture(scope="module")
+def workbooks():
+    plaintext = build_xlsx(random.Random(35), rows=200)
+    return plaintext, encrypt_xlsx(plaintext, "pw-b", spin_count=1000), encrypt_xlsx(plaintext, "pw-c", spin_count=1000)
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    base = tmp_path_factory.mktemp("serve")
+    (base / "config").mkdir()
+    (base / "config" / "shops.json").write_text(json.dumps({"platform_index": PLATFORM_INDEX}, ensure_ascii=False),
+                                                encoding="utf-8")
+    socket_path = base / "epr.sock"
+    process = subprocess.Popen(
+        [sys.executable, str(SCRIPTS_DIR / "batch_password_remover.py"), "--serve", "--unix-socket", str(socket_path),
+         "--base-dir", str(base), "--mapping", "config/shops.json", "--workers", "1", "--max-concurrency", "1",
+         "--queue-timeout", str(QUEUE_TIMEOUT)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while not socket_path.exists():
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            pytest.fail(f"服務未啟動：{process.stdout.read().decode('utf-8', 'replace')}")
+        time.sleep(0.05)
+    yield argparse.Namespace(unix_socket=str(socket_path), host=None, port=None, timeout=30, platform=None)
+    process.terminate()
+    process.wait(timeout=30)
+    assert not socket_path.exists()  # SIGTERM 後移除 socket
+
+
+def post(client, path: str, body: bytes):
+    return decrypt_client.request(client, "POST", path, body)
+
+
+def test_decrypts_with_shop_headers(server, workbooks, tmp_path, capsys):
+    plaintext, encrypted, _ = workbooks
+    status, headers, body = post(server, "/decrypt?platform=MOMO&filename=acct_b.xlsx", encrypted)
+    assert status == 200 and body == plaintext
+    assert headers["X-Encrypted"] == "1" and headers["X-Shop-Id"] == "MO2"
+    assert unquote(headers["X-Shop-Name"]) == "乙店" and unquote(headers["X-Shop-Account"]) == "acct_b"
+
+    # 用戶端儲存解密後的檔案
+    source = tmp_path / "乙店_報表.xlsx"
+    source.write_bytes(encrypted)
+    out_dir = tmp_path / "decrypted"
+    out_dir.mkdir()
+    assert decrypt_client.decrypt_file(argparse.Namespace(**dict(vars(server), platform="MOMO")), source, out_dir)
+    assert (out_dir / source.name).read_bytes() == plaintext
+    assert "商店：乙店 MO2" in capsys.readouterr().out
+
+    status, headers, body = post(server, "/decrypt?filename=plain.xlsx", plaintext)
+    assert status == 200 and body == plaintext and headers["X-Encrypted"] == "0"
+
+
+def test_platform_hint_limits_candidates(server, workbooks):
+    plaintext, _, shopee = workbooks
+    status, _, body = post(server, "/decrypt?platform=MOMO", shopee)
+    assert status == 422 and "error" in json.loads(body)
+    status, headers, body = post(server, "/decrypt?platform=Shopee", shopee)
+    assert status == 200 and body == plaintext and headers["X-Shop-Id"] == "SH1"
+    status, headers, _ = post(server, "/decrypt", shopee)  # 未指定平台時測試所有平台
+    assert status == 200 and headers["X-Shop-Id"] == "SH1"
+    status, _, body = post(server, "/decrypt?platform=Yahoo", shopee)
+    assert status == 400 and "Yahoo" in json.loads(body)["error"]
+
+
+def test_queue_timeout_returns_503(server, workbooks):
+    plaintext, _, _ = workbooks
+    # 送出標頭但暫不送本體：服務已取得唯一的處理空位，正在等待本體
+    holder = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    holder.connect(server.unix_socket)
+    try:
+        holder.sendall(f"POST /decrypt HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(plaintext)}\r\n\r\n"
+                       .encode("ascii"))
+        deadline = time.monotonic() + 10
+        while json.loads(decrypt_client.request(server, "GET", "/health")[2])["inflight"] != 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+        start = time.monotonic()
+        status, _, body = post(server, "/decrypt", plaintext)
+        assert status == 503 and json.loads(body)["error"] == "too many concurrent requests"
+        assert time.monotonic() - start >= QUEUE_TIMEOUT * 0.9
+
+        holder.sendall(plaintext)
+        assert holder.recv(64).startswith(b"HTTP/1.1 200")
+    finally:
+        holder.close()
+    assert post(server, "/decrypt", plaintext)[0] == 200  # 空位釋放後恢復正常
+
+
+def test_health_and_metrics_via_client(server):
+    command = [sys.executable, str(SCRIPTS_DIR / "decrypt_client.py"), "--unix-socket", server.unix_socket]
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    health = subprocess.run(command + ["--health"], capture_output=True, env=env, timeout=30)
+    assert health.returncode == 0
+    status = json.loads(health.stdout)
+    assert status["status"] == "ok" and status["platforms"] == ["MOMO", "Shopee"] and status["workers"] == 1
+
+    metrics = subprocess.run(command + ["--metrics"], capture_output=True, env=env, timeout=30)
+    lines = metrics.stdout.decode("utf-8").splitlines()
+    assert metrics.returncode == 0
+    assert "excel_password_remover_serve_healthy 1" in lines
+    assert "excel_password_remover_serve_max_concurrency 1" in lines
+    assert any(line.startswith("excel_password_remover_serve_requests_total{") for line in lines)
+
+
+def test_refuses_to_replace_regular_file(tmp_path):
+    occupied = tmp_path / "not-a-socket"
+    occupied.write_text("keep", encoding="utf-8")
+    result = subprocess.run([sys.executable, str(SCRIPTS_DIR / "batch_password_remover.py"), "--serve",
+                             "--unix-socket", str(occupied), "--base-dir", str(tmp_path)],
+                            capture_output=True, env=dict(os.environ, PYTHONIOENCODING="utf-8"), timeout=60)
+    assert "不是 socket" in result.stdout.decode("utf-8")
+    assert occupied.read_text(encoding="utf-8") == "keep"
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+內容雜湊去重測試：相同位元組不重新破解、索引跨執行保存、輸出被移走後的項目失效
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+PASSWORDS = {"pw-a": {"shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲店"}}
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    workbook = encrypt_xlsx(build_xlsx(random.Random(27), 200), "pw-a", spin_count=1000)
+    for name in ("a.xlsx", "b.xlsx", "c.xlsx"):
+        (input_dir / name).write_bytes(workbook)
+    return input_dir, output_dir
+
+
+def new_run(output_dir: Path, mode: str = "link") -> bpr.RunContext:
+    return bpr.RunContext(dedupe=bpr.DedupeIndex(output_dir / ".dedupe_index.json", output_dir, mode))
+
+
+def only_output(ctx: bpr.RunContext) -> str:
+    (entry,) = ctx.dedupe.entries.values()
+    return entry["output"]
+
+
+def crack(file_path: Path, output_dir: Path, ctx: bpr.RunContext, log_lines: list) -> bool:
+    return bpr.try_platform_passwords(file_path, {"MOMO": PASSWORDS}, "MOMO", output_dir, log_lines, ctx)
+
+
+def test_identical_bytes_are_not_cracked_twice(dirs, monkeypatch):
+    input_dir, output_dir = dirs
+    ctx = new_run(output_dir)
+    log_lines = []
+    assert crack(input_dir / "a.xlsx", output_dir, ctx, log_lines)
+
+    # 第二份相同內容直接指向既有輸出，不再開檔測試密碼
+    def no_crack(*args, **kwargs):
+        raise AssertionError("重複檔案不應重新破解")
+    monkeypatch.setattr(bpr, "CrackSession", no_crack)
+    assert crack(input_dir / "b.xlsx", output_dir, ctx, log_lines)
+    assert [(name, existing) for name, existing, _ in ctx.dedupe.duplicates] == [("b.xlsx", only_output(ctx))]
+    assert len(list(output_dir.glob("*.xlsx"))) == 2
+    assert any(line.startswith("[DUP] b.xlsx") for line in log_lines)
+
+
+def test_index_persists_across_runs(dirs, monkeypatch):
+    input_dir, output_dir = dirs
+    first = new_run(output_dir)
+    assert crack(input_dir / "a.xlsx", output_dir, first, [])
+    first.dedupe.save()
+
+    monkeypatch.setattr(bpr, "CrackSession", None)  # 下次執行命中索引，不會建立 CrackSession
+    second = new_run(output_dir, mode="record")
+    assert crack(input_dir / "c.xlsx", output_dir, second, [])
+    assert second.dedupe.duplicates == [("c.xlsx", only_output(first), None)]
+    assert len(list(output_dir.glob("*.xlsx"))) == 1  # record 模式不另存
+
+
+def test_stale_entry_is_a_miss(dirs):
+    input_dir, output_dir = dirs
+    first = new_run(output_dir)
+    assert crack(input_dir / "a.xlsx", output_dir, first, [])
+    first.dedupe.save()
+    (output_dir / only_output(first)).unlink()  # 輸出已被移走
+
+    second = new_run(output_dir)
+    digest = bpr.DedupeIndex.hash_file(input_dir / "b.xlsx")
+    assert second.dedupe.lookup(digest) is None and digest not in second.dedupe.entries
+    # 失效後重新破解並重新登記
+    assert crack(input_dir / "b.xlsx", output_dir, second, [])
+    assert second.dedupe.duplicates == [] and second.dedupe.lookup(digest) is not None
+    assert (output_dir / only_output(second)).exists()
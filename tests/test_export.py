@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+工作表匯出測試：依平台關鍵字或自動判斷標題列、分批寫出 CSV / Parquet、記憶體內活頁簿直接匯出
+"""
+
+import csv
+import datetime
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from benchmark_corpus import build_xls  # noqa: E402
+from workbook_export import (WorkbookExporter, detect_header, export_workbook,  # noqa: E402
+                             load_export_headers)
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def build_report(rows: int = 12) -> bytes:
+    """模擬平台報表：前兩列是報表名稱與匯出時間，第三列才是標題"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "訂單 明細"
+    sheet.append(["MOMO 訂單報表"])
+    sheet.append(["匯出時間", datetime.datetime(2026, 10, 19, 8, 0)])
+    sheet.append(["訂單編號", "商品名稱", "數量", "數量", None])
+    for index in range(rows):
+        sheet.append([f"A{index:05d}", f"商品{index}", index, 1.5 * index, None])
+    workbook.create_sheet("空白")
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def read_csv(path: Path) -> list:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_detect_header():
+    rows = [("報表",), ("匯出時間", datetime.datetime(2026, 1, 1)), ("單號", "金額"), ("A1", 10)]
+    header, data = detect_header(iter(rows))
+    assert header == ("單號", "金額") and list(data) == [("A1", 10)]
+    header, data = detect_header(iter(rows), ["匯出時間"])
+    assert header[0] == "匯出時間" and len(list(data)) == 2
+    header, data = detect_header(iter([(1, 2), (3, 4)]))
+    assert header is None and list(data) == [(1, 2), (3, 4)]
+
+
+def test_csv_export_from_memory(tmp_path):
+    exported = export_workbook(build_report(), tmp_path, "csv", stem="momo", platform="MOMO",
+                               headers={"MOMO": ["訂單編號"]}, batch_rows=5)
+    assert [path.name for path in exported] == ["momo__訂單_明細.csv"]
+    rows = read_csv(exported[0])
+    assert rows[0] == ["訂單編號", "商品名稱", "數量", "數量_4", "column_5"]
+    assert rows[1] == ["A00000", "商品0", "0", "0", ""]
+    assert rows[-1] == ["A00011", "商品11", "11", "16.5", ""]
+    assert len(rows) == 13
+    assert not list(tmp_path.glob(".*"))  # 臨時檔都已發佈
+
+
+def test_exporter_mirrors_output_layout(tmp_path):
+    output_root, export_root = tmp_path / "output", tmp_path / "export"
+    output_path = output_root / "2026" / "10" / "店_MO1_acct_20261019_080000_01.xlsx"
+    output_path.parent.mkdir(parents=True)
+    output_path.write_bytes(build_report(3))
+    exporter = WorkbookExporter("csv", export_root, output_root, load_export_headers({"export_headers": {"*": "訂單編號"}}))
+    exported = exporter.export(output_path, "MOMO")
+    assert exported == [export_root / "2026" / "10" / "店_MO1_acct_20261019_080000_01__訂單_明細.csv"]
+    assert exporter.report()["rows"] == 3 and exporter.report()["sheets"] == 1
+
+    with pytest.raises(ValueError, match="export_headers.MOMO"):
+        load_export_headers({"export_headers": {"MOMO": [1]}})
+
+
+def test_parquet_export(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    exported = export_workbook(build_report(), tmp_path, "parquet", stem="momo", batch_rows=4)
+    table = parquet.read_table(exported[0])
+    assert table.column_names == ["訂單編號", "商品名稱", "數量", "數量_4", "column_5"]
+    assert table.num_rows == 12
+    assert table.column("數量_4").to_pylist()[-1] == "16.5"
+
+
+def test_xls_export(tmp_path):
+    pytest.importorskip("xlrd")
+    path = tmp_path / "empty.xls"
+    path.write_bytes(build_xls(random.Random(48)))  # 只有 BOF / EOF 的活頁簿：沒有工作表
+    assert export_workbook(path, tmp_path / "export") == []
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+輸入清單快照測試：新增 / 變更 / 刪除 / 只更動修改時間的判斷、只重新計算變動檔案的雜湊、處理失敗的檔案保留待處理
+（壓縮檔中的工作簿失敗時保留該壓縮檔）
+"""
+
+import json
+import os
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+from input_inventory import InputInventory  # noqa: E402
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    root = tmp_path / "input"
+    for relative in ("MOMO_files/a.xlsx", "MOMO_files/b.zip", "Shopee_files/Order.all.1.xlsx", "root.xls",
+                     ".hidden"):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(relative.encode())
+    return root
+
+
+def bump_mtime(path: Path):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+
+
+def test_diff_against_snapshot(tmp_path, input_dir):
+    snapshot = tmp_path / "log" / "input_inventory.json"
+    first = InputInventory(snapshot, input_dir)
+    state = first.scan()
+    assert sorted(first.diff(state)["added"]) == ["MOMO_files/a.xlsx", "MOMO_files/b.zip", "Shopee_files/Order.all.1.xlsx",
+                                                  "root.xls"]
+    first.save(state)
+
+    (input_dir / "MOMO_files" / "a.xlsx").write_bytes(b"changed content")
+    bump_mtime(input_dir / "MOMO_files" / "a.xlsx")
+    bump_mtime(input_dir / "root.xls")  # 只更動修改時間
+    (input_dir / "Shopee_files" / "Order.all.1.xlsx").unlink()
+    (input_dir / "MOMO_files" / "new.xlsx").write_bytes(b"new")
+
+    second = InputInventory(snapshot, input_dir)
+    state = second.scan()
+    assert second.diff(state) == {"added": ["MOMO_files/new.xlsx"], "modified": ["MOMO_files/a.xlsx"],
+                                  "removed": ["Shopee_files/Order.all.1.xlsx"], "touched": ["root.xls"]}
+    assert second.hashed == 3  # 大小與修改時間沒變的 b.zip 不重新讀取
+    second.save(state)
+
+    third = InputInventory(snapshot, input_dir)
+    assert third.diff(third.scan()) == {"added": [], "modified": [], "removed": [], "touched": []}
+    assert third.hashed == 0
+
+
+def test_pending_files_stay_changed(tmp_path, input_dir):
+    snapshot = tmp_path / "input_inventory.json"
+    inventory = InputInventory(snapshot, input_dir)
+    inventory.save(inventory.scan())
+
+    (input_dir / "MOMO_files" / "a.xlsx").write_bytes(b"retry me")
+    (input_dir / "MOMO_files" / "c.xlsx").write_bytes(b"failed")
+    inventory = InputInventory(snapshot, input_dir, workers=1)
+    state = inventory.scan()
+    inventory.save(state, pending=["MOMO_files/a.xlsx", "MOMO_files/c.xlsx"])
+
+    again = InputInventory(snapshot, input_dir)
+    delta = again.diff(again.scan())
+    assert delta["added"] == ["MOMO_files/c.xlsx"] and delta["modified"] == ["MOMO_files/a.xlsx"]
+
+
+def test_diff_only_scan_skips_hashing_added_files(tmp_path, input_dir):
+    inventory = InputInventory(tmp_path / "missing.json", input_dir)
+    state = inventory.scan(hash_added=False)
+    assert inventory.hashed == 0 and all(record[2] is None for record in state.values())
+    inventory.save(state)  # 寫入前補算雜湊
+    assert InputInventory(tmp_path / "missing.json", input_dir).previous == inventory.previous
+    assert all(record[2] for record in inventory.previous.values())
+
+
+def test_failed_archive_member_keeps_archive_pending(tmp_path):
+    shop = {"shop_id": "MO1", "shop_account": "acct", "shop_name": "店"}
+    (tmp_path / "mapping").mkdir()
+    (tmp_path / "mapping" / "shops_master.json").write_text(json.dumps({"platform_index": {"MOMO": {"pw-m": shop}}}),
+                                                             encoding="utf-8")
+    folder = tmp_path / "input" / "MOMO_files"
+    folder.mkdir(parents=True)
+    workbook = build_xlsx(random.Random(46), rows=200)
+    # 壓縮檔中無法破解的成員與 input/ 中可處理的檔案同名：待處理的應是壓縮檔，不是同名檔案
+    with zipfile.ZipFile(folder / "batch.zip", "w") as zf:
+        zf.writestr("report.xlsx", encrypt_xlsx(workbook, "unknown", spin_count=1000))
+        zf.writestr("other.xlsx", encrypt_xlsx(workbook, "pw-m", spin_count=1000))
+    (folder / "report.xlsx").write_bytes(encrypt_xlsx(workbook, "pw-m", spin_count=1000))
+
+    summary = bpr.main(["--base-dir", str(tmp_path), "--changed-only", "-q", "--no-progress"])
+    assert summary["outcomes"]["ok"] == 2 and summary["outcomes"]["failed"] == 1
+
+    inventory = InputInventory(tmp_path / "log" / "input_inventory.json", tmp_path / "input")
+    assert inventory.diff(inventory.scan())["added"] == ["MOMO_files/batch.zip"]
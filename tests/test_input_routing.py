@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+輸入路由測試：依第一層資料夾判斷平台、檔名規則與略過計數、往下掃描的層數、設定檔驗證
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import RoutingTable, compile_globs, has_pending_input  # noqa: E402
+
+
+def make_files(root: Path, *relatives: str) -> None:
+    for relative in relatives:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def test_platform_for_uses_first_folder_only(tmp_path):
+    routing = RoutingTable(tmp_path / "input")
+    assert routing.platform_for(tmp_path / "input" / "MOMO_files" / "a.xlsx") == "MOMO"
+    assert routing.platform_for(str(tmp_path / "input" / "Yahoo_files" / "sub" / "b.xls")) == "Yahoo"
+    assert routing.platform_for(tmp_path / "input" / "MOMO_files.xlsx") is None  # 根目錄檔案
+    assert routing.platform_for(tmp_path / "input" / "other" / "Shopee_files.xlsx") is None
+    # 壓縮檔解壓到 temp/ 的路徑即使含有平台名稱，也不屬於任何平台
+    assert routing.platform_for(tmp_path / "temp" / "MOMO_files_bundle" / "a.xlsx") is None
+    assert routing.platform_for(tmp_path / "input_old" / "MOMO_files" / "a.xlsx") is None
+
+
+def test_scan_filters_and_counts_skipped(tmp_path):
+    input_dir = tmp_path / "input"
+    make_files(input_dir, "Shopee_files/Order.all.1.xlsx", "Shopee_files/ORDER.ALL.2.XLSX", "Shopee_files/income.xlsx",
+               "Shopee_files/Order.all.3.zip", "MOMO_files/b.xlsx", "MOMO_files/a.xls", "MOMO_files/~$a.xlsx",
+               "MOMO_files/notes.txt", "MOMO_files/nested/c.xlsx", "root.rar", "root.csv")
+    scanned = RoutingTable(input_dir).scan()
+    assert list(scanned) == ["Shopee_files", "MOMO_files", ""]
+    shopee, momo, root = scanned["Shopee_files"], scanned["MOMO_files"], scanned[""]
+    assert [path.name for path in shopee["excel"]] == ["ORDER.ALL.2.XLSX", "Order.all.1.xlsx"]
+    assert [path.name for path in shopee["archives"]] == ["Order.all.3.zip"]
+    assert shopee["skipped"] == 1
+    assert momo["excel"] == [input_dir / "MOMO_files" / "a.xls", input_dir / "MOMO_files" / "b.xlsx"]
+    assert momo["skipped"] == 2  # 暫存檔與 .txt；預設不往下掃描子資料夾
+    assert root == {"excel": [], "archives": [input_dir / "root.rar"], "skipped": 1}
+
+
+def test_depth_and_custom_routes(tmp_path):
+    input_dir = tmp_path / "input"
+    make_files(input_dir, "Momo/2026/10/a.xlsx", "Momo/2026/b.xlsx", "Momo/c.xlsx", "Momo/2026/10/01/d.xlsx")
+    routing = RoutingTable(input_dir, {"folders": {"Momo": {"platform": "MOMO", "depth": 2}}})
+    excel = routing.scan()["Momo"]["excel"]
+    assert sorted(path.name for path in excel) == ["a.xlsx", "b.xlsx", "c.xlsx"]
+    assert {routing.platform_for(path) for path in excel} == {"MOMO"}
+
+    match = compile_globs(["*.XLSX", "Order*", "*all*", "report_??.xls"])
+    assert match("a.xlsx") and match("order_1.csv") and match("x_ALL_y") and match("REPORT_01.xls")
+    assert not match("report_001.xls") and compile_globs([]) is None
+
+
+def test_config_validation_and_load(tmp_path):
+    for config, error in (({"folders": {"X": {}}}, "folders.X：必須指定 platform"),
+                          ({"folders": {"X": "MOMO"}}, "folders.X：必須指定 platform"),
+                          ({"folders": {"X": {"platform": "MOMO", "depth": -1}}}, "folders.X：depth")):
+        with pytest.raises(ValueError, match=error):
+            RoutingTable(tmp_path, config)
+
+    input_dir = tmp_path / "input"
+    routing = RoutingTable.load(input_dir, tmp_path / "missing.json")
+    assert set(routing.routes) >= {"Shopee_files", "MOMO_files"}
+    with pytest.raises(FileNotFoundError):
+        RoutingTable.load(input_dir, tmp_path / "missing.json", required=True)
+
+    config_path = tmp_path / "routing.json"
+    config_path.write_text(json.dumps({"folders": {"Momo": {"platform": "MOMO"}}, "root": {"platform": "Yahoo"}}),
+                           encoding="utf-8")
+    routing = RoutingTable.load(input_dir, config_path)
+    assert list(routing.routes) == ["Momo"] and routing.platform_for(input_dir / "a.xlsx") == "Yahoo"
+
+
+def test_has_pending_input(tmp_path):
+    input_dir = tmp_path / "input"
+    assert not has_pending_input(input_dir)  # input/ 不存在
+    make_files(input_dir, "Shopee_files/income.xlsx", "MOMO_files/notes.txt")
+    assert not has_pending_input(input_dir)
+    make_files(input_dir, "Shopee_files/Order.all.1.xlsx")
+    assert has_pending_input(input_dir)
+    assert not has_pending_input(input_dir, RoutingTable(input_dir, {"folders": {}, "root": {"exclude": ["*"]}}))
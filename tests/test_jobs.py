@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+多工作批次測試：工作清單驗證、選項轉傳、失敗的工作回傳錯誤且不留下生效中的狀態，
+以及一次執行處理多組 input / mapping / output
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import generate_corpus  # noqa: E402
+from job_runner import load_job_specs, strip_job_options  # noqa: E402
+
+
+def write_jobs(path: Path, jobs) -> Path:
+    path.write_text(json.dumps({"jobs": jobs}), encoding="utf-8")
+    return path
+
+
+def test_job_specs_defaults_and_validation(tmp_path):
+    jobs = load_job_specs(write_jobs(tmp_path / "jobs.json", [
+        {"name": "north", "input": "north/input", "mapping": "north/mapping/shops_master.json"},
+        {"name": "south", "input": str(tmp_path / "south"), "output": "out/south", "log": "logs/south"},
+    ]), tmp_path)
+    assert jobs[0]["output"] == tmp_path / "output" / "north" and jobs[0]["log"] == tmp_path / "log" / "north"
+    assert jobs[1]["mapping"] == tmp_path / "mapping" / "shops_master.json"
+    assert jobs[1]["input"] == tmp_path / "south"
+
+    for bad, error in (([{"name": "a b", "input": "x"}], "name"),
+                       ([{"name": "a"}], "缺少 input"),
+                       ([{"name": "a", "input": "x"}, {"name": "b", "input": "x"}], "input 與其他工作重複"),
+                       ([{"name": "a", "input": "x", "output": "o"}, {"name": "b", "input": "y", "output": "o"}],
+                        "output 與其他工作重複"),
+                       ([], "非空")):
+        with pytest.raises(ValueError, match=error):
+            load_job_specs(write_jobs(tmp_path / "bad.json", bad), tmp_path)
+
+
+def test_strip_job_options():
+    assert strip_job_options(["--jobs", "j.json", "-q", "--job-workers=2", "--dedupe", "off", "--job-workers", "3",
+                              "--jobs=x.json"]) == ["-q", "--dedupe", "off"]
+
+
+def test_failed_run_returns_error_and_deactivates_state(tmp_path):
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "a.xlsx").write_bytes(b"x")
+    summary = bpr.main(["--base-dir", str(tmp_path), "--mapping", "missing.json", "--profile", "--run-timeout", "60",
+                        "-q", "--no-progress"])
+    assert "missing.json" in summary["error"]
+    # 同一工作程序接著執行的下一個工作不會沿用這次的統計、日誌、剖析與截止時間
+    assert bpr._ACTIVE_METRICS is None and bpr._ACTIVE_LOG is None and bpr._ACTIVE_PROFILER is None
+    assert bpr._RUN_BUDGET is None and bpr._CONSOLE is None
+
+    (tmp_path / "mapping").mkdir()
+    (tmp_path / "mapping" / "routing.json").write_text("{not json", encoding="utf-8")
+    assert "路由設定無效" in bpr.main(["--base-dir", str(tmp_path), "-q"])["error"]
+
+
+def test_jobs_run_in_one_invocation(tmp_path):
+    expected = {}
+    for index, name in enumerate(("north", "south")):
+        manifest = generate_corpus(tmp_path / name, shops=2, files=4, platforms=["MOMO", "Yahoo"], spin_counts=[1000],
+                                   rows=200, xls_ratio=0, plain_ratio=0.2, zip_ratio=0.3, unknown_ratio=0.1,
+                                   seed=47 + index)
+        expected[name] = manifest["expected"]["ok"]
+    jobs_path = write_jobs(tmp_path / "jobs.json", [
+        {"name": name, "input": f"{name}/input", "mapping": f"{name}/mapping/shops_master.json",
+         "output": f"{name}/output"} for name in expected
+    ])
+    command = [sys.executable, str(SCRIPTS_DIR / "batch_password_remover.py"), "--base-dir", str(tmp_path),
+               "--jobs", str(jobs_path), "--job-workers", "2", "-q"]
+    result = subprocess.run(command, capture_output=True, timeout=300)
+    assert result.returncode == 0, result.stderr.decode(errors="replace")
+
+    for name, ok in expected.items():
+        assert len(list((tmp_path / name / "output").glob("*.xlsx"))) == ok
+        assert len(list((tmp_path / "log" / name).glob("run_report_*.json"))) == 1
+    report = json.loads(next((tmp_path / "log").glob("jobs_report_*.json")).read_text(encoding="utf-8"))
+    assert sorted(job["name"] for job in report["jobs"]) == sorted(expected)
+    assert all("error" not in job for job in report["jobs"])
+    assert list((tmp_path / "temp").iterdir()) == []
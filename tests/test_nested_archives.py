@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+巢狀壓縮檔展開測試：逐層在記憶體中展開、每層嘗試候選密碼、層數 / 總量 / 壓縮比上限
+"""
+
+import io
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import (ArchiveLimits, Decryptor, UnpackLimitExceeded,  # noqa: E402
+                                    expand_nested_archives, walk_archive)
+from benchmark_corpus import build_encrypted_zip, build_xlsx, encrypt_xlsx  # noqa: E402
+
+ZIP_PASSWORD = "bundle-pw"
+SHOP = {"shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲店"}
+
+
+def plain_zip(members: dict, compression: int = zipfile.ZIP_STORED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def workbook():
+    return build_xlsx(random.Random(37), 20)
+
+
+@pytest.fixture(scope="module")
+def nested_bundle(workbook):
+    """月結.zip → MOMO.zip（ZipCrypto 加密）→ 明細/深層.zip → 報表.xlsx，另有第一、二層的 Excel 與雜項檔"""
+    deepest = plain_zip({"報表.xlsx": workbook, "readme.txt": b"ignored"})
+    middle = build_encrypted_zip({"第二層.xlsx": workbook, "明細/深層.zip": deepest}, ZIP_PASSWORD,
+                                 random.Random(1))
+    return plain_zip({"第一層.xlsx": workbook, "MOMO.zip": middle})
+
+
+def test_walk_archive_yields_excel_at_every_depth(nested_bundle, workbook):
+    members = list(walk_archive(io.BytesIO(nested_bundle), [ZIP_PASSWORD], ArchiveLimits().new_budget()))
+    assert [(path, error) for path, _, error in members] == [
+        ("第一層.xlsx", None),
+        ("MOMO.zip/第二層.xlsx", None),
+        ("MOMO.zip/明細/深層.zip/報表.xlsx", None),
+    ]
+    assert all(content == workbook for _, content, _ in members)
+
+
+def test_walk_archive_reports_wrong_password(nested_bundle):
+    members = list(walk_archive(io.BytesIO(nested_bundle), ["wrong"], ArchiveLimits().new_budget()))
+    errors = {path: error for path, content, error in members if content is None}
+    assert errors == {"MOMO.zip/第二層.xlsx": "壓縮檔密碼錯誤", "MOMO.zip/明細/深層.zip": "壓縮檔密碼錯誤"}
+
+
+def test_walk_archive_depth_limit(nested_bundle):
+    members = list(walk_archive(io.BytesIO(nested_bundle), [ZIP_PASSWORD], ArchiveLimits(max_depth=1).new_budget()))
+    assert [path for path, content, _ in members if content is not None] == ["第一層.xlsx", "MOMO.zip/第二層.xlsx"]
+    assert members[-1][0] == "MOMO.zip/明細/深層.zip"
+    assert "層數上限" in members[-1][2]
+
+
+def test_walk_archive_stops_on_compression_ratio():
+    bomb = plain_zip({"zeros.xlsx": b"\0" * (4 * 1024 * 1024)}, zipfile.ZIP_DEFLATED)
+    with pytest.raises(UnpackLimitExceeded, match="壓縮比"):
+        list(walk_archive(io.BytesIO(plain_zip({"inner.zip": bomb})), [], ArchiveLimits().new_budget()))
+
+
+def test_walk_archive_total_budget_spans_levels(nested_bundle, workbook):
+    limits = ArchiveLimits(max_bytes=len(workbook) * 2, max_ratio=0)
+    with pytest.raises(UnpackLimitExceeded):
+        list(walk_archive(io.BytesIO(nested_bundle), [ZIP_PASSWORD], limits.new_budget()))
+
+
+def test_expand_nested_archives_writes_only_excel(nested_bundle, tmp_path):
+    with zipfile.ZipFile(io.BytesIO(nested_bundle)) as archive:
+        archive.extractall(tmp_path)
+        first_level = archive.namelist()
+    log_lines = []
+    nested = expand_nested_archives(tmp_path, first_level, [ZIP_PASSWORD], ArchiveLimits(), log_lines)
+    assert sorted(Path(name).as_posix() for name in nested) == [
+        "nested/MOMO.zip/明細/深層.zip/報表.xlsx",
+        "nested/MOMO.zip/第二層.xlsx",
+    ]
+    assert all((tmp_path / name).is_file() for name in nested)
+    assert not list(tmp_path.rglob("*.txt")) and log_lines == []
+
+
+def test_expand_nested_archives_logs_zip_bomb(tmp_path):
+    (tmp_path / "inner.zip").write_bytes(plain_zip({"zeros.xlsx": b"\0" * (4 * 1024 * 1024)}, zipfile.ZIP_DEFLATED))
+    log_lines = []
+    assert expand_nested_archives(tmp_path, ["inner.zip"], [], ArchiveLimits(), log_lines) == []
+    assert len(log_lines) == 1 and "zip bomb" in log_lines[0]
+
+
+def test_decryptor_decrypts_nested_members():
+    workbook = build_xlsx(random.Random(7), 500)
+    encrypted = encrypt_xlsx(workbook, "pw-a", spin_count=1000)
+    inner = build_encrypted_zip({"acct_a_訂單.xlsx": encrypted}, "pw-a", random.Random(2))
+    bundle = plain_zip({"MOMO.zip": inner})
+
+    decryptor = Decryptor({"MOMO": {"pw-a": SHOP, "pw-b": {"shop_id": "MO2"}}})
+    results = decryptor.decrypt_archive(bundle, platform="MOMO", archive_name="月結.zip")
+    assert [(name, shop, error) for name, _, shop, error in results] == [("MOMO.zip/acct_a_訂單.xlsx", SHOP, None)]
+    assert results[0][1] == workbook
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+原子化輸出測試：.partial 臨時檔、未加密檔案的 rename / reflink / 硬連結 / 複製、殘留臨時檔清除
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import OutputCommitter  # noqa: E402
+
+fcntl = pytest.importorskip("fcntl")
+DATA = b"PK\x03\x04 workbook bytes"
+
+
+@pytest.fixture
+def no_reflink(monkeypatch):
+    def fail(*args):
+        raise OSError(95, "Operation not supported")
+    monkeypatch.setattr(fcntl, "ioctl", fail)
+
+
+@pytest.fixture
+def fake_reflink(monkeypatch):
+    """以寫入來源內容模擬 FICLONE 成功"""
+    def clone(dst_fd, request, src_fd):
+        os.write(dst_fd, os.pread(src_fd, 1 << 20, 0))
+    monkeypatch.setattr(fcntl, "ioctl", clone)
+
+
+def make_source(directory: Path, name: str = "a.xlsx") -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(DATA)
+    return path
+
+
+def test_write_is_atomic(tmp_path):
+    committer = OutputCommitter()
+    final_path = tmp_path / "out.xlsx"
+
+    def writer(f_out):
+        f_out.write(DATA)
+        # 寫入途中正式檔名尚不存在，只有 .partial 臨時檔
+        assert not final_path.exists()
+        assert [p.name.split(OutputCommitter.TEMP_MARKER)[0] for p in tmp_path.iterdir()] == ["out.xlsx"]
+
+    assert committer.write(final_path, writer) == final_path
+    assert final_path.read_bytes() == DATA and committer.stats["write"] == 1
+
+    def broken(f_out):
+        f_out.write(b"half")
+        raise RuntimeError("中斷")
+
+    with pytest.raises(RuntimeError):
+        committer.write(tmp_path / "broken.xlsx", broken)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.xlsx"]
+
+
+def test_scratch_files_are_renamed(tmp_path):
+    scratch = tmp_path / "temp"
+    source = make_source(scratch)
+    committer = OutputCommitter(scratch_roots=[scratch])
+    assert committer.publish_plain(source, tmp_path / "out.xlsx") == "rename"
+    assert not source.exists() and (tmp_path / "out.xlsx").read_bytes() == DATA
+
+
+def test_input_files_use_reflink(tmp_path, fake_reflink):
+    source = make_source(tmp_path / "input")
+    final_path = tmp_path / "output" / "a.xlsx"
+    final_path.parent.mkdir()
+    assert OutputCommitter().publish_plain(source, final_path) == "reflink"
+    assert final_path.read_bytes() == DATA and source.exists()
+
+
+def test_input_files_are_copied_never_linked(tmp_path, no_reflink):
+    source = make_source(tmp_path / "input")
+    final_path = tmp_path / "output" / "a.xlsx"
+    final_path.parent.mkdir()
+    committer = OutputCommitter()
+    assert committer.publish_plain(source, final_path) == "copy"
+    # input/ 與 output/ 不共用 inode：覆寫來源不影響已發佈的輸出
+    assert not os.path.samefile(source, final_path)
+    source.write_bytes(b"changed")
+    assert final_path.read_bytes() == DATA
+    assert committer.stats["link"] == 0 and committer.stats["copy"] == 1
+
+
+def test_duplicate_outputs_fall_back_to_link_then_copy(tmp_path, no_reflink, monkeypatch):
+    existing = make_source(tmp_path / "output")
+    committer = OutputCommitter()
+    assert committer.publish_plain(existing, tmp_path / "output" / "b.xlsx", verify=False, link=True) == "link"
+    assert os.path.samefile(existing, tmp_path / "output" / "b.xlsx")
+
+    # --copy-plain：即使允許硬連結也完整複製
+    copy_only = OutputCommitter(link_plain=False)
+    assert copy_only.publish_plain(existing, tmp_path / "output" / "c.xlsx", verify=False, link=True) == "copy"
+
+    def no_link(*args):
+        raise OSError(18, "Invalid cross-device link")
+    monkeypatch.setattr(os, "link", no_link)
+    assert committer.publish_plain(existing, tmp_path / "output" / "d.xlsx", verify=False, link=True) == "copy"
+    assert (tmp_path / "output" / "d.xlsx").read_bytes() == DATA
+    assert not list((tmp_path / "output").glob(f"*{OutputCommitter.TEMP_MARKER}*"))
+
+
+def test_sweep_stale(tmp_path):
+    nested = tmp_path / "MOMO"
+    nested.mkdir()
+    dead = nested / f"a.xlsx{OutputCommitter.TEMP_MARKER}999999999-1"
+    alive = tmp_path / f"b.xlsx{OutputCommitter.TEMP_MARKER}{os.getpid()}-1"
+    for path in (dead, alive):
+        path.write_bytes(b"half")
+
+    committer = OutputCommitter(output_dir=tmp_path)
+    assert committer.swept == [dead]
+    assert alive.exists() and not dead.exists()
+
+    # 共用 output/ 時無法判斷其他主機的 PID，只以檔案年齡認定殘留
+    shared = OutputCommitter(shared=True)
+    assert shared.sweep_stale(tmp_path) == []
+    old = time.time() - OutputCommitter.STALE_AGE - 60
+    os.utime(alive, (old, old))
+    assert shared.sweep_stale(tmp_path) == [alive]
+    assert OutputCommitter().sweep_stale(tmp_path / "missing") == []
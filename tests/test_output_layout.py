@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+分層輸出配置測試：分層資料夾內的流水號分配、配置欄位檢查、平面輸出遷移與去重索引更新
+"""
+
+import datetime
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import OutputLayout, output_base_name  # noqa: E402
+from migrate_output_layout import plan_moves, shop_suffixes, update_dedupe_index  # noqa: E402
+
+SHOP = {"platform": "MOMO", "shop_id": "MO1", "shop_account": "acct_a", "shop_name": "甲 店"}
+OTHER = {"platform": "MOMO", "shop_id": "MO1", "shop_account": "a", "shop_name": "乙店"}
+
+
+def test_allocate_sequences_within_shard(tmp_path):
+    layout = OutputLayout("sharded")
+    base_name = output_base_name(SHOP)
+    first = layout.allocate(tmp_path, base_name, ".xlsx", "MOMO", SHOP)
+    second = layout.allocate(tmp_path, base_name, ".xlsx", "MOMO", SHOP)
+    now = datetime.datetime.now()
+    assert first.parent == tmp_path / f"{now:%Y}" / f"{now:%m}" / "MOMO" / "MO1"
+    assert first.parent.is_dir() and first.name.endswith("_01.xlsx") and second.name.endswith("_02.xlsx")
+    assert first.name.startswith("甲_店_MO1_acct_a_")
+
+    # 新的配置物件重新讀取資料夾內既有檔名
+    first.write_bytes(b"x")
+    again = OutputLayout("sharded").allocate(tmp_path, base_name, ".xlsx", "MOMO", SHOP)
+    assert again != first and not again.exists()
+
+
+def test_flat_layout_keeps_output_root(tmp_path):
+    path = OutputLayout().allocate(tmp_path, "店_MO1_acct", ".xlsx", "MOMO", SHOP)
+    assert path.parent == tmp_path and path.name.endswith("_01.xlsx")
+
+
+def test_layout_fields_are_validated_and_saved(tmp_path):
+    with pytest.raises(ValueError, match="shop_name"):
+        OutputLayout("{yyyy}/{shop_name}")
+    layout = OutputLayout("{platform}/{shop_account}/")
+    assert layout.directory(tmp_path, "Yahoo", {"shop_account": "a/b:c"}) == tmp_path / "Yahoo" / "a_b_c"
+    assert OutputLayout.saved(tmp_path) is None
+    layout.save(tmp_path)
+    assert OutputLayout.saved(tmp_path) == "{platform}/{shop_account}"
+
+
+def test_migration_moves_flat_outputs_and_rewrites_index(tmp_path):
+    indexed = "甲_店_MO1_acct_a_20250116_143052_01.xlsx"
+    by_name = "乙店_MO1_a_20250203_090000_01.xlsx"
+    for name in (indexed, by_name, "notes.txt", ".dedupe_index.json", "x.partial-1.xlsx"):
+        (tmp_path / name).write_bytes(b"x")
+    index = {"entries": {"sha": dict(SHOP, output=indexed)}}
+    suffixes = shop_suffixes({"shops": [SHOP, OTHER]})
+
+    layout = OutputLayout("sharded")
+    moves, skipped = plan_moves(tmp_path, layout, index["entries"], suffixes)
+    targets = {source.name: target.relative_to(tmp_path).as_posix() for source, target in moves}
+    assert targets == {indexed: f"2025/01/MOMO/MO1/{indexed}", by_name: f"2025/02/MOMO/MO1/{by_name}"}
+    assert skipped == [("notes.txt", "找不到對應商店")]
+
+    index_path = tmp_path / ".dedupe_index.json"
+    assert update_dedupe_index(index_path, index, targets) == 1
+    assert json.loads(index_path.read_text(encoding="utf-8"))["entries"]["sha"]["output"] == targets[indexed]
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+輸出完整性檢查測試：ZIP 中央目錄、CRC 與 [Content_Types].xml，OLE 檔頭與 FAT，未通過的輸出移到隔離區
+"""
+
+import io
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import OutputCommitter, OutputVerificationError, OutputVerifier  # noqa: E402
+from benchmark_corpus import build_xls, build_xlsx  # noqa: E402
+
+XLSX = build_xlsx(random.Random(44), 200)
+XLS = build_xls(random.Random(44))
+
+
+def corrupt_member(data: bytes, name: str) -> bytes:
+    """在不更動 CRC 記錄的情況下改壞成員內容"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.getinfo(name)
+    offset = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra) + info.compress_size // 2
+    broken = bytearray(data)
+    broken[offset] ^= 0xFF
+    return bytes(broken)
+
+
+def without_member(data: bytes, name: str) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            if info.filename != name:
+                dst.writestr(info, src.read(info))
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_xlsx_checks(tmp_path, workers):
+    verifier = OutputVerifier(workers)
+    verifier.PARALLEL_MIN_BYTES = 0  # 小檔案也走執行緒池
+    cases = {
+        "ok.xlsx": (XLSX, None),
+        "truncated.xlsx": (XLSX[:-200], "ZIP"),
+        "crc.xlsx": (corrupt_member(XLSX, "xl/worksheets/sheet1.xml"), "ZIP"),
+        "no_types.xlsx": (without_member(XLSX, "[Content_Types].xml"), "Content_Types"),
+    }
+    for name, (data, error) in cases.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        if error is None:
+            verifier.verify(path)
+        else:
+            with pytest.raises(OutputVerificationError, match=error):
+                verifier.verify(path)
+    verifier.close()
+    assert verifier.stats["files"] == 1 and verifier.stats["failed"] == 3
+    assert verifier.report()["bytes"] == len(XLSX)
+
+
+def test_xls_checks(tmp_path):
+    verifier = OutputVerifier()
+    path = tmp_path / "ok.xls"
+    path.write_bytes(XLS)
+    verifier.verify(path)
+    for data, error in ((XLS[:-1024], "超出檔案範圍"), (b"\0" * 8 + XLS[8:], "簽章"), (XLS[:300], "簽章")):
+        path.write_bytes(data)
+        with pytest.raises(OutputVerificationError, match=error):
+            verifier.verify(path)
+    # 臨時檔名沒有 .xls 副檔名時依最終檔名的副檔名檢查
+    partial = tmp_path / "ok.xls.partial-1-1"
+    partial.write_bytes(XLS[:-1024])
+    with pytest.raises(OutputVerificationError):
+        verifier.verify(partial, ".xls")
+    verifier.verify(tmp_path / "notes.csv")  # 其他格式不檢查
+
+
+def test_corrupt_outputs_are_quarantined(tmp_path):
+    output_dir, quarantine_dir, scratch = tmp_path / "output", tmp_path / "quarantine", tmp_path / "temp"
+    for directory in (output_dir, scratch):
+        directory.mkdir()
+    committer = OutputCommitter(scratch_roots=[scratch], verifier=OutputVerifier(), quarantine_dir=quarantine_dir)
+
+    with pytest.raises(OutputVerificationError, match="已移至"):
+        committer.write(output_dir / "a.xlsx", lambda f: f.write(XLSX[:-200]))
+    committer.write(output_dir / "b.xlsx", lambda f: f.write(XLSX))
+
+    source = tmp_path / "input.xls"
+    source.write_bytes(XLS[:-1024])
+    with pytest.raises(OutputVerificationError):
+        committer.publish_plain(source, output_dir / "c.xls")
+    assert source.exists()  # input/ 的來源保留原處
+    extracted = scratch / "d.xlsx"
+    extracted.write_bytes(b"PK not really")
+    with pytest.raises(OutputVerificationError):
+        committer.publish_plain(extracted, output_dir / "d.xlsx")
+    assert not extracted.exists()
+    committer.close()
+
+    assert [p.name for p in output_dir.iterdir()] == ["b.xlsx"]
+    assert sorted(p.name.split(".")[0] for p in quarantine_dir.iterdir()) == ["a", "c", "d"]
+    assert [final.name for final, _, _ in committer.quarantined] == ["a.xlsx", "c.xls", "d.xlsx"]
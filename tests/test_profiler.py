@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+效能剖析測試：只剖析符合 --profile-files 的檔案、取樣執行緒延後建立、輸出 .pstats 與 collapsed stack
+"""
+
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+
+
+def sampler_threads() -> list:
+    return [thread for thread in threading.enumerate() if thread.name == "profile-sampler"]
+
+
+def busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_sampler_starts_only_for_matching_files(tmp_path):
+    before = len(sampler_threads())
+    profiler = bpr.HotPathProfiler(["*slow*", "momo_files"], interval=0.001)
+    bpr.activate_profiler(profiler)
+    try:
+        assert profiler.matches("input/MOMO_files/a.xlsx") and profiler.matches("Slow_report.xlsx")
+        with bpr.metrics_file("input/Yahoo_files/a.xlsx"):
+            busy(0.02)
+        assert len(sampler_threads()) == before  # 沒有符合的檔案時不建立取樣執行緒
+
+        with bpr.metrics_file("input/Yahoo_files/slow.xlsx"):
+            busy(0.2)
+        assert len(sampler_threads()) == before + 1
+    finally:
+        bpr.activate_profiler(None)
+
+    pstats_path, collapsed_path = profiler.save(tmp_path, "run")
+    assert len(sampler_threads()) == before
+    assert profiler.samples > 0
+    functions = {name for _, _, name in pstats.Stats(str(pstats_path)).stats}
+    assert "busy" in functions
+    stacks = [line.rsplit(" ", 1) for line in collapsed_path.read_text(encoding="utf-8").splitlines()]
+    assert all(count.isdigit() for _, count in stacks)
+    assert any(stack.endswith("test_profiler.py:busy") for stack, _ in stacks)
+
+
+def test_unused_profiler_saves_empty_stacks(tmp_path):
+    profiler = bpr.HotPathProfiler(["never-matches"])
+    _, collapsed_path = profiler.save(tmp_path, "idle")
+    assert profiler.samples == 0 and collapsed_path.read_text(encoding="utf-8") == ""
+    assert not bpr.HotPathProfiler().matches("a.xlsx")  # 整次執行剖析時不逐檔開關
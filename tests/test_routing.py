@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+商店比對規則測試：批次處理（main）與 Decryptor 共用 match_shop
+"""
+
+import io
+import random
+import sys
+from pathlib import Path
+
+import msoffcrypto
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import MO_STORE_PLUS, Decryptor, match_shop, route_candidates  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+
+def shop(shop_id: str, account: str, name: str) -> dict:
+    return {"shop_id": shop_id, "shop_account": account, "shop_name": name}
+
+
+PLATFORM_INDEX = {
+    "MOMO": {
+        "pw-a": shop("MO1", "acct_a", "甲店"),
+        "pw-b": shop("MO2", "acct_b", "乙店"),
+    },
+    "Shopee": {
+        "pw-c": shop("SH1", "acct_c", "丙店"),
+    },
+    "mo_store_plus": {
+        "pw-plus": shop("MP1", "acct_plus", "加店"),
+    },
+}
+ALL_ACCOUNTS = {info["shop_account"]: info
+                for passwords in PLATFORM_INDEX.values() for info in passwords.values()}
+
+
+def test_match_shop_account_then_name():
+    assert match_shop("acct_b_訂單.xlsx", "MOMO", PLATFORM_INDEX, ALL_ACCOUNTS) == ("MOMO", "acct_b")
+    assert match_shop("乙店_訂單.xlsx", "MOMO", PLATFORM_INDEX, ALL_ACCOUNTS) == ("MOMO", "acct_b")
+    assert match_shop("其他.xlsx", "MOMO", PLATFORM_INDEX, ALL_ACCOUNTS) == ("MOMO", None)
+
+
+def test_match_shop_restricts_to_platform_accounts():
+    assert match_shop("acct_c.xlsx", "MOMO", PLATFORM_INDEX, ALL_ACCOUNTS) == ("MOMO", None)
+    assert match_shop("acct_c.xlsx", None, PLATFORM_INDEX, ALL_ACCOUNTS) == (None, "acct_c")
+
+
+@pytest.mark.parametrize("filename, platform", [
+    ("MO_Store_Plus_acct_a.xlsx", "MOMO"),
+    ("report.xlsx", "mo_store_plus"),
+])
+def test_match_shop_mo_store_plus(filename, platform):
+    assert match_shop(filename, platform, PLATFORM_INDEX, ALL_ACCOUNTS) == ("mo_store_plus", MO_STORE_PLUS)
+
+
+def test_route_candidates_puts_matched_shop_first():
+    pairs = route_candidates(PLATFORM_INDEX["MOMO"], "乙店_訂單.xlsx")
+    assert [password for password, _ in pairs] == ["pw-b", "pw-a"]
+    assert [password for password, _ in route_candidates(["x", "y"], "乙店.xlsx")] == ["x", "y"]
+
+
+def test_decryptor_routes_mo_store_plus_files():
+    plaintext = build_xlsx(random.Random(3), rows=500)  # 大於 4096 bytes，不放在 mini stream
+    encrypted = encrypt_xlsx(plaintext, "pw-plus", spin_count=1000)
+    decryptor = Decryptor(PLATFORM_INDEX)
+
+    result, shop_info = decryptor.decrypt_bytes(encrypted, platform="MOMO", filename="MO_Store_Plus_報表.xlsx")
+    assert result == plaintext
+    assert shop_info["shop_id"] == "MP1"
+
+    # 檔名不含 MO_Store_Plus 時只測 MOMO 平台（另建 Decryptor，避開內容雜湊快取）
+    with pytest.raises(msoffcrypto.exceptions.InvalidKeyError):
+        Decryptor(PLATFORM_INDEX).decrypt_stream(io.BytesIO(encrypted), io.BytesIO(),
+                                                 platform="MOMO", filename="報表.xlsx")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+結構化日誌測試：層級過濾、依大小與時間輪替、保留天數清理、由記錄產生文字日誌
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+
+
+def read_lines(path: Path) -> list:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_levels_and_context(tmp_path):
+    run_log = bpr.RunLog(tmp_path, "run-1", batch_size=100)
+    run_log.append("[FAIL] a.xlsx")
+    run_log.append("[WARN] b.xlsx")
+    run_log.append("[OK] c.xlsx")
+    run_log.record("candidate", level="debug", password="x")  # 低於 min_level 不寫入
+    metrics = bpr.RunMetrics()
+    bpr.activate_metrics(metrics)
+    try:
+        with bpr.metrics_file("input/MOMO_files/d.xlsx", platform="MOMO"), bpr.metrics_stage("crack"):
+            run_log.record("tested", tried=3, skipped=None)
+    finally:
+        bpr.activate_metrics(None)
+    assert not run_log.active_path.exists()  # 尚未達到批次大小
+    run_log.close()
+
+    entries = read_lines(run_log.active_path)
+    assert [entry["level"] for entry in entries] == ["error", "warning", "info", "info"]
+    assert entries[-1]["file"] == "d.xlsx" and entries[-1]["platform"] == "MOMO" and entries[-1]["stage"] == "crack"
+    assert entries[-1]["tried"] == 3 and "skipped" not in entries[-1]
+    assert run_log.records_written == 4
+
+
+def test_rotation_and_render_text(tmp_path):
+    # 前一次執行留下的記錄：不屬於本次，產生文字日誌時略過
+    (tmp_path / bpr.RunLog.ACTIVE_NAME).write_text(
+        json.dumps({"epoch": time.time(), "run": "old", "level": "info", "msg": "舊訊息"}) + "\n", encoding="utf-8")
+    run_log = bpr.RunLog(tmp_path, "run-2", max_bytes=200, batch_size=1)
+    for index in range(5):
+        run_log.append(f"[OK] 檔案 {index}")
+    run_log.close()
+
+    rotated = sorted(tmp_path.glob("batch_removal_*.jsonl"))
+    assert rotated and all(path.stat().st_size <= 400 for path in rotated)
+    assert len(run_log.segments) >= 2 and run_log.segments[-1] == run_log.active_path
+
+    text_path = tmp_path / "batch_removal_log_1.txt"
+    run_log.render_text(text_path)
+    assert text_path.read_text(encoding="utf-8") == "\n".join(f"[OK] 檔案 {index}" for index in range(5))
+
+    # 使用中的檔案最早一筆超過 max_age 時也輪替
+    aged = bpr.RunLog(tmp_path, "run-3", max_age_hours=0, batch_size=1)
+    aged.append("[OK] new")
+    aged.close()
+    assert read_lines(aged.active_path)[0]["run"] == "run-3"
+
+
+def test_prune_keeps_recent_files(tmp_path):
+    old = time.time() - 20 * 86400
+    for name in ("batch_removal_20200101_000000.jsonl", "run_report_20200101.json", "profile_x.pstats",
+                 "notes.txt"):
+        path = tmp_path / name
+        path.write_text("{}", encoding="utf-8")
+        os.utime(path, (old, old))
+    (tmp_path / "run_report_new.json").write_text("{}", encoding="utf-8")
+
+    run_log = bpr.RunLog(tmp_path, "run-4", keep_days=14)
+    assert run_log.prune() == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["notes.txt", "run_report_new.json"]
+    run_log.close()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+執行統計測試：階段自身耗時、檔案計數與結果、JSON 報告與 Prometheus textfile 輸出
+"""
+
+import json
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+
+
+def record_run() -> bpr.RunMetrics:
+    metrics = bpr.RunMetrics()
+    bpr.activate_metrics(metrics)
+    try:
+        with bpr.metrics_file("input/MOMO_files/bundle.zip", kind="archive", platform="MOMO"):
+            with bpr.metrics_stage("extract"):
+                with bpr.metrics_stage("hash"):
+                    bpr.metrics_add("bytes_read", 100)
+            bpr.metrics_outcome("deferred")
+            with bpr.metrics_file("temp/bundle/a.xlsx"):
+                bpr.metrics_add("candidates_tried", 3)
+                bpr.metrics_outcome("success")
+            bpr.metrics_outcome("success", overwrite=False)  # 只覆寫 deferred
+        with bpr.metrics_file("input/b.xlsx"):
+            bpr.metrics_outcome("failed")
+            bpr.metrics_outcome("success", overwrite=False)
+    finally:
+        bpr.activate_metrics(None)
+    metrics.finished = metrics.started + 2
+    return metrics
+
+
+def test_stages_and_files():
+    metrics = record_run()
+    extract, hashed = metrics.stages["extract"], metrics.stages["hash"]
+    assert extract["count"] == hashed["count"] == 1
+    # 外層的自身耗時扣除子階段
+    assert abs(extract["self_seconds"] - (extract["seconds"] - hashed["seconds"])) < 1e-6
+
+    summary = metrics.summary()
+    assert summary["outcomes"] == {"success": 2, "failed": 1}
+    assert summary["totals"]["bytes_read"] == 100 and summary["totals"]["candidates_tried"] == 3
+    assert summary["duration_seconds"] == 2
+
+    bundle = metrics.files["input/MOMO_files/bundle.zip"]
+    assert bundle["kind"] == "archive" and bundle["platform"] == "MOMO"
+    assert set(bundle["stages"]) == {"extract", "hash"}
+    # 未啟用時所有量測皆為 no-op
+    with bpr.metrics_file("x.xlsx") as record:
+        bpr.metrics_add("bytes_read")
+    assert record is None
+
+
+def test_json_and_prometheus_reports(tmp_path):
+    metrics = record_run()
+    metrics.schedule = {"MOMO": {"queued": 2, "remaining": 0, "wait_avg_seconds": 0.5, "wait_max_seconds": 1.0,
+                                 "deadline": "06:00", "deadline_met": True}}
+    metrics.write_json(tmp_path / "report.json")
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert [entry["file"] for entry in report["files"]] == ["bundle.zip", "a.xlsx", "b.xlsx"]
+    assert report["schedule"]["MOMO"]["queued"] == 2
+
+    prom_path = tmp_path / "run.prom"
+    metrics.write_prometheus(prom_path)
+    lines = prom_path.read_text(encoding="utf-8").splitlines()
+    prefix = "excel_password_remover_last_run"
+    assert f'{prefix}_files{{outcome="success"}} 2' in lines
+    assert f"{prefix}_bytes_read 100" in lines
+    assert f'{prefix}_stage_calls{{stage="extract"}} 1' in lines
+    assert f'{prefix}_platform_deadline_met{{platform="MOMO"}} 1' in lines
+    # 每個樣本都是「名稱{標籤} 數值」，註解以 # 開頭
+    assert all(line.startswith("#") or len(line.rsplit(" ", 1)) == 2 for line in lines)
+    assert not (tmp_path / "run.prom.tmp").exists()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+平台排程測試：大量積壓時各平台依權重分配處理時間、截止時間與優先度、排程設定驗證與等待時間統計，
+以及壓縮檔解出的工作簿排入來源平台的佇列
+"""
+
+import datetime
+import json
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+from platform_scheduler import PlatformScheduler, load_schedule  # noqa: E402
+
+START = datetime.datetime(2026, 10, 19, 7, 0).timestamp()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+def run(scheduler, clock, seconds_per_file):
+    order = []
+    for item in scheduler:
+        order.append(item)
+        clock.now += seconds_per_file[item[0]]
+    return order
+
+
+def build(policies, backlog):
+    clock = FakeClock()
+    scheduler = PlatformScheduler(policies, clock)
+    for platform, count in backlog.items():
+        for index in range(count):
+            scheduler.add((platform, index), platform)
+    return scheduler, clock
+
+
+def test_fair_share_by_weight():
+    policies = load_schedule({"schedule": {"ETMall": {"weight": 2}}})
+    scheduler, clock = build(policies, {"Shopee": 300, "ETMall": 5})
+    order = run(scheduler, clock, {"Shopee": 1.0, "ETMall": 1.0})
+    # ETMall 權重 2：每處理 1 個蝦皮檔案就處理 2 個 ETMall 檔案，不必等 300 個蝦皮檔案
+    assert [platform for platform, _ in order[:9]] == ["Shopee", "ETMall", "ETMall", "Shopee", "ETMall", "ETMall",
+                                                       "Shopee", "ETMall", "Shopee"]
+    report = scheduler.report()
+    assert report["ETMall"]["processed"] == 5 and report["Shopee"]["processed"] == 300
+    assert report["ETMall"]["wait_max_seconds"] == 7.0
+
+
+def test_time_based_share():
+    # 每個 MOMO 檔案耗時是 Yahoo 的 4 倍：同權重下 Yahoo 處理的檔案數約為 4 倍
+    scheduler, clock = build({}, {"MOMO": 50, "Yahoo": 200})
+    order = run(scheduler, clock, {"MOMO": 4.0, "Yahoo": 1.0})
+    first = [platform for platform, _ in order[:50]]
+    assert first.count("Yahoo") == 40 and first.count("MOMO") == 10
+
+
+def test_deadline_then_priority():
+    policies = load_schedule({"schedule": {"ETMall": {"deadline": "08:00"}, "PChome": {"priority": 5},
+                                           "*": {"weight": 1}}},
+                             now=datetime.datetime(2026, 10, 19, 6, 0))
+    scheduler, clock = build(policies, {"Shopee": 10, "PChome": 2, "ETMall": 3})
+    order = run(scheduler, clock, {"Shopee": 60.0, "PChome": 60.0, "ETMall": 600.0})
+    assert [platform for platform, _ in order[:5]] == ["ETMall"] * 3 + ["PChome"] * 2
+    report = scheduler.report()
+    assert report["ETMall"]["deadline_met"] is True and report["ETMall"]["deadline"] == "2026-10-19T08:00:00"
+
+    # 截止時間已過的平台不再優先
+    scheduler, clock = build(policies, {"ETMall": 2, "PChome": 2})
+    clock.now = datetime.datetime(2026, 10, 19, 9, 0).timestamp()
+    assert [platform for platform, _ in run(scheduler, clock, {"ETMall": 1, "PChome": 1})] == \
+        ["PChome", "PChome", "ETMall", "ETMall"]
+    assert scheduler.report()["ETMall"]["deadline_met"] is False
+
+
+def test_invalid_schedule():
+    for settings, error in (({"weight": 0}, "weight"), ({"deadline": "later"}, "schedule.MOMO"),
+                            ({"prio": 1}, "不支援"), ("high", "物件")):
+        with pytest.raises(ValueError, match=error):
+            load_schedule({"schedule": {"MOMO": settings}})
+
+
+def test_archive_members_join_their_platform_queue(tmp_path):
+    shop = {"shop_id": "S1", "shop_account": "acct", "shop_name": "店"}
+    (tmp_path / "mapping").mkdir()
+    (tmp_path / "mapping" / "shops_master.json").write_text(json.dumps({
+        "platform_index": {"MOMO": {"pw-m": shop}, "Yahoo": {"pw-y": shop}},
+        "schedule": {"MOMO": {"priority": 5}},
+    }), encoding="utf-8")
+    workbook = build_xlsx(random.Random(49), rows=200)
+    for folder in ("MOMO_files", "Yahoo_files"):
+        (tmp_path / "input" / folder).mkdir(parents=True)
+    with zipfile.ZipFile(tmp_path / "input" / "MOMO_files" / "batch.zip", "w") as zf:
+        zf.writestr("report.xlsx", encrypt_xlsx(workbook, "pw-m", spin_count=1000))
+    (tmp_path / "input" / "Yahoo_files" / "loose.xlsx").write_bytes(encrypt_xlsx(workbook, "pw-y", spin_count=1000))
+
+    summary = bpr.main(["--base-dir", str(tmp_path), "-q", "--no-progress"])
+    # 解出的工作簿帶著來源平台排入 MOMO 佇列，不落到 root 佇列、也不在解壓階段先行破解
+    assert sorted(summary["schedule"]) == ["MOMO", "Yahoo"]
+    assert summary["schedule"]["MOMO"]["processed"] == 1 and summary["schedule"]["Yahoo"]["processed"] == 1
+    assert summary["outcomes"]["ok"] == 2
+    assert len(list((tmp_path / "output").glob("*.xlsx"))) == 2
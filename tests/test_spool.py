@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+多節點 spool 模式測試：租約認領、失效租約接手、完成記錄，以及多個程序共用同一份專案資料夾
+"""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import OutputLayout  # noqa: E402
+from benchmark_corpus import generate_corpus  # noqa: E402
+from spool_worker import SpoolWorker  # noqa: E402
+
+
+@pytest.fixture
+def workers(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    started = []
+
+    def start(worker_id, lease_seconds=60):
+        worker = SpoolWorker(tmp_path / "spool", input_dir, worker_id, lease_seconds)
+        started.append(worker)
+        return worker
+
+    yield input_dir, start
+    for worker in started:
+        worker.close()
+
+
+def test_only_one_worker_claims_a_file(workers):
+    input_dir, start = workers
+    file_path = input_dir / "a.xlsx"
+    file_path.write_bytes(b"one")
+    first, second = start("w1"), start("w2")
+    assert first.claim(file_path) and first.claim(file_path)  # 同一節點重複認領
+    assert not second.claim(file_path) and second.stats["busy"] == 1
+
+    first.complete(file_path)
+    assert not start("w3").claim(file_path)  # 已處理過
+    file_path.write_bytes(b"changed")
+    assert second.claim(file_path)  # 內容變更後重新處理
+    assert first.claim(input_dir.parent / "temp" / "extracted.xlsx")  # 解壓到 temp/ 的檔案不需認領
+
+
+def test_stale_lease_is_reclaimed(workers):
+    input_dir, start = workers
+    file_path = input_dir / "a.xlsx"
+    file_path.write_bytes(b"x")
+    crashed, survivor = start("crashed", lease_seconds=1), start("survivor", lease_seconds=1)
+    assert crashed.claim(file_path)
+    crashed._stop.set()  # 模擬節點當機：心跳停止
+    crashed._thread.join()
+    lease_path = next(crashed.lease_dir.iterdir())
+    old = time.time() - 60
+    os.utime(lease_path, (old, old))
+
+    assert survivor.claim(file_path) and survivor.stats["reclaimed"] == 1
+    crashed.release(file_path)  # 已被接手的租約不會被刪除
+    assert lease_path.exists()
+    survivor.complete(file_path)
+    assert list(survivor.lease_dir.iterdir()) == []
+
+
+def test_timeout_is_retried_by_a_later_run(workers):
+    input_dir, start = workers
+    file_path = input_dir / "slow.xlsx"
+    file_path.write_bytes(b"x")
+    first, running = start("w1"), start("w2")
+    assert first.claim(file_path)
+    time.sleep(0.05)
+    first.complete(file_path, "timeout")
+    assert not running.claim(file_path)  # 同一批執行中的其他節點不重試
+    time.sleep(0.05)
+    assert start("w3").claim(file_path)  # 之後啟動的執行從隔離清單中斷處繼續
+
+
+def test_exclusive_layout_reserves_names(tmp_path):
+    shop = {"shop_id": "MO1", "shop_account": "acct"}
+    first = OutputLayout("", exclusive=True).allocate(tmp_path, "店_MO1_acct", ".xlsx", "MOMO", shop)
+    second_layout = OutputLayout("", exclusive=True)
+    second = second_layout.allocate(tmp_path, "店_MO1_acct", ".xlsx", "MOMO", shop)
+    assert first != second
+    second_layout.release_reservations()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f".{first.name}.reserved"]
+
+
+def test_workers_share_one_project(tmp_path):
+    manifest = generate_corpus(tmp_path, shops=2, files=6, platforms=["MOMO", "Yahoo"], spin_counts=[1000], rows=200,
+                               xls_ratio=0, plain_ratio=0.2, zip_ratio=0.3, unknown_ratio=0.1, seed=40)
+    command = [sys.executable, str(SCRIPTS_DIR / "batch_password_remover.py"), "--base-dir", str(tmp_path),
+               "--spool", "--lease-seconds", "30", "-q", "--no-progress"]
+    processes = [subprocess.Popen(command + ["--worker-id", f"w{i}"], stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.PIPE) for i in range(3)]
+    for process in processes:
+        _, stderr = process.communicate(timeout=300)
+        assert process.returncode == 0, stderr.decode(errors="replace")
+
+    inputs = [p for p in (tmp_path / "input").rglob("*") if p.is_file()]
+    outputs = list((tmp_path / "output").glob("*.xlsx"))
+    assert len(outputs) == manifest["expected"]["ok"]  # 每個檔案只處理一次
+    assert len(list((tmp_path / "spool" / "done").glob("*.json"))) == len(inputs)
+    assert list((tmp_path / "spool" / "leases").iterdir()) == []
+    assert list((tmp_path / "spool" / "workers").iterdir()) == []
+    assert list((tmp_path / "temp").iterdir()) == []
+    assert not list((tmp_path / "output").glob(".*.reserved"))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+啟動測試：input/ 沒有檔案時提早結束，不載入解密、解壓縮與剖析模組，也不建立 output/ log/ temp/
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+# 在獨立程序中執行，避免其他測試已載入的模組影響結果
+PROBE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import batch_password_remover as bpr
+summary = bpr.main(["--base-dir", sys.argv[2]])
+modules = ["msoffcrypto", "rarfile", "openpyxl", "cProfile", "unicodedata", "struct"]
+print(json.dumps({"loaded": [name for name in modules if name in sys.modules],
+                  "lazy_loaded": bpr.msoffcrypto._module is not None or bpr.rarfile._module is not None,
+                  "outcomes": summary["outcomes"]}))
+"""
+
+
+def test_nothing_to_do_exits_before_heavy_imports(tmp_path):
+    (tmp_path / "mapping").mkdir()
+    (tmp_path / "mapping" / "shops_master.json").write_text(json.dumps({"platform_index": {"MOMO": {}}}),
+                                                             encoding="utf-8")
+    (tmp_path / "input" / "MOMO_files").mkdir(parents=True)
+    (tmp_path / "input" / "MOMO_files" / "notes.txt").write_text("not a workbook", encoding="utf-8")
+
+    result = subprocess.run([sys.executable, "-c", PROBE, str(SCRIPTS_DIR), str(tmp_path)],
+                            capture_output=True, timeout=60, env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+    assert result.returncode == 0, result.stderr.decode("utf-8", "replace")
+    stdout = result.stdout.decode("utf-8")
+    assert "沒有需要處理的檔案" in stdout
+    probe = json.loads(stdout.splitlines()[-1])
+    assert probe == {"loaded": [], "lazy_loaded": False, "outcomes": {}}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["input", "mapping"]
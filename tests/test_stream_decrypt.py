@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+CrackSession.decrypt_to 回歸測試
+
+以 msoffcrypto 的整份解密結果為基準，比對串流解密的輸出：
+    - 跨多批（chunk）的 Agile 加密檔
+    - EncryptedPackage 的 FAT 鏈不連續（sector 打散）
+    - EncryptedPackage 小於 4096 bytes、存放在 mini stream
+    - RC4 加密與未加密的 .xls
+"""
+
+import contextlib
+import hashlib
+import io
+import random
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+import msoffcrypto
+import olefile
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import CrackSession, OutputCommitter, remove_password  # noqa: E402
+from benchmark_corpus import build_xls, build_xlsx, encrypt_xlsx  # noqa: E402
+
+PASSWORD = "pw-測試"
+CHUNK_SIZE = 8192
+SOURCE_KINDS = ["path", "file", "bytesio"]
+SECTOR_SIZE = 512
+END_OF_CHAIN, FREE_SECT, FAT_SECT, NO_STREAM = 0xFFFFFFFE, 0xFFFFFFFF, 0xFFFFFFFD, 0xFFFFFFFF
+
+
+# =============================================================================
+# 測試資料
+# =============================================================================
+
+def reference_decrypt(data: bytes, password: str = PASSWORD) -> bytes:
+    """msoffcrypto 整份解密的結果"""
+    office_file = msoffcrypto.OfficeFile(io.BytesIO(data))
+    office_file.load_key(password=password)
+    out = io.BytesIO()
+    office_file.decrypt(out)
+    return out.getvalue()
+
+
+def session_decrypt(data: bytes, source_kind: str, tmp_path: Path, password: str = PASSWORD) -> bytes:
+    """以 CrackSession 驗證密碼並解密；source_kind 為 path、file（已開啟的檔案物件）或 bytesio"""
+    if source_kind == "bytesio":
+        source = io.BytesIO(data)
+    else:
+        source = tmp_path / "source.bin"
+        source.write_bytes(data)
+    out = io.BytesIO()
+    with contextlib.ExitStack() as stack:
+        if source_kind == "file":
+            source = stack.enter_context(open(source, "rb"))
+        session = stack.enter_context(CrackSession(source, chunk_size=CHUNK_SIZE))
+        assert session.is_encrypted
+        assert not session.try_password(password + "x")
+        assert session.try_password(password)
+        session.decrypt_to(out)
+    return out.getvalue()
+
+
+def large_xlsx() -> bytes:
+    """未壓縮的亂數內容，確保 EncryptedPackage 跨越多個 chunk"""
+    rng = random.Random(28)
+    buffer = io.BytesIO(build_xlsx(rng, rows=50))
+    with zipfile.ZipFile(buffer, "a", zipfile.ZIP_STORED) as zf:
+        zf.writestr("xl/media/blob.bin", rng.randbytes(CHUNK_SIZE * 6 + 123))
+    return buffer.getvalue()
+
+
+def fragment_stream(data: bytes, stream_name: str) -> bytes:
+    """
+    把 stream_name 的 sector 反向排列（內容不變，FAT 鏈變成每一步都往回跳）
+    只處理 DIFAT 全在標頭內的小型檔案
+    """
+    buf = bytearray(data)
+    ole = olefile.OleFileIO(bytes(data))
+    sector_size = ole.sectorsize
+    entry = ole.direntries[ole._find(stream_name)]
+    chain = [entry.isectStart]
+    while ole.fat[chain[-1]] != END_OF_CHAIN:
+        chain.append(ole.fat[chain[-1]])
+    assert len(chain) > 2
+
+    def offset(sector: int) -> int:
+        return (sector + 1) * sector_size
+
+    contents = [bytes(buf[offset(s):offset(s) + sector_size]) for s in chain]
+    placement = list(reversed(chain))  # 第 i 個邏輯 sector 放到 placement[i]
+    fat = list(ole.fat)
+    for i, sector in enumerate(placement):
+        buf[offset(sector):offset(sector) + sector_size] = contents[i]
+        fat[sector] = placement[i + 1] if i + 1 < len(placement) else END_OF_CHAIN
+
+    # 寫回 FAT（標頭 DIFAT 列出的 FAT sector）
+    entries_per_sector = sector_size // 4
+    fat_sectors = [s for s in struct.unpack_from("<109I", buf, 76) if s != FREE_SECT]
+    for index, fat_sector in enumerate(fat_sectors):
+        part = fat[index * entries_per_sector:(index + 1) * entries_per_sector]
+        struct.pack_into(f"<{len(part)}I", buf, offset(fat_sector), *part)
+
+    # 更新目錄項的起始 sector
+    dir_sector = struct.unpack_from("<I", buf, 48)[0]
+    dir_chain = [dir_sector]
+    while ole.fat[dir_chain[-1]] != END_OF_CHAIN:
+        dir_chain.append(ole.fat[dir_chain[-1]])
+    per_sector = sector_size // 128
+    sid = ole._find(stream_name)
+    entry_offset = offset(dir_chain[sid // per_sector]) + (sid % per_sector) * 128
+    struct.pack_into("<I", buf, entry_offset + 116, placement[0])
+    ole.close()
+    return bytes(buf)
+
+
+def build_ole(streams: dict) -> bytes:
+    """
+    最小 OLE 複合文件寫入器（512 bytes sector、單一 FAT sector）
+    小於 4096 bytes 的串流放在 mini stream，其餘放在一般 FAT
+    """
+    mini_size, cutoff = 64, 4096
+    names = list(streams)
+    dir_sectors = -(-(len(names) + 1) // (SECTOR_SIZE // 128))
+
+    mini_data = b""
+    mini_fat = []
+    placement = {}
+    for name in names:
+        data = streams[name]
+        if len(data) < cutoff:
+            count = -(-len(data) // mini_size) or 1
+            start = len(mini_fat)
+            mini_fat += [start + i + 1 for i in range(count - 1)] + [END_OF_CHAIN]
+            mini_data += data.ljust(count * mini_size, b"\x00")
+            placement[name] = start
+
+    fat = [FAT_SECT]
+    body = b""
+
+    def allocate(data: bytes) -> int:
+        nonlocal body
+        count = -(-len(data) // SECTOR_SIZE) or 1
+        start = len(fat)
+        fat.extend([start + i + 1 for i in range(count - 1)] + [END_OF_CHAIN])
+        body += data.ljust(count * SECTOR_SIZE, b"\x00")
+        return start
+
+    dir_start = len(fat)
+    fat.extend([dir_start + i + 1 for i in range(dir_sectors - 1)] + [END_OF_CHAIN])
+    body += bytes(dir_sectors * SECTOR_SIZE)  # 目錄最後再填入
+    mini_fat_start = allocate(struct.pack(f"<{len(mini_fat)}I", *mini_fat)) if mini_fat else END_OF_CHAIN
+    root_start = allocate(mini_data) if mini_data else END_OF_CHAIN
+    for name in names:
+        if len(streams[name]) >= cutoff:
+            placement[name] = allocate(streams[name])
+    assert len(fat) <= SECTOR_SIZE // 4
+    fat += [FREE_SECT] * (SECTOR_SIZE // 4 - len(fat))
+
+    def dir_entry(name: str, entry_type: int, right: int, child: int, start: int, size: int) -> bytes:
+        encoded = (name + "\x00").encode("utf-16-le") if name else b""
+        return (encoded.ljust(64, b"\x00") + struct.pack("<HBB", len(encoded), entry_type, 1)
+                + struct.pack("<III", NO_STREAM, right, child) + bytes(16)
+                + struct.pack("<I", 0) + bytes(16) + struct.pack("<IQ", start, size))
+
+    # 子項以右兄弟串成一條鏈（olefile 不檢查紅黑樹平衡）
+    directory = dir_entry("Root Entry", 5, NO_STREAM, 1, root_start, len(mini_data))
+    for index, name in enumerate(names, start=1):
+        right = index + 1 if index < len(names) else NO_STREAM
+        directory += dir_entry(name, 2, right, NO_STREAM, placement[name], len(streams[name]))
+    directory = directory.ljust(dir_sectors * SECTOR_SIZE, b"\x00")
+    body = directory + body[len(directory):]
+
+    header = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + bytes(16)
+    header += struct.pack("<HHHHH", 0x003E, 0x0003, 0xFFFE, 9, 6) + bytes(6)
+    header += struct.pack("<IIIIIIIII", 0, 1, dir_start, 0, cutoff, mini_fat_start,
+                          -(-len(mini_fat) * 4 // SECTOR_SIZE), END_OF_CHAIN, 0)
+    header += struct.pack("<I", 0) + struct.pack("<I", FREE_SECT) * 108
+    return header + struct.pack(f"<{len(fat)}I", *fat) + body
+
+
+def build_rc4_xls(password: str) -> tuple:
+    """
+    RC4 加密的 .xls（FilePass wEncryptionType=1、版本 1.1）
+    回傳 (檔案內容, 加密前的資料記錄內容)
+    """
+    from cryptography.hazmat.primitives.ciphers import Cipher
+    try:
+        from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+    except ImportError:
+        from cryptography.hazmat.primitives.ciphers.algorithms import ARC4
+    from msoffcrypto.method.rc4 import DocumentRC4, _makekey
+
+    rng = random.Random(97)
+    salt = rng.randbytes(16)
+    verifier = rng.randbytes(16)
+    encryptor = Cipher(ARC4(_makekey(password, salt, 0)), mode=None).encryptor()
+    encrypted_verifier = encryptor.update(verifier)
+    encrypted_hash = encryptor.update(hashlib.md5(verifier).digest())
+
+    def record(num: int, payload: bytes) -> bytes:
+        return struct.pack("<HH", num, len(payload)) + payload
+
+    bof = record(0x0809, struct.pack("<HHHHII", 0x0600, 0x0005, 0x0DBB, 0x07CC, 0, 0x06))
+    filepass = record(0x002F, struct.pack("<HHH", 1, 1, 1) + salt + encrypted_verifier + encrypted_hash)
+    # 一般資料記錄（0x0204 LABEL），總長跨越多個 1024 bytes 的 RC4 區塊
+    payloads = [rng.randbytes(rng.randint(400, 900)) for _ in range(10)]
+    body = b"".join(record(0x0204, p) for p in payloads) + record(0x000A, b"")
+    stream = bytearray(bof + filepass + body)
+
+    # RC4 的金鑰串流依串流內的絕對位移決定；記錄標頭不加密
+    keystream = DocumentRC4.decrypt(password, salt, io.BytesIO(bytes(len(stream))), blocksize=1024).read()
+    pos = len(bof) + len(filepass)
+    while pos < len(stream):
+        _, size = struct.unpack_from("<HH", stream, pos)
+        for i in range(pos + 4, pos + 4 + size):
+            stream[i] ^= keystream[i]
+        pos += 4 + size
+    assert len(stream) >= 4096  # 放在一般 FAT，與實際的 .xls 相同
+    return build_ole({"Workbook": bytes(stream)}), payloads
+
+
+# =============================================================================
+# Agile（.xlsx）
+# =============================================================================
+
+@pytest.fixture(scope="module")
+def agile_large():
+    plaintext = large_xlsx()
+    return plaintext, encrypt_xlsx(plaintext, PASSWORD, spin_count=1000)
+
+
+@pytest.mark.parametrize("source_kind", SOURCE_KINDS)
+def test_agile_multi_chunk_matches_msoffcrypto(agile_large, source_kind, tmp_path):
+    plaintext, encrypted = agile_large
+    assert len(plaintext) > CHUNK_SIZE * 4
+    result = session_decrypt(encrypted, source_kind, tmp_path)
+    assert result == reference_decrypt(encrypted)
+    assert result == plaintext
+
+
+@pytest.mark.parametrize("source_kind", SOURCE_KINDS)
+def test_agile_fragmented_fat_chain(agile_large, source_kind, tmp_path):
+    plaintext, encrypted = agile_large
+    fragmented = fragment_stream(encrypted, "EncryptedPackage")
+    assert fragmented != encrypted
+    result = session_decrypt(fragmented, source_kind, tmp_path)
+    assert result == reference_decrypt(fragmented)
+    assert result == plaintext
+
+
+@pytest.mark.parametrize("source_kind", SOURCE_KINDS)
+def test_agile_mini_stream_package(source_kind, tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("xl/workbook.xml", "<workbook/>")
+    plaintext = buffer.getvalue()
+    # msoffcrypto 寫出的容器會讓 mini stream 內的串流互相重疊，故自行組裝容器
+    from msoffcrypto.method.ecma376_agile import ECMA376Agile
+    info, secret_key = ECMA376Agile.generate_encryption_parameters(PASSWORD, spin_count=1000)
+    package = ECMA376Agile.encrypt_payload(io.BytesIO(plaintext), info.encryptedKey, secret_key,
+                                           info.keyData.saltValue)
+    encryption_info = ECMA376Agile.get_encryption_information(info, package, secret_key)
+    encrypted = build_ole({"EncryptionInfo": encryption_info, "EncryptedPackage": package})
+    ole = olefile.OleFileIO(encrypted)
+    assert ole.direntries[ole._find("EncryptedPackage")].size < ole.minisectorcutoff
+    ole.close()
+
+    result = session_decrypt(encrypted, source_kind, tmp_path)
+    assert result == reference_decrypt(encrypted)
+    assert result == plaintext
+
+
+def test_agile_file_object_streams_from_mmap(agile_large, tmp_path, monkeypatch):
+    plaintext, encrypted = agile_large
+    source = tmp_path / "source.xlsx"
+    source.write_bytes(encrypted)
+    out = io.BytesIO()
+    with open(source, "rb") as f, CrackSession(f, chunk_size=CHUNK_SIZE) as session:
+        assert session.try_password(PASSWORD)
+        # 整份解密（會把整個檔案讀進記憶體）不應被呼叫
+        monkeypatch.setattr(session.office_file, "decrypt", None)
+        session.decrypt_to(out)
+    assert out.getvalue() == plaintext
+
+
+# =============================================================================
+# .xls
+# =============================================================================
+
+@pytest.mark.parametrize("source_kind", SOURCE_KINDS)
+def test_rc4_xls_matches_msoffcrypto(source_kind, tmp_path):
+    encrypted, payloads = build_rc4_xls(PASSWORD)
+    result = session_decrypt(encrypted, source_kind, tmp_path)
+    assert result == reference_decrypt(encrypted)
+
+    workbook = olefile.OleFileIO(result).openstream("Workbook").read()
+    for payload in payloads:
+        assert payload in workbook
+
+
+def test_plain_xls_published_unchanged(tmp_path):
+    data = build_xls(random.Random(1))
+    assert not msoffcrypto.OfficeFile(io.BytesIO(data)).is_encrypted()
+    source = tmp_path / "plain.xls"
+    source.write_bytes(data)
+    with CrackSession(source) as session:
+        assert session.kind == "plain"
+        assert not session.is_encrypted
+    with CrackSession(io.BytesIO(data)) as session:
+        assert not session.is_encrypted
+
+    output = tmp_path / "output.xls"
+    assert remove_password(source, output, PASSWORD, committer=OutputCommitter())
+    assert output.read_bytes() == data
+
+
+def test_remove_password_with_stream_session(agile_large, tmp_path):
+    plaintext, encrypted = agile_large
+    output = tmp_path / "output.xlsx"
+    with CrackSession(io.BytesIO(encrypted), chunk_size=CHUNK_SIZE) as session:
+        assert session.source_size == len(encrypted)
+        assert remove_password(None, output, PASSWORD, committer=OutputCommitter(), session=session)
+    assert output.read_bytes() == plaintext
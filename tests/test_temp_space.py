@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+臨時空間管理測試：解壓資料夾的參考計數、用量上限時先處理已解開的工作簿、啟動時回收殘留資料夾，
+以及 RAM 工作區放不下時個別退回 temp/、不支援的壓縮格式不留下解壓資料夾
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from batch_password_remover import (RunContext, TempSpace, process_platform_compressed_files,  # noqa: E402
+                                    process_root_compressed_files, ram_workspace_dir)
+
+
+def extract(root: Path, name: str, members: dict) -> list:
+    """模擬解壓：在 root/name 下寫入成員，回傳 Excel 成員路徑"""
+    extract_dir = root / name
+    for member, size in members.items():
+        path = extract_dir / member
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+    return [extract_dir / member for member in members if member.endswith(".xlsx")]
+
+
+def test_members_are_deleted_when_committed(tmp_path):
+    space = TempSpace(tmp_path)
+    workbooks = extract(tmp_path, "extract_a.zip_1", {"a.xlsx": 100, "sub/b.xlsx": 50, "readme.txt": 10})
+    space.track(tmp_path / "extract_a.zip_1", workbooks)
+    assert not (tmp_path / "extract_a.zip_1" / "readme.txt").exists()
+    assert space.used == 150 and space.peak == 150
+
+    space.release(workbooks[0])
+    assert not workbooks[0].exists() and workbooks[1].exists() and space.used == 50
+    workbooks[1].unlink()  # 已以 rename 發佈到 output/
+    space.release(workbooks[1])
+    assert not (tmp_path / "extract_a.zip_1").exists() and space.used == 0
+
+    space.track(tmp_path / "extract_b.zip_1", extract(tmp_path, "extract_b.zip_1", {"c.txt": 5}))
+    assert not (tmp_path / "extract_b.zip_1").exists()  # 沒有待處理的工作簿
+
+
+def test_budget_drains_oldest_workbooks_first(tmp_path):
+    space = TempSpace(tmp_path, budget_bytes=250)
+    processed = []
+    space.drain = processed.append
+    first = extract(tmp_path, "extract_1", {"a.xlsx": 100, "b.xlsx": 100})
+    space.track(tmp_path / "extract_1", first)
+
+    space.make_room(40)
+    assert processed == []  # 仍在上限內
+    space.make_room(120)
+    assert processed == first[:1] and space.drained == {first[0]} and space.paused == 1
+    assert space.used == 100 and not first[0].exists()
+
+    space.make_room(1000)  # 單一壓縮檔超過上限：處理完所有既有工作簿後仍繼續解壓
+    assert processed == first and not (tmp_path / "extract_1").exists()
+    report = space.report()
+    assert (report["budget_bytes"], report["peak_bytes"], report["paused"], report["reclaimed_dirs"]) == (250, 200, 2, 0)
+    assert report["placed"]["disk"] == {"archives": 1, "bytes": 200} and "ram" not in report
+
+
+def test_reclaim_removes_only_extraction_folders(tmp_path):
+    extract(tmp_path, "temp_a.zip_20250101_000000", {"a.xlsx": 1})
+    extract(tmp_path, "extract_b.rar_20250101_000000", {"b.xlsx": 1})
+    extract(tmp_path, "worker-1", {"c.xlsx": 1})
+    assert TempSpace(tmp_path).reclaim() == 2
+    assert [p.name for p in tmp_path.iterdir()] == ["worker-1"]
+
+
+def test_ram_workspace_falls_back_to_disk_per_archive(tmp_path):
+    disk, ram = tmp_path / "temp", tmp_path / "ram"
+    space = TempSpace(disk, ram_root=ram, ram_budget=300)
+    processed = []
+    space.drain = processed.append
+
+    assert space.prepare(disk, 200) == ram
+    in_ram = extract(ram, "extract_1", {"a.xlsx": 200, "notes.txt": 30})
+    space.track(ram / "extract_1", in_ram)
+    assert space.ram_used == 200 and space.used == 0
+
+    assert space.prepare(disk, 150) == disk  # RAM 工作區放不下，這個壓縮檔改用 temp/
+    on_disk = extract(disk, "extract_2", {"b.xlsx": 150})
+    space.track(disk / "extract_2", on_disk)
+    assert processed == [] and space.used == 150  # 不會為了 RAM 工作區提前處理
+
+    space.release(in_ram[0])
+    assert space.ram_used == 0 and not (ram / "extract_1").exists()
+    assert space.prepare(disk, 150) == ram
+    report = space.report()
+    assert report["placed"] == {"ram": {"archives": 1, "bytes": 230}, "disk": {"archives": 1, "bytes": 150}}
+    assert report["ram"] == {"path": str(ram), "budget_bytes": 300, "peak_bytes": 200}
+
+
+@pytest.mark.skipif(os.name != "posix", reason="以 PID 判斷執行是否已結束僅適用 POSIX")
+def test_ram_workspace_reclaims_dead_runs(tmp_path):
+    assert ram_workspace_dir(str(tmp_path / "missing")) is None
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+    parent = tmp_path / "excel_password_remover"
+    (parent / finished.stdout.strip()).mkdir(parents=True)
+    workspace = ram_workspace_dir(str(tmp_path))
+    assert workspace == parent / str(os.getpid())
+    assert [p.name for p in parent.iterdir()] == [str(os.getpid())]
+
+
+def test_unsupported_archive_leaves_no_folder(tmp_path):
+    temp_dir = tmp_path / "temp"
+    temp_dir.mkdir()
+    archive = tmp_path / "batch.7z"
+    archive.write_bytes(b"7z")
+    ctx = RunContext(temp_space=TempSpace(temp_dir))
+    assert process_platform_compressed_files([archive], tmp_path, temp_dir, {"MOMO": {"pw": {}}}, "MOMO", [], ctx) == []
+    assert process_root_compressed_files([archive], tmp_path, temp_dir, {}, [], ctx) == []
+    assert list(temp_dir.iterdir()) == []
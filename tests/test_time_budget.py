@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+處理時限測試：巢狀時限、超時取消後記入隔離清單，下次從中斷的候選密碼繼續
+"""
+
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import batch_password_remover as bpr  # noqa: E402
+from benchmark_corpus import build_xlsx, encrypt_xlsx  # noqa: E402
+
+PASSWORDS = {f"pw-{i}": {"shop_id": f"MO{i}", "shop_account": f"acct_{i}", "shop_name": f"店{i}"} for i in range(5)}
+
+
+def test_check_deadline_reports_the_expired_budget():
+    with bpr.time_budget(60, "archive") as outer:
+        with bpr.time_budget(60, "file") as inner:
+            bpr.check_deadline()
+            inner.deadline = 0
+            with pytest.raises(bpr.BudgetExceeded) as excinfo:
+                bpr.check_deadline()
+            assert excinfo.value.budget is inner
+            outer.deadline = 0
+            with pytest.raises(bpr.BudgetExceeded) as excinfo:
+                bpr.check_deadline()
+            assert excinfo.value.budget is outer
+    bpr.check_deadline()  # 離開區塊後不再生效
+
+
+def test_zero_budget_is_unlimited():
+    with bpr.time_budget(0, "file") as budget:
+        assert budget is None
+        bpr.check_deadline()
+
+
+def test_timeout_is_quarantined_and_resumed(tmp_path, monkeypatch):
+    input_dir = tmp_path / "input" / "MOMO_files"
+    input_dir.mkdir(parents=True)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    workbook = build_xlsx(random.Random(38), 500)
+    file_path = input_dir / "report.xlsx"
+    file_path.write_bytes(encrypt_xlsx(workbook, "pw-4", spin_count=1000))
+
+    quarantine = bpr.QuarantineList(tmp_path / "quarantine.json", tmp_path / "input")
+    ctx = bpr.RunContext(quarantine=quarantine)
+    platform_index = {"MOMO": PASSWORDS}
+
+    tried = []
+    original = bpr.test_password
+
+    def counting_test_password(path, password, session=None):
+        tried.append(password)
+        if budget is not None and len(tried) == 3:
+            budget.deadline = 0  # 第三個候選密碼開始前到期
+        return original(path, password, session)
+
+    monkeypatch.setattr(bpr, "test_password", counting_test_password)
+
+    with pytest.raises(bpr.BudgetExceeded) as excinfo:
+        with bpr.time_budget(60, "file") as budget:
+            bpr.try_platform_passwords(file_path, platform_index, "MOMO", output_dir, [], ctx)
+    assert excinfo.value.progress == {"MOMO": {"tried": 2, "of": 5}}
+    entry = quarantine.add(file_path, "workbook", excinfo.value, 1.0)
+    assert entry["attempts"] == 1 and entry["budget"] == "file"
+    quarantine.save()
+    assert list(output_dir.iterdir()) == []
+
+    # 下次執行：從第三個候選密碼繼續
+    reloaded = bpr.QuarantineList(tmp_path / "quarantine.json", tmp_path / "input")
+    assert reloaded.resume_offset(file_path, "MOMO", len(PASSWORDS)) == 2
+    assert reloaded.resume_offset(file_path, "MOMO", len(PASSWORDS) + 1) == 0  # 密碼本變更時從頭測試
+    tried.clear()
+    budget = None
+    ctx = bpr.RunContext(quarantine=reloaded)
+    assert bpr.try_platform_passwords(file_path, platform_index, "MOMO", output_dir, [], ctx)
+    assert tried == ["pw-2", "pw-3", "pw-4"]
+    reloaded.release(file_path)
+    assert reloaded.entries == {}
+
+
+def test_quarantine_ignores_changed_files(tmp_path):
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    file_path = input_dir / "a.xlsx"
+    file_path.write_bytes(b"x")
+    quarantine = bpr.QuarantineList(tmp_path / "quarantine.json", input_dir)
+    error = bpr.BudgetExceeded(bpr.TimeBudget(1, "file"))
+    error.progress = {"MOMO": {"tried": 3, "of": 5}}
+    quarantine.add(file_path, "workbook", error, 1.5)
+    assert quarantine.resume_offset(file_path, "MOMO", 5) == 3
+    file_path.write_bytes(b"changed")
+    assert quarantine.resume_offset(file_path, "MOMO", 5) == 0
+
+
+def test_archive_handler_quarantines_only_its_own_budget(tmp_path, monkeypatch):
+    (tmp_path / "input").mkdir()
+    (tmp_path / "temp").mkdir()
+    archive = tmp_path / "input" / "batch.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("report.xlsx", b"x" * 100)
+    quarantine = bpr.QuarantineList(tmp_path / "quarantine.json", tmp_path / "input")
+    ctx = bpr.RunContext(quarantine=quarantine, archive_timeout=60)
+
+    def expiring_extract(kind):
+        def extract(path, dest, password=None):
+            budget = bpr._RUN_BUDGET if kind == "run" else bpr._ACTIVE_BUDGETS[-1]
+            budget.deadline = 0
+            bpr.check_deadline()
+        return extract
+
+    # 壓縮檔自己的時限到期：記入隔離清單，繼續處理下一個壓縮檔
+    monkeypatch.setattr(bpr, "extract_zip", expiring_extract("archive"))
+    assert bpr.process_root_compressed_files([archive], tmp_path, tmp_path / "temp", {}, [], ctx) == []
+    assert [entry["budget"] for entry in quarantine.added] == ["archive"]
+
+    # 整次執行的截止時間到期：不記入隔離清單，交給 main 處理
+    quarantine.added.clear()
+    monkeypatch.setattr(bpr, "extract_zip", expiring_extract("run"))
+    bpr.set_run_deadline(60)
+    try:
+        with pytest.raises(bpr.BudgetExceeded) as excinfo:
+            bpr.process_root_compressed_files([archive], tmp_path, tmp_path / "temp", {}, [], ctx)
+    finally:
+        bpr.set_run_deadline(None)
+    assert excinfo.value.budget.kind == "run"
+    assert quarantine.added == []
+    assert list((tmp_path / "temp").iterdir()) == []  # 解壓資料夾已刪除
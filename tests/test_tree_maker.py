@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+目錄樹生成測試：萬用字元排除、排序與深度限制、多執行緒預先列出時輸出順序不變、不進入符號連結
+"""
+
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from TreeMaker import Excluder, generate_tree, write_tree  # noqa: E402
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for relative in ("b.txt", "A.txt", "mod.pyc", ".hidden", "sub/x.xlsx", "sub/deep/y.xlsx",
+                     "__pycache__/z.pyc", "Zeta/readme.md", "notes.log"):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+    return tmp_path
+
+
+def test_layout_and_glob_excludes(tree):
+    assert generate_tree(tree, excluder=Excluder(file_patterns={"*.pyc", "*.log"})) == (
+        "├── sub/\n"
+        "│   ├── deep/\n"
+        "│   │   └── y.xlsx\n"
+        "│   └── x.xlsx\n"
+        "├── Zeta/\n"
+        "│   └── readme.md\n"
+        "├── A.txt\n"
+        "└── b.txt\n"
+    )
+    assert generate_tree(tree, max_depth=1).splitlines() == ["├── sub/", "├── Zeta/", "├── A.txt", "├── b.txt",
+                                                            "└── notes.log"]
+
+
+def test_parallel_listing_keeps_order(tmp_path):
+    for shop in range(30):
+        for index in range(3):
+            path = tmp_path / f"{shop % 4}" / f"shop{shop:02d}" / f"f{index}.xlsx"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+    serial, parallel = io.StringIO(), io.StringIO()
+    stats = write_tree(serial, tmp_path)
+    assert write_tree(parallel, tmp_path, workers=4) == stats == {"dirs": 34, "files": 90, "lines": 124}
+    assert parallel.getvalue() == serial.getvalue()
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符號連結")
+def test_symlinked_directories_are_not_followed(tmp_path):
+    (tmp_path / "real").mkdir()
+    (tmp_path / "real" / "a.xlsx").touch()
+    try:
+        os.symlink(tmp_path, tmp_path / "real" / "loop", target_is_directory=True)
+    except OSError:
+        pytest.skip("無法建立符號連結")
+    assert generate_tree(tmp_path).splitlines() == ["└── real/", "    ├── loop/", "    └── a.xlsx"]